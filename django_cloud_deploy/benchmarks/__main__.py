@@ -0,0 +1,93 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""Run offline performance benchmarks and write the results as JSON.
+
+Example: python -m django_cloud_deploy.benchmarks --output results.json \
+         --baseline previous_results.json
+"""
+
+import argparse
+import sys
+
+from django_cloud_deploy.benchmarks import cli_benchmark
+from django_cloud_deploy.benchmarks import runner
+from django_cloud_deploy.benchmarks import skeleton_benchmark
+from django_cloud_deploy.benchmarks import upload_benchmark
+from django_cloud_deploy.benchmarks import workflow_benchmark
+
+_BENCHMARKS = {
+    'generate_all_source_files':
+        skeleton_benchmark.benchmark_generate_all_source_files,
+    'setup_django_environment':
+        skeleton_benchmark.benchmark_setup_django_environment,
+    'import_cli_new':
+        lambda iterations: cli_benchmark.benchmark_import_time(
+            'django_cloud_deploy.cli.new', iterations),
+    'upload_content':
+        upload_benchmark.benchmark_upload_content,
+    'create_and_deploy_new_project':
+        workflow_benchmark.benchmark_create_and_deploy_new_project,
+}
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--output',
+        default='benchmark_results.json',
+        help='Path of the JSON file to write results to.')
+    parser.add_argument(
+        '--iterations',
+        type=int,
+        default=5,
+        help='How many times each benchmark is run.')
+    parser.add_argument(
+        '--benchmark',
+        action='append',
+        choices=sorted(_BENCHMARKS),
+        help='Name of a benchmark to run. All benchmarks run by default.')
+    parser.add_argument(
+        '--baseline',
+        help=('Path of a JSON file written by a previous run to compare '
+              'results with.'))
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=1.2,
+        help=('Ratio over the baseline median above which a benchmark is '
+              'regarded as regressed.'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.benchmark or sorted(_BENCHMARKS):
+        print('Running {}...'.format(name), file=sys.stderr)
+        results[name] = _BENCHMARKS[name](args.iterations)
+        print('{}: median {:.4f}s'.format(name, results[name]['median']),
+              file=sys.stderr)
+    runner.write_results(results, args.output)
+
+    if args.baseline:
+        regressions = runner.compare_results(results, args.baseline,
+                                             args.threshold)
+        if regressions:
+            print('\n'.join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
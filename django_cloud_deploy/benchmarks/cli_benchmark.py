@@ -0,0 +1,54 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks of the command line interface."""
+
+import os
+import subprocess
+import sys
+from typing import Any, Dict
+
+from django_cloud_deploy.benchmarks import runner
+
+# Prints how long importing the module takes in a fresh interpreter.
+_IMPORT_SCRIPT = """
+import importlib
+import sys
+import time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def benchmark_import_time(module_name: str,
+                          iterations: int) -> Dict[str, Any]:
+    """Time importing the given module in a new interpreter.
+
+    Args:
+        module_name: Full name of the module to import, like
+            "django_cloud_deploy.cli.new".
+        iterations: How many interpreters to start.
+
+    Returns:
+        Statistics of the import times.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    samples = []
+    for _ in range(iterations):
+        output = subprocess.check_output(
+            [sys.executable, '-c', _IMPORT_SCRIPT, module_name],
+            env=env,
+            universal_newlines=True)
+        samples.append(float(output.strip().splitlines()[-1]))
+    return runner.summarize(samples)
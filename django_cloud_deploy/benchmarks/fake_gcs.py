@@ -0,0 +1,189 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A fake Google Cloud Storage server for offline benchmarks.
+
+It only implements the JSON API used to upload objects, which is enough to
+drive StaticContentServeClient.upload_content over real HTTP connections.
+"""
+
+from email import parser
+from http import server
+import json
+import re
+import socketserver
+import threading
+from typing import Any, Dict
+
+from googleapiclient import discovery
+import httplib2
+
+# A minimal discovery document of the storage API, only describing
+# "objects.insert".
+_DISCOVERY_DOCUMENT = {
+    'kind': 'discovery#restDescription',
+    'discoveryVersion': 'v1',
+    'id': 'storage:v1',
+    'name': 'storage',
+    'version': 'v1',
+    'rootUrl': '{root_url}',
+    'servicePath': 'storage/v1/',
+    'batchPath': 'batch/storage/v1',
+    'parameters': {},
+    'schemas': {
+        'Object': {
+            'id': 'Object',
+            'type': 'object',
+            'properties': {
+                'name': {
+                    'type': 'string'
+                }
+            }
+        }
+    },
+    'resources': {
+        'objects': {
+            'methods': {
+                'insert': {
+                    'id': 'storage.objects.insert',
+                    'path': 'b/{bucket}/o',
+                    'httpMethod': 'POST',
+                    'parameters': {
+                        'bucket': {
+                            'type': 'string',
+                            'required': True,
+                            'location': 'path'
+                        },
+                        'name': {
+                            'type': 'string',
+                            'location': 'query'
+                        }
+                    },
+                    'parameterOrder': ['bucket'],
+                    'request': {
+                        '$ref': 'Object'
+                    },
+                    'response': {
+                        '$ref': 'Object'
+                    },
+                    'supportsMediaUpload': True,
+                    'mediaUpload': {
+                        'accept': ['*/*'],
+                        'protocols': {
+                            'simple': {
+                                'multipart': True,
+                                'path': '/upload/storage/v1/b/{bucket}/o'
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+
+_UPLOAD_PATH_PATTERN = re.compile(r'^/upload/storage/v1/b/([^/?]+)/o')
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, server.HTTPServer):
+    daemon_threads = True
+
+
+class _RequestHandler(server.BaseHTTPRequestHandler):
+    """Handles object uploads and stores them in the server."""
+
+    protocol_version = 'HTTP/1.1'
+    # Avoid delayed ACKs skewing timings of small requests.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        content = self.rfile.read(int(self.headers['Content-Length']))
+        match = _UPLOAD_PATH_PATTERN.match(self.path)
+        if not match:
+            self._send_json(404, {'error': {'code': 404}})
+            return
+        bucket_name = match.group(1)
+        name = self._get_object_name(self.headers['Content-Type'], content)
+        self.server.fake_gcs.add_object(bucket_name, name, len(content))
+        self._send_json(200, {'bucket': bucket_name, 'name': name})
+
+    @staticmethod
+    def _get_object_name(content_type: str, content: bytes) -> str:
+        """Returns object name in the metadata part of a multipart upload."""
+        message = parser.BytesParser().parsebytes(
+            'Content-Type: {}\r\n\r\n'.format(content_type).encode() +
+            content)
+        metadata = message.get_payload()[0].get_payload()
+        return json.loads(metadata)['name']
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        del args  # Unused. Requests are not logged.
+
+
+class FakeGcsServer(object):
+    """A local HTTP server accepting uploads like Google Cloud Storage.
+
+    Usage:
+        with FakeGcsServer() as fake_gcs:
+            client = static_content_serve.StaticContentServeClient(
+                fake_gcs.build_storage_service())
+    """
+
+    def __init__(self):
+        self._httpd = None
+        self._thread = None
+        self._lock = threading.Lock()
+        # Map from bucket name to {object name: size of the request body}
+        self.buckets = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def add_object(self, bucket_name: str, object_name: str, size: int):
+        with self._lock:
+            self.buckets.setdefault(bucket_name, {})[object_name] = size
+
+    def start(self):
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), _RequestHandler)
+        self._httpd.fake_gcs = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def build_storage_service(self) -> discovery.Resource:
+        """Build a storage api client sending requests to this server."""
+        document = json.dumps(_DISCOVERY_DOCUMENT).replace(
+            '{root_url}', self.url)
+        return discovery.build_from_document(document, http=httplib2.Http())
@@ -0,0 +1,943 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""An in-process emulator of the Google Cloud APIs used by the workflow.
+
+The emulator answers requests made through googleapiclient for the
+cloudresourcemanager, cloudbilling, serviceusage, iam, sqladmin, storage and
+container APIs, and fakes docker, kubernetes, gcloud and cloud_sql_proxy. This
+makes it possible to run WorkflowManager.create_and_deploy_new_project
+offline and to time the orchestration overhead of the workflow.
+
+Every request takes "latency" seconds. Long running operations like creating a
+Cloud SQL instance take the durations given in "operation_durations".
+
+Usage:
+    emulator = gcp_emulator.GcpEmulator(latency=0.05)
+    with emulator.patch():
+        workflow_manager = workflow.WorkflowManager(
+            gcp_emulator.FakeCredentials(), 'gke')
+        workflow_manager.create_and_deploy_new_project(...)
+"""
+
+import base64
+import contextlib
+import copy
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import types
+from typing import Any, Callable, Dict, Optional
+from unittest import mock
+
+import django
+import docker
+from googleapiclient import discovery
+from googleapiclient import errors
+import httplib2
+import kubernetes
+
+from django_cloud_deploy import tracing
+from google.auth import credentials
+
+# The only billing account of the emulated user.
+BILLING_ACCOUNT_NAME = 'billingAccounts/000000-000000-000000'
+
+# Default durations of long running operations in seconds.
+DEFAULT_OPERATION_DURATIONS = {
+    'project_creation': 0.0,
+    'service_enabling': 0.0,
+    'sql_instance_creation': 0.0,
+    'cluster_creation': 0.0,
+    'docker_build': 0.0,
+    'docker_push': 0.0,
+    'deployment_rollout': 0.0,
+    'load_balancer_provisioning': 0.0,
+}
+
+_FAKE_TOOLS = {
+    'gcloud': '#!/bin/sh\nexit 0\n',
+    'cloud_sql_proxy': ('#!/bin/sh\necho "Ready for new connections"\n'
+                        'exec sleep 3600\n'),
+}
+
+# Settings module used instead of the settings of the generated project.
+_SETTINGS_TEMPLATE = """from {settings_module} import *  # noqa: F401,F403
+
+DATABASES = {{
+    'default': {{
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': {database_path!r},
+    }}
+}}
+"""
+
+
+def _http_error(status: int) -> errors.HttpError:
+    return errors.HttpError(
+        httplib2.Response({'status': status}),
+        json.dumps({
+            'error': {
+                'code': status
+            }
+        }).encode('utf-8'))
+
+
+class FakeCredentials(credentials.Credentials):
+    """Credentials which always have a token and never talk to Google."""
+
+    def __init__(self):
+        super().__init__()
+        self.token = 'fake-token'
+
+    def refresh(self, request):
+        del request  # Unused.
+        self.token = 'fake-token'
+
+
+class _FakeRequest(object):
+    """A fake googleapiclient.http.HttpRequest served by the emulator."""
+
+    def __init__(self, emulator: 'GcpEmulator', api_name: str,
+                 method_name: str, handler: Callable[..., Dict[str, Any]],
+                 kwargs: Dict[str, Any]):
+        self._emulator = emulator
+        self._api_name = api_name
+        self._method_name = method_name
+        self._handler = handler
+        self._kwargs = kwargs
+
+    def execute(self) -> Dict[str, Any]:
+        self._emulator.record_call(self._api_name, self._method_name)
+        with tracing.span(
+                '.'.join([self._api_name, self._method_name]),
+                category='api',
+                api=self._api_name) as api_span:
+            if self._emulator.latency:
+                time.sleep(self._emulator.latency)
+            try:
+                with self._emulator.lock:
+                    response = self._handler(**self._kwargs)
+            except errors.HttpError as e:
+                api_span.set_attribute('http.status', e.resp.status)
+                raise
+            api_span.set_attribute('http.status', 200)
+            return response
+
+
+class _FakeResource(object):
+    """A fake googleapiclient.discovery.Resource.
+
+    Calling an attribute returns either a nested resource, e.g. "projects()",
+    or a request, e.g. "projects().get(projectId='abc')", depending on whether
+    the API defines a handler for the method.
+    """
+
+    def __init__(self, api: '_FakeApi', path: str = ''):
+        self._api = api
+        self._path = path
+
+    def __getattr__(self, name: str):
+        path = '.'.join([self._path, name]) if self._path else name
+
+        def call(**kwargs):
+            handler = self._api.get_handler(path)
+            if handler:
+                return _FakeRequest(self._api.emulator, self._api.NAME, path,
+                                    handler, kwargs)
+            return _FakeResource(self._api, path)
+
+        return call
+
+
+class _FakeApi(object):
+    """Base class of emulated APIs.
+
+    Subclasses map method paths like "projects.get" to the name of the
+    method handling them in _METHODS.
+    """
+
+    NAME = ''
+    _METHODS = {}
+
+    def __init__(self, emulator: 'GcpEmulator'):
+        self.emulator = emulator
+
+    def get_handler(self, path: str) -> Optional[Callable[..., Dict]]:
+        method_name = self._METHODS.get(path)
+        return getattr(self, method_name) if method_name else None
+
+    def build(self) -> _FakeResource:
+        return _FakeResource(self)
+
+
+class _CloudResourceManagerApi(_FakeApi):
+
+    NAME = 'cloudresourcemanager'
+    _METHODS = {
+        'projects.get': '_get_project',
+        'projects.create': '_create_project',
+        'projects.getIamPolicy': '_get_iam_policy',
+        'projects.setIamPolicy': '_set_iam_policy',
+        'organizations.search': '_search_organizations',
+        'operations.get': '_get_operation',
+    }
+
+    def _get_project(self, projectId: str):
+        project = self.emulator.projects.get(projectId)
+        # Like the real API, projects being created are not visible yet and
+        # unknown projects are reported as forbidden.
+        if not project or not self.emulator.is_done(project['createTime'],
+                                                    'project_creation'):
+            raise _http_error(403)
+        return {
+            'projectId': projectId,
+            'name': project['name'],
+            'lifecycleState': 'ACTIVE'
+        }
+
+    def _create_project(self, body: Dict[str, Any]):
+        project_id = body['projectId']
+        if project_id in self.emulator.projects:
+            raise _http_error(409)
+        self.emulator.projects[project_id] = {
+            'name': body.get('name', project_id),
+            'createTime': time.monotonic(),
+            'billingAccountName': '',
+            'iamPolicy': {
+                'bindings': [{
+                    'role': 'roles/owner',
+                    'members': ['user:fake@example.com']
+                }],
+                'etag': 'BwAAAAAAAAA='
+            },
+            'services': {},
+            'serviceAccounts': set(),
+        }
+        return self.emulator.start_operation(
+            'operations/cp.{}'.format(len(self.emulator.projects)),
+            'project_creation', {'projectId': project_id})
+
+    def _get_operation(self, name: str):
+        return self.emulator.get_operation(name)
+
+    def _get_iam_policy(self, resource: str, body: Dict[str, Any] = None):
+        del body  # Unused.
+        return copy.deepcopy(self.emulator.get_project(resource)['iamPolicy'])
+
+    def _set_iam_policy(self, resource: str, body: Dict[str, Any]):
+        project = self.emulator.get_project(resource)
+        # Like the real API, a policy with a stale etag is rejected.
+        etag = body['policy'].get('etag')
+        if etag is not None and etag != project['iamPolicy']['etag']:
+            raise _http_error(409)
+        version = int.from_bytes(
+            base64.b64decode(project['iamPolicy']['etag']), 'big') + 1
+        policy = copy.deepcopy(body['policy'])
+        policy['etag'] = base64.b64encode(version.to_bytes(8, 'big')).decode()
+        project['iamPolicy'] = policy
+        return copy.deepcopy(policy)
+
+    def _search_organizations(self, body: Dict[str, Any]):
+        del body  # Unused.
+        return {}
+
+
+class _CloudBillingApi(_FakeApi):
+
+    NAME = 'cloudbilling'
+    _METHODS = {
+        'projects.getBillingInfo': '_get_billing_info',
+        'projects.updateBillingInfo': '_update_billing_info',
+        'billingAccounts.list': '_list_billing_accounts',
+    }
+
+    def _get_billing_info(self, name: str):
+        project_id = name.split('/')[-1]
+        project = self.emulator.get_project(project_id)
+        return {
+            'name': '{}/billingInfo'.format(name),
+            'projectId': project_id,
+            'billingAccountName': project['billingAccountName'],
+            'billingEnabled': bool(project['billingAccountName'])
+        }
+
+    def _update_billing_info(self, name: str, body: Dict[str, Any]):
+        project = self.emulator.get_project(name.split('/')[-1])
+        project['billingAccountName'] = body['billingAccountName']
+        return self._get_billing_info(name)
+
+    def _list_billing_accounts(self):
+        return {
+            'billingAccounts': [{
+                'name': BILLING_ACCOUNT_NAME,
+                'displayName': 'Fake Billing Account',
+                'open': True
+            }]
+        }
+
+
+class _ServiceUsageApi(_FakeApi):
+
+    NAME = 'serviceusage'
+    _METHODS = {
+        'services.enable': '_enable_service',
+        'services.batchEnable': '_batch_enable_services',
+        'services.get': '_get_service',
+        'operations.get': '_get_operation',
+    }
+
+    def _enable_service(self, name: str):
+        project_id = name.split('/')[1]
+        services = self.emulator.get_project(project_id)['services']
+        services.setdefault(name, time.monotonic())
+        return {'name': 'operations/acf.{}'.format(len(services))}
+
+    def _batch_enable_services(self, parent: str, body: Dict[str, Any]):
+        services = self.emulator.get_project(parent.split('/')[1])['services']
+        now = time.monotonic()
+        for service_id in body['serviceIds']:
+            services.setdefault('/'.join([parent, 'services', service_id]), now)
+        return self.emulator.start_operation(
+            'operations/acf.{}'.format(len(services)), 'service_enabling', {})
+
+    def _get_operation(self, name: str):
+        return self.emulator.get_operation(name)
+
+    def _get_service(self, name: str):
+        project_id = name.split('/')[1]
+        enable_time = self.emulator.get_project(project_id)['services'].get(
+            name)
+        enabled = (enable_time is not None and
+                   self.emulator.is_done(enable_time, 'service_enabling'))
+        return {'name': name, 'state': 'ENABLED' if enabled else 'DISABLED'}
+
+
+class _IamApi(_FakeApi):
+
+    NAME = 'iam'
+    _METHODS = {
+        'projects.serviceAccounts.create': '_create_service_account',
+        'projects.serviceAccounts.keys.create': '_create_key',
+    }
+
+    def _create_service_account(self, name: str, body: Dict[str, Any]):
+        project_id = name.split('/')[1]
+        service_accounts = self.emulator.get_project(project_id)[
+            'serviceAccounts']
+        email = '{}@{}.iam.gserviceaccount.com'.format(body['accountId'],
+                                                       project_id)
+        if email in service_accounts:
+            raise _http_error(409)
+        service_accounts.add(email)
+        return {
+            'name': '{}/serviceAccounts/{}'.format(name, email),
+            'email': email,
+            'displayName': body['serviceAccount']['displayName']
+        }
+
+    def _create_key(self, name: str, body: Dict[str, Any]):
+        del body  # Unused.
+        _, project_id, _, email = name.split('/')
+        if email not in self.emulator.get_project(project_id)[
+                'serviceAccounts']:
+            raise _http_error(400)
+        key_file = {
+            'type': 'service_account',
+            'project_id': project_id,
+            'private_key_id': 'fake-key-id',
+            'private_key': 'fake-private-key',
+            'client_email': email,
+        }
+        return {
+            'name': '{}/keys/fake-key-id'.format(name),
+            'privateKeyData': base64.standard_b64encode(
+                json.dumps(key_file).encode('utf-8')).decode('utf-8')
+        }
+
+
+class _SqlAdminApi(_FakeApi):
+
+    NAME = 'sqladmin'
+    _METHODS = {
+        'instances.insert': '_insert_instance',
+        'instances.get': '_get_instance',
+        'databases.insert': '_insert_database',
+        'databases.get': '_get_database',
+        'users.update': '_update_user',
+    }
+
+    def _insert_instance(self, project: str, body: Dict[str, Any]):
+        instances = self.emulator.sql_instances
+        key = (project, body['name'])
+        if key in instances:
+            raise _http_error(409)
+        instances[key] = {'createTime': time.monotonic(), 'databases': set()}
+        return {'status': 'PENDING', 'operationType': 'CREATE'}
+
+    def _get_sql_instance(self, project: str, instance: str):
+        sql_instance = self.emulator.sql_instances.get((project, instance))
+        if not sql_instance:
+            raise _http_error(404)
+        return sql_instance
+
+    def _get_instance(self, project: str, instance: str):
+        sql_instance = self._get_sql_instance(project, instance)
+        runnable = self.emulator.is_done(sql_instance['createTime'],
+                                         'sql_instance_creation')
+        return {
+            'name': instance,
+            'project': project,
+            'state': 'RUNNABLE' if runnable else 'PENDING_CREATE'
+        }
+
+    def _insert_database(self, project: str, instance: str,
+                         body: Dict[str, Any]):
+        self._get_sql_instance(project, instance)['databases'].add(
+            body['name'])
+        return {'status': 'DONE', 'operationType': 'CREATE_DATABASE'}
+
+    def _get_database(self, project: str, instance: str, database: str):
+        if database not in self._get_sql_instance(project,
+                                                  instance)['databases']:
+            raise _http_error(404)
+        return {'name': database, 'instance': instance, 'status': 'DONE'}
+
+    def _update_user(self, project: str, instance: str, name: str,
+                     body: Dict[str, Any], host: str = None):
+        del name, body, host  # Unused.
+        self._get_sql_instance(project, instance)
+        return {'status': 'DONE', 'operationType': 'UPDATE_USER'}
+
+
+class _StorageApi(_FakeApi):
+
+    NAME = 'storage'
+    _METHODS = {
+        'buckets.insert': '_insert_bucket',
+        'buckets.get': '_get_bucket_resource',
+        'buckets.list': '_list_buckets',
+        'buckets.getIamPolicy': '_get_bucket_iam_policy',
+        'buckets.setIamPolicy': '_set_bucket_iam_policy',
+        'objects.insert': '_insert_object',
+    }
+
+    def _get_bucket(self, bucket: str):
+        if bucket not in self.emulator.buckets:
+            raise _http_error(404)
+        return self.emulator.buckets[bucket]
+
+    def _get_bucket_resource(self, bucket: str):
+        self._get_bucket(bucket)
+        return {'name': bucket}
+
+    def _list_buckets(self, project: str, prefix: str = ''):
+        names = sorted(
+            name for name, bucket in self.emulator.buckets.items()
+            if bucket['project'] == project and name.startswith(prefix))
+        return {'items': [{'name': name} for name in names]}
+
+    def _insert_bucket(self, project: str, body: Dict[str, Any]):
+        if body['name'] in self.emulator.buckets:
+            raise _http_error(409)
+        self.emulator.buckets[body['name']] = {
+            'project': project,
+            'iamPolicy': {
+                'bindings': [{
+                    'role': 'roles/storage.legacyBucketOwner',
+                    'members': ['projectOwner:fake']
+                }]
+            },
+            'objects': {}
+        }
+        return {'name': body['name']}
+
+    def _get_bucket_iam_policy(self, bucket: str):
+        return self._get_bucket(bucket)['iamPolicy']
+
+    def _set_bucket_iam_policy(self, bucket: str, body: Dict[str, Any]):
+        self._get_bucket(bucket)['iamPolicy'] = body
+        return body
+
+    def _insert_object(self, bucket: str, body: Dict[str, Any],
+                       media_body=None):
+        size = media_body.size() if media_body else 0
+        self._get_bucket(bucket)['objects'][body['name']] = size
+        self.emulator.record_bytes(self.NAME, size)
+        return {'bucket': bucket, 'name': body['name'], 'size': str(size)}
+
+
+class _ContainerApi(_FakeApi):
+
+    NAME = 'container'
+    _METHODS = {
+        'projects.locations.getServerConfig': '_get_server_config',
+        'projects.locations.clusters.create': '_create_cluster',
+        'projects.locations.clusters.get': '_get_cluster',
+    }
+
+    # Zones GKE picks for a regional cluster when none are given.
+    _DEFAULT_ZONE_COUNT = 3
+
+    def _get_server_config(self, name: str):
+        del name  # Unused.
+        return {'defaultClusterVersion': '1.10.9-gke.5'}
+
+    def _create_cluster(self, parent: str, body: Dict[str, Any]):
+        name = '{}/clusters/{}'.format(parent, body['cluster']['name'])
+        if name in self.emulator.clusters:
+            raise _http_error(409)
+        location = parent.rsplit('/', 1)[-1]
+        locations = body['cluster'].get('locations') or [
+            '{}-{}'.format(location, zone)
+            for zone in 'abc'[:self._DEFAULT_ZONE_COUNT]
+        ]
+        self.emulator.clusters[name] = {
+            'createTime': time.monotonic(),
+            'locations': locations,
+            'nodesPerZone': body['cluster']['nodePools'][0]['initialNodeCount']
+        }
+        return {'name': 'operation-fake', 'status': 'RUNNING'}
+
+    def _get_cluster(self, name: str):
+        cluster = self.emulator.clusters.get(name)
+        if not cluster:
+            raise _http_error(404)
+        running = self.emulator.is_done(cluster['createTime'],
+                                        'cluster_creation')
+        node_count = cluster['nodesPerZone'] * len(cluster['locations'])
+        return {
+            'name': name.rsplit('/', 1)[-1],
+            'status': 'RUNNING' if running else 'PROVISIONING',
+            'locations': cluster['locations'],
+            'currentNodeCount': node_count if running else 0,
+            'nodePools': [{
+                'name': 'default-pool',
+                'initialNodeCount': cluster['nodesPerZone']
+            }],
+            'endpoint': '127.0.0.1',
+            'masterAuth': {
+                'clusterCaCertificate':
+                    base64.standard_b64encode(b'fake-ca').decode('utf-8')
+            }
+        }
+
+
+class _ComputeApi(_FakeApi):
+    """Emulates the global resources of a Cloud CDN load balancer.
+
+    Operations creating resources are done right away.
+    """
+
+    NAME = 'compute'
+    _METHODS = {
+        'globalAddresses.insert': '_insert_address',
+        'globalAddresses.get': '_get_address',
+        'backendBuckets.insert': '_insert_backend_bucket',
+        'urlMaps.insert': '_insert_url_map',
+        'urlMaps.invalidateCache': '_invalidate_cache',
+        'targetHttpProxies.insert': '_insert_target_http_proxy',
+        'globalForwardingRules.insert': '_insert_forwarding_rule',
+        'globalOperations.get': '_get_operation',
+    }
+
+    def _insert(self, project: str, collection: str, body: Dict[str, Any]):
+        key = (project, collection, body['name'])
+        if key in self.emulator.compute_resources:
+            raise _http_error(409)
+        self.emulator.compute_resources[key] = body
+        return {
+            'name': 'operation-insert-{}'.format(body['name']),
+            'status': 'DONE'
+        }
+
+    def _get(self, project: str, collection: str, name: str):
+        resource = self.emulator.compute_resources.get((project, collection,
+                                                        name))
+        if resource is None:
+            raise _http_error(404)
+        return resource
+
+    def _insert_address(self, project: str, body: Dict[str, Any]):
+        body = dict(body, address='203.0.113.{}'.format(
+            len(self.emulator.compute_resources) + 1))
+        return self._insert(project, 'globalAddresses', body)
+
+    def _get_address(self, project: str, address: str):
+        return self._get(project, 'globalAddresses', address)
+
+    def _insert_backend_bucket(self, project: str, body: Dict[str, Any]):
+        if body['bucketName'] not in self.emulator.buckets:
+            raise _http_error(400)
+        return self._insert(project, 'backendBuckets', body)
+
+    def _insert_url_map(self, project: str, body: Dict[str, Any]):
+        self._get(project, 'backendBuckets',
+                  body['defaultService'].rsplit('/', 1)[-1])
+        return self._insert(project, 'urlMaps', body)
+
+    def _invalidate_cache(self, project: str, urlMap: str,
+                          body: Dict[str, Any]):
+        del body  # Unused.
+        self._get(project, 'urlMaps', urlMap)
+        return {'name': 'operation-invalidate', 'status': 'DONE'}
+
+    def _insert_target_http_proxy(self, project: str, body: Dict[str, Any]):
+        self._get(project, 'urlMaps', body['urlMap'].rsplit('/', 1)[-1])
+        return self._insert(project, 'targetHttpProxies', body)
+
+    def _insert_forwarding_rule(self, project: str, body: Dict[str, Any]):
+        self._get(project, 'targetHttpProxies',
+                  body['target'].rsplit('/', 1)[-1])
+        return self._insert(project, 'globalForwardingRules', body)
+
+    def _get_operation(self, project: str, operation: str):
+        del project  # Unused.
+        return {'name': operation, 'status': 'DONE'}
+
+
+_APIS = {
+    api.NAME: api for api in (_CloudResourceManagerApi, _CloudBillingApi,
+                              _ServiceUsageApi, _IamApi, _SqlAdminApi,
+                              _StorageApi, _ContainerApi, _ComputeApi)
+}
+
+
+class _FakeImageCollection(object):
+    """Fake of docker.models.images.ImageCollection."""
+
+    def __init__(self, emulator: 'GcpEmulator'):
+        self._emulator = emulator
+
+    def build(self, tag: str, path: str, **kwargs):
+        del kwargs  # Unused.
+        if not os.path.exists(os.path.join(path, 'Dockerfile')):
+            raise docker.errors.BuildError('Dockerfile not found', [])
+        self._emulator.record_call('docker', 'images.build')
+        self._emulator.wait_for('docker_build')
+        self._emulator.images.add(tag)
+
+    def push(self, repository: str, **kwargs):
+        del kwargs  # Unused.
+        self._emulator.record_call('docker', 'images.push')
+        if repository not in self._emulator.images:
+            raise docker.errors.ImageNotFound(repository)
+        self._emulator.wait_for('docker_push')
+        # Progress messages of a single layer, as with stream=True.
+        return iter([{
+            'status': 'Pushing',
+            'id': 'layer',
+            'progressDetail': {
+                'current': 0,
+                'total': 1024
+            }
+        }, {
+            'status': 'Pushed',
+            'id': 'layer',
+            'progressDetail': {}
+        }])
+
+
+class _FakeDockerClient(object):
+    """Fake of docker.DockerClient."""
+
+    def __init__(self, emulator: 'GcpEmulator'):
+        self.images = _FakeImageCollection(emulator)
+        self._emulator = emulator
+
+    def login(self,
+              username: str,
+              password: str,
+              registry: str,
+              reauth: bool = False):
+        del username, password, registry, reauth  # Unused.
+        self._emulator.record_call('docker', 'login')
+        return {'Status': 'Login Succeeded'}
+
+
+class _FakeKubernetesApi(object):
+    """Base class of fakes of kubernetes.client APIs."""
+
+    def __init__(self, emulator: 'GcpEmulator', api_client=None):
+        del api_client  # Unused.
+        self._emulator = emulator
+
+    def _record_call(self, method_name: str):
+        self._emulator.record_call('kubernetes', method_name)
+        if self._emulator.latency:
+            time.sleep(self._emulator.latency)
+
+    @staticmethod
+    def _matches(body: Dict[str, Any], label_selector: Optional[str]) -> bool:
+        if not label_selector:
+            return True
+        labels = body.get('metadata', {}).get('labels') or {}
+        return all(
+            labels.get(key) == value for key, value in
+            (requirement.split('=') for requirement in label_selector.split(',')))
+
+
+class _FakeCoreV1Api(_FakeKubernetesApi):
+
+    def create_namespaced_secret(self, namespace: str, body, **kwargs):
+        del kwargs  # Unused.
+        self._record_call('create_namespaced_secret')
+        self._emulator.kubernetes_objects['secrets'][(
+            namespace, body.metadata['name'])] = body
+        return body
+
+    def create_namespaced_service(self, namespace: str, body: Dict[str, Any],
+                                  **kwargs):
+        del kwargs  # Unused.
+        self._record_call('create_namespaced_service')
+        self._emulator.kubernetes_objects['services'][(
+            namespace, body['metadata']['name'])] = (body, time.monotonic())
+        return body
+
+    def list_service_for_all_namespaces(self, **kwargs):
+        del kwargs  # Unused.
+        self._record_call('list_service_for_all_namespaces')
+        items = []
+        for body, create_time in list(
+                self._emulator.kubernetes_objects['services'].values()):
+            ingress = None
+            if (body.get('spec', {}).get('type') == 'LoadBalancer' and
+                    self._emulator.is_done(create_time,
+                                           'load_balancer_provisioning')):
+                ingress = [types.SimpleNamespace(hostname=None, ip='127.0.0.1')]
+            items.append(
+                types.SimpleNamespace(
+                    metadata=types.SimpleNamespace(
+                        name=body['metadata']['name']),
+                    status=types.SimpleNamespace(
+                        load_balancer=types.SimpleNamespace(ingress=ingress))))
+        return types.SimpleNamespace(items=items)
+
+
+class _FakeExtensionsV1beta1Api(_FakeKubernetesApi):
+
+    def create_namespaced_deployment(self, namespace: str,
+                                     body: Dict[str, Any], **kwargs):
+        del kwargs  # Unused.
+        self._record_call('create_namespaced_deployment')
+        self._emulator.kubernetes_objects['deployments'][(
+            namespace, body['metadata']['name'])] = (body, time.monotonic())
+        return body
+
+    def patch_namespaced_deployment(self, name: str, namespace: str,
+                                    body: Dict[str, Any], **kwargs):
+        del kwargs  # Unused.
+        self._record_call('patch_namespaced_deployment')
+        self._emulator.kubernetes_objects['deployments'][(namespace, name)] = (
+            body, time.monotonic())
+        return body
+
+    def list_deployment_for_all_namespaces(self,
+                                           label_selector: str = None,
+                                           **kwargs):
+        del kwargs  # Unused.
+        self._record_call('list_deployment_for_all_namespaces')
+        items = []
+        for body, create_time in list(
+                self._emulator.kubernetes_objects['deployments'].values()):
+            if not self._matches(body, label_selector):
+                continue
+            ready_replicas = None
+            if self._emulator.is_done(create_time, 'deployment_rollout'):
+                ready_replicas = body.get('spec', {}).get('replicas', 1)
+            items.append(
+                types.SimpleNamespace(
+                    metadata=types.SimpleNamespace(
+                        name=body['metadata']['name']),
+                    spec=types.SimpleNamespace(
+                        replicas=body.get('spec', {}).get('replicas', 1)),
+                    status=types.SimpleNamespace(
+                        ready_replicas=ready_replicas)))
+        return types.SimpleNamespace(items=items)
+
+
+class GcpEmulator(object):
+    """Emulates Google Cloud APIs, docker and kubernetes in process.
+
+    Attributes:
+        latency: Time in seconds every API request takes.
+        operation_durations: Time in seconds each kind of long running
+            operation takes. See DEFAULT_OPERATION_DURATIONS for the keys.
+        api_calls: Number of requests received, keyed by
+            "<api name>.<method path>".
+        api_bytes: Number of bytes uploaded, keyed by api name.
+    """
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 operation_durations: Optional[Dict[str, float]] = None):
+        self.latency = latency
+        self.operation_durations = dict(DEFAULT_OPERATION_DURATIONS)
+        self.operation_durations.update(operation_durations or {})
+        self.lock = threading.RLock()
+        self.api_calls = {}
+        self.api_bytes = {}
+
+        self.operations = {}
+        self.projects = {}
+        self.sql_instances = {}
+        self.buckets = {}
+        self.clusters = {}
+        self.compute_resources = {}
+        self.images = set()
+        self.kubernetes_objects = {
+            'secrets': {},
+            'services': {},
+            'deployments': {},
+        }
+
+    def record_call(self, api_name: str, method_name: str):
+        key = '.'.join([api_name, method_name])
+        with self.lock:
+            self.api_calls[key] = self.api_calls.get(key, 0) + 1
+
+    def record_bytes(self, api_name: str, size: int):
+        with self.lock:
+            self.api_bytes[api_name] = self.api_bytes.get(api_name, 0) + size
+
+    def is_done(self, start_time: float, operation: str) -> bool:
+        """Returns whether an operation started at "start_time" finished."""
+        return (time.monotonic() - start_time >=
+                self.operation_durations[operation])
+
+    def wait_for(self, operation: str):
+        """Block for the duration of a synchronous operation."""
+        duration = self.operation_durations[operation]
+        if duration:
+            time.sleep(duration)
+
+    def start_operation(self, name: str, operation: str,
+                        response: Dict[str, Any]) -> Dict[str, Any]:
+        """Start a long running operation of the kind "operation".
+
+        Returns:
+            The Operation resource, as returned by the API call.
+        """
+        self.operations[name] = (time.monotonic(), operation, response)
+        return self.get_operation(name)
+
+    def get_operation(self, name: str) -> Dict[str, Any]:
+        if name not in self.operations:
+            raise _http_error(404)
+        start_time, operation, response = self.operations[name]
+        if not self.is_done(start_time, operation):
+            return {'name': name, 'done': False}
+        return {'name': name, 'done': True, 'response': response}
+
+    def get_project(self, project_id: str) -> Dict[str, Any]:
+        if project_id not in self.projects:
+            raise _http_error(403)
+        return self.projects[project_id]
+
+    def build(self, serviceName: str, version: str, *args,
+              **kwargs) -> _FakeResource:
+        """A replacement of googleapiclient.discovery.build."""
+        del version, args, kwargs  # Unused.
+        if serviceName not in _APIS:
+            raise ValueError(
+                'API "{}" is not emulated.'.format(serviceName))
+        return _APIS[serviceName](self).build()
+
+    @staticmethod
+    def _create_fake_tools(directory: str):
+        for name, content in _FAKE_TOOLS.items():
+            path = os.path.join(directory, name)
+            with open(path, 'w') as f:
+                f.write(content)
+            os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+    @contextlib.contextmanager
+    def patch(self, database_path: Optional[str] = None):
+        """Route all calls to Google Cloud, docker and kubernetes here.
+
+        Fake "gcloud" and "cloud_sql_proxy" executables are put first on
+        PATH. Django projects set up while patched use a SQLite database
+        instead of Cloud SQL.
+
+        Args:
+            database_path: Path of the SQLite database to use. A temporary
+                file is used by default.
+
+        Yields:
+            None
+        """
+        tools_dir = tempfile.mkdtemp()
+        self._create_fake_tools(tools_dir)
+        database_path = database_path or os.path.join(tools_dir, 'db.sqlite3')
+        django_setup = django.setup
+
+        def setup_emulated_django(*args, **kwargs):
+            # Model classes look up the database backend while Django is set
+            # up, so the database has to be replaced in the settings module
+            # itself.
+            settings_path = os.path.join(tools_dir, '_emulator_settings.py')
+            with open(settings_path, 'w') as f:
+                f.write(
+                    _SETTINGS_TEMPLATE.format(
+                        settings_module=os.environ['DJANGO_SETTINGS_MODULE'],
+                        database_path=database_path))
+            if tools_dir not in sys.path:
+                sys.path.append(tools_dir)
+            os.environ['DJANGO_SETTINGS_MODULE'] = '_emulator_settings'
+            django_setup(*args, **kwargs)
+
+        kubernetes_apis = {
+            'CoreV1Api': _FakeCoreV1Api,
+            'ExtensionsV1beta1Api': _FakeExtensionsV1beta1Api,
+        }
+        patches = [
+            mock.patch.object(discovery, 'build', self.build),
+            mock.patch.object(docker, 'DockerClient',
+                              lambda *args, **kwargs: _FakeDockerClient(self)),
+            mock.patch.object(django, 'setup', setup_emulated_django),
+            mock.patch.dict(
+                os.environ,
+                {'PATH': os.pathsep.join([tools_dir, os.environ['PATH']])}),
+        ] + [
+            mock.patch.object(kubernetes.client, name,
+                              self._kubernetes_api_factory(fake))
+            for name, fake in kubernetes_apis.items()
+        ]
+        try:
+            with contextlib.ExitStack() as stack:
+                for patch in patches:
+                    stack.enter_context(patch)
+                yield
+        finally:
+            shutil.rmtree(tools_dir, ignore_errors=True)
+
+    def _kubernetes_api_factory(self, fake_class: type) -> Callable:
+
+        def create(api_client=None):
+            return fake_class(self, api_client)
+
+        return create
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns numbers of API calls and uploaded bytes."""
+        with self.lock:
+            return {
+                'api_calls': dict(self.api_calls),
+                'total_api_calls': sum(self.api_calls.values()),
+                'api_bytes': dict(self.api_bytes),
+            }
@@ -0,0 +1,122 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Helpers to time benchmarks and to store and compare their results."""
+
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+def time_function(func: Callable[[], Any],
+                  iterations: int = 5,
+                  setup: Optional[Callable[[], Any]] = None,
+                  teardown: Optional[Callable[[], Any]] = None
+                 ) -> Dict[str, Any]:
+    """Time the given function.
+
+    Args:
+        func: The function to time. It is called without arguments.
+        iterations: How many times the function should be called.
+        setup: A function called before each call of "func". It is not
+            timed.
+        teardown: A function called after each call of "func". It is not
+            timed.
+
+    Returns:
+        Statistics of the timings in seconds, like
+            {
+                'iterations': 5,
+                'min': 0.1,
+                'median': 0.12,
+                'mean': 0.13,
+                'max': 0.2,
+                'samples': [...]
+            }
+    """
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+        if teardown:
+            teardown()
+    return summarize(samples)
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Returns statistics of the given timing samples in seconds."""
+    return {
+        'iterations': len(samples),
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.mean(samples),
+        'max': max(samples),
+        'samples': samples,
+    }
+
+
+def write_results(results: Dict[str, Dict[str, Any]], output_path: str):
+    """Write benchmark results as JSON.
+
+    Args:
+        results: Results of each benchmark, keyed by benchmark name.
+        output_path: Path of the JSON file to write.
+    """
+    data = {
+        'timestamp': time.time(),
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(output_path, 'w') as output_file:
+        json.dump(data, output_file, indent=2, sort_keys=True)
+
+
+def compare_results(results: Dict[str, Dict[str, Any]], baseline_path: str,
+                    threshold: float) -> List[str]:
+    """Compare benchmark results with results written previously.
+
+    The median of each benchmark is compared. Benchmarks which do not exist in
+    the baseline are ignored.
+
+    Args:
+        results: Results of each benchmark, keyed by benchmark name.
+        baseline_path: Path of a JSON file written by "write_results".
+        threshold: The ratio of the new median over the baseline median
+            above which a benchmark is regarded as regressed. For example 1.2
+            means 20% slower.
+
+    Returns:
+        Descriptions of the regressed benchmarks.
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline or not baseline[name]['median']:
+            continue
+        ratio = result['median'] / baseline[name]['median']
+        print('{}: {:.4f}s (baseline {:.4f}s, x{:.2f})'.format(
+            name, result['median'], baseline[name]['median'], ratio),
+              file=sys.stderr)
+        if ratio > threshold:
+            regressions.append('{} is {:.0%} slower than the baseline'.format(
+                name, ratio - 1))
+    return regressions
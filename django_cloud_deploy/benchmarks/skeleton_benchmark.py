@@ -0,0 +1,107 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks of the Django source file generator."""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict
+
+from django_cloud_deploy.benchmarks import runner
+from django_cloud_deploy.skeleton import source_generator
+
+_PROJECT_NAME = 'benchmarksite'
+_APP_NAME = 'home'
+
+# Prints how long "setup_django_environment" takes in a fresh interpreter,
+# which is what users pay for on every run.
+_SETUP_DJANGO_ENVIRONMENT_SCRIPT = """
+import sys
+import time
+from django_cloud_deploy.skeleton import source_generator
+generator = source_generator.DjangoSourceFileGenerator()
+start = time.perf_counter()
+generator.setup_django_environment(sys.argv[1], sys.argv[2], 'postgres',
+                                   'fakepassword')
+print(time.perf_counter() - start)
+"""
+
+
+def _generate(generator: source_generator.DjangoSourceFileGenerator,
+              project_dir: str):
+    generator.generate_all_source_files(
+        project_id='fake-project-id',
+        project_name=_PROJECT_NAME,
+        app_name=_APP_NAME,
+        project_dir=project_dir,
+        database_user='postgres',
+        database_password='fakepassword')
+
+
+def _count_files(directory: str) -> int:
+    return sum(len(files) for _, _, files in os.walk(directory))
+
+
+def benchmark_generate_all_source_files(iterations: int) -> Dict[str, Any]:
+    """Time generating a new Django project in an empty directory."""
+    generator = source_generator.DjangoSourceFileGenerator()
+    project_dirs = []
+
+    def setup():
+        project_dirs.append(tempfile.mkdtemp())
+
+    def teardown():
+        shutil.rmtree(project_dirs.pop(), ignore_errors=True)
+
+    # Warm up so that the first sample does not include one time costs like
+    # importing Django management commands.
+    setup()
+    _generate(generator, project_dirs[-1])
+    file_count = _count_files(project_dirs[-1])
+    teardown()
+
+    result = runner.time_function(
+        lambda: _generate(generator, project_dirs[-1]), iterations, setup,
+        teardown)
+    result['files'] = file_count
+    result['files_per_second'] = file_count / result['median']
+    return result
+
+
+def benchmark_setup_django_environment(iterations: int) -> Dict[str, Any]:
+    """Time setting up the environment of a generated project.
+
+    Each sample runs in a new interpreter because Django can only be setup
+    once per process.
+    """
+    project_dir = tempfile.mkdtemp()
+    try:
+        _generate(source_generator.DjangoSourceFileGenerator(), project_dir)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        samples = []
+        for _ in range(iterations):
+            output = subprocess.check_output(
+                [
+                    sys.executable, '-c', _SETUP_DJANGO_ENVIRONMENT_SCRIPT,
+                    project_dir, _PROJECT_NAME
+                ],
+                env=env,
+                universal_newlines=True)
+            samples.append(float(output.strip().splitlines()[-1]))
+        return runner.summarize(samples)
+    finally:
+        shutil.rmtree(project_dir, ignore_errors=True)
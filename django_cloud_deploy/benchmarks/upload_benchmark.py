@@ -0,0 +1,75 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks of uploading static content to Google Cloud Storage."""
+
+import os
+import random
+import shutil
+import tempfile
+from typing import Any, Dict
+
+from django_cloud_deploy.benchmarks import fake_gcs
+from django_cloud_deploy.benchmarks import runner
+from django_cloud_deploy.cloudlib import static_content_serve
+
+_BUCKET_NAME = 'fake-bucket'
+
+# Sizes of the generated static files in bytes. They roughly follow what the
+# Django admin app ships: many small files and a few large ones.
+_FILE_SIZES = [512] * 60 + [4 * 1024] * 30 + [64 * 1024] * 8 + [
+    512 * 1024
+] * 2
+
+
+def _create_static_content(directory: str) -> int:
+    """Create fake static files in the given directory.
+
+    Returns:
+        The total size of the created files in bytes.
+    """
+    rand = random.Random(0)
+    total_size = 0
+    for i, size in enumerate(_FILE_SIZES):
+        subdirectory = os.path.join(directory, 'dir{}'.format(i % 5))
+        os.makedirs(subdirectory, exist_ok=True)
+        with open(os.path.join(subdirectory, 'file{}.css'.format(i)),
+                  'wb') as f:
+            f.write(bytes(rand.getrandbits(8) for _ in range(size)))
+        total_size += size
+    return total_size
+
+
+def benchmark_upload_content(iterations: int) -> Dict[str, Any]:
+    """Time uploading a directory of static files to a fake GCS server."""
+    static_content_dir = tempfile.mkdtemp()
+    try:
+        total_size = _create_static_content(static_content_dir)
+        with fake_gcs.FakeGcsServer() as server:
+            client = static_content_serve.StaticContentServeClient(
+                server.build_storage_service())
+            result = runner.time_function(
+                lambda: client.upload_content(_BUCKET_NAME,
+                                              static_content_dir),
+                iterations)
+            uploaded = len(server.buckets.get(_BUCKET_NAME, {}))
+            if uploaded != len(_FILE_SIZES):
+                raise AssertionError('{} files uploaded, expected {}'.format(
+                    uploaded, len(_FILE_SIZES)))
+        result['files'] = len(_FILE_SIZES)
+        result['bytes'] = total_size
+        result['files_per_second'] = len(_FILE_SIZES) / result['median']
+        result['bytes_per_second'] = total_size / result['median']
+        return result
+    finally:
+        shutil.rmtree(static_content_dir, ignore_errors=True)
@@ -0,0 +1,174 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""Benchmark of WorkflowManager.create_and_deploy_new_project.
+
+The workflow runs against the in-process Google Cloud emulator, so it measures
+the orchestration overhead of the workflow plus the emulated latencies.
+
+Example: python -m django_cloud_deploy.benchmarks.workflow_benchmark \
+         --latency 0.05 --operation-duration sql_instance_creation=5
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from django_cloud_deploy.benchmarks import gcp_emulator
+from django_cloud_deploy.benchmarks import runner
+
+
+def run_create_and_deploy_new_project(
+        latency: float = 0.0,
+        operation_durations: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """Run the workflow of the "new" command once against the emulator.
+
+    Django can only be set up once per process, so this should be called at
+    most once per process.
+
+    Args:
+        latency: Time in seconds every emulated API request takes.
+        operation_durations: Durations of emulated long running operations.
+            See gcp_emulator.DEFAULT_OPERATION_DURATIONS.
+
+    Returns:
+        The duration of the workflow and the emulated API calls it made, like
+            {
+                'seconds': 1.2,
+                'api_calls': {'sqladmin.instances.get': 1, ...},
+                'total_api_calls': 42,
+                'api_bytes': {'storage': 123456}
+            }
+    """
+    # Imported here so that importing this module does not import Django
+    # settings dependent modules.
+    from django_cloud_deploy import workflow
+
+    emulator = gcp_emulator.GcpEmulator(latency, operation_durations)
+    django_directory_path = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        with emulator.patch():
+            workflow_manager = workflow.WorkflowManager(
+                gcp_emulator.FakeCredentials(), 'gke')
+            start = time.perf_counter()
+            # The workflow prints the header of each step.
+            with contextlib.redirect_stdout(io.StringIO()):
+                workflow_manager.create_and_deploy_new_project(
+                    project_name='Benchmark Project',
+                    project_id='benchmark-project',
+                    project_creation_mode=workflow.ProjectCreationMode.CREATE,
+                    billing_account_name=gcp_emulator.BILLING_ACCOUNT_NAME,
+                    django_project_name='benchmarksite',
+                    django_app_name='home',
+                    django_superuser_name='admin',
+                    django_superuser_email='admin@example.com',
+                    django_superuser_password='fakepassword',
+                    django_directory_path=django_directory_path,
+                    database_password='fakepassword',
+                    open_browser=False)
+            seconds = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(django_directory_path, ignore_errors=True)
+    result = emulator.summary()
+    result['seconds'] = seconds
+    return result
+
+
+def benchmark_create_and_deploy_new_project(
+        iterations: int,
+        latency: float = 0.0,
+        operation_durations: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """Time the workflow of the "new" command, each run in a new interpreter.
+
+    Args:
+        iterations: How many times the workflow should be run.
+        latency: Time in seconds every emulated API request takes.
+        operation_durations: Durations of emulated long running operations.
+
+    Returns:
+        Statistics of the durations and the API calls of the last run.
+    """
+    command = [
+        sys.executable, '-m', 'django_cloud_deploy.benchmarks.workflow_benchmark',
+        '--latency', str(latency)
+    ]
+    for operation, duration in (operation_durations or {}).items():
+        command += ['--operation-duration', '{}={}'.format(operation, duration)]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+
+    samples = []
+    run_result = {}
+    for _ in range(iterations):
+        output = subprocess.check_output(
+            command, env=env, universal_newlines=True)
+        run_result = json.loads(output.strip().splitlines()[-1])
+        samples.append(run_result['seconds'])
+    result = runner.summarize(samples)
+    result['total_api_calls'] = run_result.get('total_api_calls')
+    result['api_calls'] = run_result.get('api_calls')
+    return result
+
+
+def _parse_operation_duration(value: str):
+    operation, _, duration = value.partition('=')
+    if operation not in gcp_emulator.DEFAULT_OPERATION_DURATIONS:
+        raise argparse.ArgumentTypeError(
+            'Unknown operation "{}". Valid operations are: {}'.format(
+                operation,
+                ', '.join(sorted(gcp_emulator.DEFAULT_OPERATION_DURATIONS))))
+    try:
+        return operation, float(duration)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'Invalid duration "{}"'.format(duration))
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0.0,
+        help='Time in seconds every emulated API request takes.')
+    parser.add_argument(
+        '--operation-duration',
+        type=_parse_operation_duration,
+        action='append',
+        default=[],
+        help=('Duration of an emulated long running operation, like '
+              '"sql_instance_creation=5". Can be used multiple times.'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+    result = run_create_and_deploy_new_project(
+        args.latency, dict(args.operation_duration))
+    print(json.dumps(result, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Cancellation of the work running in the process, e.g. on Ctrl-C.
+
+Python only interrupts the main thread on Ctrl-C. Worker threads, like those
+polling long running operations, keep going and the process does not exit
+until they finish. Calling cancel() makes them stop:
+    - sleep() and check() raise CancelledError in every thread.
+    - Registered callbacks run, e.g. to kill subprocesses or to remove
+      temporary files.
+
+Usage:
+    with cancellation.cancel_on_interrupt():
+        run_workflow()
+
+    def poll():
+        while not done():
+            cancellation.sleep(2)
+"""
+
+import contextlib
+import itertools
+import logging
+import threading
+from typing import Callable
+
+_cancelled = threading.Event()
+_lock = threading.Lock()
+_callbacks = {}
+_callback_ids = itertools.count()
+
+
+class CancelledError(Exception):
+    """The work was cancelled, e.g. because the user pressed Ctrl-C."""
+
+
+def is_cancelled() -> bool:
+    """Returns whether cancel() was called."""
+    return _cancelled.is_set()
+
+
+def check():
+    """Raise CancelledError if cancel() was called.
+
+    Raises:
+        CancelledError: If cancel() was called.
+    """
+    if _cancelled.is_set():
+        raise CancelledError('Cancelled')
+
+
+def sleep(seconds: float):
+    """Like time.sleep, but wakes up as soon as cancel() is called.
+
+    Args:
+        seconds: Time to sleep.
+
+    Raises:
+        CancelledError: If cancel() was called before or while sleeping.
+    """
+    if _cancelled.wait(seconds):
+        raise CancelledError('Cancelled')
+
+
+def add_callback(callback: Callable[[], None]) -> int:
+    """Register a function to call when cancel() is called.
+
+    The function is called right away if cancel() was already called.
+
+    Args:
+        callback: The function to call. It should not block.
+
+    Returns:
+        An id to pass to remove_callback.
+    """
+    with _lock:
+        callback_id = next(_callback_ids)
+        if not _cancelled.is_set():
+            _callbacks[callback_id] = callback
+            return callback_id
+    callback()
+    return callback_id
+
+
+def remove_callback(callback_id: int):
+    """Unregister a function registered with add_callback."""
+    with _lock:
+        _callbacks.pop(callback_id, None)
+
+
+@contextlib.contextmanager
+def on_cancel(callback: Callable[[], None]):
+    """A context manager calling "callback" if cancel() is called inside.
+
+    Args:
+        callback: The function to call. It should not block.
+
+    Yields:
+        None
+    """
+    callback_id = add_callback(callback)
+    try:
+        yield
+    finally:
+        remove_callback(callback_id)
+
+
+def cancel():
+    """Cancel the work running in the process.
+
+    Registered callbacks are called on the calling thread. Exceptions they
+    raise are logged.
+    """
+    with _lock:
+        _cancelled.set()
+        callbacks = list(_callbacks.values())
+        _callbacks.clear()
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:  # pylint: disable=broad-except
+            logging.exception('Error while cancelling')
+
+
+def reset():
+    """Allow new work to run after cancel() was called."""
+    with _lock:
+        _cancelled.clear()
+
+
+@contextlib.contextmanager
+def cancel_on_interrupt():
+    """A context manager calling cancel() on KeyboardInterrupt.
+
+    The KeyboardInterrupt is raised again after cancelling.
+
+    Yields:
+        None
+    """
+    try:
+        yield
+    except KeyboardInterrupt:
+        cancel()
+        raise
@@ -0,0 +1,326 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Deploy many Django projects on GKE, as listed in a manifest.
+
+A manifest is a YAML or JSON file like:
+
+    defaults:
+      database_password: secret
+    projects:
+      - path: mysite
+      - path: /home/user/blog
+        database_password: other-secret
+        force: true
+
+Each project must have been created with "django-cloud-deploy new". Relative
+paths are relative to the directory of the manifest.
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+from django_cloud_deploy import tool_requirements
+from django_cloud_deploy import workflow
+from django_cloud_deploy.cli import io
+from django_cloud_deploy.cloudlib import auth
+from django_cloud_deploy.cloudlib import quota
+import yaml
+
+from google.auth import credentials
+from google.auth.transport import requests
+from google.oauth2 import credentials as oauth2_credentials
+
+# Keys a project in the manifest can have. They are the arguments of
+# WorkflowManager.update_project with the same names.
+_PROJECT_KEYS = ('path', 'database_password', 'migrate_in_cluster',
+                 'lock_timeout', 'statement_timeout', 'force')
+_REQUIRED_PROJECT_KEYS = ('path', 'database_password')
+
+_DEFAULT_MAX_CONCURRENCY = 4
+
+
+def add_arguments(parser):
+
+    parser.add_argument(
+        'manifest',
+        help='The YAML or JSON file listing the Django projects to deploy.')
+
+    parser.add_argument(
+        '--max-concurrency',
+        dest='max_concurrency',
+        type=int,
+        default=_DEFAULT_MAX_CONCURRENCY,
+        help=('The maximum number of projects deployed at the same time. '
+              'Lower it if deployments fail because of API quotas.'))
+
+    parser.add_argument(
+        '--log-dir',
+        dest='log_dir',
+        help=('The directory to write the output of the deployment of each '
+              'project to. Defaults to a new temporary directory.'))
+
+    parser.add_argument(
+        '--report',
+        dest='report',
+        help='The file to write the result of each deployment to, as JSON.')
+
+    parser.add_argument(
+        '--credentials',
+        dest='credentials',
+        help=('The file path of the credentials file to use for deployment. '
+              'Test only, do not use.'))
+
+
+def load_manifest(manifest_path: str) -> List[Dict[str, Any]]:
+    """Load the projects to deploy from a manifest.
+
+    Args:
+        manifest_path: The path of the YAML or JSON manifest.
+
+    Returns:
+        The projects to deploy. Each project is a dictionary with the keys in
+        _PROJECT_KEYS. Its "path" is absolute.
+
+    Raises:
+        ValueError: If the manifest is invalid.
+    """
+    try:
+        with open(manifest_path) as f:
+            manifest = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError) as e:
+        raise ValueError('Not able to read manifest "{}": {}'.format(
+            manifest_path, e))
+    if not isinstance(manifest, dict) or not isinstance(
+            manifest.get('projects'), list):
+        raise ValueError(
+            'Manifest "{}" must have a list of "projects".'.format(
+                manifest_path))
+
+    defaults = manifest.get('defaults') or {}
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    projects = []
+    paths = set()
+    for i, entry in enumerate(manifest['projects']):
+        if isinstance(entry, str):
+            entry = {'path': entry}
+        if not isinstance(entry, dict):
+            raise ValueError('Project #{} of the manifest is invalid.'.format(
+                i + 1))
+        project = dict(defaults)
+        project.update(entry)
+        unknown_keys = sorted(set(project) - set(_PROJECT_KEYS))
+        if unknown_keys:
+            raise ValueError('Project #{} of the manifest has unknown keys: '
+                             '{}'.format(i + 1, ', '.join(unknown_keys)))
+        missing_keys = [k for k in _REQUIRED_PROJECT_KEYS if k not in project]
+        if missing_keys:
+            raise ValueError('Project #{} of the manifest is missing: {}'.format(
+                i + 1, ', '.join(missing_keys)))
+        project['path'] = os.path.join(manifest_dir,
+                                       os.path.expanduser(project['path']))
+        if project['path'] in paths:
+            raise ValueError('Project "{}" is listed more than once.'.format(
+                project['path']))
+        paths.add(project['path'])
+        projects.append(project)
+    return projects
+
+
+@contextlib.contextmanager
+def _redirect_output(log_path: str):
+    """Redirect stdout and stderr, including those of subprocesses, to a file.
+
+    Args:
+        log_path: The path of the file to write the output to.
+
+    Yields:
+        None
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = [os.dup(1), os.dup(2)]
+    try:
+        with open(log_path, 'w', buffering=1) as log_file:
+            os.dup2(log_file.fileno(), 1)
+            os.dup2(log_file.fileno(), 2)
+            try:
+                with contextlib.redirect_stdout(log_file), \
+                        contextlib.redirect_stderr(log_file):
+                    yield
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os.dup2(saved_fds[0], 1)
+                os.dup2(saved_fds[1], 2)
+    finally:
+        for fd in saved_fds:
+            os.close(fd)
+
+
+def _deploy_project(creds: credentials.Credentials, project: Dict[str, Any],
+                    log_path: str) -> Dict[str, Any]:
+    """Deploy one project of the manifest.
+
+    This runs in its own process because Django settings can be configured
+    only once per process.
+
+    Args:
+        creds: The credentials to use for the deployment.
+        project: The project to deploy, as returned by load_manifest.
+        log_path: The file to write the output of the deployment to.
+
+    Returns:
+        The result of the deployment. See deploy_fleet.
+    """
+    result = {
+        'path': project['path'],
+        'log': log_path,
+        'app_url': None,
+        'error': None,
+    }
+    start = time.time()
+    with _redirect_output(log_path):
+        try:
+            workflow_manager = workflow.WorkflowManager(creds, 'gke')
+            result['app_url'] = workflow_manager.update_project(
+                project['path'],
+                project['database_password'],
+                open_browser=False,
+                migrate_in_cluster=project.get('migrate_in_cluster', False),
+                lock_timeout=project.get('lock_timeout'),
+                statement_timeout=project.get('statement_timeout'),
+                force=project.get('force', False))
+        except Exception as e:
+            traceback.print_exc()
+            result['error'] = '{}: {}'.format(type(e).__name__, e)
+    result['succeeded'] = result['error'] is None
+    result['duration_seconds'] = round(time.time() - start, 1)
+    return result
+
+
+def deploy_fleet(creds: credentials.Credentials,
+                 projects: List[Dict[str, Any]],
+                 log_dir: str,
+                 max_concurrency: int = _DEFAULT_MAX_CONCURRENCY
+                ) -> List[Dict[str, Any]]:
+    """Deploy projects concurrently, each in its own process.
+
+    The credentials are refreshed once and shared by all deployments, as are
+    the API rate limits.
+
+    Args:
+        creds: The credentials to use for the deployments.
+        projects: The projects to deploy, as returned by load_manifest.
+        log_dir: The directory to write the output of each deployment to.
+        max_concurrency: The maximum number of projects deployed at the same
+            time.
+
+    Returns:
+        The result of the deployment of each project, in the order of
+        "projects". Each result is a dictionary like:
+        {
+            'path': '/home/user/mysite',
+            'succeeded': True,
+            'app_url': 'http://1.2.3.4/',
+            'error': None,
+            'duration_seconds': 123.4,
+            'log': '/tmp/fleet/01-mysite.log',
+        }
+    """
+    if not creds.valid:
+        creds.refresh(requests.Request())
+
+    os.makedirs(log_dir, exist_ok=True)
+    tasks = []
+    for i, project in enumerate(projects):
+        log_name = '{:02d}-{}.log'.format(
+            i + 1, os.path.basename(os.path.normpath(project['path'])))
+        tasks.append((creds, project, os.path.join(log_dir, log_name)))
+
+    # A fresh process per project, so that each one sets up Django for its own
+    # settings module. The processes share the token buckets of the quota
+    # profile, so that together they stay below the API quotas.
+    context = multiprocessing.get_context('spawn')
+    profile = quota.load_profile()
+    buckets = quota.create_shared_buckets(profile, context)
+    with context.Pool(processes=max(1, min(max_concurrency, len(tasks))),
+                      maxtasksperchild=1,
+                      initializer=quota.configure,
+                      initargs=(profile, buckets)) as pool:
+        return pool.starmap(_deploy_project, tasks, chunksize=1)
+
+
+def _tell_report(console: io.IO, results: List[Dict[str, Any]]):
+    console.tell('<b>Deployment report:</b>')
+    for result in results:
+        if result['succeeded']:
+            console.tell('  {} succeeded in {}s: {}'.format(
+                result['path'], result['duration_seconds'], result['app_url']))
+        else:
+            console.tell('  {} failed in {}s: {}'.format(
+                result['path'], result['duration_seconds'], result['error']))
+            console.tell('    See {}'.format(result['log']))
+    num_failed = len([r for r in results if not r['succeeded']])
+    console.tell('{} of {} projects deployed.'.format(
+        len(results) - num_failed, len(results)))
+
+
+def _load_credentials(credentials_path: Optional[str]
+                     ) -> Optional[credentials.Credentials]:
+    if credentials_path:
+        return oauth2_credentials.Credentials.from_authorized_user_file(
+            credentials_path)
+    return auth.AuthClient.get_default_credentials()
+
+
+def main(args: argparse.Namespace, console: io.IO = io.ConsoleIO()):
+
+    try:
+        projects = load_manifest(args.manifest)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    if args.max_concurrency < 1:
+        print('--max-concurrency must be at least 1.', file=sys.stderr)
+        sys.exit(1)
+
+    if not tool_requirements.check_and_handle_requirements(console, 'gke'):
+        return
+
+    creds = _load_credentials(getattr(args, 'credentials', None))
+    if not creds:
+        console.error('Not logged in. Run "gcloud auth login" and try again.')
+        sys.exit(1)
+
+    log_dir = args.log_dir or tempfile.mkdtemp(
+        prefix='django-cloud-deploy-fleet-')
+    console.tell('Deploying {} projects, {} at a time. Logs are in {}'.format(
+        len(projects), min(args.max_concurrency, len(projects)), log_dir))
+    results = deploy_fleet(creds, projects, log_dir, args.max_concurrency)
+
+    _tell_report(console, results)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+    if not all(result['succeeded'] for result in results):
+        sys.exit(1)
+    return results
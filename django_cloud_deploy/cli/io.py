@@ -19,87 +19,108 @@ import getpass
 import os
 import re
 import sys
-import threading
-import time
 
+from django_cloud_deploy import progress
 import progressbar
 
 
-class _ProgressBar(object):
-    """A progress bar showing status of a task.
+class _ProgressRenderer(object):
+    """Renders progress events as progress bars on the console.
 
     Output of the progress bar will be like the following:
-        <message>|██████████∙∙∙∙∙∙∙∙| (ETA:  0:00:05)
+        <message>|██████████∙∙∙∙∙∙∙∙|  55%
+    or, when the total amount of work of the task is unknown:
+        <message> | (PENDING_CREATE)
+
+    Only one bar is shown at a time. The bar of a task is finished when the task
+    is done or when events of another task arrive.
     """
 
-    def __init__(self,
-                 expect_time: int,
-                 message: str,
-                 tty: bool = True,
-                 width: int = 80):
+    def __init__(self, tty: bool = True, width: int = 80, fd=None):
         """Constructor of the class.
 
-        It will take "expect_time" seconds for the progress bar to go from 0%
-        to 100%. If the task takes shorter than "expect time", the progress bar
-        will directly go to 100%.
-
         Args:
-            expect_time: How long the progress bar is going to run.
-                (In seconds).
-            message: A prefix of the progress bar showing what it is about.
             tty: Whether the progress bar is being used in a terminal.
             width: Width of the whole progress bar, including the prefix and
                 suffix.
+            fd: The file to write the progress bar to. Defaults to stdout.
         """
-        self._expect_time = expect_time
-
-        if tty:
-            widgets = [
-                message,
-                progressbar.Bar(marker='█', fill='∙'), ' (',
-                progressbar.ETA(), ') '
-            ]
+        self._tty = tty
+        self._width = width
+        self._fd = fd or sys.stdout
+        self._task = None
+        self._bar = None
+        self._status = None
+        # Whether the total amount of work of the current task is known.
+        self._determinate = False
+        # Number of updates of a bar of unknown length, used to animate it.
+        self._ticks = 0
+
+    def render(self, event: progress.ProgressEvent):
+        """Update the progress bar with the given event."""
+        determinate = event.total is not None
+        if (event.task != self._task or
+            (self._bar is not None and determinate != self._determinate)):
+            self.finish()
+        if self._bar is None:
+            self._start(event, determinate)
+
+        if event.status:
+            self._status.update_mapping(status=event.status)
+        if determinate:
+            # Total can grow, e.g. when docker discovers more layers to push.
+            self._bar.max_value = max(event.total, event.current or 0, 1)
+            self._bar.update(min(event.current or 0, self._bar.max_value))
         else:
-            # Not showing progress bar when not writing to an interactive
-            # console. This is because the progress bar might not show properly.
-            widgets = [message, ' (', progressbar.ETA(), ') ']
-        # The bar will tick every 0.5 seconds.
-        # term_width define width of the whole progress bar, including the
-        # prefix and suffix.
-        self._bar = progressbar.ProgressBar(
-            widgets=widgets, max_value=expect_time * 2, term_width=width)
-
-        self._thread = threading.Thread(target=self._run)
-        self._bar_lock = threading.Lock()
-
-    def start(self):
-        self._thread.start()
+            self._ticks += 1
+            self._bar.update(self._ticks)
+        if event.done:
+            self.finish()
 
     def finish(self):
-        """Make progress bar go to the end.
-
-        This is useful when the task takes shorter than the expect time to
-        finish.
-        """
-        with self._bar_lock:
-            # Go to the end of progress bar.
-            self._bar.update(self._expect_time * 2)
+        """Finish the progress bar of the current task, if any."""
+        if self._bar is not None:
+            if self._determinate:
+                self._bar.update(self._bar.max_value)
             self._bar.finish()
-
-    def _run(self):
-        """The function to update progress bar."""
-        # TODO: Find a way to handle tasks take longer than expectation.
-        # Right now the progress bar will stuck.
-        with self._bar_lock:
-            self._bar.start()
-        for i in range(self._expect_time * 2):
-            with self._bar_lock:
-                # The progress of the bar can be modified by _finish method.
-                # This part is to handle that case.
-                if self._bar.value == self._expect_time * 2:
-                    return
-                self._bar.update(i)
-            time.sleep(0.5)
+        self._task = None
+        self._bar = None
+
+    def _start(self, event: progress.ProgressEvent, determinate: bool):
+        self._task = event.task
+        self._determinate = determinate
+        self._ticks = 0
+        self._status = progressbar.FormatCustomText(' (%(status)s)',
+                                                    dict(status=''))
+        message = event.message + ' '
+        if determinate:
+            if event.unit == 'B':
+                counter = [' ', progressbar.Percentage()]
+            else:
+                counter = [
+                    ' ',
+                    progressbar.SimpleProgress(), ' ', event.unit or ''
+                ]
+            if self._tty:
+                widgets = [message, progressbar.Bar(marker='█', fill='∙')]
+            else:
+                # Not showing progress bar when not writing to an interactive
+                # console. This is because the progress bar might not show
+                # properly.
+                widgets = [message]
+            widgets += counter
+            max_value = max(event.total, event.current or 0, 1)
+        else:
+            widgets = [message, progressbar.AnimatedMarker(), self._status]
+            max_value = progressbar.UnknownLength
+        # term_width define width of the whole progress bar, including the
+        # prefix and suffix.
+        self._bar = progressbar.ProgressBar(
+            widgets=widgets,
+            max_value=max_value,
+            term_width=self._width,
+            fd=self._fd)
+        self._bar.start()
 
 
 class IO(abc.ABC):
@@ -135,6 +156,15 @@ class IO(abc.ABC):
     def getpass(self, prompt=None):
         """Prompt the user for a password and return the result."""
 
+    @contextlib.contextmanager
+    def show_progress(self):
+        """A context manager that shows progress of long running operations.
+
+        Yields:
+            None
+        """
+        yield
+
 
 class ConsoleIO(IO):
     BOLD = '\033[1m'
@@ -166,31 +196,26 @@ class ConsoleIO(IO):
         return getpass.getpass(prompt)
 
     @contextlib.contextmanager
-    def progressbar(self, expect_time: int, message: str):
-        """A context manager that shows a progress bar.
-
-        Output of the progress bar will be like the following:
-            <message>|██████████∙∙∙∙∙∙∙∙| (ETA:  0:00:05)
+    def show_progress(self):
+        """A context manager that shows progress of long running operations.
 
-        If the task ends earlier than expected, the progress bar will directly
-        go to the end.
-
-        Args:
-            expect_time: How long the progress bar is going to run.
-                (In seconds).
-            message: A prefix of the progress bar showing what it is about.
+        Progress events published on the event bus of the process are rendered
+        as progress bars while the context is active. Rendering happens on the
+        dispatcher thread of the event bus, never on the thread doing the
+        work.
 
         Yields:
             None
         """
-
-        is_tty = os.isatty(sys.stdout.fileno())
-        progress_bar = _ProgressBar(expect_time, message, tty=is_tty)
+        renderer = _ProgressRenderer(tty=os.isatty(sys.stdout.fileno()))
+        event_bus = progress.get_event_bus()
+        event_bus.subscribe(renderer.render)
         try:
-            progress_bar.start()
             yield
         finally:
-            progress_bar.finish()
+            event_bus.flush()
+            event_bus.unsubscribe(renderer.render)
+            renderer.finish()
 
 
 class TestIO(IO):
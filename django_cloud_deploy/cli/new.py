@@ -20,6 +20,7 @@ from django_cloud_deploy import tool_requirements
 from django_cloud_deploy import workflow
 from django_cloud_deploy.cli import io
 from django_cloud_deploy.cli import prompt
+from django_cloud_deploy.skeleton import source_generator
 
 
 def add_arguments(parser):
@@ -76,6 +77,13 @@ def add_arguments(parser):
         action='store_true',
         help='Flag to indicate using a new or existing project.')
 
+    parser.add_argument(
+        '--resume',
+        dest='resume',
+        action='store_true',
+        help=('Resume a failed deployment of the project in --project-path. '
+              'Steps completed by the previous run are skipped.'))
+
     parser.add_argument(
         '--backend',
         dest='backend',
@@ -84,6 +92,38 @@ def add_arguments(parser):
         choices=['gae', 'gke'],
         help='The desired backend to deploy the Django App on.')
 
+    parser.add_argument(
+        '--region',
+        dest='region',
+        default='us-west1',
+        help=('The region to create the Cloud SQL instance and the GKE '
+              'cluster in. The nodes of the cluster are spread across several '
+              'zones of the region.'))
+
+    parser.add_argument(
+        '--static-bucket-location',
+        dest='static_bucket_location',
+        help=('Location of the bucket serving static files: a multi-region '
+              'like "US" or a dual-region like "NAM4". See '
+              'https://cloud.google.com/storage/docs/locations.'))
+
+    parser.add_argument(
+        '--static-cdn',
+        dest='static_cdn',
+        action='store_true',
+        help=('Serve static files through Cloud CDN, from edge caches close '
+              'to the users of the app. Only supported with "--backend gke": '
+              'the CDN is served over plain HTTP, which browsers block on '
+              'the HTTPS pages of App Engine apps.'))
+
+    parser.add_argument(
+        '--gae-scaling-profile',
+        dest='gae_scaling_profile',
+        default=source_generator.DEFAULT_GAE_SCALING_PROFILE,
+        choices=sorted(source_generator.GAE_SCALING_PROFILES),
+        help=('The instance class and automatic scaling settings of the App '
+              'Engine app. Only used with "--backend gae".'))
+
     parser.add_argument(
         '--credentials',
         dest='credentials',
@@ -113,6 +153,15 @@ def add_arguments(parser):
 
 def main(args: argparse.Namespace, console: io.IO = io.ConsoleIO()):
 
+    if getattr(args, 'static_cdn', False) and args.backend == 'gae':
+        console.error('--static-cdn is only supported with "--backend gke".')
+        return
+
+    if getattr(args, 'credentials', None) is None:
+        # Look up the active gcloud account while tool requirements are
+        # checked.
+        prompt.start_prefetching({})
+
     if not tool_requirements.check_and_handle_requirements(
             console, args.backend):
         return
@@ -175,6 +224,9 @@ def main(args: argparse.Namespace, console: io.IO = io.ConsoleIO()):
         remaining_parameters_to_prompt['project_id'] = (
             prompt.ExistingProjectIdPrompt)
 
+    # Lookups needed by later prompts run in the background while the user
+    # answers earlier ones.
+    prompt.start_prefetching(actual_parameters)
     if remaining_parameters_to_prompt:
         num_steps = len(remaining_parameters_to_prompt)
         console.tell(
@@ -189,32 +241,53 @@ def main(args: argparse.Namespace, console: io.IO = io.ConsoleIO()):
             actual_parameters[parameter_name] = prompter.prompt(
                 console, step, actual_parameters,
                 actual_parameters.get('credentials', None))
+            prompt.start_prefetching(actual_parameters)
 
     workflow_manager = workflow.WorkflowManager(
         actual_parameters['credentials'], args.backend)
 
     try:
-        admin_url = workflow_manager.create_and_deploy_new_project(
-            project_name=actual_parameters['project_name'],
-            project_id=actual_parameters['project_id'],
-            project_creation_mode=actual_parameters['project_creation_mode'],
-            billing_account_name=actual_parameters['billing_account_name'],
-            django_project_name=actual_parameters['django_project_name'],
-            django_app_name=actual_parameters['django_app_name'],
-            django_superuser_name=actual_parameters['django_superuser_login'],
-            django_superuser_email=actual_parameters['django_superuser_email'],
-            django_superuser_password=actual_parameters[
-                'django_superuser_password'],
-            django_directory_path=actual_parameters['django_directory_path'],
-            database_password=actual_parameters['database_password'],
-            required_services=actual_parameters['services'],
-            required_service_accounts=actual_parameters['service_accounts'],
-            cloud_storage_bucket_name=actual_parameters['bucket_name'],
-            backend=args.backend)
+        with console.show_progress():
+            admin_url = workflow_manager.create_and_deploy_new_project(
+                project_name=actual_parameters['project_name'],
+                project_id=actual_parameters['project_id'],
+                project_creation_mode=actual_parameters[
+                    'project_creation_mode'],
+                billing_account_name=actual_parameters[
+                    'billing_account_name'],
+                django_project_name=actual_parameters['django_project_name'],
+                django_app_name=actual_parameters['django_app_name'],
+                django_superuser_name=actual_parameters[
+                    'django_superuser_login'],
+                django_superuser_email=actual_parameters[
+                    'django_superuser_email'],
+                django_superuser_password=actual_parameters[
+                    'django_superuser_password'],
+                django_directory_path=actual_parameters[
+                    'django_directory_path'],
+                database_password=actual_parameters['database_password'],
+                required_services=actual_parameters['services'],
+                required_service_accounts=actual_parameters[
+                    'service_accounts'],
+                cloud_storage_bucket_name=actual_parameters['bucket_name'],
+                region=getattr(args, 'region', 'us-west1'),
+                static_bucket_location=getattr(args, 'static_bucket_location',
+                                               None),
+                static_cdn=getattr(args, 'static_cdn', False),
+                backend=args.backend,
+                gae_scaling_profile=getattr(
+                    args, 'gae_scaling_profile',
+                    source_generator.DEFAULT_GAE_SCALING_PROFILE),
+                resume=getattr(args, 'resume', False))
         return admin_url
     except workflow.ProjectExistsError:
         console.error('A project with id "{}" already exists'.format(
             actual_parameters['project_id']))
+    except KeyboardInterrupt:
+        # Completed steps are recorded in the journal as they finish.
+        console.error('Deployment interrupted. Run the same command with '
+                      '--resume to continue from the last completed step.')
+        raise
 
 
 if __name__ == '__main__':
@@ -14,16 +14,18 @@
 """Prompts the user for information e.g. project name."""
 
 import abc
+from concurrent import futures
 import os.path
 import random
 import re
 import string
-import time
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
 import webbrowser
 
 from google.auth import credentials
 
+from django_cloud_deploy import cancellation
 from django_cloud_deploy import workflow
 from django_cloud_deploy.cli import io
 from django_cloud_deploy.cloudlib import auth
@@ -32,6 +34,112 @@ from django_cloud_deploy.cloudlib import project
 from django_cloud_deploy.skeleton import utils
 
 
+class _Prefetcher(object):
+    """Runs lookups needed by later prompts in the background.
+
+    A prompt gets the result of a lookup started earlier, e.g. while the user
+    was answering previous prompts, instead of waiting for a round trip.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def start(self, key: Hashable, function: Callable[[], Any]):
+        """Start calling "function" in the background, unless already started.
+
+        Args:
+            key: Identifies the lookup, including everything its result
+                depends on.
+            function: Does the lookup.
+        """
+        with self._lock:
+            if key not in self._futures:
+                self._futures[key] = self._executor.submit(function)
+
+    def get(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """Get the result of a lookup started with "start".
+
+        The result is used only once, so that later calls see fresh data. If
+        the lookup was not started, "function" is called directly.
+
+        Args:
+            key: Identifies the lookup, including everything its result
+                depends on.
+            function: Does the lookup.
+
+        Returns:
+            The return value of "function". Exceptions it raises are raised
+            here.
+        """
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is None:
+            return function()
+        return future.result()
+
+
+_prefetcher = _Prefetcher()
+
+
+# Each lookup function returns the key and the function of a lookup.
+
+
+def _active_account_lookup():
+    return 'active_account', auth.AuthClient().get_active_account
+
+
+def _billing_accounts_lookup(credentials: credentials.Credentials):
+
+    def list_open_billing_accounts():
+        billing_client = billing.BillingClient.from_credentials(credentials)
+        return billing_client.list_billing_accounts(only_open_accounts=True)
+
+    return ('billing_accounts', credentials), list_open_billing_accounts
+
+
+def _billing_account_lookup(credentials: credentials.Credentials,
+                            project_id: str):
+
+    def get_billing_account():
+        billing_client = billing.BillingClient.from_credentials(credentials)
+        return billing_client.get_billing_account(project_id)
+
+    return ('billing_account', credentials, project_id), get_billing_account
+
+
+def _project_lookup(credentials: credentials.Credentials, project_id: str):
+
+    def get_project():
+        project_client = project.ProjectClient.from_credentials(credentials)
+        return project_client.get_project(project_id)
+
+    return ('project', credentials, project_id), get_project
+
+
+def start_prefetching(arguments: Dict[str, Any]):
+    """Start the lookups of later prompts possible with the given arguments.
+
+    This should be called whenever arguments are collected, so that the
+    lookups overlap with the user typing answers.
+
+    Args:
+        arguments: The arguments that have already been collected from the
+            user e.g. {"project_id", "project-123"}
+    """
+    credentials = arguments.get('credentials')
+    if not credentials:
+        _prefetcher.start(*_active_account_lookup())
+        return
+    _prefetcher.start(*_billing_accounts_lookup(credentials))
+    project_id = arguments.get('project_id')
+    if (project_id and arguments.get('project_creation_mode') ==
+            workflow.ProjectCreationMode.MUST_EXIST):
+        _prefetcher.start(*_project_lookup(credentials, project_id))
+        _prefetcher.start(*_billing_account_lookup(credentials, project_id))
+
+
 class Prompt(object):
     """Base class for classes the collect user input from the console."""
 
@@ -145,8 +253,8 @@ class GoogleCloudProjectNamePrompt(NamePrompt):
 
         assert 'project_id' in arguments, 'project_id must be set'
         project_id = arguments['project_id']
-        project_client = project.ProjectClient.from_credentials(credentials)
-        project_name = project_client.get_project(project_id)['name']
+        project_name = _prefetcher.get(
+            *_project_lookup(credentials, project_id))['name']
         message = 'Project name found: {}'.format(project_name)
         console.tell(('{} {}').format(step_prompt, message))
         return project_name
@@ -695,7 +803,7 @@ class CredentialsPrompt(Prompt):
              'Deploy to access your Google account.').format(step_prompt))
         auth_client = auth.AuthClient()
         create_new_credentials = True
-        active_account = auth_client.get_active_account()
+        active_account = _prefetcher.get(*_active_account_lookup())
 
         if active_account:  # The user has already logged in before
             while True:
@@ -749,7 +857,7 @@ class BillingPrompt(Prompt):
                     set(billing_account_names) -
                     set(existing_billing_account_names))
                 return diff[0]
-            time.sleep(2)
+            cancellation.sleep(2)
 
     @classmethod
     def prompt(cls,
@@ -778,15 +886,16 @@ class BillingPrompt(Prompt):
 
             assert 'project_id' in arguments, 'project_id must be set'
             project_id = arguments['project_id']
-            billing_account = (billing_client.get_billing_account(project_id))
+            billing_account = _prefetcher.get(
+                *_billing_account_lookup(credentials, project_id))
             if billing_account.get('billingEnabled', False):
                 msg = ('{} Billing is already enabled on this project.'.format(
                     step_prompt))
                 console.tell(msg)
                 return billing_account.get('billingAccountName')
 
-        billing_accounts = billing_client.list_billing_accounts(
-            only_open_accounts=True)
+        billing_accounts = _prefetcher.get(
+            *_billing_accounts_lookup(credentials))
         console.tell(
             ('{} In order to deploy your application, you must enable billing '
              'for your Google Cloud Project.').format(step_prompt))
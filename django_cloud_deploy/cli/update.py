@@ -49,6 +49,60 @@ def add_arguments(parser):
         choices=['gae', 'gke'],
         help='The desired backend to update the Django App on.')
 
+    parser.add_argument(
+        '--plan-migrations',
+        dest='plan_migrations',
+        action='store_true',
+        help=('List the pending database migrations and the sizes of the '
+              'tables they touch, without updating anything.'))
+
+    parser.add_argument(
+        '--migrate-in-cluster',
+        dest='migrate_in_cluster',
+        action='store_true',
+        help=('Apply database migrations with a Kubernetes Job inside the '
+              'cluster instead of through a local Cloud SQL Proxy.'))
+
+    parser.add_argument(
+        '--lock-timeout',
+        dest='lock_timeout',
+        help=('Maximum time a database migration waits for a table lock, '
+              'e.g. "5s".'))
+
+    parser.add_argument(
+        '--statement-timeout',
+        dest='statement_timeout',
+        help=('Maximum time a single database migration statement may run, '
+              'e.g. "10min".'))
+
+    parser.add_argument(
+        '--force',
+        dest='force',
+        action='store_true',
+        help=('Run every update step, even those whose inputs did not change '
+              'since the last deployment.'))
+
+
+def _format_size(size_bytes: int) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size_bytes < 1024:
+            return '{:.0f} {}'.format(size_bytes, unit)
+        size_bytes /= 1024
+    return '{:.0f} TB'.format(size_bytes)
+
+
+def _tell_migration_plan(console: io.IO, migration_plan):
+    if not migration_plan:
+        console.tell('No pending database migrations.')
+        return
+    console.tell('<b>Pending database migrations:</b>')
+    for entry in migration_plan:
+        console.tell('  {}'.format(entry['migration']))
+        for table in entry['tables']:
+            console.tell('    {}: ~{} rows, {}'.format(
+                table['name'], table['rows'], _format_size(
+                    table['size_bytes'])))
+
 
 def main(args: argparse.Namespace, console: io.IO = io.ConsoleIO()):
 
@@ -101,8 +155,20 @@ def main(args: argparse.Namespace, console: io.IO = io.ConsoleIO()):
 
     workflow_manager = workflow.WorkflowManager(
         actual_parameters['credentials'], args.backend)
-    workflow_manager.update_project(actual_parameters['django_directory_path'],
-                                    actual_parameters['database_password'])
+    if getattr(args, 'plan_migrations', False):
+        migration_plan = workflow_manager.plan_database_migration(
+            actual_parameters['django_directory_path'],
+            actual_parameters['database_password'])
+        _tell_migration_plan(console, migration_plan)
+        return
+    with console.show_progress():
+        workflow_manager.update_project(
+            actual_parameters['django_directory_path'],
+            actual_parameters['database_password'],
+            migrate_in_cluster=getattr(args, 'migrate_in_cluster', False),
+            lock_timeout=getattr(args, 'lock_timeout', None),
+            statement_timeout=getattr(args, 'statement_timeout', None),
+            force=getattr(args, 'force', False))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,218 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Manages Google App Engine applications and their versions.
+
+See https://cloud.google.com/appengine/docs/admin-api/reference/rest/
+"""
+
+from typing import Any, Dict, Optional, Set
+
+import backoff
+
+from django_cloud_deploy import cancellation
+from django_cloud_deploy.cloudlib import quota
+from googleapiclient import discovery
+from googleapiclient import errors
+from googleapiclient import http
+
+from google.auth import credentials
+
+# Creating a version includes building it with Cloud Build, which can take
+# several minutes.
+_OPERATION_TIMEOUT_SECONDS = 20 * 60
+
+
+class AppEngineError(Exception):
+    """An error occurred while managing an App Engine application."""
+
+
+class AppEngineClient(object):
+    """A class for deploying apps with the App Engine Admin API."""
+
+    def __init__(self, appengine_service: discovery.Resource,
+                 storage_service: discovery.Resource):
+        self._appengine_service = appengine_service
+        self._storage_service = storage_service
+
+    @classmethod
+    def from_credentials(cls, credentials: credentials.Credentials):
+        return cls(
+            discovery.build(
+                'appengine',
+                'v1',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest),
+            discovery.build(
+                'storage',
+                'v1',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest))
+
+    def get_application(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Get the App Engine application of a project.
+
+        Args:
+            project_id: GCP project id.
+
+        Returns:
+            The Application resource, or None if the project does not have an
+            App Engine application. See
+            https://cloud.google.com/appengine/docs/admin-api/reference/rest/v1/apps
+        """
+        request = self._appengine_service.apps().get(appsId=project_id)
+        try:
+            return request.execute()
+        except errors.HttpError as e:
+            if e.resp.status == 404:
+                return None
+            raise
+
+    def create_application(self, project_id: str,
+                           region: str) -> Dict[str, Any]:
+        """Create the App Engine application of a project.
+
+        The region of an application can not be changed later.
+
+        Args:
+            project_id: GCP project id.
+            region: Location of the application, e.g. "us-west2".
+
+        Returns:
+            The created Application resource.
+
+        Raises:
+            AppEngineError: When it fails to create the application.
+        """
+        body = {'id': project_id, 'locationId': region}
+        request = self._appengine_service.apps().create(body=body)
+        self._wait_for_operation(project_id, request.execute())
+        application = self.get_application(project_id)
+        if application is None:
+            raise AppEngineError(
+                'App Engine application of project "{}" not found after '
+                'creating it'.format(project_id))
+        return application
+
+    def list_staged_files(self, bucket_name: str) -> Set[str]:
+        """List the names of the files staged in a bucket.
+
+        Args:
+            bucket_name: Name of the staging bucket.
+
+        Returns:
+            The names of all objects in the bucket.
+        """
+        names = set()
+        request = self._storage_service.objects().list(
+            bucket=bucket_name, fields='items/name,nextPageToken')
+        while request is not None:
+            response = request.execute()
+            names.update(item['name'] for item in response.get('items', []))
+            request = self._storage_service.objects().list_next(
+                request, response)
+        return names
+
+    def stage_file(self, bucket_name: str, object_name: str, path: str):
+        """Upload a file to the staging bucket.
+
+        Args:
+            bucket_name: Name of the staging bucket.
+            object_name: Name of the object to create.
+            path: Absolute path of the file to upload.
+        """
+        media_body = http.MediaFileUpload(path)
+        try:
+            request = self._storage_service.objects().insert(
+                bucket=bucket_name,
+                body={'name': object_name},
+                media_body=media_body)
+            request.execute()
+        finally:
+            # http.MediaFileUpload opens a file but never closes it.
+            media_body.stream().close()
+
+    def create_version(self, project_id: str, service_id: str,
+                       version: Dict[str, Any]):
+        """Create a version of a service and wait until it is deployed.
+
+        Args:
+            project_id: GCP project id.
+            service_id: Id of the service, e.g. "default".
+            version: The Version resource to create. See
+                https://cloud.google.com/appengine/docs/admin-api/reference/rest/v1/apps.services.versions
+
+        Raises:
+            AppEngineError: When it fails to create the version.
+        """
+        request = self._appengine_service.apps().services().versions().create(
+            appsId=project_id, servicesId=service_id, body=version)
+        self._wait_for_operation(project_id, request.execute())
+
+    def promote_version(self, project_id: str, service_id: str,
+                        version_id: str):
+        """Send all traffic of a service to the given version.
+
+        Args:
+            project_id: GCP project id.
+            service_id: Id of the service, e.g. "default".
+            version_id: Id of the version to promote.
+
+        Raises:
+            AppEngineError: When it fails to update the service.
+        """
+        body = {'split': {'allocations': {version_id: 1}}}
+        request = self._appengine_service.apps().services().patch(
+            appsId=project_id,
+            servicesId=service_id,
+            updateMask='split',
+            body=body)
+        self._wait_for_operation(project_id, request.execute())
+
+    def _wait_for_operation(self, project_id: str,
+                            operation: Dict[str, Any]) -> Dict[str, Any]:
+        """Wait until an App Engine operation is done.
+
+        Args:
+            project_id: GCP project id.
+            operation: The Operation resource returned by the API call.
+
+        Returns:
+            The finished Operation resource.
+
+        Raises:
+            AppEngineError: If the operation failed or did not finish in time.
+        """
+        if not operation.get('done'):
+            operation_id = operation['name'].split('/')[-1]
+            operation = self._get_finished_operation(project_id, operation_id)
+        if not operation:
+            raise AppEngineError(
+                'Timed out waiting for App Engine operation of project "{}"'
+                .format(project_id))
+        if 'error' in operation:
+            raise AppEngineError('App Engine operation failed: {}'.format(
+                operation['error'].get('message', operation['error'])))
+        return operation
+
+    @backoff.on_predicate(
+        backoff.constant, interval=2, max_time=_OPERATION_TIMEOUT_SECONDS)
+    def _get_finished_operation(self, project_id: str,
+                                operation_id: str) -> Optional[Dict[str, Any]]:
+        cancellation.check()
+        request = self._appengine_service.apps().operations().get(
+            appsId=project_id, operationsId=operation_id)
+        operation = request.execute()
+        # @backoff.on_predicate will keep calling this method until it
+        # returns something truthy.
+        return operation if operation.get('done') else None
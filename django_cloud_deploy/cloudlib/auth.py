@@ -12,10 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
 import subprocess
 from typing import Optional
 
+from django_cloud_deploy.cloudlib import gcloud_config
+
 from google.oauth2 import credentials
 
 
@@ -65,10 +66,12 @@ class AuthClient(object):
 
     @staticmethod
     def get_active_account() -> str:
-        """Get the active account logged in on gcloud."""
-        command = ['gcloud', 'info', '--format=value(config.account)']
-        return subprocess.check_output(
-            command, universal_newlines=True).rstrip()
+        """Get the active account logged in on gcloud.
+
+        Returns:
+            The account, or an empty string if no account is logged in.
+        """
+        return gcloud_config.get_property('core', 'account') or ''
 
     @staticmethod
     def _get_active_account_adc_path() -> str:
@@ -84,12 +87,5 @@ class AuthClient(object):
             Absolute path of the application default credentials path of the
             given account.
         """
-        command = [
-            'gcloud', 'info', '--format=value(config.paths.global_config_dir)'
-        ]
-        gcloud_config_path = subprocess.check_output(
-            command, universal_newlines=True).rstrip()
-        active_account = AuthClient.get_active_account()
-        # These hardcoded values are also hardcoded by gcloud.
-        return os.path.join(gcloud_config_path, 'legacy_credentials',
-                            active_account, 'adc.json')
+        return gcloud_config.get_legacy_credentials_path(
+            AuthClient.get_active_account())
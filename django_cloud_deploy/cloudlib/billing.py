@@ -15,6 +15,7 @@
 
 from typing import Any, Dict, List
 
+from django_cloud_deploy.cloudlib import quota
 from googleapiclient import discovery
 from google.auth import credentials
 
@@ -32,7 +33,11 @@ class BillingClient(object):
     @classmethod
     def from_credentials(cls, credentials: credentials.Credentials):
         return cls(
-            discovery.build('cloudbilling', 'v1', credentials=credentials))
+            discovery.build(
+                'cloudbilling',
+                'v1',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest))
 
     def check_billing_enabled(self, project_id: str) -> bool:
         """Check is billing enabled for the given project.
@@ -0,0 +1,251 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Serves Google Cloud Storage buckets through Cloud CDN.
+
+Cloud CDN caches the content of a backend bucket at the edge locations of
+Google's network. The backend bucket is the default service of a global HTTP
+load balancer, whose IP address is the host of the CDN.
+
+See https://cloud.google.com/cdn/docs/setting-up-cdn-with-bucket
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+import backoff
+
+from django_cloud_deploy import cancellation
+from django_cloud_deploy.cloudlib import quota
+from googleapiclient import discovery
+from googleapiclient import errors
+
+from google.auth import credentials
+
+_OPERATION_TIMEOUT_SECONDS = 5 * 60
+
+# Edge caches keep static files for an hour, unless the response says
+# otherwise.
+_DEFAULT_TTL_SECONDS = 60 * 60
+
+# Names of Compute Engine resources must match this, see
+# https://cloud.google.com/compute/docs/reference/rest/v1/backendBuckets
+_MAX_RESOURCE_NAME_LENGTH = 63
+
+
+class CdnError(Exception):
+    """An error occurred while setting up Cloud CDN."""
+
+
+class CdnClient(object):
+    """A class for serving buckets through Cloud CDN."""
+
+    def __init__(self, compute_service: discovery.Resource):
+        self._compute_service = compute_service
+
+    @classmethod
+    def from_credentials(cls, credentials: credentials.Credentials):
+        return cls(
+            discovery.build(
+                'compute',
+                'v1',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest))
+
+    @staticmethod
+    def _resource_name(bucket_name: str, kind: str) -> str:
+        """Returns the name of a resource serving the given bucket.
+
+        Args:
+            bucket_name: Name of the served bucket. Bucket names can contain
+                characters which are not allowed in resource names.
+            kind: Kind of the resource, e.g. "backend".
+
+        Returns:
+            A valid Compute Engine resource name, e.g.
+            "my-bucket-static-backend".
+        """
+        suffix = '-static-{}'.format(kind)
+        prefix = re.sub(r'[^a-z0-9-]', '-', bucket_name.lower())
+        prefix = prefix[:_MAX_RESOURCE_NAME_LENGTH - len(suffix)].strip('-')
+        if not prefix[:1].isalpha():
+            prefix = 'b' + prefix[1:]
+        return prefix + suffix
+
+    def serve_bucket_sync(self, project_id: str, bucket_name: str) -> str:
+        """Serve a public bucket through Cloud CDN.
+
+        Resources which already exist, e.g. because of a previous run, are
+        reused.
+
+        Args:
+            project_id: GCP project id.
+            bucket_name: Name of the bucket to serve.
+
+        Returns:
+            The IP address the bucket is served on, over HTTP.
+
+        Raises:
+            CdnError: When it fails to create a resource.
+        """
+        project_url = 'projects/{}/global'.format(project_id)
+        address_name = self._resource_name(bucket_name, 'address')
+        backend_name = self._resource_name(bucket_name, 'backend')
+        url_map_name = self._resource_name(bucket_name, 'url-map')
+        proxy_name = self._resource_name(bucket_name, 'proxy')
+
+        # The address and the backend bucket do not depend on each other, so
+        # they are created at the same time.
+        operations = [
+            self._insert(
+                self._compute_service.globalAddresses(), project_id,
+                {'name': address_name}),
+            self._insert(
+                self._compute_service.backendBuckets(), project_id, {
+                    'name': backend_name,
+                    'bucketName': bucket_name,
+                    'enableCdn': True,
+                    'cdnPolicy': {
+                        'cacheMode': 'CACHE_ALL_STATIC',
+                        'defaultTtl': _DEFAULT_TTL_SECONDS
+                    }
+                })
+        ]
+        for operation in operations:
+            self._wait_for_operation(project_id, operation)
+
+        self._wait_for_operation(
+            project_id,
+            self._insert(
+                self._compute_service.urlMaps(), project_id, {
+                    'name': url_map_name,
+                    'defaultService': '{}/backendBuckets/{}'.format(
+                        project_url, backend_name)
+                }))
+        self._wait_for_operation(
+            project_id,
+            self._insert(
+                self._compute_service.targetHttpProxies(), project_id, {
+                    'name': proxy_name,
+                    'urlMap': '{}/urlMaps/{}'.format(project_url, url_map_name)
+                }))
+
+        address = self._compute_service.globalAddresses().get(
+            project=project_id, address=address_name).execute()['address']
+        self._wait_for_operation(
+            project_id,
+            self._insert(
+                self._compute_service.globalForwardingRules(), project_id, {
+                    'name': self._resource_name(bucket_name, 'http'),
+                    'IPAddress': address,
+                    'IPProtocol': 'TCP',
+                    'portRange': '80',
+                    'loadBalancingScheme': 'EXTERNAL',
+                    'target': '{}/targetHttpProxies/{}'.format(
+                        project_url, proxy_name)
+                }))
+        return address
+
+    def invalidate_cache(self, project_id: str, bucket_name: str,
+                         path: str = '/*'):
+        """Remove cached copies of the files of a bucket from the CDN.
+
+        The invalidation is not waited on. It usually completes within
+        minutes.
+
+        Args:
+            project_id: GCP project id.
+            bucket_name: Name of the bucket served with serve_bucket_sync.
+            path: Path pattern of the files to invalidate, e.g. "/static/*".
+
+        Raises:
+            CdnError: When it fails to request the invalidation.
+        """
+        request = self._compute_service.urlMaps().invalidateCache(
+            project=project_id,
+            urlMap=self._resource_name(bucket_name, 'url-map'),
+            body={'path': path})
+        try:
+            request.execute()
+        except errors.HttpError as e:
+            raise CdnError(
+                'Unexpected error invalidating the CDN cache of bucket "{}"'
+                .format(bucket_name)) from e
+
+    @staticmethod
+    def _insert(collection: discovery.Resource, project_id: str,
+                body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Create a global resource.
+
+        Args:
+            collection: The resource collection, e.g. "backendBuckets()".
+            project_id: GCP project id.
+            body: The resource to create.
+
+        Returns:
+            The Operation creating the resource, or None if the resource
+            already exists.
+
+        Raises:
+            CdnError: When it fails to create the resource.
+        """
+        request = collection.insert(project=project_id, body=body)
+        try:
+            return request.execute()
+        except errors.HttpError as e:
+            if e.resp.status == 409:
+                return None
+            elif e.resp.status == 403:
+                raise CdnError(
+                    'You do not have permission to create "{}" in project '
+                    '"{}"'.format(body['name'], project_id))
+            raise CdnError(
+                'Unexpected error creating "{}" in project "{}"'.format(
+                    body['name'], project_id)) from e
+
+    def _wait_for_operation(self, project_id: str,
+                            operation: Optional[Dict[str, Any]]):
+        """Wait until a global operation is done.
+
+        Args:
+            project_id: GCP project id.
+            operation: The Operation returned by _insert.
+
+        Raises:
+            CdnError: If the operation failed or did not finish in time.
+        """
+        if operation is None:
+            return
+        if operation.get('status') != 'DONE':
+            operation = self._get_finished_operation(project_id,
+                                                     operation['name'])
+        if not operation:
+            raise CdnError(
+                'Timed out waiting for operation of project "{}"'.format(
+                    project_id))
+        if 'error' in operation:
+            raise CdnError('Operation "{}" failed: {}'.format(
+                operation['name'], operation['error'].get('errors')))
+
+    @backoff.on_predicate(
+        backoff.expo, max_value=8, max_time=_OPERATION_TIMEOUT_SECONDS)
+    def _get_finished_operation(
+            self, project_id: str,
+            operation_name: str) -> Optional[Dict[str, Any]]:
+        cancellation.check()
+        request = self._compute_service.globalOperations().get(
+            project=project_id, operation=operation_name)
+        operation = request.execute()
+        # @backoff.on_predicate will keep calling this method until it
+        # returns something truthy.
+        return operation if operation.get('status') == 'DONE' else None
@@ -22,8 +22,13 @@ import base64
 import json
 import os
 import tempfile
-import time
+from typing import List, Optional
 
+from django_cloud_deploy import cancellation
+from django_cloud_deploy import progress
+from django_cloud_deploy import tracing
+from django_cloud_deploy.cloudlib import credential_manager
+from django_cloud_deploy.cloudlib import quota
 import docker
 from googleapiclient import discovery
 from googleapiclient import errors
@@ -31,11 +36,17 @@ import jinja2
 import kubernetes
 
 from google.auth import credentials
-from google.auth.transport import requests
 
 _TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'data')
 _CLUSTER_TEMPLATE_NAME = 'cluster_definition.json'
 
+# Nodes created in each zone of a regional cluster. The default three zones
+# give the same number of nodes as the zonal clusters created before.
+_NODES_PER_ZONE = 1
+
+# Statuses in docker push progress messages meaning a layer is in the registry.
+_PUSHED_LAYER_STATUSES = ('Pushed', 'Layer already exists')
+
 
 class ContainerCreationError(Exception):
     """Exception raised in container creation."""
@@ -74,23 +85,29 @@ class ContainerClient(object):
         self._create_docker_client(credentials)
 
     def _create_docker_client(self, credentials: credentials.Credentials):
-        # credentials.token is a bearer token that can be used in HTTP headers
-        # to make authenticated requests. When the given credentials does not
-        # have token, we need to force it to get a new token.
-        if not credentials.token:
-            credentials.refresh(requests.Request())
+        self._docker_client = docker.DockerClient()
+        # The registry login holds a copy of the token, so log in again with
+        # every new token. Otherwise pushes fail once the token expires.
+        credential_manager.get_credential_manager(
+            credentials).add_weak_token_listener(
+                self, ContainerClient._login_docker_registry)
 
+    def _login_docker_registry(self, token: str):
         # See https://cloud.google.com/container-registry/docs/advanced-authentication
-        self._docker_client = docker.DockerClient()
         self._docker_client.login(
             username='oauth2accesstoken',
-            password=credentials.token,
-            registry='https://gcr.io')
+            password=token,
+            registry='https://gcr.io',
+            reauth=True)
 
     @classmethod
     def from_credentials(cls, credentials: credentials.Credentials):
         return cls(
-            discovery.build('container', 'v1', credentials=credentials),
+            discovery.build(
+                'container',
+                'v1',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest),
             credentials)
 
     @staticmethod
@@ -108,8 +125,14 @@ class ContainerClient(object):
                 pass
         self._temp_ca_files = []
 
-    def _get_default_kubernetes_version(self, project_id, zone='us-west1-a'):
-        name = 'projects/{}/locations/{}'.format(project_id, zone)
+    @staticmethod
+    def _cluster_resource_name(project_id: str, location: str,
+                               cluster_name: str) -> str:
+        return 'projects/{}/locations/{}/clusters/{}'.format(
+            project_id, location, cluster_name)
+
+    def _get_default_kubernetes_version(self, project_id, location='us-west1'):
+        name = 'projects/{}/locations/{}'.format(project_id, location)
         request = self._container_service.projects().locations(
         ).getServerConfig(name=name)
         response = request.execute()
@@ -117,12 +140,39 @@ class ContainerClient(object):
             raise ContainerCreationError('')
         return response['defaultClusterVersion']
 
+    def cluster_exists(self,
+                       project_id: str,
+                       cluster_name: str,
+                       location: str = 'us-west1') -> bool:
+        """Returns True if the given cluster exists and is running.
+
+        Args:
+            project_id: The id of the GCP project of the cluster.
+            cluster_name: The name of the cluster.
+            location: The region of a regional cluster, or the zone of a zonal
+                cluster.
+        """
+        request = self._container_service.projects().locations().clusters(
+        ).get(name=self._cluster_resource_name(project_id, location,
+                                               cluster_name))
+        try:
+            response = request.execute()
+        except errors.HttpError as e:
+            if e.resp.status in [403, 404]:
+                return False
+            raise
+        return response.get('status') == 'RUNNING'
+
     def create_cluster_sync(self,
                             project_id: str,
                             cluster_name: str,
                             region: str = 'us-west1',
-                            zone: str = 'us-west1-a'):
-        """Create a cluster with your GCP account.
+                            zones: Optional[List[str]] = None):
+        """Create a regional cluster with your GCP account.
+
+        The control plane and the nodes of a regional cluster are replicated
+        in several zones of the region, so the cluster survives the failure
+        of a zone. Each zone gets _NODES_PER_ZONE nodes.
 
         Available region and zones can be found on
         https://cloud.google.com/compute/docs/regions-zones/#available
@@ -131,8 +181,9 @@ class ContainerClient(object):
             project_id: The id of your GCP project to create cluster in.
             cluster_name: The name of your cluster to create.
             region: Where do you want to host the cluster.
-            zone: Name of the Google Compute Engine zone in which the cluster
-                resides.
+            zones: Zones of the region to run nodes in, e.g.
+                ["us-west1-a", "us-west1-b"]. By default GKE picks three zones
+                of the region.
 
         Raises:
             ContainerCreationError: If unable to create a cluster.
@@ -140,7 +191,7 @@ class ContainerClient(object):
 
         template = ContainerClient._load_cluster_definition_template()
         kubernetes_version = self._get_default_kubernetes_version(
-            project_id, zone)
+            project_id, region)
         cluster_definition = template.render({
             'cluster_name':
             cluster_name,
@@ -148,12 +199,17 @@ class ContainerClient(object):
             project_id,
             'region':
             region,
+            'zones':
+            json.dumps(zones) if zones else None,
+            'nodes_per_zone':
+            _NODES_PER_ZONE,
             'kubernetes_version':
             kubernetes_version,
         })
         body = json.loads(cluster_definition)
-        request = self._container_service.projects().zones().clusters().create(
-            projectId=project_id, zone=zone, body=body)
+        request = self._container_service.projects().locations().clusters(
+        ).create(parent='projects/{}/locations/{}'.format(project_id, region),
+                 body=body)
         try:
             request.execute()
         except errors.HttpError as e:
@@ -162,25 +218,41 @@ class ContainerClient(object):
                     ('You do not have permission to create a cluster in '
                      'project: "{}"').format(project_id))
             elif e.resp.status == 409:
-                raise ContainerCreationError(
-                    'Cluster "{}" already exist in project "{}".'.format(
-                        cluster_name, project_id))
+                # The cluster was created by a run interrupted while it was
+                # being provisioned. Wait for it like for a new one.
+                pass
             else:
                 raise ContainerCreationError(
                     ('Unexpected error when creating cluster "{}" in '
                      'project "{}"').format(cluster_name, project_id)) from e
 
+        task = 'cluster:{}'.format(cluster_name)
+        message = 'Creating GKE cluster "{}"'.format(cluster_name)
+        name = self._cluster_resource_name(project_id, region, cluster_name)
         while True:
-            request = self._container_service.projects().zones().clusters().get(
-                projectId=project_id, zone=zone, clusterId=cluster_name)
+            request = self._container_service.projects().locations().clusters(
+            ).get(name=name)
             response = request.execute()
 
             # Possible status:
-            # https://cloud.google.com/kubernetes-engine/docs/reference/rest/v1/projects.zones.clusters#Status
+            # https://cloud.google.com/kubernetes-engine/docs/reference/rest/v1/projects.locations.clusters#Status
+            # initialNodeCount is the number of nodes in each zone.
+            zone_count = len(response.get('locations') or [None])
+            node_count = zone_count * sum(
+                pool.get('initialNodeCount', 0)
+                for pool in response.get('nodePools', []))
+            progress.report(
+                task,
+                message,
+                current=response.get('currentNodeCount', 0),
+                total=node_count or None,
+                unit='nodes',
+                status=response['status'],
+                done=response['status'] == 'RUNNING')
             if response['status'] == 'RUNNING':
                 return
             elif response['status'] == 'PROVISIONING':
-                time.sleep(2)
+                cancellation.sleep(2)
                 continue
             else:
                 raise ContainerCreationError(
@@ -192,7 +264,7 @@ class ContainerClient(object):
             credentials: credentials.Credentials,
             project_id: str,
             cluster_name: str,
-            zone: str = 'us-west1-a') -> kubernetes.client.Configuration:
+            location: str = 'us-west1') -> kubernetes.client.Configuration:
         """Create a kubernetes config which has access to the given cluster.
 
         Args:
@@ -200,7 +272,8 @@ class ContainerClient(object):
                 access kubernetes clusters.
             project_id: GCP project id.
             cluster_name: Name of the kubernetes cluster we want to access.
-            zone: Where is the cluster hosted.
+            location: The region of a regional cluster, or the zone of a zonal
+                cluster.
 
         Raises:
             ClusterGetInfoError: When unexpected cluster information is returned
@@ -214,15 +287,11 @@ class ContainerClient(object):
         # Those temporary files should be removed after the program exists.
         if not ContainerClient._temp_ca_files:
             atexit.register(self._cleanup_temp_files)
+            cancellation.add_callback(self._cleanup_temp_files)
 
-        # credentials.token is a bearer token that can be used in HTTP headers
-        # to make authenticated requests. When the given credentials does not
-        # have token, we need to force it to get a new token.
-        if not credentials.token:
-            credentials.refresh(requests.Request())
-
-        request = self._container_service.projects().zones().clusters().get(
-            projectId=project_id, zone=zone, clusterId=cluster_name)
+        request = self._container_service.projects().locations().clusters(
+        ).get(name=self._cluster_resource_name(project_id, location,
+                                               cluster_name))
         response = request.execute()
         if ('masterAuth' not in response or
                 'clusterCaCertificate' not in response['masterAuth']):
@@ -239,10 +308,17 @@ class ContainerClient(object):
         with open(ca_file_path, 'wb') as ca_file:
             ca_file.write(base64.standard_b64decode(ca))
         configuration = kubernetes.client.Configuration()
-        configuration.api_key['authorization'] = credentials.token
         configuration.api_key_prefix['authorization'] = 'Bearer'
         configuration.host = 'https://' + response['endpoint']
         configuration.ssl_ca_cert = ca_file_path
+
+        # The configuration holds a copy of the token, so it gets every new
+        # token.
+        def update_token(config: kubernetes.client.Configuration, token: str):
+            config.api_key['authorization'] = token
+
+        credential_manager.get_credential_manager(
+            credentials).add_weak_token_listener(configuration, update_token)
         return configuration
 
     def build_docker_image(self, tag: str, directory: str):
@@ -254,16 +330,52 @@ class ContainerClient(object):
             directory: Absolute path of the directory containing a Dockerfile.
         """
 
-        self._docker_client.images.build(tag=tag, path=directory)
+        with tracing.span(
+                'docker.images.build', category='api', api='docker', tag=tag):
+            self._docker_client.images.build(tag=tag, path=directory)
 
-    def push_docker_image(self, tag: str):
+    def push_docker_image(self, tag: str) -> Optional[str]:
         """Push docker image.
 
         Args:
             tag: Docker image tag. Should looks similar to
                 "gcr.io/<project_id>/<image_name>"
+
+        Returns:
+            The digest of the pushed image, e.g. "sha256:...", if the registry
+            reported it.
         """
-        self._docker_client.images.push(tag)
+        task = 'push:{}'.format(tag)
+        message = 'Pushing docker image "{}"'.format(tag)
+        # Bytes pushed and total bytes of each layer, by layer id.
+        layers = {}
+        digest = None
+        with tracing.span(
+                'docker.images.push', category='api', api='docker', tag=tag):
+            # See https://docs.docker.com/engine/api/v1.37/#operation/ImagePush
+            # for the format of the progress messages.
+            for line in self._docker_client.images.push(
+                    tag, stream=True, decode=True):
+                if 'aux' in line:
+                    digest = line['aux'].get('Digest')
+                detail = line.get('progressDetail') or {}
+                if 'id' in line and 'total' in detail:
+                    layers[line['id']] = (detail.get('current', 0),
+                                          detail['total'])
+                elif ('id' in line and
+                      line.get('status') in _PUSHED_LAYER_STATUSES):
+                    _, total = layers.get(line['id'], (0, 0))
+                    layers[line['id']] = (total, total)
+                else:
+                    continue
+                progress.report(
+                    task,
+                    message,
+                    current=sum(current for current, _ in layers.values()),
+                    total=sum(total for _, total in layers.values()),
+                    unit='B')
+        progress.report(task, message, done=True)
+        return digest
 
     def create_deployment(
             self,
@@ -275,7 +387,8 @@ class ContainerClient(object):
 
         A Kubernetes Deployment describes a desired state of your application.
         For example, it manages creation of Pods by means of ReplicaSets, and
-        defines what images to use for the containers.
+        defines what images to use for the containers. An existing deployment
+        with the same name, e.g. from an interrupted run, is patched instead.
 
         Args:
             deployment_data: Definition of the deployment.
@@ -286,8 +399,20 @@ class ContainerClient(object):
         """
         api_client = kubernetes.client.ApiClient(configuration)
         api_instance = kubernetes.client.ExtensionsV1beta1Api(api_client)
-        api_instance.create_namespaced_deployment(
-            namespace=namespace, body=deployment_data)
+        with tracing.span(
+                'kubernetes.create_namespaced_deployment',
+                category='api',
+                api='kubernetes'):
+            try:
+                api_instance.create_namespaced_deployment(
+                    namespace=namespace, body=deployment_data)
+            except kubernetes.client.rest.ApiException as e:
+                if e.status != 409:
+                    raise
+                api_instance.patch_namespaced_deployment(
+                    name=deployment_data['metadata']['name'],
+                    namespace=namespace,
+                    body=deployment_data)
 
     def update_deployment(
             self,
@@ -319,11 +444,17 @@ class ContainerClient(object):
         # will trigger an image update.
         replicas = deployment_data['spec']['replicas']
         deployment_data['spec']['replicas'] = 0
-        api_instance.patch_namespaced_deployment(
-            name=deployment_name, namespace=namespace, body=deployment_data)
-        deployment_data['spec']['replicas'] = replicas
-        api_instance.patch_namespaced_deployment(
-            name=deployment_name, namespace=namespace, body=deployment_data)
+        with tracing.span(
+                'kubernetes.patch_namespaced_deployment',
+                category='api',
+                api='kubernetes'):
+            api_instance.patch_namespaced_deployment(
+                name=deployment_name, namespace=namespace,
+                body=deployment_data)
+            deployment_data['spec']['replicas'] = replicas
+            api_instance.patch_namespaced_deployment(
+                name=deployment_name, namespace=namespace,
+                body=deployment_data)
 
     def create_service(
             self,
@@ -334,7 +465,8 @@ class ContainerClient(object):
         """Create a Kubernetes Dervice.
 
         A Kubernetes Service is an abstraction which defines a logical set of
-        Pods and a policy by which to access them.
+        Pods and a policy by which to access them. An existing service with the
+        same name, e.g. from an interrupted run, is kept.
 
         Args:
             service_data: Definition of the service.
@@ -345,8 +477,16 @@ class ContainerClient(object):
         """
         api_client = kubernetes.client.ApiClient(configuration)
         api_instance = kubernetes.client.CoreV1Api(api_client)
-        api_instance.create_namespaced_service(
-            namespace=namespace, body=service_data)
+        with tracing.span(
+                'kubernetes.create_namespaced_service',
+                category='api',
+                api='kubernetes'):
+            try:
+                api_instance.create_namespaced_service(
+                    namespace=namespace, body=service_data)
+            except kubernetes.client.rest.ApiException as e:
+                if e.status != 409:
+                    raise
 
     def create_secret(self,
                       secret_data: kubernetes.client.V1Secret,
@@ -356,7 +496,8 @@ class ContainerClient(object):
         """Create a Kubernetes Secret.
 
         Kubernetes Secrets are intended to hold sensitive information. They are
-        accessible inside Pods.
+        accessible inside Pods. An existing secret with the same name, e.g. from
+        an interrupted run, is replaced.
 
         Args:
             secret_data: Definition of the secret.
@@ -367,5 +508,121 @@ class ContainerClient(object):
         """
         api_client = kubernetes.client.ApiClient(configuration)
         api_instance = kubernetes.client.CoreV1Api(api_client)
-        api_instance.create_namespaced_secret(
-            namespace=namespace, body=secret_data)
+        with tracing.span(
+                'kubernetes.create_namespaced_secret',
+                category='api',
+                api='kubernetes'):
+            try:
+                api_instance.create_namespaced_secret(
+                    namespace=namespace, body=secret_data)
+            except kubernetes.client.rest.ApiException as e:
+                if e.status != 409:
+                    raise
+                api_instance.replace_namespaced_secret(
+                    name=secret_data.metadata['name'],
+                    namespace=namespace,
+                    body=secret_data)
+
+    def create_job(self,
+                   job_data: kubernetes.client.V1Job,
+                   configuration: (
+                       kubernetes.client.configuration.Configuration) = None,
+                   namespace: str = 'default'):
+        """Create a Kubernetes Job.
+
+        A Kubernetes Job creates Pods which run to completion. It is useful for
+        one-off tasks inside the cluster, e.g. database migrations.
+
+        Args:
+            job_data: Definition of the job.
+            configuration: A Kubernetes configuration which has access to the
+                cluster for the job. If not set, it will use the default
+                kubernetes configuration.
+            namespace: Namespace of the job.
+        """
+        api_client = kubernetes.client.ApiClient(configuration)
+        api_instance = kubernetes.client.BatchV1Api(api_client)
+        with tracing.span(
+                'kubernetes.create_namespaced_job',
+                category='api',
+                api='kubernetes'):
+            api_instance.create_namespaced_job(
+                namespace=namespace, body=job_data)
+
+    def list_job_pods(self,
+                      job_name: str,
+                      configuration: (
+                          kubernetes.client.configuration.Configuration) = None,
+                      namespace: str = 'default'
+                     ) -> List[kubernetes.client.V1Pod]:
+        """List the Pods created by a Kubernetes Job.
+
+        Args:
+            job_name: Name of the job.
+            configuration: A Kubernetes configuration which has access to the
+                cluster for the job. If not set, it will use the default
+                kubernetes configuration.
+            namespace: Namespace of the job.
+
+        Returns:
+            Pods created by the job.
+        """
+        api_client = kubernetes.client.ApiClient(configuration)
+        api_instance = kubernetes.client.CoreV1Api(api_client)
+        label_selector = '='.join(['job-name', job_name])
+        return api_instance.list_namespaced_pod(
+            namespace=namespace, label_selector=label_selector).items
+
+    def read_pod_log(self,
+                     pod_name: str,
+                     container_name: str,
+                     configuration: (
+                         kubernetes.client.configuration.Configuration) = None,
+                     namespace: str = 'default',
+                     tail_lines: Optional[int] = None) -> str:
+        """Read the log of a container of a Kubernetes Pod.
+
+        Args:
+            pod_name: Name of the pod.
+            container_name: Name of the container in the pod.
+            configuration: A Kubernetes configuration which has access to the
+                cluster for the pod. If not set, it will use the default
+                kubernetes configuration.
+            namespace: Namespace of the pod.
+            tail_lines: Number of lines to read from the end of the log. The
+                whole log is read if not set.
+
+        Returns:
+            The log of the container.
+        """
+        api_client = kubernetes.client.ApiClient(configuration)
+        api_instance = kubernetes.client.CoreV1Api(api_client)
+        kwargs = {}
+        if tail_lines is not None:
+            kwargs['tail_lines'] = tail_lines
+        return api_instance.read_namespaced_pod_log(
+            name=pod_name,
+            namespace=namespace,
+            container=container_name,
+            **kwargs)
+
+    def delete_job(self,
+                   job_name: str,
+                   configuration: (
+                       kubernetes.client.configuration.Configuration) = None,
+                   namespace: str = 'default'):
+        """Delete a Kubernetes Job and the Pods it created.
+
+        Args:
+            job_name: Name of the job.
+            configuration: A Kubernetes configuration which has access to the
+                cluster for the job. If not set, it will use the default
+                kubernetes configuration.
+            namespace: Namespace of the job.
+        """
+        api_client = kubernetes.client.ApiClient(configuration)
+        api_instance = kubernetes.client.BatchV1Api(api_client)
+        body = kubernetes.client.V1DeleteOptions(
+            propagation_policy='Background')
+        api_instance.delete_namespaced_job(
+            name=job_name, namespace=namespace, body=body)
@@ -0,0 +1,184 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Keeps the access tokens of credentials fresh.
+
+Google API clients refresh expired tokens by themselves, but docker and
+kubernetes are given a copy of the token, which expires after an hour. A
+CredentialManager refreshes the token shortly before it expires and passes the
+new token to its listeners, e.g. to log in to the docker registry again.
+
+Usage:
+    manager = credential_manager.get_credential_manager(credentials)
+    manager.add_token_listener(lambda token: docker_client.login(...))
+"""
+
+import datetime
+import logging
+import threading
+from typing import Any, Callable, Optional
+import weakref
+
+from google.auth import credentials
+from google.auth.transport import requests
+
+# Tokens are refreshed this long before they expire.
+_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# Time to wait before retrying a failed refresh in the background.
+_RETRY_INTERVAL_SECONDS = 30
+
+# Managers live as long as the process, like the credentials they refresh.
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+class CredentialManager(object):
+    """Caches the token of credentials and refreshes it before it expires.
+
+    Once a listener is added, a daemon thread refreshes the token
+    _REFRESH_MARGIN before it expires and calls every listener with the new
+    token.
+    """
+
+    def __init__(self,
+                 credentials: credentials.Credentials,
+                 refresh_margin: datetime.timedelta = _REFRESH_MARGIN):
+        self._credentials = credentials
+        self._refresh_margin = refresh_margin
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def credentials(self) -> credentials.Credentials:
+        return self._credentials
+
+    def _seconds_until_refresh(self) -> Optional[float]:
+        """Returns the time left before the token should be refreshed.
+
+        Returns:
+            The number of seconds, 0 if the token should be refreshed now, or
+            None if the token never expires.
+        """
+        if not self._credentials.token:
+            return 0
+        expiry = self._credentials.expiry
+        if expiry is None:
+            return None
+        refresh_time = expiry - self._refresh_margin
+        return max((refresh_time - datetime.datetime.utcnow()).total_seconds(),
+                   0)
+
+    def get_token(self) -> str:
+        """Returns a token which is valid for at least the refresh margin."""
+        with self._lock:
+            if self._seconds_until_refresh() != 0:
+                return self._credentials.token
+        return self.refresh()
+
+    def refresh(self) -> str:
+        """Get a new token and pass it to the listeners.
+
+        Returns:
+            The new token.
+        """
+        with self._lock:
+            self._credentials.refresh(requests.Request())
+            token = self._credentials.token
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(token)
+        return token
+
+    def add_token_listener(self, listener: Callable[[str], None]):
+        """Call the given function with the current token and every new one.
+
+        The first call happens before this method returns, so its exceptions
+        are raised to the caller. Later calls happen on a background thread,
+        where exceptions are logged.
+
+        Args:
+            listener: Function called with the token.
+        """
+        listener(self.get_token())
+        with self._lock:
+            self._listeners.append(listener)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._refresh_forever,
+                    name='credential-refresh',
+                    daemon=True)
+                self._thread.start()
+
+    def add_weak_token_listener(self, obj: Any,
+                                listener: Callable[[Any, str], None]):
+        """Like add_token_listener, but only as long as "obj" is alive.
+
+        The manager only references "obj" weakly, so that clients which are
+        not used anymore can be garbage collected. The listener is removed
+        then.
+
+        Args:
+            obj: The object using the token, e.g. a docker client.
+            listener: Function called with "obj" and the token. It must not
+                reference "obj", e.g. through a bound method of "obj".
+        """
+
+        def call_listener(token: str):
+            target = obj_ref()
+            if target is not None:
+                listener(target, token)
+
+        obj_ref = weakref.ref(
+            obj, lambda unused_ref: self.remove_token_listener(call_listener))
+        self.add_token_listener(call_listener)
+
+    def remove_token_listener(self, listener: Callable[[str], None]):
+        """Stop calling a function added with add_token_listener.
+
+        Args:
+            listener: The function to remove.
+        """
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def stop(self):
+        """Stop refreshing the token in the background."""
+        self._stopped.set()
+
+    def _refresh_forever(self):
+        delay = self._seconds_until_refresh()
+        while not self._stopped.wait(delay):
+            try:
+                self.refresh()
+            except Exception:  # pylint: disable=broad-except
+                # The refresh is retried, and the next user of the token will
+                # see the error if it persists.
+                logging.exception('Unable to refresh credentials')
+                delay = _RETRY_INTERVAL_SECONDS
+            else:
+                delay = self._seconds_until_refresh()
+
+
+def get_credential_manager(
+        credentials: credentials.Credentials) -> CredentialManager:
+    """Returns the CredentialManager shared by all users of the credentials."""
+    with _managers_lock:
+        manager = _managers.get(credentials)
+        if manager is None:
+            manager = CredentialManager(credentials)
+            _managers[credentials] = manager
+        return manager
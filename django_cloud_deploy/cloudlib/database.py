@@ -18,15 +18,20 @@ See https://cloud.google.com/sql/docs/
 
 import contextlib
 import signal
-import time
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
+from django import apps
 from django import db
 from django.core import management
+from django.db.migrations import executor
+from django_cloud_deploy import cancellation
 from django_cloud_deploy import crash_handling
+from django_cloud_deploy import progress
+from django_cloud_deploy.cloudlib import quota
 import pexpect
 
 from googleapiclient import discovery
+from googleapiclient import errors
 from google.auth import credentials
 
 
@@ -43,7 +48,11 @@ class DatabaseClient(object):
     @classmethod
     def from_credentials(cls, credentials: credentials.Credentials):
         return cls(
-            discovery.build('sqladmin', 'v1beta4', credentials=credentials))
+            discovery.build(
+                'sqladmin',
+                'v1beta4',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest))
 
     def create_instance_sync(self,
                              project_id: str,
@@ -96,24 +105,54 @@ class DatabaseClient(object):
 
         # See
         # https://cloud.google.com/sql/docs/mysql/admin-api/v1beta4/instances/insert
-        request.execute()
-
+        try:
+            request.execute()
+        except errors.HttpError as e:
+            # The instance was created by a run interrupted while it was being
+            # provisioned. Wait for it like for a new one.
+            if e.resp.status != 409:
+                raise
+
+        task = 'sql:{}'.format(instance)
+        message = 'Creating Cloud SQL instance "{}"'.format(instance)
         while True:
             request = self._sqladmin_service.instances().get(
                 project=project_id, instance=instance)
             response = request.execute()
             # Response format:
             # https://cloud.google.com/sql/docs/mysql/admin-api/v1beta4/instances#resource
+            progress.report(
+                task,
+                message,
+                status=response['state'],
+                done=response['state'] == 'RUNNABLE')
             if response['state'] == 'RUNNABLE':
                 return
             elif response['state'] == 'PENDING_CREATE':
-                time.sleep(2)
+                cancellation.sleep(2)
                 continue
             else:
                 raise DatabaseError(
                     'unexpected instance status after creation: {!r} [{!r}]'.
                     format(response['state'], response))
 
+    def instance_exists(self, project_id: str, instance: str) -> bool:
+        """Returns True if the given Cloud SQL instance exists and is running.
+
+        Args:
+            project_id: The id of the project of the SQL instance.
+            instance: The name of the SQL instance.
+        """
+        request = self._sqladmin_service.instances().get(
+            project=project_id, instance=instance)
+        try:
+            response = request.execute()
+        except errors.HttpError as e:
+            if e.resp.status in [403, 404]:
+                return False
+            raise
+        return response.get('state') == 'RUNNABLE'
+
     def create_database_sync(self, project_id: str, instance: str,
                              database: str):
         """Creates a new database in a Cloud SQL instance and wait for completion.
@@ -136,12 +175,18 @@ class DatabaseClient(object):
                 'project': project_id,
                 'name': database
             })
-        response = request.execute()
+        try:
+            response = request.execute()
+        except errors.HttpError as e:
+            # The database was created by an interrupted run.
+            if e.resp.status == 409:
+                return
+            raise
         while response['status'] in ['PENDING']:
             request = self._sqladmin_service.databases().get(
                 project=project_id, instance=instance, database=database)
             response = request.execute()
-            time.sleep(2)
+            cancellation.sleep(2)
 
         if response['status'] not in ['DONE', 'RUNNING']:
             raise DatabaseError(
@@ -211,10 +256,18 @@ class DatabaseClient(object):
         instance_flag = '-instances={}=tcp:{}'.format(
             instance_connection_string, port)
         process = pexpect.spawn(cloud_sql_proxy_path, args=[instance_flag])
+
+        def kill_process():
+            if process.isalive():
+                process.kill(signal.SIGTERM)
+
         try:
             # Make sure cloud sql proxy is started before doing the real work
             process.expect('Ready for new connections', timeout=5)
-            yield
+            # The proxy must not outlive a cancelled deployment, even if the
+            # thread using it is still blocked on a query.
+            with cancellation.on_cancel(kill_process):
+                yield
         except pexpect.exceptions.TIMEOUT:
             raise DatabaseError(
                 ('Cloud SQL Proxy was unable to start after 5 seconds. Output '
@@ -224,14 +277,193 @@ class DatabaseClient(object):
                 ('Cloud SQL Proxy exited unexpectedly. Output of '
                  'cloud_sql_proxy: \n{}').format(process.before))
         finally:
-            process.kill(signal.SIGTERM)
+            kill_process()
+
+    def make_migrations(self,
+                        project_id: str,
+                        instance_name: str,
+                        cloud_sql_proxy_path: str = 'cloud_sql_proxy',
+                        region: str = 'us-west1',
+                        port: Optional[int] = 5432):
+        """Generate migration files based on definitions in models.py.
+
+        This does not modify the Cloud SQL database. The cloud sql proxy is
+        still needed because "makemigrations" checks the consistency of the
+        migration history stored in the database.
+
+        Args:
+            project_id: GCP project id.
+            instance_name: Name of the Cloud SQL instance where the database you
+                want to migrate is in.
+            cloud_sql_proxy_path: The command to run your cloud sql proxy.
+            region: Where the Cloud SQL instance is in.
+            port: The port being forwarded by cloud sql proxy.
+        """
+        with self.with_cloud_sql_proxy(project_id, instance_name,
+                                       cloud_sql_proxy_path, region, port):
+            try:
+                management.call_command(
+                    'makemigrations', verbosity=0, interactive=False)
+            except Exception as e:
+                raise crash_handling.UserError(
+                    'Not able to generate database migrations.') from e
+
+    def get_migration_plan(self,
+                           project_id: str,
+                           instance_name: str,
+                           cloud_sql_proxy_path: str = 'cloud_sql_proxy',
+                           region: str = 'us-west1',
+                           port: Optional[int] = 5432) -> List[Dict[str, Any]]:
+        """Returns the migrations "migrate" would apply to the database.
+
+        The plan only covers migration files which already exist. Tables
+        touched by each migration are looked up in "pg_class" to estimate how
+        long the migration might hold locks on them. This function does not
+        modify the Cloud SQL database.
+
+        Args:
+            project_id: GCP project id.
+            instance_name: Name of the Cloud SQL instance where the database you
+                want to migrate is in.
+            cloud_sql_proxy_path: The command to run your cloud sql proxy.
+            region: Where the Cloud SQL instance is in.
+            port: The port being forwarded by cloud sql proxy.
+
+        Returns:
+            The pending migrations in the order they would be applied. For
+            example:
+                [
+                    {
+                        'migration': 'polls.0002_question_author',
+                        'tables': [
+                            {
+                                'name': 'polls_question',
+                                'rows': 120000,
+                                'size_bytes': 24576000
+                            }
+                        ]
+                    }
+                ]
+            "tables" only contains tables which already exist in the database.
+        """
+        with self.with_cloud_sql_proxy(project_id, instance_name,
+                                       cloud_sql_proxy_path, region, port):
+            try:
+                migration_executor = executor.MigrationExecutor(db.connection)
+                targets = migration_executor.loader.graph.leaf_nodes()
+                plan = migration_executor.migration_plan(targets)
+                migrations = [migration for migration, _ in plan]
+                affected_tables = {
+                    migration: self._get_affected_tables(migration)
+                    for migration in migrations
+                }
+                all_tables = set()
+                for tables in affected_tables.values():
+                    all_tables.update(tables)
+                table_sizes = self._get_table_sizes(all_tables)
+            except Exception as e:
+                raise crash_handling.UserError(
+                    'Not able to plan database migration.') from e
+
+        migration_plan = []
+        for migration in migrations:
+            tables = [
+                dict(name=table, **table_sizes[table])
+                for table in affected_tables[migration]
+                if table in table_sizes
+            ]
+            migration_plan.append({
+                'migration': '{}.{}'.format(migration.app_label,
+                                            migration.name),
+                'tables': tables
+            })
+        return migration_plan
+
+    @staticmethod
+    def _get_affected_tables(migration) -> List[str]:
+        """Returns names of the existing tables a migration operates on.
+
+        Args:
+            migration: A django.db.migrations.Migration object.
+
+        Returns:
+            Database table names of the models touched by the migration. Models
+            which are not registered in the current project are skipped.
+        """
+        tables = []
+        for operation in migration.operations:
+            # Field operations have "model_name", "RenameModel" has "old_name"
+            # and the other model operations use "name".
+            model_name = (getattr(operation, 'model_name', None) or
+                          getattr(operation, 'old_name', None) or
+                          getattr(operation, 'name', None))
+            if not model_name:
+                continue
+            try:
+                model = apps.apps.get_model(migration.app_label, model_name)
+            except LookupError:
+                continue
+            if model._meta.db_table not in tables:
+                tables.append(model._meta.db_table)
+        return tables
+
+    @staticmethod
+    def _get_table_sizes(tables) -> Dict[str, Dict[str, int]]:
+        """Returns estimated row counts and sizes of the given tables.
+
+        Args:
+            tables: Names of the tables to look up.
+
+        Returns:
+            A dict mapping table names to {'rows': ..., 'size_bytes': ...}.
+            Tables which do not exist are not included.
+        """
+        if not tables:
+            return {}
+        with db.connection.cursor() as cursor:
+            # "reltuples" is an estimate maintained by VACUUM and ANALYZE. It
+            # is -1 for tables which have never been analyzed.
+            cursor.execute(
+                'SELECT relname, reltuples::bigint, '
+                'pg_total_relation_size(oid) FROM pg_class '
+                "WHERE relkind = 'r' AND relname = ANY(%s)",
+                [sorted(tables)])
+            return {
+                name: {
+                    'rows': max(rows, 0),
+                    'size_bytes': size_bytes
+                } for name, rows, size_bytes in cursor.fetchall()
+            }
+
+    @staticmethod
+    def _set_session_timeouts(lock_timeout: Optional[str] = None,
+                              statement_timeout: Optional[str] = None):
+        """Set lock and statement timeouts for the current database session.
+
+        Args:
+            lock_timeout: Maximum time a statement waits to acquire a lock, e.g.
+                "5s". A migration fails instead of queueing every other query
+                on the table behind it when this is exceeded.
+            statement_timeout: Maximum time a single statement may run, e.g.
+                "10min".
+        """
+        if not (lock_timeout or statement_timeout):
+            return
+        with db.connection.cursor() as cursor:
+            if lock_timeout:
+                cursor.execute('SET lock_timeout = %s', [lock_timeout])
+            if statement_timeout:
+                cursor.execute('SET statement_timeout = %s',
+                               [statement_timeout])
 
     def migrate_database(self,
                          project_id: str,
                          instance_name: str,
                          cloud_sql_proxy_path: str = 'cloud_sql_proxy',
                          region: str = 'us-west1',
-                         port: Optional[int] = 5432):
+                         port: Optional[int] = 5432,
+                         lock_timeout: Optional[str] = None,
+                         statement_timeout: Optional[str] = None):
         """Migrate to Cloud SQL database.
 
         This function should be called after we do the following:
@@ -247,6 +479,10 @@ class DatabaseClient(object):
             cloud_sql_proxy_path: The command to run your cloud sql proxy.
             region: Where the Cloud SQL instance is in.
             port: The port being forwarded by cloud sql proxy.
+            lock_timeout: Postgres "lock_timeout" to use while migrating, e.g.
+                "5s". By default the server setting is used.
+            statement_timeout: Postgres "statement_timeout" to use while
+                migrating, e.g. "10min". By default the server setting is used.
         """
         with self.with_cloud_sql_proxy(project_id, instance_name,
                                        cloud_sql_proxy_path, region, port):
@@ -256,6 +492,8 @@ class DatabaseClient(object):
                 management.call_command(
                     'makemigrations', verbosity=0, interactive=False)
 
+                self._set_session_timeouts(lock_timeout, statement_timeout)
+
                 # "migrate" will modify cloud sql database.
                 management.call_command(
                     'migrate', verbosity=0, interactive=False)
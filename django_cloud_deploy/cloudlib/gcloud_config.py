@@ -0,0 +1,129 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Reads and writes the configuration of the gcloud command line tool.
+
+This is much faster than running "gcloud config" or "gcloud info", which take
+a second or more to start. The files are laid out as gcloud does:
+
+    <config dir>/active_config: Name of the active configuration.
+    <config dir>/configurations/config_<name>: Properties of a configuration,
+        in INI format, e.g. "project" in section "core".
+    <config dir>/legacy_credentials/<account>/adc.json: Credentials of an
+        account logged in with "gcloud auth login".
+
+See https://cloud.google.com/sdk/docs/configurations
+"""
+
+import configparser
+import os
+from typing import Optional
+
+_DEFAULT_CONFIGURATION_NAME = 'default'
+
+
+def get_config_dir() -> str:
+    """Returns the absolute path of the gcloud configuration directory."""
+    config_dir = os.environ.get('CLOUDSDK_CONFIG')
+    if config_dir:
+        return os.path.abspath(os.path.expanduser(config_dir))
+    if os.name == 'nt' and 'APPDATA' in os.environ:
+        return os.path.join(os.environ['APPDATA'], 'gcloud')
+    return os.path.join(os.path.expanduser('~'), '.config', 'gcloud')
+
+
+def get_active_configuration_name() -> str:
+    """Returns the name of the active gcloud configuration."""
+    name = os.environ.get('CLOUDSDK_ACTIVE_CONFIG_NAME')
+    if name:
+        return name
+    try:
+        with open(os.path.join(get_config_dir(), 'active_config')) as f:
+            name = f.read().strip()
+    except OSError:
+        return _DEFAULT_CONFIGURATION_NAME
+    return name or _DEFAULT_CONFIGURATION_NAME
+
+
+def _get_configuration_path() -> str:
+    return os.path.join(get_config_dir(), 'configurations',
+                        'config_' + get_active_configuration_name())
+
+
+def _read_configuration(path: str) -> configparser.ConfigParser:
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        parser.read(path)
+    except configparser.Error:
+        # gcloud would fail as well; treat the configuration as empty.
+        pass
+    return parser
+
+
+def get_property(section: str, name: str) -> Optional[str]:
+    """Returns a property of the active gcloud configuration.
+
+    Like gcloud, the environment variable CLOUDSDK_<SECTION>_<NAME> overrides
+    the configuration.
+
+    Args:
+        section: Section of the property, e.g. "core".
+        name: Name of the property, e.g. "project".
+
+    Returns:
+        The value of the property, or None if it is not set.
+    """
+    env_name = 'CLOUDSDK_{}_{}'.format(section, name).upper()
+    if os.environ.get(env_name):
+        return os.environ[env_name]
+    parser = _read_configuration(_get_configuration_path())
+    return parser.get(section, name, fallback=None) or None
+
+
+def set_property(section: str, name: str, value: str):
+    """Set a property of the active gcloud configuration.
+
+    This is the equivalent of "gcloud config set <section>/<name> <value>".
+
+    Args:
+        section: Section of the property, e.g. "core".
+        name: Name of the property, e.g. "project".
+        value: The value to set.
+    """
+    path = _get_configuration_path()
+    parser = _read_configuration(path)
+    if not parser.has_section(section):
+        parser.add_section(section)
+    parser.set(section, name, value)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        parser.write(f)
+    os.replace(tmp_path, path)
+
+
+def get_legacy_credentials_path(account: str) -> str:
+    """Returns the path of the credentials of an account.
+
+    The credentials file is created by "gcloud auth login". It grants a
+    superset of the access of "gcloud auth application-default login".
+
+    Args:
+        account: The account, e.g. "user@example.com".
+
+    Returns:
+        Absolute path of the credentials file of the account.
+    """
+    return os.path.join(get_config_dir(), 'legacy_credentials', account,
+                        'adc.json')
@@ -16,11 +16,13 @@
 See https://gcloud-python.readthedocs.io/en/latest/resource-manager/api.html
 """
 
-import subprocess
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import backoff
 
+from django_cloud_deploy import cancellation
+from django_cloud_deploy.cloudlib import gcloud_config
+from django_cloud_deploy.cloudlib import quota
 from googleapiclient import discovery
 from google.auth import credentials
 from googleapiclient import errors
@@ -32,6 +34,10 @@ from googleapiclient import errors
 _DEFAULT_GOOGLE_FOLDER_ID = '396521612403'
 _GOOGLE_ORGANIZATION_ID = '433637338589'  # id of organization "google.com"
 
+# The SLO of project creation is 30s at the 90th percentile:
+# https://cloud.google.com/resource-manager/reference/rest/v1/projects/create
+_PROJECT_CREATION_TIMEOUT_SECONDS = 5 * 60
+
 
 class ProjectError(Exception):
     """An error occurred while creating or accessing a project."""
@@ -51,7 +57,10 @@ class ProjectClient(object):
     def from_credentials(cls, credentials: credentials.Credentials):
         return cls(
             discovery.build(
-                'cloudresourcemanager', 'v1', credentials=credentials))
+                'cloudresourcemanager',
+                'v1',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest))
 
     def project_exists(self, project_id: str) -> bool:
         """Returns True if the given project id exists."""
@@ -83,8 +92,22 @@ class ProjectClient(object):
         # 'google.com' organization
         return 'organizations' in response
 
-    def create_project(self, project_id: str, project_name: str):
-        """Create a new GCP project."""
+    def create_project(self, project_id: str,
+                       project_name: str) -> Dict[str, Any]:
+        """Create a new GCP project and wait until it is created.
+
+        Args:
+            project_id: Id of the project to create.
+            project_name: Display name of the project to create.
+
+        Returns:
+            The created Project resource. See
+            https://cloud.google.com/resource-manager/reference/rest/v1/projects
+
+        Raises:
+            ProjectExistsError: If the project id is already used.
+            ProjectError: If the creation failed or did not finish in time.
+        """
         body = {
             'name': project_name,
             'projectId': project_id,
@@ -108,9 +131,19 @@ class ProjectClient(object):
                 'unexpected response creating project "{}": {}'.format(
                     project_id, response))
 
-        if not self._confirm_project_creation(project_id):
+        operation = response
+        if not operation.get('done'):
+            operation = self._get_finished_operation(operation['name'])
+        if not operation:
+            raise ProjectError(
+                'Timed out waiting for project "{}" to be created'.format(
+                    project_id))
+        if 'error' in operation:
+            error = operation['error']
             raise ProjectError(
-                'Project "{}" is not successfully created.'.format(project_id))
+                'Project "{}" is not successfully created: {}'.format(
+                    project_id, error.get('message', error)))
+        return operation.get('response', {})
 
     def create_and_set_project(self, project_id: str, project_name: str):
         self.create_project(project_id, project_name)
@@ -123,15 +156,19 @@ class ProjectClient(object):
         else:
             raise ProjectError('project "{}" does not exist'.format(project_id))
 
-    # The SLO is 30s at the 90th percentile:
-    # https://cloud.google.com/resource-manager/reference/rest/v1/projects/create
-    @backoff.on_predicate(backoff.constant, max_tries=20, interval=3)
-    def _confirm_project_creation(self, project_id: str) -> bool:
-        return self.project_exists(project_id)
+    @backoff.on_predicate(
+        backoff.expo, max_value=8, max_time=_PROJECT_CREATION_TIMEOUT_SECONDS)
+    def _get_finished_operation(
+            self, operation_name: str) -> Optional[Dict[str, Any]]:
+        cancellation.check()
+        request = self._cloudresourcemanager_service.operations().get(
+            name=operation_name)
+        operation = request.execute()
+        # @backoff.on_predicate will keep calling this method until it
+        # returns something truthy.
+        return operation if operation.get('done') else None
 
     def _set_gcloud_project(self, project_id):
         # TODO: Remove this. This module (and the rest of the package)
         # should not be dependant on global state.
-        command = ['gcloud', '-q', 'config', 'set', 'project', project_id]
-        subprocess.check_call(
-            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        gcloud_config.set_property('core', 'project', project_id)
@@ -0,0 +1,430 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Client-side rate limiting of Google Cloud API calls.
+
+Requests are throttled with a token bucket per API, or per API method, so that
+concurrent workflows stay below the API quotas instead of failing. Requests
+rejected because of a quota anyway are retried with exponential backoff,
+honoring the "Retry-After" header of the response.
+
+The limits come from a quota profile, a dictionary like:
+
+    {
+        'default': {'rate': 10, 'burst': 20},
+        'iam': {'rate': 5},
+        'cloudresourcemanager.projects.setIamPolicy': {'rate': 1, 'burst': 3},
+    }
+
+The most specific entry matching the method id of a request is used. "rate" is
+in requests per second and "burst" is the number of requests that can be sent
+at once after a quiet period; it defaults to "rate". The default profile can
+be overridden with a YAML or JSON file at _PROFILE_PATH.
+"""
+
+import email.utils
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+import weakref
+
+from django_cloud_deploy import tracing
+import google_auth_httplib2
+import yaml
+
+from googleapiclient import errors
+from googleapiclient import http as googleapiclient_http
+
+_PROFILE_PATH = '~/.config/django_cloud/quota_profile.yaml'
+
+# Based on the default per-project quotas of each API.
+_DEFAULT_PROFILE = {
+    'default': {
+        'rate': 10,
+        'burst': 20
+    },
+    'cloudbilling': {
+        'rate': 5
+    },
+    # 600 requests per minute, but set/getIamPolicy are far more limited.
+    'cloudresourcemanager': {
+        'rate': 10
+    },
+    'cloudresourcemanager.projects.getIamPolicy': {
+        'rate': 1,
+        'burst': 5
+    },
+    'cloudresourcemanager.projects.setIamPolicy': {
+        'rate': 1,
+        'burst': 3
+    },
+    'iam': {
+        'rate': 5,
+        'burst': 10
+    },
+    'serviceusage': {
+        'rate': 3,
+        'burst': 5
+    },
+    'sqladmin': {
+        'rate': 3,
+        'burst': 5
+    },
+    'storage': {
+        'rate': 50,
+        'burst': 100
+    },
+}
+
+# Reasons of 403 responses which mean the request was rate limited.
+_RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+_RETRYABLE_STATUSES = (429, 503)
+
+_MAX_RETRIES = 6
+_INITIAL_BACKOFF_SECONDS = 1
+_MAX_BACKOFF_SECONDS = 32
+# Longer "Retry-After" values are capped so that a misbehaving server can not
+# stall a deployment.
+_MAX_RETRY_AFTER_SECONDS = 300
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket.
+
+    Tokens are added at "rate" per second, up to "burst" tokens. Each request
+    takes one token, waiting until one is available.
+    """
+
+    def __init__(self,
+                 rate: float,
+                 burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = burst or rate
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+        # Time before which no token is handed out. See pause.
+        self._paused_until = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Take a token, waiting until one is available.
+
+        Returns:
+            The number of seconds waited.
+        """
+        waited = 0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given time.
+
+        Used when the server rejects a request because of quota, so that other
+        requests to the same API wait as well instead of being rejected too.
+
+        Args:
+            seconds: How long to pause.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens = 0
+            self._paused_until = max(self._paused_until, now + seconds)
+
+
+class SharedTokenBucket(TokenBucket):
+    """A token bucket shared by processes.
+
+    The state of the bucket lives in shared memory, so processes started by
+    multiprocessing, e.g. the workers of a pool, take tokens from the same
+    bucket. It can only be passed to processes when they start, e.g. as an
+    argument of the initializer of a pool.
+    """
+
+    def __init__(self,
+                 rate: float,
+                 burst: Optional[float] = None,
+                 context: Optional[multiprocessing.context.BaseContext] = None):
+        context = context or multiprocessing.get_context()
+        # Tokens, time of the last refill and end of the pause. The clock is
+        # time.monotonic, which is the same for all processes of the machine.
+        self._state = context.RawArray('d', 3)
+        super().__init__(rate, burst)
+        self._lock = context.Lock()
+
+    @property
+    def _tokens(self) -> float:
+        return self._state[0]
+
+    @_tokens.setter
+    def _tokens(self, value: float):
+        self._state[0] = value
+
+    @property
+    def _updated(self) -> float:
+        return self._state[1]
+
+    @_updated.setter
+    def _updated(self, value: float):
+        self._state[1] = value
+
+    @property
+    def _paused_until(self) -> float:
+        return self._state[2]
+
+    @_paused_until.setter
+    def _paused_until(self, value: float):
+        self._state[2] = value
+
+
+class _RateLimiter(object):
+    """The token buckets of all APIs, configured by a quota profile."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profile = None
+        self._buckets = {}
+
+    def configure(self,
+                  profile: Optional[Dict[str, Dict[str, float]]],
+                  buckets: Optional[Dict[str, TokenBucket]] = None):
+        with self._lock:
+            self._profile = profile
+            self._buckets = dict(buckets or {})
+
+    def get_bucket(self, method_id: Optional[str]) -> TokenBucket:
+        """Returns the bucket of the most specific profile entry for a method.
+
+        Args:
+            method_id: The method id of the request, e.g.
+                "storage.objects.insert".
+
+        Returns:
+            The token bucket shared by all requests matching the same entry.
+        """
+        with self._lock:
+            if self._profile is None:
+                self._profile = load_profile()
+            key = 'default'
+            parts = (method_id or '').split('.')
+            for i in range(len(parts), 0, -1):
+                candidate = '.'.join(parts[:i])
+                if candidate in self._profile:
+                    key = candidate
+                    break
+            if key not in self._buckets:
+                limits = self._profile.get(key, _DEFAULT_PROFILE['default'])
+                self._buckets[key] = TokenBucket(limits['rate'],
+                                                 limits.get('burst'))
+            return self._buckets[key]
+
+
+_rate_limiter = _RateLimiter()
+
+
+def load_profile(path: str = _PROFILE_PATH) -> Dict[str, Dict[str, float]]:
+    """Load the quota profile, overriding the default one with a file.
+
+    Args:
+        path: The YAML or JSON file overriding entries of the default profile.
+            Ignored if it does not exist.
+
+    Returns:
+        The quota profile.
+
+    Raises:
+        ValueError: If the file is not a valid quota profile.
+    """
+    profile = dict(_DEFAULT_PROFILE)
+    try:
+        with open(os.path.expanduser(path)) as f:
+            overrides = yaml.safe_load(f)
+    except FileNotFoundError:
+        return profile
+    except yaml.YAMLError as e:
+        raise ValueError('Not able to read quota profile "{}": {}'.format(
+            path, e))
+    if not isinstance(overrides, dict):
+        raise ValueError('Quota profile "{}" must be a mapping.'.format(path))
+    for key, limits in overrides.items():
+        if not isinstance(limits, dict) or not limits.get('rate', 0) > 0:
+            raise ValueError(
+                'Entry "{}" of quota profile "{}" must have a positive '
+                '"rate".'.format(key, path))
+        profile[key] = limits
+    return profile
+
+
+def configure(profile: Optional[Dict[str, Dict[str, float]]],
+              buckets: Optional[Dict[str, TokenBucket]] = None):
+    """Use the given quota profile for all following requests.
+
+    Args:
+        profile: The quota profile. See the module docstring. If None, the
+            profile is loaded with load_profile on the next request.
+        buckets: Token buckets to use for entries of the profile, by key of
+            the entry, e.g. those returned by create_shared_buckets. Buckets
+            of the other entries are created when needed.
+    """
+    _rate_limiter.configure(profile, buckets)
+
+
+def create_shared_buckets(
+        profile: Dict[str, Dict[str, float]],
+        context: Optional[multiprocessing.context.BaseContext] = None
+) -> Dict[str, TokenBucket]:
+    """Create token buckets for a quota profile, shared by processes.
+
+    Without them, each process would send requests at the full rate of the
+    profile. Usage:
+
+        profile = quota.load_profile()
+        buckets = quota.create_shared_buckets(profile, context)
+        pool = context.Pool(initializer=quota.configure,
+                            initargs=(profile, buckets))
+
+    Args:
+        profile: The quota profile.
+        context: The multiprocessing context used to start the processes.
+
+    Returns:
+        A SharedTokenBucket for each entry of the profile, by key of the
+        entry. Pass them to configure in each process.
+    """
+    return {
+        key: SharedTokenBucket(limits['rate'], limits.get('burst'), context)
+        for key, limits in profile.items()
+    }
+
+
+_thread_local = threading.local()
+
+
+def _get_thread_http(http):
+    """Returns a copy of an authorized http object owned by the current thread.
+
+    httplib2.Http objects are not thread-safe, so clients shared between
+    threads must not send requests through the same one.
+
+    Args:
+        http: The http object a client was built with.
+
+    Returns:
+        An http object with the same credentials, used only by the current
+        thread. "http" itself if it is not an authorized http object, e.g. a
+        mock.
+    """
+    if not isinstance(http, google_auth_httplib2.AuthorizedHttp):
+        return http
+    copies = getattr(_thread_local, 'http_copies', None)
+    if copies is None:
+        copies = _thread_local.http_copies = weakref.WeakKeyDictionary()
+    if http not in copies:
+        copies[http] = google_auth_httplib2.AuthorizedHttp(
+            http.credentials, http=googleapiclient_http.build_http())
+    return copies[http]
+
+
+def _is_rate_limited(error: errors.HttpError) -> bool:
+    if error.resp.status in _RETRYABLE_STATUSES:
+        return True
+    if error.resp.status != 403:
+        return False
+    try:
+        content = json.loads(error.content.decode('utf-8'))
+        reasons = [e.get('reason') for e in content['error']['errors']]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return False
+    return any(reason in _RATE_LIMIT_REASONS for reason in reasons)
+
+
+def _get_retry_after(error: errors.HttpError) -> Optional[float]:
+    """Returns the delay requested by the "Retry-After" header, if any.
+
+    Args:
+        error: The error of the rejected request.
+
+    Returns:
+        The number of seconds to wait before retrying or None if the response
+        has no valid "Retry-After" header.
+    """
+    value = error.resp.get('retry-after')
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        # parsedate_to_datetime returns None on Python 3.5 but raises
+        # TypeError or ValueError on later versions for invalid dates.
+        try:
+            retry_date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_date is None:
+            return None
+        seconds = retry_date.timestamp() - time.time()
+    return min(max(seconds, 0), _MAX_RETRY_AFTER_SECONDS)
+
+
+class QuotaHttpRequest(tracing.TracedHttpRequest):
+    """A googleapiclient request respecting the quota profile.
+
+    Requests are sent through a connection of the calling thread, so that
+    clients can be shared between threads.
+
+    Pass it as "requestBuilder" to googleapiclient.discovery.build.
+    """
+
+    def execute(self, http=None, num_retries=0):
+        if http is None:
+            http = _get_thread_http(self.http)
+        bucket = _rate_limiter.get_bucket(self.methodId)
+        retries = 0
+        while True:
+            bucket.acquire()
+            try:
+                return super().execute(http=http, num_retries=num_retries)
+            except errors.HttpError as e:
+                if retries >= _MAX_RETRIES or not _is_rate_limited(e):
+                    raise
+                delay = _get_retry_after(e)
+                if delay is None:
+                    delay = min(_MAX_BACKOFF_SECONDS,
+                                _INITIAL_BACKOFF_SECONDS * 2**retries)
+                    delay *= 0.5 + random.random() / 2
+                bucket.pause(delay)
+                retries += 1
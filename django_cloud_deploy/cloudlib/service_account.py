@@ -19,8 +19,13 @@ https://cloud.google.com/resource-manager/reference/rest/
 """
 
 import base64
-from typing import List
+import contextlib
+import copy
+import threading
+from typing import Iterable, Iterator, List, Tuple
 
+import backoff
+from django_cloud_deploy.cloudlib import quota
 from googleapiclient import discovery
 from googleapiclient import errors
 
@@ -35,6 +40,55 @@ class ServiceAccountKeyCreationError(Exception):
     pass
 
 
+def _is_not_iam_policy_conflict(e: errors.HttpError) -> bool:
+    # setIamPolicy fails with 409 if the etag of the given policy does not
+    # match the current one, i.e. the policy was modified concurrently.
+    return e.resp.status != 409
+
+
+class IamPolicyUpdate(object):
+    """Role bindings to add to the IAM policy of a project in one update.
+
+    Create it with ServiceAccountClient.iam_policy_update. Bindings can be
+    added from multiple threads.
+    """
+
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+        self._lock = threading.Lock()
+        self._bindings = []
+
+    def add(self, member: str, role: str):
+        """Add a role binding.
+
+        Args:
+            member: The member to grant the role to, e.g.
+                "serviceAccount:<email>".
+            role: The role to grant, e.g. "roles/cloudsql.client".
+        """
+        with self._lock:
+            self._bindings.append((member, role))
+
+    def add_service_account_roles(self, service_account_id: str,
+                                  roles: List[str]):
+        """Add role bindings of a service account of the project.
+
+        Args:
+            service_account_id: Id of the service account.
+            roles: Roles the service account should have.
+        """
+        member = 'serviceAccount:{}@{}.iam.gserviceaccount.com'.format(
+            service_account_id, self.project_id)
+        for role in roles:
+            self.add(member, role)
+
+    @property
+    def bindings(self) -> List[Tuple[str, str]]:
+        """The (member, role) pairs added so far."""
+        with self._lock:
+            return list(self._bindings)
+
+
 class ServiceAccountClient(object):
     """Help with creation and generation of service account keys."""
 
@@ -46,9 +100,16 @@ class ServiceAccountClient(object):
     @classmethod
     def from_credentials(cls, credentials: credentials.Credentials):
         return cls(
-            discovery.build('iam', 'v1', credentials=credentials),
             discovery.build(
-                'cloudresourcemanager', 'v1', credentials=credentials))
+                'iam',
+                'v1',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest),
+            discovery.build(
+                'cloudresourcemanager',
+                'v1',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest))
 
     def _get_iam_policy(self, project_id):
         request = self._cloudresourcemanager_service.projects().getIamPolicy(
@@ -61,30 +122,100 @@ class ServiceAccountClient(object):
 
         return response
 
-    def _generate_updated_iam_policy(self, policy, member: str, role: str):
-        """Generate a new bindings object after updating iam policy."""
+    def _generate_updated_iam_policy(self, policy,
+                                     bindings: Iterable[Tuple[str, str]]):
+        """Generate a new policy object with the given role bindings added.
 
-        # Avoid changing the input policy.
-        policy = dict(policy)
+        Args:
+            policy: The current IAM policy of the project.
+            bindings: (member, role) pairs to add to the policy.
 
-        # The given member might already have the provided role
-        for binding in policy['bindings']:
-            if binding['role'] == role:
-                if member not in binding['members']:
-                    binding['members'].append(member)
-                return policy
+        Returns:
+            The updated policy. The input policy is not changed.
+        """
 
-        new_bindings = {
-            'members': [member],
-            'role': role,
-        }
-        policy['bindings'].append(new_bindings)
+        policy = dict(policy)
+        bindings_by_role = {}
+        # Policies without any bindings do not have the "bindings" key.
+        if 'bindings' in policy:
+            policy['bindings'] = copy.deepcopy(policy['bindings'])
+            for binding in policy['bindings']:
+                bindings_by_role[binding['role']] = binding
+        for member, role in bindings:
+            binding = bindings_by_role.get(role)
+            if binding is None:
+                binding = {'members': [], 'role': role}
+                bindings_by_role[role] = binding
+                policy.setdefault('bindings', []).append(binding)
+            # The given member might already have the provided role
+            if member not in binding['members']:
+                binding['members'].append(member)
         return policy
 
-    def create_service_account(self, project_id: str, service_account_id: str,
-                               service_account_name: str, roles: List[str]):
+    @backoff.on_exception(
+        backoff.expo,
+        errors.HttpError,
+        max_tries=5,
+        giveup=_is_not_iam_policy_conflict)
+    def grant_roles(self, project_id: str, bindings: List[Tuple[str, str]]):
+        """Add role bindings to the IAM policy of a project.
+
+        The policy is read and written back once for all bindings. The write
+        is guarded by the etag of the policy read, and is retried if the policy
+        was modified in between.
+
+        Args:
+            project_id: GCP project id.
+            bindings: (member, role) pairs to add to the policy.
+
+        Raises:
+            ServiceAccountCreationError: When the server returns an unexpected
+                policy.
+        """
+        policy = self._get_iam_policy(project_id)
+        policy = self._generate_updated_iam_policy(policy, bindings)
+
+        body = {'policy': policy}
+        request = self._cloudresourcemanager_service.projects().setIamPolicy(
+            resource=project_id, body=body)
+        response = request.execute()
+
+        # When the api call succeed, the response is a Policy object.
+        # See
+        # https://cloud.google.com/resource-manager/reference/rest/v1/projects/setIamPolicy
+        if 'bindings' not in response:
+            raise ServiceAccountCreationError(
+                ('unexpected response granting roles in project "{}":{}'.format(
+                    project_id, response)))
+
+    @contextlib.contextmanager
+    def iam_policy_update(self, project_id: str) -> Iterator[IamPolicyUpdate]:
+        """Collect role bindings and add them to the IAM policy at once.
+
+        The bindings are added when the context exits without an exception.
+
+        Args:
+            project_id: GCP project id.
+
+        Yields:
+            The IamPolicyUpdate to add bindings to.
+        """
+        policy_update = IamPolicyUpdate(project_id)
+        yield policy_update
+        if policy_update.bindings:
+            self.grant_roles(project_id, policy_update.bindings)
+
+    def create_service_account(self,
+                               project_id: str,
+                               service_account_id: str,
+                               service_account_name: str,
+                               roles: List[str],
+                               policy_update: IamPolicyUpdate = None
+                              ) -> bool:
         """Create a service account and assign it with the given roles.
 
+        An existing service account with the same id is reused.
+
         Args:
             project_id: GCP project id.
             service_account_id: Id of your service account. For example, a
@@ -93,6 +224,12 @@ class ServiceAccountClient(object):
             service_account_name: Display name of your service account.
             roles: Roles the service account should have. Valid roles can be
                 found on https://cloud.google.com/iam/docs/understanding-roles
+            policy_update: If given, the roles are added to it instead of
+                being granted right away.
+
+        Returns:
+            True if the service account was created, False if it already
+            existed.
 
         Raises:
             ServiceAccountCreationError: When it fails to create a service
@@ -109,6 +246,7 @@ class ServiceAccountClient(object):
         }
         request = self._iam_service.projects().serviceAccounts().create(
             name=resource_name, body=body)
+        created = True
         try:
             response = request.execute()
             # When the api call succeed, the response is a Service Account
@@ -120,33 +258,24 @@ class ServiceAccountClient(object):
                     format(service_account_id, response))
         except errors.HttpError as e:
             if e.resp.status == 409:
-                raise ServiceAccountCreationError(
-                    'Service account {} already exists within project {}'.
-                    format(service_account_id, project_id))
+                # The service account already exists, e.g. it was created by
+                # a previous deployment. Reuse it.
+                created = False
             elif e.resp.status == 400:
                 raise ServiceAccountCreationError(
                     'Service account id {} is invalid'.format(
                         service_account_id))
+            else:
+                raise
 
-        # Bind the newly created service account with given roles
-        member = ('serviceAccount:{}@{}.iam.gserviceaccount.com'.format(
-            service_account_id, project_id))
-        policy = self._get_iam_policy(project_id)
-        for role in roles:
-            policy = self._generate_updated_iam_policy(policy, member, role)
-
-        body = {'policy': policy}
-        request = self._cloudresourcemanager_service.projects().setIamPolicy(
-            resource=project_id, body=body)
-        response = request.execute()
-
-        # When the api call succeed, the response is a Policy object.
-        # See
-        # https://cloud.google.com/resource-manager/reference/rest/v1/projects/setIamPolicy
-        if 'bindings' not in response:
-            raise ServiceAccountCreationError(
-                ('unexpected response granting roles to service account "{}":{}'
-                 .format(service_account_id, response)))
+        # Bind the service account with given roles
+        if policy_update:
+            policy_update.add_service_account_roles(service_account_id, roles)
+        else:
+            policy_update = IamPolicyUpdate(project_id)
+            policy_update.add_service_account_roles(service_account_id, roles)
+            self.grant_roles(project_id, policy_update.bindings)
+        return created
 
     def create_key(self, project_id: str, service_account_id: str) -> str:
         """Create a new key of the given service account.
@@ -13,11 +13,15 @@
 # limitations under the License.
 """Manages resources about static content serving of Django projects."""
 
+import copy
 import os
+from typing import Optional
 
 from django.conf import settings
 from django.core import management
 from django_cloud_deploy import crash_handling
+from django_cloud_deploy import progress
+from django_cloud_deploy.cloudlib import quota
 
 from googleapiclient import discovery
 from googleapiclient import errors
@@ -25,6 +29,11 @@ from googleapiclient import http
 from google.auth import credentials
 
 
+# Role and member of the IAM binding making the objects of a bucket public.
+_PUBLIC_READ_ROLE = 'roles/storage.objectViewer'
+_PUBLIC_READ_MEMBER = 'allUsers'
+
+
 class StaticContentServeError(Exception):
     """An exception occured while managing resources about static content."""
     pass
@@ -42,19 +51,109 @@ class StaticContentServeClient(object):
 
     @classmethod
     def from_credentials(cls, credentials: credentials.Credentials):
-        return cls(discovery.build('storage', 'v1', credentials=credentials))
+        return cls(
+            discovery.build(
+                'storage',
+                'v1',
+                credentials=credentials,
+                requestBuilder=quota.QuotaHttpRequest))
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        """Returns True if the given bucket exists and we have access to it.
+
+        Args:
+            bucket_name: Name of the bucket.
+        """
+        request = self._storage_service.buckets().get(bucket=bucket_name)
+        try:
+            request.execute()
+        except errors.HttpError as e:
+            if e.resp.status in [403, 404]:
+                return False
+            raise
+        return True
+
+    def _bucket_in_project(self, project_id: str, bucket_name: str) -> bool:
+        """Returns True if the given bucket belongs to the given project.
+
+        Having access to a bucket is not enough to use it: anyone can create a
+        bucket with the name we expect and grant us access to it.
+
+        Args:
+            project_id: Id of the GCP project.
+            bucket_name: Name of the bucket.
+        """
+        # Buckets are listed in lexicographic order, so the bucket is on the
+        # first page if it is listed at all.
+        request = self._storage_service.buckets().list(
+            project=project_id, prefix=bucket_name)
+        try:
+            response = request.execute()
+        except errors.HttpError as e:
+            if e.resp.status in [403, 404]:
+                return False
+            raise
+        return any(
+            bucket.get('name') == bucket_name
+            for bucket in response.get('items', []))
+
+    def provision_bucket(self,
+                         project_id: str,
+                         bucket_name: str,
+                         location: Optional[str] = None,
+                         public: bool = False):
+        """Create a bucket unless it exists, and make it public if requested.
+
+        This can be called again on a provisioned bucket: nothing changes and
+        the IAM policy is only read.
+
+        Args:
+            project_id: Id of the GCP project.
+            bucket_name: Name of the bucket to provision.
+            location: Where the bucket stores its objects. See create_bucket.
+            public: Whether everyone should be able to read the objects of
+                the bucket.
+
+        Raises:
+            StaticContentServeError: When it fails to provision the bucket.
+        """
+        self.create_bucket(project_id, bucket_name, location, exist_ok=True)
+        if public:
+            self.make_bucket_public(bucket_name)
 
-    def create_bucket(self, project_id: str, bucket_name: str):
+    def create_bucket(self,
+                      project_id: str,
+                      bucket_name: str,
+                      location: Optional[str] = None,
+                      exist_ok: bool = False):
         """Create a Google Cloud Storage Bucket on the given project.
 
+        Access to the bucket is controlled by IAM only: uniform bucket-level
+        access is enabled, so objects do not have ACLs.
+
         Args:
             project_id: Id of the GCP project.
             bucket_name: Name of the bucket to create.
+            location: Where the bucket stores its objects: a region, a
+                dual-region like "NAM4" or a multi-region like "US". See
+                https://cloud.google.com/storage/docs/locations. By default
+                the "US" multi-region.
+            exist_ok: Whether to accept a bucket with the same name which
+                already exists in the project.
 
         Raises:
             StaticContentServeError: When it fails to create the bucket.
         """
-        bucket_body = {'name': bucket_name}
+        bucket_body = {
+            'name': bucket_name,
+            'iamConfiguration': {
+                'uniformBucketLevelAccess': {
+                    'enabled': True
+                }
+            }
+        }
+        if location:
+            bucket_body['location'] = location
         request = self._storage_service.buckets().insert(
             project=project_id, body=bucket_body)
         try:
@@ -72,6 +171,9 @@ class StaticContentServeClient(object):
                     'You do not have permission to create bucket in project: '
                     '"{}"'.format(project_id))
             elif e.resp.status == 409:
+                if exist_ok and self._bucket_in_project(project_id,
+                                                        bucket_name):
+                    return
                 raise StaticContentServeError(
                     'Bucket "{}" already exist. Name of the bucket should be '
                     'unique across the whole Google Cloud Platform.'.format(
@@ -84,7 +186,8 @@ class StaticContentServeClient(object):
     def make_bucket_public(self, bucket_name: str):
         """Make a Google Cloud Storage Bucket public readable.
 
-        This step is necessary to serve static content.
+        This step is necessary to serve static content. The IAM policy of the
+        bucket is only changed if it does not make the bucket public already.
 
         Args:
             bucket_name: Name of the bucket to create.
@@ -113,13 +216,28 @@ class StaticContentServeClient(object):
                     'Unexpected error getting iam policy of bucket "{}"'.format(
                         bucket_name)) from e
 
-        bindings = response['bindings']
-        new_binding = {
-            'role': 'roles/storage.objectViewer',
-            'members': ['allUsers']
-        }
-        bindings.append(new_binding)
+        bindings = copy.deepcopy(response['bindings'])
+        role_bindings = [
+            binding for binding in bindings
+            if binding['role'] == _PUBLIC_READ_ROLE and
+            'condition' not in binding
+        ]
+        for binding in role_bindings:
+            if _PUBLIC_READ_MEMBER in binding.get('members', []):
+                return
+        if role_bindings:
+            role_bindings[0].setdefault('members',
+                                        []).append(_PUBLIC_READ_MEMBER)
+        else:
+            bindings.append({
+                'role': _PUBLIC_READ_ROLE,
+                'members': [_PUBLIC_READ_MEMBER]
+            })
         body = {'bindings': bindings}
+        # The update fails instead of overwriting concurrent changes to the
+        # policy.
+        if 'etag' in response:
+            body['etag'] = response['etag']
         request = self._storage_service.buckets().setIamPolicy(
             bucket=bucket_name, body=body)
         try:
@@ -144,7 +262,8 @@ class StaticContentServeClient(object):
     def upload_content(self,
                        bucket_name: str,
                        static_content_dir: str,
-                       folder_root: str = None):
+                       folder_root: str = None,
+                       cache_control: Optional[str] = None):
         """Upload content in the given directory to a GCS bucket.
 
         Args:
@@ -153,12 +272,21 @@ class StaticContentServeClient(object):
             static_content_dir: Absolute path of the directory containing
                 static files of the Django app.
             folder_root: Name of root folder for files in GCS bucket.
+            cache_control: The "Cache-Control" header to serve the files
+                with, e.g. "public, max-age=3600".
 
         Raises:
             StaticContentServeError: When failed to upload files.
         """
 
         prefix_length = len(static_content_dir)
+        task = 'upload:{}'.format(bucket_name)
+        message = 'Uploading static files to bucket "{}"'.format(bucket_name)
+        total_bytes = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(static_content_dir)
+            for name in files)
+        uploaded_bytes = 0
 
         # The api only supports uploading a single file. So we need to iterate
         # all files in the given directory.
@@ -174,6 +302,8 @@ class StaticContentServeClient(object):
                 absolute_file_path = os.path.join(root, relative_file_path)
                 media_body = http.MediaFileUpload(absolute_file_path)
                 body = {'name': gcs_file_path}
+                if cache_control:
+                    body['cacheControl'] = cache_control
                 request = self._storage_service.objects().insert(
                     bucket=bucket_name, body=body, media_body=media_body)
                 try:
@@ -204,6 +334,14 @@ class StaticContentServeClient(object):
                 # https://github.com/googleapis/google-api-python-client/issues/575
                 # is resolved.
                 media_body.stream().close()
+                uploaded_bytes += media_body.size()
+                progress.report(
+                    task,
+                    message,
+                    current=uploaded_bytes,
+                    total=total_bytes,
+                    unit='B')
+        progress.report(task, message, done=True)
 
     def collect_static_content(self):
         """Collect static content of the provided Django project.
@@ -17,7 +17,7 @@ The configuration files are expected to capture the state of Django projects.
 """
 
 import os
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 import yaml
 
 
@@ -26,6 +26,9 @@ class Configuration(object):
 
     _HEADER = '# Generated file, do not edit'
 
+    # Key of the journal of completed workflow steps and their outputs.
+    _STEPS_KEY = 'completed_steps'
+
     def __init__(self, django_directory_path: str):
         """Initialize a configuration object from a Django project directory.
 
@@ -48,7 +51,7 @@ class Configuration(object):
                                          '.config.yaml')
         if os.path.exists(self._config_path):
             with open(self._config_path) as config_file:
-                self._data = yaml.load(config_file)
+                self._data = yaml.safe_load(config_file) or {}
         else:
             self._data = {}
 
@@ -62,11 +65,17 @@ class Configuration(object):
         self._data[attr] = value
 
     def save(self):
-        """Generate the configuration file in yaml format."""
+        """Generate the configuration file in yaml format.
+
+        The file is replaced atomically, so an interrupted save never leaves a
+        truncated configuration file behind.
+        """
         yaml_text = '\n'.join([self._HEADER,
                                yaml.dump(self._data, default_flow_style=False)])
-        with open(self._config_path, 'w') as config_file:
+        temp_path = self._config_path + '.tmp'
+        with open(temp_path, 'w') as config_file:
             config_file.write(yaml_text)
+        os.replace(temp_path, self._config_path)
 
     def get(self, attr: str) -> Optional[Any]:
         """Get the value of the specified attribute.
@@ -79,3 +88,33 @@ class Configuration(object):
                 None.
         """
         return self._data.get(attr)
+
+    def complete_step(self, step: str,
+                      outputs: Optional[Dict[str, Any]] = None):
+        """Record that a workflow step finished and save the configuration.
+
+        Args:
+            step: Name of the workflow step, e.g. "database".
+            outputs: Values produced by the step that later steps or a resumed
+                workflow need, e.g. the name of the created bucket.
+        """
+        steps = self._data.setdefault(self._STEPS_KEY, {})
+        steps[step] = outputs or {}
+        self.save()
+
+    def get_completed_step(self, step: str) -> Optional[Dict[str, Any]]:
+        """Get the outputs of a completed workflow step.
+
+        Args:
+            step: Name of the workflow step, e.g. "database".
+
+        Returns:
+            The outputs recorded by "complete_step" if the step completed.
+            Otherwise returns None.
+        """
+        return (self._data.get(self._STEPS_KEY) or {}).get(step)
+
+    def clear_completed_steps(self):
+        """Forget all completed workflow steps and save the configuration."""
+        self._data.pop(self._STEPS_KEY, None)
+        self.save()
@@ -17,14 +17,50 @@ import sys
 import warnings
 
 import django_cloud_deploy.crash_handling
+from django_cloud_deploy import cancellation
+from django_cloud_deploy import tracing
+from django_cloud_deploy.cli import fleet
 from django_cloud_deploy.cli import new
 from django_cloud_deploy.cli import update
 
 
+def _add_tracing_arguments(parser):
+    parser.add_argument(
+        '--trace-file',
+        dest='trace_file',
+        help=('Record how long each step and Google Cloud API call takes and '
+              'write it to this file in the Chrome trace format.'))
+    parser.add_argument(
+        '--trace-opentelemetry',
+        dest='trace_opentelemetry',
+        action='store_true',
+        help=('Report the steps and API calls to OpenTelemetry. Requires the '
+              '"opentelemetry-api" package.'))
+
+
+def _run_traced(command_main, args, command: str):
+    """Run a command, recording a trace if requested by the arguments."""
+    trace_file = getattr(args, 'trace_file', None)
+    trace_opentelemetry = getattr(args, 'trace_opentelemetry', False)
+    if trace_file or trace_opentelemetry:
+        try:
+            tracing.enable(opentelemetry=trace_opentelemetry)
+        except tracing.TracingError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+    try:
+        with cancellation.cancel_on_interrupt():
+            with tracing.span(command, category='command'):
+                command_main(args)
+    finally:
+        if trace_file:
+            tracing.export_chrome_trace(trace_file)
+
+
 def _update(args):
     """Update the Django project on GKE."""
     try:
-        update.main(args)
+        _run_traced(update.main, args, 'django-cloud-deploy update')
     except Exception as e:
         django_cloud_deploy.crash_handling.handle_crash(
             e, 'django-cloud-deploy update')
@@ -33,12 +69,21 @@ def _update(args):
 def _new(args):
     """Create a new Django GKE project."""
     try:
-        new.main(args)
+        _run_traced(new.main, args, 'django-cloud-deploy new')
     except Exception as e:
         django_cloud_deploy.crash_handling.handle_crash(
             e, 'django-cloud-deploy new')
 
 
+def _deploy_fleet(args):
+    """Deploy the Django projects listed in a manifest on GKE."""
+    try:
+        _run_traced(fleet.main, args, 'django-cloud-deploy deploy-fleet')
+    except Exception as e:
+        django_cloud_deploy.crash_handling.handle_crash(
+            e, 'django-cloud-deploy deploy-fleet')
+
+
 def main():
     warnings.filterwarnings(
         'ignore',
@@ -53,12 +98,22 @@ def main():
                      'Kubernetes Engine.'))
     new_parser.set_defaults(func=_new)
     new.add_arguments(new_parser)
+    _add_tracing_arguments(new_parser)
     update_parser = subparsers.add_parser(
         'update',
         description=('Deploys an Django project, previously created with '
                      'django_cloud_deploy, on Google Kubernetes Engine.'))
     update_parser.set_defaults(func=_update)
     update.add_arguments(update_parser)
+    _add_tracing_arguments(update_parser)
+    fleet_parser = subparsers.add_parser(
+        'deploy-fleet',
+        description=('Deploys many Django projects, previously created with '
+                     'django_cloud_deploy, on Google Kubernetes Engine '
+                     'without prompting.'))
+    fleet_parser.set_defaults(func=_deploy_fleet)
+    fleet.add_arguments(fleet_parser)
+    _add_tracing_arguments(fleet_parser)
     if len(sys.argv) == 1:
         parser.print_help(sys.stderr)
         sys.exit(1)
@@ -92,3 +92,18 @@ def e2e_test(session, python_version):
     session.interpreter = 'python{}'.format(python_version)
     session.install(*PACKAGES)
     session.run('py.test', 'tests/e2e', '--timeout=1800')
+
+
+@nox.session
+def benchmark(session):
+    """Run the offline performance benchmarks.
+
+    Pass a previous result file to detect regressions, e.g.
+    "nox -s benchmark -- --baseline benchmark_results_old.json".
+    """
+
+    session.interpreter = 'python3.5'
+    session.install(*PACKAGES)
+    session.install('..')
+    session.run('python', '-m', 'django_cloud_deploy.benchmarks', '--output',
+                'benchmark_results.json', *session.posargs)
@@ -0,0 +1,140 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Progress events of long running operations.
+
+Cloud operations publish progress events computed from their real state,
+e.g. uploaded bytes or ready replicas. Renderers like the console subscribe to
+the event bus. Subscribers are called on a dispatcher thread, so slow
+rendering never blocks the threads doing the work.
+
+Usage:
+    progress.report('upload', 'Uploading static files', current=10,
+                    total=100, unit='B')
+"""
+
+import queue
+import threading
+from typing import Callable, Optional
+
+
+class ProgressEvent(object):
+    """The state of a long running task.
+
+    Attributes:
+        task: Identifier of the task, e.g. "upload:my-bucket". Events with the
+            same task update the same progress display.
+        message: Human readable description of the task.
+        current: How much of the task is done, e.g. uploaded bytes. None if
+            unknown.
+        total: How much work the task is, in the same unit as "current". None
+            if unknown.
+        unit: Unit of "current" and "total", e.g. "B" or "replicas".
+        status: State reported by the service, e.g. "PENDING_CREATE".
+        done: Whether the task finished.
+    """
+
+    def __init__(self,
+                 task: str,
+                 message: str,
+                 current: Optional[float] = None,
+                 total: Optional[float] = None,
+                 unit: Optional[str] = None,
+                 status: Optional[str] = None,
+                 done: bool = False):
+        self.task = task
+        self.message = message
+        self.current = current
+        self.total = total
+        self.unit = unit
+        self.status = status
+        self.done = done
+
+    def __repr__(self):
+        return ('ProgressEvent(task={!r}, current={!r}, total={!r}, '
+                'status={!r}, done={!r})').format(self.task, self.current,
+                                                  self.total, self.status,
+                                                  self.done)
+
+
+class EventBus(object):
+    """Delivers published events to subscribers on a dispatcher thread."""
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def subscribe(self, callback: Callable[[ProgressEvent], None]):
+        """Call "callback" with every event published from now on."""
+        with self._lock:
+            self._subscribers.append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def unsubscribe(self, callback: Callable[[ProgressEvent], None]):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+    def publish(self, event: ProgressEvent):
+        """Queue an event for subscribers. This never blocks."""
+        # Avoid queueing events nobody listens to.
+        if self._subscribers:
+            self._queue.put(event)
+
+    def flush(self):
+        """Wait until all published events are delivered."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _dispatch(self):
+        while True:
+            event = self._queue.get()
+            try:
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for callback in subscribers:
+                    try:
+                        callback(event)
+                    except Exception:
+                        # A broken renderer should not stop other
+                        # subscribers or the deployment.
+                        pass
+            finally:
+                self._queue.task_done()
+
+
+_event_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    """Returns the event bus of the process."""
+    return _event_bus
+
+
+def report(task: str,
+           message: str,
+           current: Optional[float] = None,
+           total: Optional[float] = None,
+           unit: Optional[str] = None,
+           status: Optional[str] = None,
+           done: bool = False):
+    """Publish a progress event on the event bus of the process.
+
+    See ProgressEvent for the meaning of the arguments.
+    """
+    _event_bus.publish(
+        ProgressEvent(task, message, current, total, unit, status, done))
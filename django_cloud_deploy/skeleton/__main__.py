@@ -53,6 +53,11 @@ def add_arguments(parser):
         default=False,
         help=('Should the generator generate files based on an existing '
               'project'))
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help=('Only rewrite generated files whose content changed, keeping '
+              'files modified by hand.'))
 
 
 def main():
@@ -60,13 +65,20 @@ def main():
     add_arguments(parser)
     args = parser.parse_args()
     generator = source_generator.DjangoSourceFileGenerator()
-    generator.generate_all_source_files(
+    report = generator.generate_all_source_files(
         project_id=args.project_id,
         project_name=args.project_name,
         app_name=args.app_name,
         project_dir=args.project_dir,
         database_user=args.database_user,
-        database_password=args.database_password)
+        database_password=args.database_password,
+        incremental=args.incremental)
+    if report:
+        for status in ('created', 'updated', 'removed'):
+            for path in report[status]:
+                print('{}: {}'.format(status, path))
+        for path in report['conflicts']:
+            print('not overwritten, modified by hand: {}'.format(path))
 
 
 if __name__ == '__main__':
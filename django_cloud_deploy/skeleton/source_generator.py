@@ -15,24 +15,60 @@
 """Generate source files of a django app ready to be deployed to GKE."""
 
 import abc
+from concurrent import futures
+import hashlib
 import os
+import re
 import shutil
 import sys
-from typing import Any, Dict, List, Optional
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
 import django
 from django.core.management import utils
 from django.utils import version
+from django_cloud_deploy import config
 from django_cloud_deploy import crash_handling
 import jinja2
 
+_TEMPLATE_FOLDER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# Instance class and automatic scaling settings written in app.yaml, by name of
+# the scaling profile. See
+# https://cloud.google.com/appengine/docs/standard/python3/config/appref#scaling_elements
+GAE_SCALING_PROFILES = {
+    # Scale to zero. The first request after an idle period waits for an
+    # instance to start.
+    'economy': {
+        'instance_class': 'F1',
+        'min_instances': 0,
+        'target_cpu_utilization': 0.8,
+        'max_concurrent_requests': 10
+    },
+    'standard': {
+        'instance_class': 'F2',
+        'min_instances': 1,
+        'target_cpu_utilization': 0.65,
+        'max_concurrent_requests': 20
+    },
+    # Keep spare capacity warm for bursty traffic.
+    'low-latency': {
+        'instance_class': 'F4',
+        'min_instances': 2,
+        'target_cpu_utilization': 0.5,
+        'max_concurrent_requests': 40
+    },
+}
+DEFAULT_GAE_SCALING_PROFILE = 'standard'
+
 
 class _FileGenerator(object):  # pytype: disable=ignored-abstractmethod
     """An abstract class to generate files using templates."""
 
     def _get_template_folder_path(self) -> str:
-        dirname, _ = os.path.split(os.path.abspath(__file__))
-        return os.path.join(dirname, 'templates')
+        return _TEMPLATE_FOLDER_PATH
 
     @staticmethod
     @abc.abstractmethod
@@ -76,8 +112,52 @@ class _Jinja2FileGenerator(_FileGenerator):
         ('.html-tpl', '.html'),
         ('.css-tpl', '.css'),)
 
+    # Maximum number of files rendered and written at the same time.
+    _MAX_WORKERS = 8
+
+    # All generators share one environment, so every template is compiled at
+    # most once per process. Compiled templates are also kept in a bytecode
+    # cache on disk, which makes later runs skip compilation.
+    _shared_template_env = None
+    _shared_template_env_lock = threading.Lock()
+
     def __init__(self):
-        self._template_env = jinja2.Environment()
+        self._template_env = self._get_template_env()
+
+    @classmethod
+    def _get_template_env(cls) -> jinja2.Environment:
+        with cls._shared_template_env_lock:
+            if _Jinja2FileGenerator._shared_template_env is None:
+                template_loader = jinja2.FileSystemLoader(
+                    searchpath=_TEMPLATE_FOLDER_PATH)
+                try:
+                    bytecode_cache = jinja2.FileSystemBytecodeCache()
+                except (OSError, RuntimeError):
+                    # The default cache directory is not usable, e.g. it is
+                    # owned by another user.
+                    bytecode_cache = None
+                _Jinja2FileGenerator._shared_template_env = jinja2.Environment(
+                    loader=template_loader, bytecode_cache=bytecode_cache)
+            return _Jinja2FileGenerator._shared_template_env
+
+    def _get_template(self, template_path: str) -> jinja2.Template:
+        """Returns the compiled template of the given file.
+
+        Args:
+            template_path: Absolute path of the template.
+
+        Returns:
+            The compiled template.
+        """
+        relative_path = os.path.relpath(template_path,
+                                        self._get_template_folder_path())
+        if relative_path.startswith(os.pardir):
+            # The template is not shipped with this package, so it cannot be
+            # found by the loader.
+            with open(template_path) as template_file:
+                return self._template_env.from_string(template_file.read())
+        return self._template_env.get_template(
+            relative_path.replace(os.sep, '/'))
 
     def _render_file(self,
                      template_path: str,
@@ -92,13 +172,31 @@ class _Jinja2FileGenerator(_FileGenerator):
         """
         if not options:
             options = {}
-        with open(template_path) as template_file:
-            content = template_file.read()
-        template = self._template_env.from_string(content)
-        content = template.render(options)
+        content = self._get_template(template_path).render(options)
         with open(output_path, 'w') as new_file:
             new_file.write(content)
 
+    def _render_files(self,
+                      paths: List[Tuple[str, str]],
+                      options: Optional[Dict[str, Any]] = None):
+        """Render independent files concurrently.
+
+        Args:
+            paths: Pairs of (absolute template path, absolute output path).
+                Directories of the output paths should already exist.
+            options: Options used to render the files.
+        """
+        if len(paths) <= 1:
+            for template_path, output_path in paths:
+                self._render_file(template_path, output_path, options)
+            return
+        max_workers = min(self._MAX_WORKERS, len(paths))
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # list() makes exceptions raised while rendering propagate.
+            list(
+                executor.map(
+                    lambda p: self._render_file(p[0], p[1], options), paths))
+
     def _render_directory(self,
                           template_dir: str,
                           output_dir: str,
@@ -120,6 +218,7 @@ class _Jinja2FileGenerator(_FileGenerator):
         if not os.path.isdir(output_dir):
             os.makedirs(output_dir, exist_ok=True)
 
+        paths = []
         for root, _, files in os.walk(template_dir):
             path_rest = root[prefix_length:]
             if template_replacement:
@@ -138,7 +237,10 @@ class _Jinja2FileGenerator(_FileGenerator):
                     if new_path.endswith(old_suffix):
                         new_path = new_path[:-len(old_suffix)] + new_suffix
                         break  # Only rewrite once
-                self._render_file(old_path, new_path, options)
+                paths.append((old_path, new_path))
+
+        # Directories are created above, so the files are independent.
+        self._render_files(paths, options)
 
     def _generate_files(self, folder_name: str, destination: str,
                         filename_template_replacement=None, options=None):
@@ -325,13 +427,57 @@ class _SettingsFileGenerator(_Jinja2FileGenerator):
         return os.path.exists(os.path.join(project_dir, project_name,
                                            'settings.py'))
 
+    @staticmethod
+    def get_secret_key(project_dir: str, project_name: str) -> Optional[str]:
+        """Returns the secret key of previously generated settings files.
+
+        Args:
+            project_dir: The directory holding files of the project.
+            project_name: Name of the Django project.
+
+        Returns:
+            The value of "SECRET_KEY" in the generated "base_settings.py", or
+            None if it cannot be found.
+        """
+        base_settings_path = os.path.join(project_dir, project_name,
+                                          'base_settings.py')
+        if not os.path.exists(base_settings_path):
+            return None
+        with open(base_settings_path) as base_settings_file:
+            match = re.search(r"^SECRET_KEY = '(.+)'$",
+                              base_settings_file.read(), re.MULTILINE)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def set_static_url(project_dir: str, project_name: str, static_url: str):
+        """Change "STATIC_URL" in the generated "remote_settings.py".
+
+        Args:
+            project_dir: The directory holding files of the project.
+            project_name: Name of the Django project.
+            static_url: The new URL static files are served from, e.g.
+                "http://203.0.113.1/static/".
+        """
+        remote_settings_path = os.path.join(project_dir, project_name,
+                                            'remote_settings.py')
+        with open(remote_settings_path) as remote_settings_file:
+            content = remote_settings_file.read()
+        line = 'STATIC_URL = {!r}'.format(static_url)
+        content, count = re.subn(r'^STATIC_URL = .*$', lambda _: line,
+                                 content, flags=re.MULTILINE)
+        if not count:
+            content += '\n{}\n'.format(line)
+        with open(remote_settings_path, 'w') as remote_settings_file:
+            remote_settings_file.write(content)
+
     def generate(self,
                  project_id: str,
                  project_name: str,
                  project_dir: str,
                  cloud_sql_connection: str,
                  database_name: Optional[str] = None,
-                 cloud_storage_bucket_name: Optional[str] = None):
+                 cloud_storage_bucket_name: Optional[str] = None,
+                 secret_key: Optional[str] = None):
         if self.generated(project_dir, project_name):
             return
 
@@ -342,7 +488,7 @@ class _SettingsFileGenerator(_Jinja2FileGenerator):
         else:
             self._generate_new(project_id, project_name, project_dir,
                                cloud_sql_connection, database_name,
-                               cloud_storage_bucket_name)
+                               cloud_storage_bucket_name, secret_key)
 
     def _generate_new(self,
                       project_id: str,
@@ -350,7 +496,8 @@ class _SettingsFileGenerator(_Jinja2FileGenerator):
                       project_dir: str,
                       cloud_sql_connection: str,
                       database_name: Optional[str] = None,
-                      cloud_storage_bucket_name: Optional[str] = None):
+                      cloud_storage_bucket_name: Optional[str] = None,
+                      secret_key: Optional[str] = None):
         """Create Django settings file using our template.
 
         Args:
@@ -362,6 +509,8 @@ class _SettingsFileGenerator(_Jinja2FileGenerator):
             database_name: Name of your cloud database.
             cloud_storage_bucket_name: Google Cloud Storage bucket name to
                 serve static content.
+            secret_key: The Django secret key to use. A random one is
+                generated by default.
         """
         database_name = database_name or project_name + '-db'
         destination = os.path.join(
@@ -373,7 +522,7 @@ class _SettingsFileGenerator(_Jinja2FileGenerator):
             'project_id': project_id,
             'project_name': project_name,
             'docs_version': version.get_docs_version(),
-            'secret_key': utils.get_random_secret_key(),
+            'secret_key': secret_key or utils.get_random_secret_key(),
             'database_name': database_name,
             'bucket_name': cloud_storage_bucket_name,
             'cloud_sql_connection': cloud_sql_connection
@@ -463,11 +612,10 @@ class _DockerfileGenerator(_Jinja2FileGenerator):
         """
         file_names = ('Dockerfile', '.dockerignore')
         options = {'project_name': project_name}
-        for file_name in file_names:
-            template_path = os.path.join(self._get_template_folder_path(),
-                                         file_name)
-            output_path = os.path.join(project_dir, file_name)
-            self._render_file(template_path, output_path, options)
+        paths = [(os.path.join(self._get_template_folder_path(), file_name),
+                  os.path.join(project_dir, file_name))
+                 for file_name in file_names]
+        self._render_files(paths, options)
 
 
 class _AppEngineFileGenerator(_Jinja2FileGenerator):
@@ -483,16 +631,21 @@ class _AppEngineFileGenerator(_Jinja2FileGenerator):
                 return False
         return True
 
-    def generate(self, project_name: str, project_dir: str):
+    def generate(self,
+                 project_name: str,
+                 project_dir: str,
+                 scaling_profile: str = DEFAULT_GAE_SCALING_PROFILE):
         """Generate app.yaml and .gcloudignore.
 
         Args:
             project_name: The name of your Django project.
             project_dir: The destination directory path to put Dockerfile.
+            scaling_profile: Name of the scaling profile to write in app.yaml.
+                One of the keys of GAE_SCALING_PROFILES.
         """
         if not self.generated(project_dir):
             self._generate_ignore(project_dir)
-            self._generate_yaml(project_dir, project_name)
+            self._generate_yaml(project_dir, project_name, scaling_profile)
 
     def _generate_ignore(self, project_dir: str):
         file_name = '.gcloudignore'
@@ -501,12 +654,12 @@ class _AppEngineFileGenerator(_Jinja2FileGenerator):
         output_path = os.path.join(project_dir, file_name)
         self._render_file(template_path, output_path)
 
-    def _generate_yaml(self, project_dir: str, project_name: str):
+    def _generate_yaml(self, project_dir: str, project_name: str,
+                       scaling_profile: str):
         """Generate a yaml file to define how to deploy a Django app to GAE."""
         file_name = 'app.yaml'
-        options = {
-            'project_name': project_name
-        }
+        options = {'project_name': project_name}
+        options.update(GAE_SCALING_PROFILES[scaling_profile])
         template_path = os.path.join(self._get_template_folder_path(),
                                      file_name)
         output_path = os.path.join(project_dir, file_name)
@@ -674,6 +827,18 @@ class DjangoSourceFileGenerator(_FileGenerator):
             elif os.path.isdir(file_path):
                 shutil.rmtree(file_path)
 
+    def set_static_url(self, project_dir: str, project_name: str,
+                       static_url: str):
+        """Change the URL the deployed project serves static files from.
+
+        Args:
+            project_dir: Absolute directory path of your Django project.
+            project_name: Name of your Django project.
+            static_url: The new URL of the static files, ending with "/".
+        """
+        self.settings_file_generator.set_static_url(project_dir, project_name,
+                                                    static_url)
+
     def setup_django_environment(self,
                                  project_dir: str,
                                  project_name: str,
@@ -722,7 +887,11 @@ class DjangoSourceFileGenerator(_FileGenerator):
                                   database_name: Optional[str] = None,
                                   region: Optional[str] = 'us-west1',
                                   image_tag: Optional[str] = None,
-                                  overwrite: Optional[bool] = True):
+                                  gae_scaling_profile: Optional[
+                                      str] = DEFAULT_GAE_SCALING_PROFILE,
+                                  overwrite: Optional[bool] = True,
+                                  incremental: Optional[bool] = False
+                                 ) -> Optional[Dict[str, List[str]]]:
         """Generate all source files of a Django app to be deployed to GCP.
 
         Args:
@@ -748,16 +917,82 @@ class DjangoSourceFileGenerator(_FileGenerator):
             database_name: Name of your cloud database.
             region: Where to host the Django project.
             image_tag: A customized docker image tag used in integration tests.
+            gae_scaling_profile: Name of the instance class and scaling
+                settings of app.yaml. One of the keys of GAE_SCALING_PROFILES.
             overwrite: A flag indicating whether to delete existing files in the
                 provided directory.
+            incremental: A flag indicating whether to only write files whose
+                content changed since the last generation. Files modified by
+                the user are never overwritten. "overwrite" is ignored when
+                this is set.
+
+        Returns:
+            When "incremental" is set, a report of what happened to each file,
+            with paths relative to the project directory:
+                {
+                    'created': [...],
+                    'updated': [...],
+                    'unchanged': [...],
+                    'removed': [...],
+                    'conflicts': [...]
+                }
+            "conflicts" are files modified by the user which were left
+            untouched although the generated content changed. Otherwise None.
         """
 
         project_dir = os.path.abspath(os.path.expanduser(project_dir))
         os.makedirs(project_dir, exist_ok=True)
-        if overwrite:
-            self._delete_all_files(project_dir)
-
         instance_name = instance_name or project_name + '-instance'
+        generate_options = {
+            'project_id': project_id,
+            'project_name': project_name,
+            'app_name': app_name,
+            'cloud_storage_bucket_name': cloud_storage_bucket_name,
+            'cloudsql_secrets': cloudsql_secrets,
+            'django_secrets': django_secrets,
+            'instance_name': instance_name,
+            'database_name': database_name,
+            'region': region,
+            'image_tag': image_tag,
+            'gae_scaling_profile': gae_scaling_profile,
+        }
+
+        report = None
+        if incremental:
+            report = self._generate_incrementally(project_dir,
+                                                  **generate_options)
+        else:
+            if overwrite:
+                self._delete_all_files(project_dir)
+            self._generate_files_into(project_dir, **generate_options)
+
+        self.setup_django_environment(
+            project_dir=project_dir,
+            project_name=project_name,
+            database_user=database_user,
+            database_password=database_password,
+            cloud_sql_proxy_port=cloud_sql_proxy_port)
+        return report
+
+    def _generate_files_into(self,
+                             project_dir: str,
+                             project_id: str,
+                             project_name: str,
+                             app_name: str,
+                             cloud_storage_bucket_name: Optional[str] = None,
+                             cloudsql_secrets: Optional[List[str]] = None,
+                             django_secrets: Optional[List[str]] = None,
+                             instance_name: Optional[str] = None,
+                             database_name: Optional[str] = None,
+                             region: Optional[str] = 'us-west1',
+                             image_tag: Optional[str] = None,
+                             gae_scaling_profile: Optional[
+                                 str] = DEFAULT_GAE_SCALING_PROFILE,
+                             secret_key: Optional[str] = None):
+        """Generate all missing source files in the given directory.
+
+        See generate_all_source_files for the meaning of the arguments.
+        """
         cloud_sql_connection_string = (
             '{}:{}:{}'.format(project_id, region, instance_name))
         self._generate_django_source_files(project_id, project_name, app_name,
@@ -770,16 +1005,109 @@ class DjangoSourceFileGenerator(_FileGenerator):
                                               project_dir,
                                               cloud_sql_connection_string,
                                               database_name,
-                                              cloud_storage_bucket_name)
+                                              cloud_storage_bucket_name,
+                                              secret_key)
         self.docker_file_generator.generate(project_name, project_dir)
         self.dependency_file_generator.generate(project_dir)
         self.yaml_file_generator.generate(project_dir, project_name, project_id,
                                           instance_name, region, image_tag,
                                           cloudsql_secrets, django_secrets)
-        self.app_engine_file_generator.generate(project_name, project_dir)
-        self.setup_django_environment(
-            project_dir=project_dir,
-            project_name=project_name,
-            database_user=database_user,
-            database_password=database_password,
-            cloud_sql_proxy_port=cloud_sql_proxy_port)
+        self.app_engine_file_generator.generate(project_name, project_dir,
+                                                gae_scaling_profile)
+
+    # Key in the project configuration file holding hashes of generated files.
+    _MANIFEST_KEY = 'generated_files'
+
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        with open(file_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _generate_incrementally(self, project_dir: str,
+                                **generate_options) -> Dict[str, List[str]]:
+        """Regenerate source files, writing only files whose content changed.
+
+        Files are first rendered into a staging directory. Each of them is
+        then compared with the file in the project directory and with the
+        hash recorded when it was last generated:
+            - Identical files are left untouched, so their mtime is kept.
+            - Files which still match the recorded hash were not modified by
+              the user and are replaced.
+            - Other files were modified by the user and are reported as
+              conflicts instead of being overwritten.
+        Files generated last time but not anymore are removed if the user did
+        not modify them.
+
+        Args:
+            project_dir: Absolute path of the Django project directory.
+            **generate_options: Arguments of _generate_files_into.
+
+        Returns:
+            A report of what happened to each file. See
+            generate_all_source_files for the format.
+        """
+        config_obj = config.Configuration(project_dir)
+        manifest = config_obj.get(self._MANIFEST_KEY) or {}
+        report = {
+            'created': [],
+            'updated': [],
+            'unchanged': [],
+            'removed': [],
+            'conflicts': []
+        }
+
+        # Reuse the secret key. Otherwise the settings file would change on
+        # every generation.
+        generate_options['secret_key'] = (
+            self.settings_file_generator.get_secret_key(
+                project_dir, generate_options['project_name']))
+        staging_dir = tempfile.mkdtemp()
+        try:
+            self._generate_files_into(staging_dir, **generate_options)
+            new_manifest = {}
+            for root, _, files in os.walk(staging_dir):
+                for file_name in files:
+                    staged_path = os.path.join(root, file_name)
+                    relative_path = os.path.relpath(staged_path, staging_dir)
+                    target_path = os.path.join(project_dir, relative_path)
+                    new_hash = self._hash_file(staged_path)
+                    new_manifest[relative_path] = new_hash
+                    if not os.path.exists(target_path):
+                        os.makedirs(os.path.dirname(target_path),
+                                    exist_ok=True)
+                        shutil.copyfile(staged_path, target_path)
+                        report['created'].append(relative_path)
+                        continue
+                    current_hash = self._hash_file(target_path)
+                    if current_hash == new_hash:
+                        report['unchanged'].append(relative_path)
+                    elif current_hash == manifest.get(relative_path):
+                        shutil.copyfile(staged_path, target_path)
+                        report['updated'].append(relative_path)
+                    else:
+                        # Keep the previous hash so that the file is still
+                        # recognized as modified by the user next time.
+                        new_manifest[relative_path] = manifest.get(
+                            relative_path)
+                        report['conflicts'].append(relative_path)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        for relative_path, old_hash in manifest.items():
+            target_path = os.path.join(project_dir, relative_path)
+            if relative_path in new_manifest or not os.path.exists(target_path):
+                continue
+            if self._hash_file(target_path) == old_hash:
+                os.remove(target_path)
+                report['removed'].append(relative_path)
+            else:
+                report['conflicts'].append(relative_path)
+
+        config_obj.set(self._MANIFEST_KEY, {
+            path: file_hash
+            for path, file_hash in new_manifest.items() if file_hash
+        })
+        config_obj.save()
+        for paths in report.values():
+            paths.sort()
+        return report
@@ -59,8 +59,8 @@ class BaseTest(absltest.TestCase):
                 scopes=['https://www.googleapis.com/auth/cloud-platform']))
 
     @property
-    def zone(self):
-        return _TEST_CONFIG['zone']
+    def region(self):
+        return _TEST_CONFIG['region']
 
     @property
     def project_id(self):
@@ -125,10 +125,9 @@ class ResourceCleanUpTest(BaseTest):
         finally:
             container_service = discovery.build(
                 'container', 'v1', credentials=self.credentials)
-            request = container_service.projects().zones().clusters().delete(
-                projectId=self.project_id,
-                zone=self.zone,
-                clusterId=cluster_name)
+            request = container_service.projects().locations().clusters(
+            ).delete(name='projects/{}/locations/{}/clusters/{}'.format(
+                self.project_id, self.region, cluster_name))
             request.execute()
 
     def _delete_objects(self, bucket_name: str,
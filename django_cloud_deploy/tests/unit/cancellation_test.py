@@ -0,0 +1,87 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit test for django_cloud_deploy/cancellation.py."""
+
+import threading
+import time
+import unittest
+
+from django_cloud_deploy import cancellation
+
+
+class CancellationTest(unittest.TestCase):
+    """Unit test for the cancellation module."""
+
+    def setUp(self):
+        cancellation.reset()
+        self.addCleanup(cancellation.reset)
+
+    def test_check(self):
+        cancellation.check()
+        cancellation.cancel()
+        self.assertTrue(cancellation.is_cancelled())
+        with self.assertRaises(cancellation.CancelledError):
+            cancellation.check()
+
+    def test_sleep_wakes_up_on_cancel(self):
+        errors = []
+
+        def sleep():
+            try:
+                cancellation.sleep(60)
+            except cancellation.CancelledError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=sleep)
+        start = time.time()
+        thread.start()
+        cancellation.cancel()
+        thread.join(timeout=10)
+        self.assertEqual(len(errors), 1)
+        self.assertLess(time.time() - start, 10)
+
+    def test_callbacks(self):
+        calls = []
+        with cancellation.on_cancel(lambda: calls.append('inside')):
+            pass
+        callback_id = cancellation.add_callback(lambda: calls.append('added'))
+        cancellation.add_callback(lambda: calls.append('removed'))
+        cancellation.remove_callback(callback_id + 1)
+        cancellation.cancel()
+        self.assertEqual(calls, ['added'])
+
+        # Callbacks registered after cancel() are called right away.
+        cancellation.add_callback(lambda: calls.append('late'))
+        self.assertEqual(calls, ['added', 'late'])
+
+    def test_broken_callback_does_not_stop_others(self):
+        calls = []
+
+        def broken():
+            raise ValueError('broken')
+
+        cancellation.add_callback(broken)
+        cancellation.add_callback(lambda: calls.append('called'))
+        cancellation.cancel()
+        self.assertEqual(calls, ['called'])
+
+    def test_cancel_on_interrupt(self):
+        with self.assertRaises(KeyboardInterrupt):
+            with cancellation.cancel_on_interrupt():
+                raise KeyboardInterrupt()
+        self.assertTrue(cancellation.is_cancelled())
+
+
+if __name__ == '__main__':
+    unittest.main()
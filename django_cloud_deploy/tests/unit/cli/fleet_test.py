@@ -0,0 +1,182 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for django_cloud_deploy.cli.fleet."""
+
+import json
+import multiprocessing
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+
+from django_cloud_deploy.cli import fleet
+from django_cloud_deploy.cloudlib import quota
+
+from google.auth import credentials
+
+
+class LoadManifestTest(absltest.TestCase):
+    """Tests for fleet.load_manifest."""
+
+    def setUp(self):
+        self.manifest_dir = tempfile.mkdtemp()
+        self.manifest_path = os.path.join(self.manifest_dir, 'fleet.yaml')
+
+    def _write_manifest(self, content):
+        with open(self.manifest_path, 'w') as f:
+            f.write(content)
+
+    def test_yaml_with_defaults(self):
+        self._write_manifest('\n'.join([
+            'defaults:',
+            '  database_password: secret',
+            'projects:',
+            '  - path: mysite',
+            '  - path: /srv/blog',
+            '    database_password: other',
+            '    force: true',
+        ]))
+        projects = fleet.load_manifest(self.manifest_path)
+        self.assertEqual(projects, [{
+            'path': os.path.join(self.manifest_dir, 'mysite'),
+            'database_password': 'secret'
+        }, {
+            'path': '/srv/blog',
+            'database_password': 'other',
+            'force': True
+        }])
+
+    def test_json(self):
+        self._write_manifest(
+            json.dumps({
+                'projects': [{
+                    'path': '/srv/mysite',
+                    'database_password': 'secret'
+                }]
+            }))
+        projects = fleet.load_manifest(self.manifest_path)
+        self.assertEqual(projects, [{
+            'path': '/srv/mysite',
+            'database_password': 'secret'
+        }])
+
+    def test_missing_password(self):
+        self._write_manifest('projects: [/srv/mysite]')
+        with self.assertRaisesRegex(ValueError, 'database_password'):
+            fleet.load_manifest(self.manifest_path)
+
+    def test_unknown_key(self):
+        self._write_manifest('\n'.join([
+            'projects:',
+            '  - path: /srv/mysite',
+            '    database_password: secret',
+            '    region: us-east1',
+        ]))
+        with self.assertRaisesRegex(ValueError, 'region'):
+            fleet.load_manifest(self.manifest_path)
+
+    def test_duplicate_project(self):
+        self._write_manifest('\n'.join([
+            'defaults: {database_password: secret}',
+            'projects: [/srv/mysite, /srv/mysite]',
+        ]))
+        with self.assertRaisesRegex(ValueError, 'more than once'):
+            fleet.load_manifest(self.manifest_path)
+
+    def test_no_projects(self):
+        self._write_manifest('defaults: {}')
+        with self.assertRaisesRegex(ValueError, 'projects'):
+            fleet.load_manifest(self.manifest_path)
+
+
+class DeployProjectTest(absltest.TestCase):
+    """Tests for fleet._deploy_project."""
+
+    def setUp(self):
+        self.credentials = mock.Mock(credentials.Credentials, authSpec=True)
+        self.log_path = os.path.join(tempfile.mkdtemp(), 'mysite.log')
+        self.project = {
+            'path': '/srv/mysite',
+            'database_password': 'secret',
+            'force': True
+        }
+
+    @mock.patch('django_cloud_deploy.workflow.WorkflowManager')
+    def test_success(self, mock_workflow_manager):
+        update_project = mock_workflow_manager.return_value.update_project
+        update_project.return_value = 'http://1.2.3.4/'
+
+        result = fleet._deploy_project(self.credentials, self.project,
+                                       self.log_path)
+
+        update_project.assert_called_once_with(
+            '/srv/mysite',
+            'secret',
+            open_browser=False,
+            migrate_in_cluster=False,
+            lock_timeout=None,
+            statement_timeout=None,
+            force=True)
+        self.assertTrue(result['succeeded'])
+        self.assertEqual(result['app_url'], 'http://1.2.3.4/')
+        self.assertIsNone(result['error'])
+
+    @mock.patch('django_cloud_deploy.workflow.WorkflowManager')
+    def test_failure_is_logged(self, mock_workflow_manager):
+        update_project = mock_workflow_manager.return_value.update_project
+        update_project.side_effect = RuntimeError('cluster not found')
+
+        result = fleet._deploy_project(self.credentials, self.project,
+                                       self.log_path)
+
+        self.assertFalse(result['succeeded'])
+        self.assertEqual(result['error'], 'RuntimeError: cluster not found')
+        with open(self.log_path) as f:
+            self.assertIn('cluster not found', f.read())
+
+
+class DeployFleetTest(absltest.TestCase):
+    """Tests for fleet.deploy_fleet."""
+
+    def test_workers_share_quota(self):
+        context = mock.Mock(wraps=multiprocessing.get_context('spawn'))
+        context.Pool = mock.MagicMock()
+        pool = context.Pool.return_value.__enter__.return_value
+        pool.starmap.return_value = [{'succeeded': True}] * 2
+        creds = mock.Mock(credentials.Credentials, authSpec=True)
+        projects = [{
+            'path': '/srv/mysite',
+            'database_password': 'secret'
+        }, {
+            'path': '/srv/blog',
+            'database_password': 'secret'
+        }]
+
+        with mock.patch.object(
+                fleet.multiprocessing, 'get_context', return_value=context):
+            results = fleet.deploy_fleet(creds, projects, tempfile.mkdtemp())
+
+        self.assertLen(results, 2)
+        kwargs = context.Pool.call_args[1]
+        self.assertEqual(kwargs['processes'], 2)
+        self.assertIs(kwargs['initializer'], quota.configure)
+        profile, buckets = kwargs['initargs']
+        self.assertEqual(set(buckets), set(profile))
+        for bucket in buckets.values():
+            self.assertIsInstance(bucket, quota.SharedTokenBucket)
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -0,0 +1,42 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for django_cloud_deploy.cli.new."""
+
+import argparse
+from unittest import mock
+
+from absl.testing import absltest
+
+from django_cloud_deploy import tool_requirements
+from django_cloud_deploy.cli import io
+from django_cloud_deploy.cli import new
+
+
+class MainTest(absltest.TestCase):
+    """Tests for new.main."""
+
+    def test_static_cdn_rejected_with_gae(self):
+        parser = argparse.ArgumentParser()
+        new.add_arguments(parser)
+        args = parser.parse_args(['--backend', 'gae', '--static-cdn'])
+        console = io.TestIO()
+        with mock.patch.object(tool_requirements,
+                               'check_and_handle_requirements') as check:
+            self.assertIsNone(new.main(args, console))
+        self.assertFalse(check.called)
+        self.assertIn('--static-cdn', console.error_calls[0][0])
+
+
+if __name__ == '__main__':
+    absltest.main()
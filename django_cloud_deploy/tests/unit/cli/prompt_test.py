@@ -635,5 +635,70 @@ class BillingPromptTest(absltest.TestCase):
             prompt.BillingPrompt.validate('fakeaccount', self.credentials)
 
 
+class PrefetchTest(absltest.TestCase):
+    """Tests for prefetching lookups of prompts."""
+
+    def setUp(self):
+        self.credentials = mock.Mock(credentials.Credentials, authSpec=True)
+        patcher = mock.patch.object(prompt, '_prefetcher',
+                                    prompt._Prefetcher())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_without_start_calls_function(self):
+        function = mock.Mock(return_value=42)
+        self.assertEqual(prompt._prefetcher.get('key', function), 42)
+        function.assert_called_once_with()
+
+    def test_prefetched_result_is_used_once(self):
+        prefetched = mock.Mock(return_value=1)
+        direct = mock.Mock(return_value=2)
+        prompt._prefetcher.start('key', prefetched)
+        prompt._prefetcher.start('key', prefetched)
+        self.assertEqual(prompt._prefetcher.get('key', direct), 1)
+        self.assertEqual(prompt._prefetcher.get('key', direct), 2)
+        prefetched.assert_called_once_with()
+
+    def test_prefetched_exception_is_raised(self):
+        prompt._prefetcher.start('key', mock.Mock(side_effect=ValueError))
+        with self.assertRaises(ValueError):
+            prompt._prefetcher.get('key', mock.Mock())
+
+    @mock.patch(('django_cloud_deploy.cloudlib.billing.BillingClient.'
+                 'list_billing_accounts'),
+                return_value=_FAKE_BILLING_ACCOUNTS)
+    def test_billing_prompt_uses_prefetched_accounts(self,
+                                                     mock_list_accounts):
+        prompt.start_prefetching({'credentials': self.credentials})
+        test_io = io.TestIO()
+        test_io.answers.append('1')
+        billing_name = prompt.BillingPrompt.prompt(test_io, '[1/2]', {},
+                                                   self.credentials)
+        self.assertEqual(billing_name, _FAKE_BILLING_ACCOUNTS[0]['name'])
+        mock_list_accounts.assert_called_once_with(only_open_accounts=True)
+
+    @mock.patch('django_cloud_deploy.cloudlib.project.ProjectClient.'
+                'get_project',
+                return_value=_FAKE_PROJECT_RESPONSE)
+    @mock.patch(('django_cloud_deploy.cloudlib.billing.BillingClient.'
+                 'list_billing_accounts'),
+                return_value=_FAKE_BILLING_ACCOUNTS)
+    @mock.patch(('django_cloud_deploy.cloudlib.billing.BillingClient.'
+                 'get_billing_account'),
+                return_value=_FAKE_BILLING_INFO)
+    def test_existing_project_is_prefetched(self, *unused_mocks):
+        mock_get_project = unused_mocks[-1]
+        args = {
+            'credentials': self.credentials,
+            'project_creation_mode': workflow.ProjectCreationMode.MUST_EXIST,
+            'project_id': 'project-abc'
+        }
+        prompt.start_prefetching(args)
+        name = prompt.GoogleCloudProjectNamePrompt.prompt(
+            io.TestIO(), '[1/2]', args, self.credentials)
+        self.assertEqual(name, _FAKE_PROJECT_RESPONSE['name'])
+        mock_get_project.assert_called_once_with('project-abc')
+
+
 if __name__ == '__main__':
     absltest.main()
@@ -0,0 +1,106 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for django_cloud_deploy.cli.update."""
+
+import argparse
+from unittest import mock
+
+from absl.testing import absltest
+
+from django_cloud_deploy import tool_requirements
+from django_cloud_deploy import workflow
+from django_cloud_deploy.cli import io
+from django_cloud_deploy.cli import prompt
+from django_cloud_deploy.cli import update
+
+PROJECT_DIR = '/tmp/mysite'
+REQUIRED_ARGS = [
+    '--project-path', PROJECT_DIR, '--database-password', 'password',
+    '--credentials', 'credentials.json'
+]
+
+
+class MainTest(absltest.TestCase):
+    """Tests for update.main."""
+
+    def setUp(self):
+        for patcher in [
+                mock.patch.object(
+                    tool_requirements,
+                    'check_and_handle_requirements',
+                    return_value=True),
+                mock.patch.object(prompt.DjangoFilesystemPathUpdate,
+                                  'validate'),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(workflow, 'WorkflowManager')
+        self._workflow_manager = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self._console = io.TestIO()
+
+    def _run(self, flags):
+        parser = argparse.ArgumentParser()
+        update.add_arguments(parser)
+        update.main(parser.parse_args(REQUIRED_ARGS + flags), self._console)
+
+    def test_default_flags(self):
+        self._run([])
+        self._workflow_manager.update_project.assert_called_once_with(
+            PROJECT_DIR,
+            'password',
+            migrate_in_cluster=False,
+            lock_timeout=None,
+            statement_timeout=None,
+            force=False)
+
+    def test_migration_flags(self):
+        self._run([
+            '--migrate-in-cluster', '--lock-timeout', '5s',
+            '--statement-timeout', '10min', '--force'
+        ])
+        self._workflow_manager.update_project.assert_called_once_with(
+            PROJECT_DIR,
+            'password',
+            migrate_in_cluster=True,
+            lock_timeout='5s',
+            statement_timeout='10min',
+            force=True)
+
+    def test_plan_migrations(self):
+        self._workflow_manager.plan_database_migration.return_value = [{
+            'migration': 'polls.0002_question_author',
+            'tables': [{
+                'name': 'polls_question',
+                'rows': 120000,
+                'size_bytes': 24576000
+            }]
+        }]
+        self._run(['--plan-migrations'])
+        self.assertFalse(self._workflow_manager.update_project.called)
+        self._workflow_manager.plan_database_migration.assert_called_once_with(
+            PROJECT_DIR, 'password')
+        output = [' '.join(call) for call in self._console.tell_calls]
+        self.assertIn('  polls.0002_question_author', output)
+        self.assertIn('    polls_question: ~120000 rows, 23 MB', output)
+
+    def test_plan_migrations_without_pending_migrations(self):
+        self._workflow_manager.plan_database_migration.return_value = []
+        self._run(['--plan-migrations'])
+        self.assertIn(('No pending database migrations.',),
+                      self._console.tell_calls)
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -0,0 +1,135 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the cloudlib.cdn module."""
+
+from absl.testing import absltest
+from django_cloud_deploy.cloudlib import cdn
+from django_cloud_deploy.tests.unit.cloudlib.lib import http_fake
+from googleapiclient import errors
+
+PROJECT_ID = 'fake-project-id'
+BUCKET_NAME = 'fake_bucket.name'
+ADDRESS = '203.0.113.1'
+
+
+class CollectionFake(object):
+    """A fake object returned by e.g. ...backendBuckets()."""
+
+    def __init__(self, compute_service, name):
+        self._compute_service = compute_service
+        self._name = name
+
+    def insert(self, project, body):
+        self._compute_service.inserted.append((self._name, body))
+        if body['name'] in self._compute_service.existing:
+            return http_fake.HttpRequestFake(
+                errors.HttpError(
+                    http_fake.HttpResponseFake(409), b'already exists'))
+        return http_fake.HttpRequestFake({
+            'name': 'operation-{}'.format(body['name']),
+            'status': 'RUNNING'
+        })
+
+    def get(self, project, address):
+        return http_fake.HttpRequestFake({
+            'name': address,
+            'address': ADDRESS
+        })
+
+    def invalidateCache(self, project, urlMap, body):
+        self._compute_service.invalidated.append((urlMap, body['path']))
+        return http_fake.HttpRequestFake({'name': 'operation-invalidate'})
+
+
+class GlobalOperationsFake(object):
+    """A fake object returned by ...globalOperations()."""
+
+    def get(self, project, operation):
+        return http_fake.HttpRequestFake({
+            'name': operation,
+            'status': 'DONE'
+        })
+
+
+class ComputeServiceFake(object):
+
+    def __init__(self):
+        self.inserted = []
+        self.invalidated = []
+        self.existing = set()
+
+    def globalAddresses(self):
+        return CollectionFake(self, 'globalAddresses')
+
+    def backendBuckets(self):
+        return CollectionFake(self, 'backendBuckets')
+
+    def urlMaps(self):
+        return CollectionFake(self, 'urlMaps')
+
+    def targetHttpProxies(self):
+        return CollectionFake(self, 'targetHttpProxies')
+
+    def globalForwardingRules(self):
+        return CollectionFake(self, 'globalForwardingRules')
+
+    def globalOperations(self):
+        return GlobalOperationsFake()
+
+
+class CdnClientTest(absltest.TestCase):
+    """Test case for cdn.CdnClient."""
+
+    def setUp(self):
+        self._compute_service = ComputeServiceFake()
+        self._cdn_client = cdn.CdnClient(self._compute_service)
+
+    def test_serve_bucket(self):
+        address = self._cdn_client.serve_bucket_sync(PROJECT_ID, BUCKET_NAME)
+        self.assertEqual(address, ADDRESS)
+        self.assertEqual([name for name, _ in self._compute_service.inserted], [
+            'globalAddresses', 'backendBuckets', 'urlMaps',
+            'targetHttpProxies', 'globalForwardingRules'
+        ])
+        bodies = dict(self._compute_service.inserted)
+        self.assertEqual(bodies['backendBuckets']['bucketName'], BUCKET_NAME)
+        self.assertTrue(bodies['backendBuckets']['enableCdn'])
+        self.assertEqual(bodies['backendBuckets']['name'],
+                         'fake-bucket-name-static-backend')
+        self.assertTrue(bodies['urlMaps']['defaultService'].endswith(
+            '/backendBuckets/fake-bucket-name-static-backend'))
+        self.assertEqual(bodies['globalForwardingRules']['IPAddress'], ADDRESS)
+
+    def test_serve_bucket_reuses_existing_resources(self):
+        self._compute_service.existing = {
+            'fake-bucket-name-static-address',
+            'fake-bucket-name-static-backend'
+        }
+        address = self._cdn_client.serve_bucket_sync(PROJECT_ID, BUCKET_NAME)
+        self.assertEqual(address, ADDRESS)
+        self.assertLen(self._compute_service.inserted, 5)
+
+    def test_resource_names_are_valid(self):
+        name = cdn.CdnClient._resource_name('1' + 'a' * 100, 'url-map')
+        self.assertLessEqual(len(name), 63)
+        self.assertRegex(name, r'^[a-z]([-a-z0-9]*[a-z0-9])?$')
+
+    def test_invalidate_cache(self):
+        self._cdn_client.invalidate_cache(PROJECT_ID, BUCKET_NAME, '/static/*')
+        self.assertEqual(self._compute_service.invalidated,
+                         [('fake-bucket-name-static-url-map', '/static/*')])
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -14,14 +14,19 @@
 """Tests for the cloudlib.container module."""
 
 import base64
+import gc
 import json
 from unittest import mock
 
 from absl.testing import absltest
 
+from django_cloud_deploy import progress
 from django_cloud_deploy.cloudlib import container
+from django_cloud_deploy.cloudlib import credential_manager
 from django_cloud_deploy.tests.unit.cloudlib.lib import http_fake
 import google
+from googleapiclient import errors
+import kubernetes
 
 PROJECT_ID = 'fake_project_id'
 CLUSTER_NAME = 'fake_cluster'
@@ -46,9 +51,14 @@ class ClustersFake(object):
 
     def __init__(self):
         self.clusters_to_get_count = {}
+        self.create_calls = []
 
-    def create(self, projectId, zone, body):
+    def create(self, parent, body):
+        self.create_calls.append((parent, body))
         name = body['cluster']['name']
+        if name in self.clusters_to_get_count:
+            return http_fake.HttpRequestFake(
+                errors.HttpError(http_fake.HttpResponseFake(409), b''))
         if 'fail' not in name:
             if 'first' in name:
                 # (current_get_count, total_get_count)
@@ -60,7 +70,8 @@ class ClustersFake(object):
             'operations/cp.7730969938063130608'
         })
 
-    def get(self, projectId, zone, clusterId):
+    def get(self, name):
+        clusterId = name.rsplit('/', 1)[-1]
         ca = base64.standard_b64encode(FAKE_CA).decode('utf-8')
         if 'invalid_response' in clusterId:
             return http_fake.HttpRequestFake(
@@ -78,7 +89,7 @@ class ClustersFake(object):
         return http_fake.HttpRequestFake(json.loads(response))
 
 
-class ZonesFake(object):
+class LocationsFake(object):
 
     def __init__(self):
         self.clusters_fake = ClustersFake()
@@ -86,9 +97,6 @@ class ZonesFake(object):
     def clusters(self):
         return self.clusters_fake
 
-
-class LocationsFake(object):
-
     def getServerConfig(self, name):
         del name
         return http_fake.HttpRequestFake({
@@ -99,12 +107,8 @@ class LocationsFake(object):
 class ProjectsFake(object):
 
     def __init__(self):
-        self.zones_fake = ZonesFake()
         self.locations_fake = LocationsFake()
 
-    def zones(self):
-        return self.zones_fake
-
     def locations(self):
         return self.locations_fake
 
@@ -123,41 +127,81 @@ class ContainerClientTestCase(absltest.TestCase):
 
     def setUp(self):
         mock_credentials = mock.Mock(spec=google.auth.credentials.Credentials)
-        patcher = mock.patch('django_cloud_deploy.cloudlib.container.'
-                             'ContainerClient._create_docker_client')
-        self.addCleanup(patcher.stop)
-        patcher.start()
+        self._docker_client_patcher = mock.patch(
+            'django_cloud_deploy.cloudlib.container.'
+            'ContainerClient._create_docker_client')
+        self._docker_client_patcher.start()
         self._container_service = ContainerServiceFake()
         self._container_client = container.ContainerClient(
             self._container_service, mock_credentials)
+        self._docker_client = mock.Mock()
+        self._container_client._docker_client = self._docker_client
+        self.addCleanup(mock.patch.stopall)
 
     def test_create_cluster_simple_success(self):
         cluster_name = 'first_success'
         self._container_client.create_cluster_sync(PROJECT_ID, cluster_name)
-        created_clusters = (self._container_service.projects_fake.zones_fake.
-                            clusters_fake.clusters_to_get_count)
+        created_clusters = (self._container_service.projects_fake.
+                            locations_fake.clusters_fake.clusters_to_get_count)
         self.assertIn(cluster_name, created_clusters)
         self.assertEqual(created_clusters[cluster_name][0], 1)
 
     def test_create_cluster_success_at_second_time(self):
         cluster_name = 'second_success'
         self._container_client.create_cluster_sync(PROJECT_ID, cluster_name)
-        created_clusters = (self._container_service.projects_fake.zones_fake.
-                            clusters_fake.clusters_to_get_count)
+        created_clusters = (self._container_service.projects_fake.
+                            locations_fake.clusters_fake.clusters_to_get_count)
         self.assertIn(cluster_name, created_clusters)
         self.assertEqual(created_clusters[cluster_name][0], 2)
 
+    @mock.patch.object(container.cancellation, 'sleep')
+    def test_create_cluster_after_interrupted_run(self, unused_sleep):
+        cluster_name = 'second_success'
+        clusters_fake = (
+            self._container_service.projects_fake.locations_fake.clusters_fake)
+        # The interrupted run created the cluster, which is still
+        # provisioning.
+        clusters_fake.create(
+            'projects/{}/locations/us-west1'.format(PROJECT_ID),
+            {'cluster': {
+                'name': cluster_name
+            }}).execute()
+        self._container_client.create_cluster_sync(PROJECT_ID, cluster_name)
+        self.assertLen(clusters_fake.create_calls, 2)
+        self.assertEqual(clusters_fake.clusters_to_get_count[cluster_name][0],
+                         2)
+
+    def test_create_regional_cluster(self):
+        cluster_name = 'first_regional'
+        self._container_client.create_cluster_sync(
+            PROJECT_ID,
+            cluster_name,
+            region='europe-west1',
+            zones=['europe-west1-b', 'europe-west1-c'])
+        clusters_fake = (
+            self._container_service.projects_fake.locations_fake.clusters_fake)
+        parent, body = clusters_fake.create_calls[0]
+        self.assertEqual(
+            parent, 'projects/{}/locations/europe-west1'.format(PROJECT_ID))
+        self.assertEqual(body['cluster']['location'], 'europe-west1')
+        self.assertEqual(body['cluster']['locations'],
+                         ['europe-west1-b', 'europe-west1-c'])
+        self.assertEqual(body['cluster']['nodePools'][0]['initialNodeCount'],
+                         1)
+        self.assertIn('regions/europe-west1/', body['cluster']['subnetwork'])
+
     def test_create_cluster_fail(self):
         cluster_name = 'fail'
         with self.assertRaises(container.ContainerCreationError):
             self._container_client.create_cluster_sync(PROJECT_ID, cluster_name)
-        created_clusters = (self._container_service.projects_fake.zones_fake.
-                            clusters_fake.clusters_to_get_count)
+        created_clusters = (self._container_service.projects_fake.
+                            locations_fake.clusters_fake.clusters_to_get_count)
         self.assertNotIn(cluster_name, created_clusters)
 
     @mock.patch('google.auth.credentials.Credentials', autoSpec=True)
     def test_create_kubernetes_configuration_success(self, mock_credentials):
         mock_credentials.token = 'fake_token'
+        mock_credentials.expiry = None
         kube_config = self._container_client.create_kubernetes_configuration(
             mock_credentials, PROJECT_ID, CLUSTER_NAME)
         self.assertEqual(kube_config.host, 'https://12.34.56.78')
@@ -167,10 +211,94 @@ class ContainerClientTestCase(absltest.TestCase):
             self.assertEqual(ca_file.read(), FAKE_CA)
         self.assertEqual(kube_config.api_key_prefix['authorization'], 'Bearer')
 
+    @mock.patch('google.auth.credentials.Credentials', autoSpec=True)
+    def test_kubernetes_configuration_gets_new_tokens(self, mock_credentials):
+        mock_credentials.token = 'fake_token'
+        mock_credentials.expiry = None
+        kube_config = self._container_client.create_kubernetes_configuration(
+            mock_credentials, PROJECT_ID, CLUSTER_NAME)
+
+        def refresh(request):
+            del request  # Unused.
+            mock_credentials.token = 'new_token'
+
+        mock_credentials.refresh.side_effect = refresh
+        credential_manager.get_credential_manager(mock_credentials).refresh()
+        self.assertEqual(kube_config.api_key['authorization'], 'new_token')
+
+    @mock.patch('docker.DockerClient')
+    @mock.patch('google.auth.credentials.Credentials', autoSpec=True)
+    def test_docker_login_stops_with_client(self, mock_credentials,
+                                            mock_docker_client):
+        mock_credentials.token = 'fake_token'
+        mock_credentials.expiry = None
+        manager = credential_manager.get_credential_manager(mock_credentials)
+        self.addCleanup(manager.stop)
+        self._docker_client_patcher.stop()
+        client = container.ContainerClient(self._container_service,
+                                           mock_credentials)
+        login = mock_docker_client.return_value.login
+        self.assertEqual(login.call_count, 1)
+        manager.refresh()
+        self.assertEqual(login.call_count, 2)
+
+        # Clients which are not used anymore are garbage collected and do not
+        # log in again.
+        del client
+        gc.collect()
+        manager.refresh()
+        self.assertEqual(login.call_count, 2)
+
     @mock.patch('google.auth.credentials.Credentials', autoSpec=True)
     def test_create_kubernetes_configuration_fail(self, mock_credentials):
         mock_credentials.token = 'fake_token'
+        mock_credentials.expiry = None
         cluster_name = 'invalid_response'
         with self.assertRaises(container.ClusterGetInfoError):
             self._container_client.create_kubernetes_configuration(
                 mock_credentials, PROJECT_ID, cluster_name)
+
+    @mock.patch.object(progress, 'report')
+    def test_push_docker_image_reports_pushed_bytes(self, mock_report):
+        self._docker_client.images.push.return_value = iter([
+            {'status': 'Preparing', 'id': 'a', 'progressDetail': {}},
+            {'status': 'Pushing', 'id': 'a',
+             'progressDetail': {'current': 50, 'total': 100}},
+            {'status': 'Pushing', 'id': 'b',
+             'progressDetail': {'current': 0, 'total': 300}},
+            {'status': 'Pushed', 'id': 'a', 'progressDetail': {}},
+            {'status': 'Layer already exists', 'id': 'b',
+             'progressDetail': {}},
+        ])
+        self._container_client.push_docker_image('gcr.io/fake/image')
+        self._docker_client.images.push.assert_called_once_with(
+            'gcr.io/fake/image', stream=True, decode=True)
+        reported = [(call[1].get('current'), call[1].get('total'))
+                    for call in mock_report.call_args_list]
+        self.assertEqual(reported, [(50, 100), (50, 400), (100, 400),
+                                    (400, 400), (None, None)])
+        self.assertTrue(mock_report.call_args_list[-1][1]['done'])
+
+    @mock.patch('kubernetes.client.CoreV1Api')
+    def test_create_secret_replaces_existing_secret(self, mock_core_api):
+        api = mock_core_api.return_value
+        api.create_namespaced_secret.side_effect = (
+            kubernetes.client.rest.ApiException(status=409))
+        secret_data = kubernetes.client.V1Secret(
+            api_version='v1',
+            data={'key': 'dmFsdWU='},
+            kind='Secret',
+            metadata={'name': 'cloudsql'})
+        self._container_client.create_secret(secret_data)
+        api.replace_namespaced_secret.assert_called_once_with(
+            name='cloudsql', namespace='default', body=secret_data)
+
+    @mock.patch('kubernetes.client.CoreV1Api')
+    def test_create_secret_other_error(self, mock_core_api):
+        api = mock_core_api.return_value
+        api.create_namespaced_secret.side_effect = (
+            kubernetes.client.rest.ApiException(status=403))
+        secret_data = kubernetes.client.V1Secret(metadata={'name': 'cloudsql'})
+        with self.assertRaises(kubernetes.client.rest.ApiException):
+            self._container_client.create_secret(secret_data)
+        api.replace_namespaced_secret.assert_not_called()
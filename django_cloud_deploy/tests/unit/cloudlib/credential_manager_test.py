@@ -0,0 +1,118 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the cloudlib.credential_manager module."""
+
+import datetime
+import gc
+import threading
+
+from absl.testing import absltest
+
+from django_cloud_deploy.cloudlib import credential_manager
+from google.auth import credentials
+
+
+class CredentialsFake(credentials.Credentials):
+    """Credentials whose tokens expire after "lifetime"."""
+
+    def __init__(self, lifetime=datetime.timedelta(hours=1)):
+        super().__init__()
+        self.refresh_count = 0
+        self._lifetime = lifetime
+
+    def refresh(self, request):
+        del request  # Unused.
+        self.refresh_count += 1
+        self.token = 'token-{}'.format(self.refresh_count)
+        self.expiry = datetime.datetime.utcnow() + self._lifetime
+
+
+class CredentialManagerTest(absltest.TestCase):
+    """Tests for credential_manager.CredentialManager."""
+
+    def test_get_token_cached(self):
+        creds = CredentialsFake()
+        manager = credential_manager.CredentialManager(creds)
+        self.assertEqual(manager.get_token(), 'token-1')
+        self.assertEqual(manager.get_token(), 'token-1')
+        self.assertEqual(creds.refresh_count, 1)
+
+    def test_get_token_refreshed_before_expiry(self):
+        creds = CredentialsFake(lifetime=datetime.timedelta(minutes=4))
+        manager = credential_manager.CredentialManager(creds)
+        self.assertEqual(manager.get_token(), 'token-1')
+        # The token expires within the refresh margin.
+        self.assertEqual(manager.get_token(), 'token-2')
+
+    def test_listeners_get_new_tokens(self):
+        creds = CredentialsFake()
+        manager = credential_manager.CredentialManager(creds)
+        tokens = []
+        manager.add_token_listener(tokens.append)
+        manager.refresh()
+        self.assertEqual(tokens, ['token-1', 'token-2'])
+        manager.stop()
+
+    def test_remove_listener(self):
+        creds = CredentialsFake()
+        manager = credential_manager.CredentialManager(creds)
+        tokens = []
+        manager.add_token_listener(tokens.append)
+        manager.remove_token_listener(tokens.append)
+        manager.refresh()
+        self.assertEqual(tokens, ['token-1'])
+        manager.stop()
+
+    def test_weak_listener_removed_with_its_object(self):
+
+        class Client(object):
+
+            def __init__(self):
+                self.tokens = []
+
+        creds = CredentialsFake()
+        manager = credential_manager.CredentialManager(creds)
+        client = Client()
+        manager.add_weak_token_listener(
+            client, lambda target, token: target.tokens.append(token))
+        manager.refresh()
+        self.assertEqual(client.tokens, ['token-1', 'token-2'])
+        del client
+        gc.collect()
+        self.assertEqual(manager._listeners, [])
+        manager.stop()
+
+    def test_background_refresh(self):
+        creds = CredentialsFake(lifetime=datetime.timedelta(seconds=1))
+        manager = credential_manager.CredentialManager(
+            creds, refresh_margin=datetime.timedelta(0))
+        refreshed = threading.Event()
+
+        def on_token(token):
+            if token == 'token-2':
+                refreshed.set()
+
+        manager.add_token_listener(on_token)
+        self.assertTrue(refreshed.wait(timeout=10))
+        manager.stop()
+
+    def test_manager_shared(self):
+        creds = CredentialsFake()
+        self.assertIs(
+            credential_manager.get_credential_manager(creds),
+            credential_manager.get_credential_manager(creds))
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -0,0 +1,229 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the cloudlib.database module."""
+
+import contextlib
+import types
+from unittest import mock
+
+from absl.testing import absltest
+from django_cloud_deploy import crash_handling
+from django_cloud_deploy.cloudlib import database
+from django_cloud_deploy.tests.unit.cloudlib.lib import http_fake
+
+from googleapiclient import errors
+
+PROJECT_ID = 'fake-project-id'
+INSTANCE_NAME = 'fake-instance'
+
+TABLES = {
+    ('polls', 'question'): 'polls_question',
+    ('polls', 'choice'): 'polls_choice',
+}
+
+
+class MigrationFake(object):
+    """A fake django.db.migrations.Migration."""
+
+    def __init__(self, app_label, name, model_names):
+        self.app_label = app_label
+        self.name = name
+        self.operations = [
+            types.SimpleNamespace(model_name=model_name)
+            for model_name in model_names
+        ]
+
+
+def _get_model(app_label, model_name):
+    try:
+        db_table = TABLES[(app_label, model_name)]
+    except KeyError:
+        raise LookupError(model_name)
+    return types.SimpleNamespace(_meta=types.SimpleNamespace(
+        db_table=db_table))
+
+
+def _conflict():
+    return http_fake.HttpRequestFake(
+        errors.HttpError(http_fake.HttpResponseFake(409), b'already exists'))
+
+
+class InstancesFake(object):
+    """A fake object returned by ...instances()."""
+
+    def __init__(self, states):
+        self.states = states
+        self.insert_count = 0
+
+    def insert(self, project, body):
+        self.insert_count += 1
+        if body['name'] == INSTANCE_NAME:
+            return _conflict()
+        return http_fake.HttpRequestFake({'status': 'PENDING'})
+
+    def get(self, project, instance):
+        return http_fake.HttpRequestFake({'state': self.states.pop(0)})
+
+
+class DatabasesFake(object):
+    """A fake object returned by ...databases()."""
+
+    def insert(self, project, instance, body):
+        if body['name'] == 'existing-db':
+            return _conflict()
+        return http_fake.HttpRequestFake({'status': 'DONE'})
+
+
+class SqlAdminServiceFake(object):
+
+    def __init__(self, states):
+        self.instances_fake = InstancesFake(states)
+
+    def instances(self):
+        return self.instances_fake
+
+    def databases(self):
+        return DatabasesFake()
+
+
+class DatabaseCreationTest(absltest.TestCase):
+    """Tests for creating instances and databases with DatabaseClient."""
+
+    def setUp(self):
+        self._sqladmin_service = SqlAdminServiceFake(
+            ['PENDING_CREATE', 'RUNNABLE'])
+        self._client = database.DatabaseClient(self._sqladmin_service)
+
+    @mock.patch.object(database.cancellation, 'sleep')
+    def test_create_instance(self, unused_sleep):
+        self._client.create_instance_sync(PROJECT_ID, 'new-instance')
+        self.assertEqual(self._sqladmin_service.instances_fake.states, [])
+
+    @mock.patch.object(database.cancellation, 'sleep')
+    def test_create_instance_after_interrupted_run(self, unused_sleep):
+        # The interrupted run created the instance, which is still being
+        # provisioned.
+        self._client.create_instance_sync(PROJECT_ID, INSTANCE_NAME)
+        self.assertEqual(self._sqladmin_service.instances_fake.insert_count, 1)
+        self.assertEqual(self._sqladmin_service.instances_fake.states, [])
+
+    def test_create_database_after_interrupted_run(self):
+        self._client.create_database_sync(PROJECT_ID, INSTANCE_NAME,
+                                          'existing-db')
+
+
+class DatabaseMigrationTest(absltest.TestCase):
+    """Tests for the migration functions of database.DatabaseClient."""
+
+    def setUp(self):
+        self._client = database.DatabaseClient(mock.Mock())
+
+        @contextlib.contextmanager
+        def with_cloud_sql_proxy(*unused_args, **unused_kwargs):
+            yield
+
+        for patcher in [
+                mock.patch.object(self._client, 'with_cloud_sql_proxy',
+                                  with_cloud_sql_proxy),
+                mock.patch.object(database.apps.apps, 'get_model', _get_model),
+                mock.patch.object(database, 'db'),
+                mock.patch.object(database.executor, 'MigrationExecutor'),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(database.management, 'call_command')
+        self._call_command = patcher.start()
+        self.addCleanup(patcher.stop)
+        self._cursor = mock.MagicMock()
+        database.db.connection.cursor.return_value.__enter__.return_value = (
+            self._cursor)
+
+    def _set_plan(self, migrations):
+        migration_executor = database.executor.MigrationExecutor.return_value
+        migration_executor.migration_plan.return_value = [
+            (migration, False) for migration in migrations
+        ]
+
+    def test_get_migration_plan(self):
+        self._set_plan([
+            MigrationFake('polls', '0002_question_author',
+                       ['question', 'unknown']),
+            MigrationFake('polls', '0003_choice', ['choice', 'choice']),
+        ])
+        # The "choice" table is created by the migration, so it does not
+        # exist yet. The row count of a table never analyzed is -1.
+        self._cursor.fetchall.return_value = [('polls_question', -1, 8192)]
+
+        plan = self._client.get_migration_plan(PROJECT_ID, INSTANCE_NAME)
+
+        self.assertEqual(plan, [{
+            'migration': 'polls.0002_question_author',
+            'tables': [{
+                'name': 'polls_question',
+                'rows': 0,
+                'size_bytes': 8192
+            }]
+        }, {
+            'migration': 'polls.0003_choice',
+            'tables': []
+        }])
+        query_args = self._cursor.execute.call_args[0][1]
+        self.assertEqual(query_args, [['polls_choice', 'polls_question']])
+
+    def test_no_pending_migrations(self):
+        self._set_plan([])
+        self.assertEqual(
+            self._client.get_migration_plan(PROJECT_ID, INSTANCE_NAME), [])
+        self.assertFalse(self._cursor.execute.called)
+
+    def test_get_migration_plan_error(self):
+        database.executor.MigrationExecutor.side_effect = ValueError('bad')
+        with self.assertRaises(crash_handling.UserError):
+            self._client.get_migration_plan(PROJECT_ID, INSTANCE_NAME)
+
+    def test_migrate_with_timeouts(self):
+        calls = []
+        self._call_command.side_effect = (
+            lambda command, **kwargs: calls.append(command))
+        self._cursor.execute.side_effect = (
+            lambda query, args: calls.append((query, args)))
+
+        self._client.migrate_database(
+            PROJECT_ID,
+            INSTANCE_NAME,
+            lock_timeout='5s',
+            statement_timeout='10min')
+
+        self.assertEqual(calls, [
+            'makemigrations',
+            ('SET lock_timeout = %s', ['5s']),
+            ('SET statement_timeout = %s', ['10min']),
+            'migrate',
+        ])
+
+    def test_migrate_without_timeouts(self):
+        self._client.migrate_database(PROJECT_ID, INSTANCE_NAME)
+        self.assertFalse(self._cursor.execute.called)
+        self.assertEqual(
+            [c[0][0] for c in self._call_command.call_args_list],
+            ['makemigrations', 'migrate'])
+
+    def test_migrate_error(self):
+        self._call_command.side_effect = ValueError('bad')
+        with self.assertRaises(crash_handling.UserError):
+            self._client.migrate_database(PROJECT_ID, INSTANCE_NAME)
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -36,9 +36,17 @@ class ServicesFake(object):
 
     def __init__(self, query_times=1):
         self.service_to_get_count = {}
+        self.batches = []
         self._query_times = query_times
         self._get_times = 0
 
+    def batchEnable(self, parent, body):
+        self.batches.append((parent, body['serviceIds']))
+        return http_fake.HttpRequestFake({
+            'name': 'operations/acf.{}'.format(len(self.batches)),
+            'done': False
+        })
+
     def enable(self, name):
         self.service_to_get_count.setdefault(name, 0)
         return http_fake.HttpRequestFake({
@@ -56,14 +64,32 @@ class ServicesFake(object):
             return http_fake.HttpRequestFake(DISABLED_SERVICE_RESPONSE)
 
 
+class OperationsFake(object):
+
+    def __init__(self, error=None):
+        self.operation_names = []
+        self._error = error
+
+    def get(self, name):
+        self.operation_names.append(name)
+        operation = {'name': name, 'done': True}
+        if self._error:
+            operation['error'] = self._error
+        return http_fake.HttpRequestFake(operation)
+
+
 class ServiceUsageFake(object):
 
-    def __init__(self, query_times=1):
+    def __init__(self, query_times=1, operation_error=None):
         self.services_fake = ServicesFake(query_times)
+        self.operations_fake = OperationsFake(operation_error)
 
     def services(self):
         return self.services_fake
 
+    def operations(self):
+        return self.operations_fake
+
 
 class EnableServiceClientTestCase(absltest.TestCase):
     """Test case for project.ProjectClient."""
@@ -89,3 +115,25 @@ class EnableServiceClientTestCase(absltest.TestCase):
                       mock_service.services_fake.service_to_get_count)
         self.assertEqual(
             2, mock_service.services_fake.service_to_get_count[service_name])
+
+    def test_enable_services_in_batches(self):
+        mock_service = ServiceUsageFake()
+        enable_service_client = enable_service.EnableServiceClient(mock_service)
+        services = ['service{}.googleapis.com'.format(i) for i in range(25)]
+
+        enable_service_client.enable_services_sync(PROJECT_ID, services)
+        self.assertEqual(mock_service.services_fake.batches, [
+            ('projects/' + PROJECT_ID, services[:20]),
+            ('projects/' + PROJECT_ID, services[20:]),
+        ])
+        self.assertEqual(mock_service.operations_fake.operation_names,
+                         ['operations/acf.1', 'operations/acf.2'])
+
+    def test_enable_services_operation_error(self):
+        mock_service = ServiceUsageFake(
+            operation_error={'message': 'billing disabled'})
+        enable_service_client = enable_service.EnableServiceClient(mock_service)
+
+        with self.assertRaisesRegex(enable_service.EnableServiceError,
+                                    'billing disabled'):
+            enable_service_client.enable_services_sync(PROJECT_ID, [SERVICE])
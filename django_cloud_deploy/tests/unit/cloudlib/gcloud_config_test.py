@@ -0,0 +1,90 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the cloudlib.gcloud_config module."""
+
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+
+from django_cloud_deploy.cloudlib import auth
+from django_cloud_deploy.cloudlib import gcloud_config
+
+
+class GcloudConfigTest(absltest.TestCase):
+    """Tests for gcloud_config."""
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        patcher = mock.patch.dict(
+            os.environ, {'CLOUDSDK_CONFIG': self.config_dir}, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _write_configuration(self, name, content):
+        configurations_dir = os.path.join(self.config_dir, 'configurations')
+        os.makedirs(configurations_dir, exist_ok=True)
+        with open(os.path.join(configurations_dir, 'config_' + name),
+                  'w') as f:
+            f.write(content)
+
+    def test_get_property_default_configuration(self):
+        self._write_configuration('default',
+                                  '[core]\naccount = user@example.com\n')
+        self.assertEqual(
+            gcloud_config.get_property('core', 'account'), 'user@example.com')
+        self.assertIsNone(gcloud_config.get_property('core', 'project'))
+
+    def test_get_property_active_configuration(self):
+        self._write_configuration('default', '[core]\nproject = default-p\n')
+        self._write_configuration('work', '[core]\nproject = work-p\n')
+        with open(os.path.join(self.config_dir, 'active_config'), 'w') as f:
+            f.write('work')
+        self.assertEqual(
+            gcloud_config.get_property('core', 'project'), 'work-p')
+
+    def test_get_property_environment_override(self):
+        self._write_configuration('default', '[core]\nproject = default-p\n')
+        os.environ['CLOUDSDK_CORE_PROJECT'] = 'env-p'
+        self.assertEqual(gcloud_config.get_property('core', 'project'), 'env-p')
+
+    def test_get_property_no_configuration(self):
+        self.assertIsNone(gcloud_config.get_property('core', 'account'))
+
+    def test_set_property_keeps_other_properties(self):
+        self._write_configuration(
+            'default', '[core]\naccount = user@example.com\nproject = old\n')
+        gcloud_config.set_property('core', 'project', 'new')
+        self.assertEqual(gcloud_config.get_property('core', 'project'), 'new')
+        self.assertEqual(
+            gcloud_config.get_property('core', 'account'), 'user@example.com')
+
+    def test_set_property_creates_configuration(self):
+        gcloud_config.set_property('core', 'project', 'new')
+        self.assertEqual(gcloud_config.get_property('core', 'project'), 'new')
+
+    def test_active_account_credentials_path(self):
+        self._write_configuration('default',
+                                  '[core]\naccount = user@example.com\n')
+        self.assertEqual(auth.AuthClient.get_active_account(),
+                         'user@example.com')
+        self.assertEqual(
+            auth.AuthClient._get_active_account_adc_path(),
+            os.path.join(self.config_dir, 'legacy_credentials',
+                         'user@example.com', 'adc.json'))
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -13,7 +13,6 @@
 # limitations under the License.
 """Tests for the cloudlib.project module."""
 
-import subprocess
 from unittest import mock
 
 from absl.testing import absltest
@@ -40,11 +39,32 @@ class OrganizationsFake(object):
             return http_fake.HttpRequestFake({})
 
 
+class OperationsFake(object):
+    """A fake object returned by ...operations()."""
+
+    def __init__(self, polls_until_done=1, error=None):
+        self.get_count = 0
+        self._polls_until_done = polls_until_done
+        self._error = error
+
+    def get(self, name):
+        self.get_count += 1
+        if self.get_count < self._polls_until_done:
+            return http_fake.HttpRequestFake({'name': name, 'done': False})
+        operation = {'name': name, 'done': True}
+        if self._error:
+            operation['error'] = self._error
+        else:
+            operation['response'] = {'projectId': 'fn123'}
+        return http_fake.HttpRequestFake(operation)
+
+
 class ProjectsFake(object):
     """A fake object returned by ...projects()."""
 
     def __init__(self):
         self.projects = []
+        self.get_count = 0
 
     def create(self, body):
         for p in self.projects:
@@ -60,6 +80,7 @@ class ProjectsFake(object):
         })
 
     def get(self, projectId):
+        self.get_count += 1
         for p in self.projects:
             if p['projectId'] == projectId:
                 return http_fake.HttpRequestFake(p)
@@ -71,13 +92,17 @@ class ProjectsFake(object):
 class ServiceFake:
     """A fake Resource returned by discovery.build('cloudresourcemanager', .."""
 
-    def __init__(self, is_google=False):
+    def __init__(self, is_google=False, operations_fake=None):
         self.projects_fake = ProjectsFake()
         self.organizations_fake = OrganizationsFake(is_google)
+        self.operations_fake = operations_fake or OperationsFake()
 
     def projects(self):
         return self.projects_fake
 
+    def operations(self):
+        return self.operations_fake
+
     def organizations(self):
         return self.organizations_fake
 
@@ -111,13 +136,31 @@ class ProjectClientTestCase(absltest.TestCase):
                              }
                          }])
 
+    @mock.patch('time.sleep')
+    def test_create_project_waits_for_operation(self, unused_sleep):
+        operations_fake = OperationsFake(polls_until_done=3)
+        project_client = project.ProjectClient(
+            ServiceFake(operations_fake=operations_fake))
+        created = project_client.create_project('fn123', 'Friendly Name')
+        self.assertEqual(created, {'projectId': 'fn123'})
+        self.assertEqual(operations_fake.get_count, 3)
+
+    def test_create_project_operation_error(self):
+        service_fake = ServiceFake(
+            operations_fake=OperationsFake(error={'message': 'quota exceeded'}))
+        project_client = project.ProjectClient(service_fake)
+        with self.assertRaisesRegex(project.ProjectError, 'quota exceeded'):
+            project_client.create_project('fn123', 'Friendly Name')
+        # Errors are reported by the operation, not by polling the project.
+        self.assertEqual(service_fake.projects_fake.get_count, 0)
+
     def test_create_project_exists(self):
         self._project_client.create_project('fn123', 'Friendly Name')
         with self.assertRaises(project.ProjectExistsError):
             self._project_client.create_project('fn123', 'Duplicate!')
 
-    @mock.patch('subprocess.check_call')
-    def test_create_and_set_project(self, check_call):
+    @mock.patch('django_cloud_deploy.cloudlib.gcloud_config.set_property')
+    def test_create_and_set_project(self, set_property):
         self._project_client.create_and_set_project('fn123', 'Friendly Name')
         self.assertEqual(self._service_fake.projects_fake.projects,
                          [{
@@ -125,30 +168,21 @@ class ProjectClientTestCase(absltest.TestCase):
                              'projectId': 'fn123',
                          }])
 
-        check_call.assert_called_once_with(
-            ['gcloud', '-q', 'config', 'set', 'project', 'fn123'],
-            stderr=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL)
+        set_property.assert_called_once_with('core', 'project', 'fn123')
 
-    @mock.patch('subprocess.check_call')
-    def test_project_exists_does(self, check_call):
+    @mock.patch('django_cloud_deploy.cloudlib.gcloud_config.set_property')
+    def test_project_exists_does(self, set_property):
         self._project_client.create_and_set_project('p123', 'Friendly Name')
-        check_call.assert_called_once_with(
-            ['gcloud', '-q', 'config', 'set', 'project', 'p123'],
-            stderr=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL)
+        set_property.assert_called_once_with('core', 'project', 'p123')
 
     def test_project_exists_doesnot(self):
         self.assertFalse(self._project_client.project_exists('p123'))
 
-    @mock.patch('subprocess.check_call')
-    def test_set_existing_project(self, check_call):
+    @mock.patch('django_cloud_deploy.cloudlib.gcloud_config.set_property')
+    def test_set_existing_project(self, set_property):
         self._project_client.create_project('fn123', 'Friendly Name')
         self._project_client.set_existing_project('fn123')
-        check_call.assert_called_once_with(
-            ['gcloud', '-q', 'config', 'set', 'project', 'fn123'],
-            stderr=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL)
+        set_property.assert_called_once_with('core', 'project', 'fn123')
 
     def test_set_existing_project_non_existant(self):
         with self.assertRaises(project.ProjectError):
@@ -0,0 +1,254 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for django_cloud_deploy.cloudlib.quota."""
+
+import email.utils
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from absl.testing import absltest
+
+from django_cloud_deploy.cloudlib import quota
+
+from googleapiclient import errors
+from googleapiclient import http
+from googleapiclient import model
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTest(absltest.TestCase):
+    """Tests for quota.TokenBucket."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_burst_then_rate(self):
+        bucket = quota.TokenBucket(
+            2, burst=3, clock=self.clock.time, sleep=self.clock.sleep)
+        waits = [bucket.acquire() for _ in range(5)]
+        self.assertEqual(waits, [0, 0, 0, 0.5, 0.5])
+
+    def test_refill_capped_at_burst(self):
+        bucket = quota.TokenBucket(
+            1, burst=2, clock=self.clock.time, sleep=self.clock.sleep)
+        bucket.acquire()
+        self.clock.now = 100
+        waits = [bucket.acquire() for _ in range(3)]
+        self.assertEqual(waits, [0, 0, 1])
+
+    def test_pause(self):
+        bucket = quota.TokenBucket(
+            10, clock=self.clock.time, sleep=self.clock.sleep)
+        bucket.pause(5)
+        self.assertEqual(bucket.acquire(), 5)
+
+
+class RateLimiterTest(absltest.TestCase):
+    """Tests for the selection of token buckets by method id."""
+
+    def setUp(self):
+        quota.configure({
+            'default': {
+                'rate': 10
+            },
+            'iam': {
+                'rate': 5
+            },
+            'iam.projects.serviceAccounts.create': {
+                'rate': 1
+            },
+        })
+        self.addCleanup(quota.configure, None)
+
+    def test_most_specific_entry(self):
+        get_bucket = quota._rate_limiter.get_bucket
+        self.assertEqual(get_bucket('iam.projects.serviceAccounts.create').rate,
+                         1)
+        self.assertEqual(get_bucket('iam.projects.serviceAccounts.get').rate, 5)
+        self.assertEqual(get_bucket('storage.objects.insert').rate, 10)
+        self.assertIs(
+            get_bucket('iam.projects.serviceAccounts.get'),
+            get_bucket('iam.projects.serviceAccounts.list'))
+
+
+class LoadProfileTest(absltest.TestCase):
+    """Tests for quota.load_profile."""
+
+    def setUp(self):
+        self.profile_path = os.path.join(tempfile.mkdtemp(), 'quota.yaml')
+
+    def test_no_file(self):
+        self.assertEqual(quota.load_profile(self.profile_path),
+                         quota._DEFAULT_PROFILE)
+
+    def test_override(self):
+        with open(self.profile_path, 'w') as f:
+            f.write('iam: {rate: 1, burst: 2}\n')
+        profile = quota.load_profile(self.profile_path)
+        self.assertEqual(profile['iam'], {'rate': 1, 'burst': 2})
+        self.assertEqual(profile['storage'], quota._DEFAULT_PROFILE['storage'])
+
+    def test_invalid_rate(self):
+        with open(self.profile_path, 'w') as f:
+            f.write('iam: {burst: 2}\n')
+        with self.assertRaisesRegex(ValueError, 'rate'):
+            quota.load_profile(self.profile_path)
+
+
+class SharedTokenBucketTest(absltest.TestCase):
+    """Tests for quota.SharedTokenBucket."""
+
+    def test_shared_between_processes(self):
+        context = multiprocessing.get_context('spawn')
+        bucket = quota.SharedTokenBucket(rate=0.001, burst=2, context=context)
+        processes = [
+            context.Process(target=bucket.acquire) for _ in range(2)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+            self.assertEqual(process.exitcode, 0)
+        # Both processes took a token from the bucket of this process.
+        self.assertLess(bucket._tokens, 1)
+
+    def test_create_shared_buckets(self):
+        buckets = quota.create_shared_buckets({
+            'default': {
+                'rate': 10
+            },
+            'iam': {
+                'rate': 5,
+                'burst': 10
+            }
+        })
+        self.assertEqual(buckets['default'].burst, 10)
+        self.assertEqual(buckets['iam'].rate, 5)
+        self.assertEqual(buckets['iam'].burst, 10)
+
+    def test_configure_with_buckets(self):
+        profile = {'default': {'rate': 10}, 'iam': {'rate': 5}}
+        buckets = quota.create_shared_buckets(profile)
+        quota.configure(profile, buckets)
+        self.addCleanup(quota.configure, None)
+        self.assertIs(
+            quota._rate_limiter.get_bucket('iam.projects.serviceAccounts.get'),
+            buckets['iam'])
+        self.assertIs(
+            quota._rate_limiter.get_bucket('storage.buckets.get'),
+            buckets['default'])
+
+
+class QuotaHttpRequestTest(absltest.TestCase):
+    """Tests for quota.QuotaHttpRequest."""
+
+    def setUp(self):
+        quota.configure({'default': {'rate': 100}})
+        self.addCleanup(quota.configure, None)
+        self.clock = FakeClock()
+        self.bucket = quota._rate_limiter.get_bucket('storage.buckets.get')
+        self.bucket._clock = self.clock.time
+        self.bucket._sleep = self.clock.sleep
+        self.bucket._updated = self.clock.now
+
+    def _create_request(self, responses):
+        return quota.QuotaHttpRequest(
+            http.HttpMockSequence(responses),
+            model.JsonModel().response,
+            'https://www.googleapis.com/storage/v1/b/bucket?alt=json',
+            methodId='storage.buckets.get')
+
+    def test_retry_after(self):
+        request = self._create_request([({
+            'status': '429',
+            'retry-after': '7'
+        }, ''), ({
+            'status': '200'
+        }, '{"name": "abc"}')])
+        self.assertEqual(request.execute(), {'name': 'abc'})
+        self.assertEqual(self.clock.now, 7)
+
+    def test_retry_after_http_date(self):
+        retry_date = email.utils.formatdate(time.time() + 60, usegmt=True)
+        request = self._create_request([({
+            'status': '429',
+            'retry-after': retry_date
+        }, ''), ({
+            'status': '200'
+        }, '{"name": "abc"}')])
+        self.assertEqual(request.execute(), {'name': 'abc'})
+        self.assertGreater(self.clock.now, 50)
+        self.assertLessEqual(self.clock.now, 60)
+
+    def test_invalid_retry_after_falls_back_to_backoff(self):
+        request = self._create_request([({
+            'status': '429',
+            'retry-after': 'garbage'
+        }, ''), ({
+            'status': '200'
+        }, '{"name": "abc"}')])
+        self.assertEqual(request.execute(), {'name': 'abc'})
+        self.assertGreater(self.clock.now, 0)
+        self.assertLessEqual(self.clock.now, quota._INITIAL_BACKOFF_SECONDS)
+
+    def test_rate_limit_reason(self):
+        content = json.dumps({
+            'error': {
+                'errors': [{
+                    'reason': 'userRateLimitExceeded'
+                }]
+            }
+        })
+        request = self._create_request([({
+            'status': '403'
+        }, content), ({
+            'status': '200'
+        }, '{"name": "abc"}')])
+        self.assertEqual(request.execute(), {'name': 'abc'})
+        self.assertGreater(self.clock.now, 0)
+
+    def test_permission_denied_not_retried(self):
+        content = json.dumps({'error': {'errors': [{'reason': 'forbidden'}]}})
+        request = self._create_request([({
+            'status': '403'
+        }, content), ({
+            'status': '200'
+        }, '{"name": "abc"}')])
+        with self.assertRaises(errors.HttpError):
+            request.execute()
+
+    def test_gives_up(self):
+        request = self._create_request([({
+            'status': '429'
+        }, '')] * (quota._MAX_RETRIES + 1))
+        with self.assertRaises(errors.HttpError):
+            request.execute()
+
+
+if __name__ == '__main__':
+    absltest.main()
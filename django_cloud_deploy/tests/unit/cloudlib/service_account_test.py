@@ -96,6 +96,10 @@ class ProjectsFake(object):
     def __init__(self):
         self.service_accounts_fake = ServiceAccountsFake()
         self.iam_policy = FAKE_IAM_POLICY
+        self.set_iam_policy_count = 0
+        # Number of following setIamPolicy calls failing because of a
+        # concurrent modification.
+        self.conflicts = 0
 
     def getIamPolicy(self, resource):
         if 'invalid' in resource:
@@ -104,6 +108,12 @@ class ProjectsFake(object):
             return http_fake.HttpRequestFake(self.iam_policy)
 
     def setIamPolicy(self, resource, body):
+        self.set_iam_policy_count += 1
+        if self.conflicts:
+            self.conflicts -= 1
+            return http_fake.HttpRequestFake(
+                errors.HttpError(
+                    http_fake.HttpResponseFake(409), b'etag mismatch'))
         if 'bindings' in body['policy']:
             self.iam_policy = body['policy']
         return http_fake.HttpRequestFake(body['policy'])
@@ -148,7 +158,7 @@ class ServiceAccountClientTestCase(absltest.TestCase):
         member = ('serviceAccount:{}@{}.iam.gserviceaccount.com'.format(
             service_account_id, project_id))
         new_policy = self._service_account_client._generate_updated_iam_policy(
-            policy, member, role)
+            policy, [(member, role)])
         self.assertIn(member, new_policy['bindings'][0]['members'])
 
     def test_update_iam_policy_member_already_exist(self):
@@ -160,7 +170,7 @@ class ServiceAccountClientTestCase(absltest.TestCase):
         role = FAKE_ROLE
         member = FAKE_SERVICE_ACCOUNT
         new_policy = self._service_account_client._generate_updated_iam_policy(
-            policy, member, role)
+            policy, [(member, role)])
         self.assertDictEqual(FAKE_IAM_POLICY, new_policy)
 
     def test_update_iam_policy_role_not_exist(self):
@@ -168,7 +178,7 @@ class ServiceAccountClientTestCase(absltest.TestCase):
         role = 'role/new_fake_role'
         member = FAKE_SERVICE_ACCOUNT
         new_policy = self._service_account_client._generate_updated_iam_policy(
-            policy, member, role)
+            policy, [(member, role)])
         self.assertEqual(len(new_policy['bindings']), 2)
         self.assertEqual(role, new_policy['bindings'][1]['role'])
         self.assertIn(member, new_policy['bindings'][1]['members'])
@@ -176,8 +186,9 @@ class ServiceAccountClientTestCase(absltest.TestCase):
     def test_create_service_account_success(self):
         service_account_id = 'test_create_service_account_success'
         service_account_name = 'Test Create Service Account Success'
-        self._service_account_client.create_service_account(
+        created = self._service_account_client.create_service_account(
             PROJECT_ID, service_account_id, service_account_name, [FAKE_ROLE])
+        self.assertTrue(created)
 
         # Assert the service account is created
         all_service_accounts = (self._iam_service_fake.projects_fake.
@@ -212,19 +223,24 @@ class ServiceAccountClientTestCase(absltest.TestCase):
         service_account_id = SERVICE
         service_account_name = 'Fake Service Account'
 
-        with self.assertRaises(service_account.ServiceAccountCreationError):
-            self._service_account_client.create_service_account(
-                PROJECT_ID, service_account_id, service_account_name,
-                [FAKE_ROLE])
+        created = self._service_account_client.create_service_account(
+            PROJECT_ID, service_account_id, service_account_name,
+            ['role/new_fake_role'])
+        self.assertFalse(created)
 
         # Assert the service account list is unchanged
         all_service_accounts = (self._iam_service_fake.projects_fake.
                                 service_accounts_fake.service_accounts)
         self.assertCountEqual([SERVICE], all_service_accounts)
 
-        # Assert iam policy is unchanged
+        # Assert the existing service account is granted the roles
+        member = ('serviceAccount:{}@{}.iam.gserviceaccount.com'.format(
+            service_account_id, PROJECT_ID))
         policy = self._cloudresourcemanager_fake.projects_fake.iam_policy
-        self.assertDictEqual(FAKE_IAM_POLICY, policy)
+        self.assertEqual(policy['bindings'][-1], {
+            'members': [member],
+            'role': 'role/new_fake_role'
+        })
 
     def test_create_service_account_server_returns_invalid_policy(self):
         service_account_id = (
@@ -270,6 +286,52 @@ class ServiceAccountClientTestCase(absltest.TestCase):
             policy = self._cloudresourcemanager_fake.projects_fake.iam_policy
             self.assertDictEqual(FAKE_IAM_POLICY, policy)
 
+    def test_update_iam_policy_input_unchanged(self):
+        policy = {'bindings': [{'members': ['user:a'], 'role': FAKE_ROLE}]}
+        self._service_account_client._generate_updated_iam_policy(
+            policy, [('user:b', FAKE_ROLE)])
+        self.assertEqual(policy['bindings'][0]['members'], ['user:a'])
+
+    def test_iam_policy_update_coalesced(self):
+        client = self._service_account_client
+        with client.iam_policy_update(PROJECT_ID) as policy_update:
+            client.create_service_account(
+                PROJECT_ID,
+                'account-a',
+                'Account A', [FAKE_ROLE, 'roles/new_fake_role'],
+                policy_update=policy_update)
+            client.create_service_account(
+                PROJECT_ID,
+                'account-b',
+                'Account B', [FAKE_ROLE],
+                policy_update=policy_update)
+
+        projects_fake = self._cloudresourcemanager_fake.projects_fake
+        self.assertEqual(projects_fake.set_iam_policy_count, 1)
+        members = {
+            binding['role']: binding['members']
+            for binding in projects_fake.iam_policy['bindings']
+        }
+        member_a = 'serviceAccount:account-a@{}.iam.gserviceaccount.com'.format(
+            PROJECT_ID)
+        member_b = 'serviceAccount:account-b@{}.iam.gserviceaccount.com'.format(
+            PROJECT_ID)
+        self.assertIn(member_a, members[FAKE_ROLE])
+        self.assertIn(member_b, members[FAKE_ROLE])
+        self.assertEqual(members['roles/new_fake_role'], [member_a])
+
+    @mock.patch('time.sleep')
+    def test_grant_roles_retries_on_conflict(self, unused_mock_sleep):
+        projects_fake = self._cloudresourcemanager_fake.projects_fake
+        projects_fake.conflicts = 2
+        self._service_account_client.grant_roles(
+            PROJECT_ID, [('user:a', 'roles/new_fake_role')])
+        self.assertEqual(projects_fake.set_iam_policy_count, 3)
+        self.assertEqual(projects_fake.iam_policy['bindings'][-1], {
+            'members': ['user:a'],
+            'role': 'roles/new_fake_role'
+        })
+
     def test_create_service_account_key_success(self):
         service_account_id = 'test_create_service_account_key_success'
 
@@ -55,7 +55,11 @@ class BucketsFake(object):
 
     def __init__(self):
         self.buckets = ['exist']
+        # Buckets of another project which we have access to.
+        self.foreign_buckets = ['foreign']
+        self.bucket_bodies = {}
         self.iam_policy = FAKE_IAM_POLICY
+        self.set_iam_policy_count = 0
 
     def insert(self, project, body):
         bucket_name = body['name']
@@ -65,10 +69,30 @@ class BucketsFake(object):
                     http_fake.HttpResponseFake(403), b'permission denied'))
         elif 'invalid' in bucket_name:
             return http_fake.HttpRequestFake({'invalid': 'response'})
+        elif bucket_name in self.buckets + self.foreign_buckets:
+            return http_fake.HttpRequestFake(
+                errors.HttpError(
+                    http_fake.HttpResponseFake(409), b'already exists'))
         else:
             self.buckets.append(bucket_name)
+            self.bucket_bodies[bucket_name] = body
             return http_fake.HttpRequestFake(body)
 
+    def list(self, project, prefix):
+        # Buckets of other projects are not listed.
+        if project != PROJECT_ID:
+            return http_fake.HttpRequestFake({})
+        items = [{
+            'name': bucket
+        } for bucket in sorted(self.buckets) if bucket.startswith(prefix)]
+        return http_fake.HttpRequestFake({'items': items})
+
+    def get(self, bucket):
+        if bucket not in self.buckets + self.foreign_buckets:
+            return http_fake.HttpRequestFake(
+                errors.HttpError(http_fake.HttpResponseFake(404), b'not found'))
+        return http_fake.HttpRequestFake({'name': bucket})
+
     def getIamPolicy(self, bucket):
         if 'invalid' in bucket:
             return http_fake.HttpRequestFake(INVALID_IAM_POLICY)
@@ -80,6 +104,7 @@ class BucketsFake(object):
             return http_fake.HttpRequestFake(self.iam_policy)
 
     def setIamPolicy(self, bucket, body):
+        self.set_iam_policy_count += 1
         self.iam_policy = body
         return http_fake.HttpRequestFake(body)
 
@@ -110,6 +135,36 @@ class StaticContentServeClientTest(absltest.TestCase):
         self._static_content_serve_client.create_bucket(PROJECT_ID, BUCKET_NAME)
         self.assertIn(BUCKET_NAME, self._storage_service_fake.buckets().buckets)
 
+    def test_create_bucket_in_location(self):
+        bucket_name = 'dual_region_bucket'
+        self._static_content_serve_client.create_bucket(
+            PROJECT_ID, bucket_name, location='NAM4')
+        body = self._storage_service_fake.buckets().bucket_bodies[bucket_name]
+        self.assertEqual(body['location'], 'NAM4')
+        self.assertTrue(
+            body['iamConfiguration']['uniformBucketLevelAccess']['enabled'])
+
+    def test_create_existing_bucket(self):
+        with self.assertRaises(static_content_serve.StaticContentServeError):
+            self._static_content_serve_client.create_bucket(
+                PROJECT_ID, 'exist')
+        self._static_content_serve_client.create_bucket(
+            PROJECT_ID, 'exist', exist_ok=True)
+
+    def test_create_bucket_of_another_project(self):
+        with self.assertRaises(static_content_serve.StaticContentServeError):
+            self._static_content_serve_client.create_bucket(
+                PROJECT_ID, 'foreign', exist_ok=True)
+
+    def test_provision_bucket_twice(self):
+        for _ in range(2):
+            self._static_content_serve_client.provision_bucket(
+                PROJECT_ID, BUCKET_NAME, public=True)
+        buckets_fake = self._storage_service_fake.buckets()
+        self.assertEqual(buckets_fake.iam_policy['bindings'],
+                         [PUBLIC_READ_BINDING])
+        self.assertEqual(buckets_fake.set_iam_policy_count, 1)
+
     def test_create_bucket_no_permission(self):
         project_id = 'project_no_permission'
         with self.assertRaises(static_content_serve.StaticContentServeError):
@@ -132,6 +187,25 @@ class StaticContentServeClientTest(absltest.TestCase):
             PUBLIC_READ_BINDING,
             self._storage_service_fake.buckets().iam_policy['bindings'])
 
+    def test_make_bucket_public_adds_member_to_existing_binding(self):
+        buckets_fake = self._storage_service_fake.buckets()
+        buckets_fake.iam_policy = {
+            'bindings': [{
+                'role': 'roles/storage.objectViewer',
+                'members': ['user:someone@example.com']
+            }],
+            'etag': 'CAE='
+        }
+        self._static_content_serve_client.make_bucket_public(BUCKET_NAME)
+        self.assertEqual(
+            buckets_fake.iam_policy, {
+                'bindings': [{
+                    'role': 'roles/storage.objectViewer',
+                    'members': ['user:someone@example.com', 'allUsers']
+                }],
+                'etag': 'CAE='
+            })
+
     def test_make_bucket_public_no_permission(self):
         bucket_name = 'bucket_no_permission'
         with self.assertRaises(static_content_serve.StaticContentServeError):
@@ -82,3 +82,28 @@ class ConfigurationTest(unittest.TestCase):
         self.assertEqual(configuration.get('list1'), ['a', 'b'])
         self.assertEqual(configuration.get('dict1'), {'a': 'b'})
         self.assertIsNone(configuration.get('var3'))
+
+    def test_complete_step_is_saved(self):
+        configuration = config.Configuration(
+            django_directory_path=self._project_dir)
+        self.assertIsNone(configuration.get_completed_step('database'))
+        configuration.complete_step('database', {'instance': 'mysite'})
+        configuration.complete_step('enable_services')
+
+        configuration = config.Configuration(
+            django_directory_path=self._project_dir)
+        self.assertEqual(
+            configuration.get_completed_step('database'),
+            {'instance': 'mysite'})
+        self.assertEqual(
+            configuration.get_completed_step('enable_services'), {})
+
+    def test_clear_completed_steps(self):
+        configuration = config.Configuration(
+            django_directory_path=self._project_dir)
+        configuration.complete_step('database', {'instance': 'mysite'})
+        configuration.clear_completed_steps()
+
+        configuration = config.Configuration(
+            django_directory_path=self._project_dir)
+        self.assertIsNone(configuration.get_completed_step('database'))
@@ -0,0 +1,119 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit test for django_cloud_deploy/progress.py."""
+
+import io as std_io
+import threading
+import unittest
+from unittest import mock
+
+from django_cloud_deploy import progress
+from django_cloud_deploy.cli import io
+
+
+class EventBusTest(unittest.TestCase):
+    """Unit test for progress.EventBus."""
+
+    def setUp(self):
+        self._event_bus = progress.EventBus()
+        patcher = mock.patch.object(progress, '_event_bus', self._event_bus)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_subscribers_receive_events_on_dispatcher_thread(self):
+        events = []
+        threads = []
+
+        def callback(event):
+            events.append(event)
+            threads.append(threading.current_thread())
+
+        self._event_bus.subscribe(callback)
+        progress.report('upload', 'Uploading', current=1, total=2, unit='B')
+        self._event_bus.flush()
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].task, 'upload')
+        self.assertEqual(events[0].current, 1)
+        self.assertEqual(events[0].total, 2)
+        self.assertNotEqual(threads[0], threading.current_thread())
+
+    def test_unsubscribe(self):
+        events = []
+        self._event_bus.subscribe(events.append)
+        self._event_bus.unsubscribe(events.append)
+        progress.report('upload', 'Uploading')
+        self._event_bus.flush()
+        self.assertEqual(events, [])
+
+    def test_broken_subscriber_does_not_stop_others(self):
+        events = []
+
+        def broken_callback(event):
+            raise ValueError(event)
+
+        self._event_bus.subscribe(broken_callback)
+        self._event_bus.subscribe(events.append)
+        progress.report('upload', 'Uploading')
+        progress.report('upload', 'Uploading', done=True)
+        self._event_bus.flush()
+        self.assertEqual([event.done for event in events], [False, True])
+
+
+class ProgressRendererTest(unittest.TestCase):
+    """Unit test for the console renderer of progress events."""
+
+    def setUp(self):
+        self._output = std_io.StringIO()
+        self._renderer = io._ProgressRenderer(tty=False, fd=self._output)
+
+    def test_render_known_total(self):
+        self._renderer.render(
+            progress.ProgressEvent(
+                'rollout', 'Rolling out', current=1, total=3,
+                unit='replicas'))
+        self._renderer.render(
+            progress.ProgressEvent(
+                'rollout',
+                'Rolling out',
+                current=3,
+                total=3,
+                unit='replicas',
+                done=True))
+        self.assertIn('Rolling out', self._output.getvalue())
+        self.assertIn('3 of 3 replicas', self._output.getvalue())
+
+    def test_render_growing_total(self):
+        self._renderer.render(
+            progress.ProgressEvent(
+                'push', 'Pushing', current=10, total=10, unit='B'))
+        self._renderer.render(
+            progress.ProgressEvent(
+                'push', 'Pushing', current=15, total=20, unit='B'))
+        self._renderer.finish()
+        self.assertIn('100%', self._output.getvalue())
+
+    def test_render_unknown_total(self):
+        self._renderer.render(
+            progress.ProgressEvent(
+                'sql', 'Creating instance', status='PENDING_CREATE'))
+        self._renderer.render(
+            progress.ProgressEvent(
+                'sql', 'Creating instance', status='RUNNABLE', done=True))
+        self.assertIn('Creating instance', self._output.getvalue())
+        self.assertIn('RUNNABLE', self._output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
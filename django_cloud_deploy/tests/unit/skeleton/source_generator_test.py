@@ -21,6 +21,8 @@ from unittest import mock
 
 from absl.testing import absltest
 from django.core import management
+import jinja2
+import yaml
 
 from django_cloud_deploy.skeleton import source_generator
 
@@ -36,10 +38,62 @@ class FileGeneratorTest(absltest.TestCase):
         shutil.rmtree(self._project_dir)
 
 
+class Jinja2FileGeneratorTest(FileGeneratorTest):
+
+    OPTIONS = {
+        'project_id': 'fake-project-id',
+        'project_name': 'mysite',
+        'app_name': 'polls',
+        'camel_case_app_name': 'Polls',
+        'docs_version': '2.1',
+        'secret_key': 'fake-secret-key',
+        'database_name': 'mysite-db',
+        'bucket_name': 'fake-bucket',
+        'cloud_sql_connection': 'fake-project-id:us-west1:mysite-instance',
+        'cloud_sql_connection_string':
+            'fake-project-id:us-west1:mysite-instance',
+        'image_tag': 'gcr.io/fake-project-id/mysite',
+        'cloudsql_secrets': ['cloudsql-oauth-credentials'],
+        'django_secrets': ['logging-credentials'],
+    }
+
+    def test_shared_template_environment(self):
+        generator1 = source_generator._DockerfileGenerator()
+        generator2 = source_generator._DjangoAppFileGenerator()
+        self.assertIs(generator1._template_env, generator2._template_env)
+
+    def test_render_same_as_uncached_template(self):
+        generator = source_generator._Jinja2FileGenerator()
+        template_dir = generator._get_template_folder_path()
+        for root, _, files in os.walk(template_dir):
+            for file_name in files:
+                template_path = os.path.join(root, file_name)
+                output_path = os.path.join(self._project_dir, 'output')
+                generator._render_file(template_path, output_path,
+                                       self.OPTIONS)
+                with open(template_path) as template_file:
+                    expected = jinja2.Environment().from_string(
+                        template_file.read()).render(self.OPTIONS)
+                with open(output_path) as output_file:
+                    self.assertEqual(output_file.read(), expected,
+                                     template_path)
+
+    def test_render_template_outside_package(self):
+        template_path = os.path.join(self._project_dir, 'template')
+        output_path = os.path.join(self._project_dir, 'output')
+        with open(template_path, 'w') as template_file:
+            template_file.write('Hello {{ name }}')
+        generator = source_generator._Jinja2FileGenerator()
+        generator._render_file(template_path, output_path, {'name': 'World'})
+        with open(output_path) as output_file:
+            self.assertEqual(output_file.read(), 'Hello World')
+
+
 class DjangoProjectFileGeneratorTest(FileGeneratorTest):
 
     PROJECT_ROOT_FOLDER_FILES = ('manage.py',)
-    DJANGO_ROOT_FOLDER_FILES = ('__init__.py', 'urls.py', 'wsgi.py')
+    DJANGO_ROOT_FOLDER_FILES = ('__init__.py', 'urls.py', 'warmup.py',
+                                'wsgi.py')
 
     @classmethod
     def setUpClass(cls):
@@ -220,6 +274,21 @@ class SettingsFileGeneratorTest(FileGeneratorTest):
                 cloud_sql_connection_string)
             self.assertIn(value, settings_content)
 
+    def test_set_static_url(self):
+        project_name = 'test_set_static_url'
+        project_id = project_name + 'project_id'
+        cloud_sql_connection_string = ('{}:{}:{}'.format(
+            project_id, 'us-west', 'instance'))
+        self._generator.generate(project_id, project_name, self._project_dir,
+                                 cloud_sql_connection_string)
+        self._generator.set_static_url(self._project_dir, project_name,
+                                       'http://203.0.113.1/static/')
+
+        sys.path.append(self._project_dir)
+        module = importlib.import_module(project_name + '.remote_settings')
+        self.assertEqual(
+            getattr(module, 'STATIC_URL'), 'http://203.0.113.1/static/')
+
     def test_customize_remote_settings(self):
         project_name = 'test_remote_settings_customize_database_name'
         project_id = project_name + 'project_id'
@@ -373,6 +442,41 @@ class DependencyFileGeneratorTest(FileGeneratorTest):
         self.assertTrue(self._generator.generated(self._project_dir))
 
 
+class AppEngineFileGeneratorTest(FileGeneratorTest):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._generator = source_generator._AppEngineFileGenerator()
+
+    def _load_app_yaml(self):
+        with open(os.path.join(self._project_dir, 'app.yaml')) as app_yaml:
+            return yaml.safe_load(app_yaml)
+
+    def test_generate_default_scaling_profile(self):
+        self._generator.generate('polls', self._project_dir)
+        app_yaml = self._load_app_yaml()
+        profile = source_generator.GAE_SCALING_PROFILES[
+            source_generator.DEFAULT_GAE_SCALING_PROFILE]
+        self.assertEqual(app_yaml['instance_class'], profile['instance_class'])
+        self.assertEqual(
+            app_yaml['automatic_scaling'], {
+                'min_instances': profile['min_instances'],
+                'target_cpu_utilization': profile['target_cpu_utilization'],
+                'max_concurrent_requests': profile['max_concurrent_requests']
+            })
+        self.assertEqual(app_yaml['inbound_services'], ['warmup'])
+        self.assertIn({
+            'url': '/_ah/warmup',
+            'script': 'auto'
+        }, app_yaml['handlers'])
+
+    def test_generate_scaling_profile(self):
+        self._generator.generate('polls', self._project_dir, 'low-latency')
+        app_yaml = self._load_app_yaml()
+        self.assertEqual(app_yaml['instance_class'], 'F4')
+        self.assertEqual(app_yaml['automatic_scaling']['min_instances'], 2)
+
+
 class YAMLFileGeneratorTest(FileGeneratorTest):
 
     @classmethod
@@ -514,6 +618,51 @@ class DjangoSourceFileGeneratorTest(FileGeneratorTest):
             'fake_db_password')
         self._test_project_structure(project_name, app_name, project_dir)
 
+    def test_incremental_generation_keeps_unchanged_files(self):
+        project_id = project_name = 'test_incremental_unchanged'
+        app_name = 'polls'
+        report = self._generator.generate_all_source_files(
+            project_id, project_name, app_name, self._project_dir,
+            'fake_db_user', 'fake_db_password', incremental=True)
+        self.assertIn('Dockerfile', report['created'])
+        self.assertFalse(report['conflicts'])
+        dockerfile_path = os.path.join(self._project_dir, 'Dockerfile')
+        os.utime(dockerfile_path, (0, 0))
+
+        report = self._generator.generate_all_source_files(
+            project_id, project_name, app_name, self._project_dir,
+            'fake_db_user', 'fake_db_password', incremental=True)
+        self.assertFalse(report['created'])
+        self.assertFalse(report['updated'])
+        self.assertFalse(report['conflicts'])
+        self.assertIn(
+            os.path.join(project_name, 'base_settings.py'),
+            report['unchanged'])
+        self.assertEqual(os.path.getmtime(dockerfile_path), 0)
+
+    def test_incremental_generation_reports_modified_files(self):
+        project_id = project_name = 'test_incremental_modified'
+        app_name = 'polls'
+        self._generator.generate_all_source_files(
+            project_id, project_name, app_name, self._project_dir,
+            'fake_db_user', 'fake_db_password', incremental=True)
+        dockerfile_path = os.path.join(self._project_dir, 'Dockerfile')
+        with open(dockerfile_path, 'w') as f:
+            f.write('FROM scratch\n')
+        yaml_path = os.path.join(self._project_dir, project_name + '.yaml')
+        with open(yaml_path) as f:
+            yaml_content = f.read()
+
+        report = self._generator.generate_all_source_files(
+            'another-project-id', project_name, app_name, self._project_dir,
+            'fake_db_user', 'fake_db_password', incremental=True)
+        self.assertEqual(report['conflicts'], ['Dockerfile'])
+        self.assertIn(project_name + '.yaml', report['updated'])
+        with open(dockerfile_path) as f:
+            self.assertEqual(f.read(), 'FROM scratch\n')
+        with open(yaml_path) as f:
+            self.assertNotEqual(f.read(), yaml_content)
+
     def test_generate_missing_source_files(self):
         project_id = project_name = 'test_generate_missing_source_files'
         app_name = 'existing_app'
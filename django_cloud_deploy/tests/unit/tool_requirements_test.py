@@ -0,0 +1,158 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit test for django_cloud_deploy/tool_requirements.py."""
+
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+from django_cloud_deploy import tool_requirements
+from django_cloud_deploy.cli import io
+
+
+class _FakeRequirement(tool_requirements.Requirement):
+    NAME = 'Fake'
+    BINARY = 'fake_binary'
+    check_calls = 0
+    check_cached_calls = 0
+    missing = False
+    stopped = False
+
+    @classmethod
+    def check(cls):
+        cls.check_calls += 1
+        if cls.missing:
+            raise tool_requirements.MissingRequirementError(
+                cls.NAME, 'Install fake_binary.')
+
+    @classmethod
+    def check_cached(cls):
+        cls.check_cached_calls += 1
+        if cls.stopped:
+            raise tool_requirements.MissingRequirementError(
+                cls.NAME, 'Start fake_binary.')
+
+
+class CheckAndHandleRequirementsTest(unittest.TestCase):
+    """Unit test for tool_requirements.check_and_handle_requirements."""
+
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._temp_dir)
+        self._binary_path = os.path.join(self._temp_dir, 'fake_binary')
+        with open(self._binary_path, 'w') as binary:
+            binary.write('#!/bin/sh\n')
+        os.chmod(self._binary_path, stat.S_IRWXU)
+
+        patchers = [
+            mock.patch.object(tool_requirements, '_CACHE_PATH',
+                              os.path.join(self._temp_dir, 'cache.json')),
+            mock.patch.object(tool_requirements, '_REQUIREMENTS',
+                              {'test': [_FakeRequirement]}),
+            mock.patch.dict(os.environ, {'PATH': self._temp_dir}),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        _FakeRequirement.check_calls = 0
+        _FakeRequirement.check_cached_calls = 0
+        _FakeRequirement.missing = False
+        _FakeRequirement.stopped = False
+        self._console = io.TestIO()
+
+    def test_successful_check_is_cached(self):
+        self.assertTrue(
+            tool_requirements.check_and_handle_requirements(
+                self._console, 'test'))
+        self.assertTrue(
+            tool_requirements.check_and_handle_requirements(
+                self._console, 'test'))
+        self.assertEqual(_FakeRequirement.check_calls, 1)
+        self.assertEqual(_FakeRequirement.check_cached_calls, 1)
+
+    def test_cached_check_failure_is_reported(self):
+        tool_requirements.check_and_handle_requirements(self._console, 'test')
+        _FakeRequirement.stopped = True
+        self.assertFalse(
+            tool_requirements.check_and_handle_requirements(
+                self._console, 'test'))
+        self.assertEqual(self._console.error_calls, [('Start fake_binary.',)])
+
+    def test_changed_binary_is_checked_again(self):
+        tool_requirements.check_and_handle_requirements(self._console, 'test')
+        mtime = os.path.getmtime(self._binary_path)
+        os.utime(self._binary_path, (mtime + 10, mtime + 10))
+        tool_requirements.check_and_handle_requirements(self._console, 'test')
+        self.assertEqual(_FakeRequirement.check_calls, 2)
+
+    def test_failed_check_is_not_cached(self):
+        _FakeRequirement.missing = True
+        self.assertFalse(
+            tool_requirements.check_and_handle_requirements(
+                self._console, 'test'))
+        self.assertEqual(self._console.error_calls, [('Install fake_binary.',)])
+        _FakeRequirement.missing = False
+        self.assertTrue(
+            tool_requirements.check_and_handle_requirements(
+                self._console, 'test'))
+        self.assertEqual(_FakeRequirement.check_calls, 2)
+
+
+class DockerCheckCachedTest(unittest.TestCase):
+    """Unit test for tool_requirements.Docker.check_cached."""
+
+    def setUp(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        self._socket_path = os.path.join(temp_dir, 'docker.sock')
+        docker_host = 'unix://' + self._socket_path
+        patcher = mock.patch.dict(os.environ, {'DOCKER_HOST': docker_host})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('subprocess.call')
+    def test_daemon_reachable(self, mock_call):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(self._socket_path)
+        server.listen(1)
+        tool_requirements.Docker.check_cached()
+        mock_call.assert_not_called()
+
+    @mock.patch('subprocess.call')
+    @mock.patch.object(tool_requirements.Docker,
+                       '_is_missing_group_membership',
+                       return_value=False)
+    @mock.patch('sys.platform', 'linux')
+    def test_daemon_not_reachable(self, *unused_mocks):
+        with self.assertRaises(
+                tool_requirements.MissingRequirementError) as context:
+            tool_requirements.Docker.check_cached()
+        self.assertEqual(
+            context.exception.how_to_install_message,
+            tool_requirements.Docker._LINUX_GENERIC_NOT_USABLE_MESSAGE)
+
+    @mock.patch.dict(os.environ, {'DOCKER_HOST': 'ssh://user@host'})
+    @mock.patch.object(tool_requirements.Docker, 'check')
+    def test_unknown_daemon_address(self, mock_check):
+        tool_requirements.Docker.check_cached()
+        mock_check.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
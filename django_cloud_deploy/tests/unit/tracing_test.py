@@ -0,0 +1,143 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit test for django_cloud_deploy/tracing.py."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from googleapiclient import errors
+from googleapiclient import http
+from googleapiclient import model
+
+from django_cloud_deploy import tracing
+
+
+class TracerTest(unittest.TestCase):
+    """Unit test for django_cloud_deploy/tracing.py."""
+
+    def setUp(self):
+        self._tracer = tracing.Tracer()
+        patcher = mock.patch.object(tracing, '_tracer', self._tracer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self._trace_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._trace_dir)
+
+    def test_disabled_by_default(self):
+        with tracing.span('step') as step_span:
+            step_span.set_attribute('key', 'value')
+        self.assertEqual(self._tracer.spans, [])
+
+    def test_nested_spans(self):
+        tracing.enable()
+        with tracing.span('outer', step=1):
+            with tracing.span('inner', category='api') as inner_span:
+                inner_span.set_attribute('http.status', 200)
+        inner_span, outer_span = self._tracer.spans
+        self.assertEqual(inner_span.name, 'inner')
+        self.assertEqual(inner_span.category, 'api')
+        self.assertEqual(inner_span.attributes, {'http.status': 200})
+        self.assertEqual(outer_span.attributes, {'step': 1})
+        self.assertGreaterEqual(outer_span.duration, inner_span.duration)
+
+    def test_span_records_error(self):
+        tracing.enable()
+        with self.assertRaises(ValueError):
+            with tracing.span('step'):
+                raise ValueError()
+        self.assertEqual(self._tracer.spans[0].attributes,
+                         {'error': 'ValueError'})
+
+    def test_export_chrome_trace(self):
+        tracing.enable()
+        with tracing.span('step', step=3):
+            pass
+        trace_path = os.path.join(self._trace_dir, 'trace.json')
+        tracing.export_chrome_trace(trace_path)
+        with open(trace_path) as trace_file:
+            events = json.load(trace_file)['traceEvents']
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['name'], 'step')
+        self.assertEqual(events[0]['ph'], 'X')
+        self.assertEqual(events[0]['cat'], 'workflow')
+        self.assertEqual(events[0]['args'], {'step': 3})
+
+    @mock.patch.object(tracing, 'otel_trace', None)
+    def test_opentelemetry_not_installed(self):
+        with self.assertRaises(tracing.TracingError):
+            tracing.enable(opentelemetry=True)
+        self.assertFalse(self._tracer.enabled)
+
+    def _create_request(self, responses):
+        request = tracing.TracedHttpRequest(
+            http.HttpMockSequence(responses),
+            model.JsonModel().response,
+            'https://www.googleapis.com/storage/v1/b/bucket?alt=json',
+            methodId='storage.buckets.get')
+        request._sleep = lambda seconds: None
+        return request
+
+    def test_traced_http_request(self):
+        tracing.enable()
+        request = self._create_request([({
+            'status': '503'
+        }, ''), ({
+            'status': '200',
+            'content-length': '16'
+        }, '{"name": "abc"}')])
+        self.assertEqual(request.execute(num_retries=2), {'name': 'abc'})
+        api_span = self._tracer.spans[0]
+        self.assertEqual(api_span.name, 'storage.buckets.get')
+        self.assertEqual(api_span.category, 'api')
+        self.assertEqual(api_span.attributes['api'], 'storage')
+        self.assertEqual(api_span.attributes['http.url'],
+                         'https://www.googleapis.com/storage/v1/b/bucket')
+        self.assertEqual(api_span.attributes['http.status'], 200)
+        self.assertEqual(api_span.attributes['retries'], 1)
+        self.assertEqual(api_span.attributes['response_bytes'], 16)
+
+    def test_traced_http_request_executed_twice(self):
+        tracing.enable()
+        request = self._create_request([({
+            'status': '503'
+        }, ''), ({
+            'status': '404'
+        }, ''), ({
+            'status': '200'
+        }, '{"name": "abc"}')])
+        sleep = request._sleep
+        with self.assertRaises(errors.HttpError):
+            request.execute(num_retries=1)
+        self.assertEqual(request.execute(), {'name': 'abc'})
+        self.assertIs(request._sleep, sleep)
+        self.assertEqual(request.response_callbacks, [])
+        first_span, second_span = self._tracer.spans
+        self.assertEqual(first_span.attributes['http.status'], 404)
+        self.assertEqual(first_span.attributes['retries'], 1)
+        self.assertEqual(second_span.attributes['http.status'], 200)
+        self.assertEqual(second_span.attributes['retries'], 0)
+
+    def test_traced_http_request_error(self):
+        tracing.enable()
+        request = self._create_request([({'status': '404'}, '')])
+        with self.assertRaises(errors.HttpError):
+            request.execute()
+        api_span = self._tracer.spans[0]
+        self.assertEqual(api_span.attributes['http.status'], 404)
+        self.assertEqual(api_span.attributes['retries'], 0)
+        self.assertEqual(api_span.attributes['error'], 'HttpError')
@@ -0,0 +1,188 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for django_cloud_deploy.workflow._deploygae."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+
+from django_cloud_deploy import cancellation
+from django_cloud_deploy.cloudlib import app_engine
+from django_cloud_deploy.workflow import _deploygae
+
+PROJECT_ID = 'fake-project'
+BUCKET = 'staging.fake-project.appspot.com'
+
+APP_YAML = """\
+runtime: python37
+entrypoint: gunicorn -b :$PORT mysite.wsgi
+instance_class: F2
+automatic_scaling:
+  min_instances: 1
+  target_cpu_utilization: 0.65
+  max_concurrent_requests: 20
+inbound_services:
+- warmup
+env_variables:
+  DATABASE_USER: user
+handlers:
+- url: /static
+  static_dir: static/
+- url: /.*
+  script: auto
+"""
+
+
+def _sha1(content):
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class DeploygaeWorkflowTest(absltest.TestCase):
+    """Tests for _deploygae.DeploygaeWorkflow."""
+
+    def setUp(self):
+        self._django_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._django_dir)
+        self._write_file('app.yaml', APP_YAML)
+        self._write_file('manage.py', 'manage')
+        self._write_file(os.path.join('static', 'style.css'), 'css')
+        self._write_file(os.path.join('mysite', '__pycache__', 'x.pyc'), 'x')
+        self._write_file('.config.yaml', 'config')
+
+        self._client = mock.Mock(spec=app_engine.AppEngineClient)
+        self._client.get_application.return_value = {
+            'codeBucket': BUCKET,
+            'defaultHostname': 'fake-project.appspot.com'
+        }
+        self._client.list_staged_files.return_value = set()
+        with mock.patch.object(
+                app_engine.AppEngineClient,
+                'from_credentials',
+                return_value=self._client):
+            self._workflow = _deploygae.DeploygaeWorkflow(mock.Mock())
+
+    def _write_file(self, relative_path, content):
+        path = os.path.join(self._django_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def _staged_object_names(self):
+        return sorted(
+            call[0][1] for call in self._client.stage_file.call_args_list)
+
+    def test_deploy_gae_app(self):
+        app_url = self._workflow.deploy_gae_app(PROJECT_ID, self._django_dir)
+
+        self.assertEqual(app_url, 'https://fake-project.appspot.com/')
+        self._client.create_application.assert_not_called()
+        self.assertEqual(
+            self._staged_object_names(),
+            sorted([_sha1(APP_YAML),
+                    _sha1('manage'),
+                    _sha1('css')]))
+
+        project_id, service_id, version = (
+            self._client.create_version.call_args[0])
+        self.assertEqual(project_id, PROJECT_ID)
+        self.assertEqual(service_id, 'default')
+        self.assertEqual(version['runtime'], 'python37')
+        self.assertEqual(version['envVariables'], {'DATABASE_USER': 'user'})
+        self.assertEqual(version['instanceClass'], 'F2')
+        self.assertEqual(
+            version['automaticScaling'], {
+                'maxConcurrentRequests': 20,
+                'standardSchedulerSettings': {
+                    'minInstances': 1,
+                    'targetCpuUtilization': 0.65
+                }
+            })
+        self.assertEqual(version['inboundServices'],
+                         ['INBOUND_SERVICE_WARMUP'])
+        self.assertEqual(version['handlers'][0]['staticFiles'], {
+            'path': r'static/\1',
+            'uploadPathRegex': 'static/.*'
+        })
+        self.assertEqual(version['handlers'][1]['script'],
+                         {'scriptPath': 'auto'})
+        files = version['deployment']['files']
+        self.assertCountEqual(files,
+                              ['app.yaml', 'manage.py', 'static/style.css'])
+        self.assertEqual(
+            files['manage.py'], {
+                'sourceUrl': 'https://storage.googleapis.com/{}/{}'.format(
+                    BUCKET, _sha1('manage')),
+                'sha1Sum': _sha1('manage')
+            })
+        self._client.promote_version.assert_called_once_with(
+            PROJECT_ID, 'default', version['id'])
+
+    def test_only_missing_files_uploaded(self):
+        self._client.list_staged_files.return_value = {
+            _sha1(APP_YAML), _sha1('css')
+        }
+        self._workflow.deploy_gae_app(PROJECT_ID, self._django_dir)
+        self.assertEqual(self._staged_object_names(), [_sha1('manage')])
+
+    def test_create_application(self):
+        self._client.get_application.return_value = None
+        self._client.create_application.return_value = {'codeBucket': BUCKET}
+        app_url = self._workflow.deploy_gae_app(
+            PROJECT_ID, self._django_dir, region='us-central')
+        self._client.create_application.assert_called_once_with(
+            PROJECT_ID, 'us-central')
+        self.assertEqual(app_url, 'https://fake-project.appspot.com/')
+
+    def test_non_default_service(self):
+        self._write_file('app.yaml', APP_YAML + 'service: api\n')
+        app_url = self._workflow.deploy_gae_app(PROJECT_ID, self._django_dir)
+        self.assertEqual(app_url, 'https://api-dot-fake-project.appspot.com/')
+        _, service_id, version = self._client.create_version.call_args[0]
+        self.assertEqual(service_id, 'api')
+        self.assertNotIn('service', version)
+        self._client.promote_version.assert_called_once_with(
+            PROJECT_ID, 'api', version['id'])
+
+    def test_unsupported_app_yaml(self):
+        self._write_file('app.yaml', APP_YAML + 'vpc_access_connector: x\n')
+        with self.assertRaises(_deploygae.DeployNewAppError):
+            self._workflow.deploy_gae_app(PROJECT_ID, self._django_dir)
+        self._client.create_version.assert_not_called()
+
+    def test_queued_uploads_cancelled_on_interrupt(self):
+        self.addCleanup(cancellation.reset)
+        for i in range(20):
+            self._write_file(os.path.join('static', '{}.js'.format(i)), str(i))
+        self._client.stage_file.side_effect = KeyboardInterrupt()
+        with mock.patch.object(self._workflow, '_MAX_UPLOAD_WORKERS', 1):
+            with self.assertRaises(KeyboardInterrupt):
+                self._workflow.deploy_gae_app(PROJECT_ID, self._django_dir)
+        self.assertTrue(cancellation.is_cancelled())
+        # The worker may have started the next upload before the
+        # cancellation, but not the 20 others.
+        self.assertLessEqual(self._client.stage_file.call_count, 2)
+
+    def test_deployment_failure(self):
+        self._client.create_version.side_effect = app_engine.AppEngineError(
+            'build failed')
+        with self.assertRaises(_deploygae.DeployNewAppError):
+            self._workflow.deploy_gae_app(PROJECT_ID, self._django_dir)
+
+
+if __name__ == '__main__':
+    absltest.main()
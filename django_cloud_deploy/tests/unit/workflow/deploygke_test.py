@@ -0,0 +1,328 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the migration job of django_cloud_deploy.workflow._deploygke."""
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+
+from django_cloud_deploy.cloudlib import container
+from django_cloud_deploy.workflow import _deploygke
+import kubernetes
+import yaml
+
+APP_NAME = 'mysite'
+JOB_NAME = 'mysite-migrate-1'
+PROXY_COMMAND = [
+    '/cloud_sql_proxy', '--dir=/cloudsql',
+    '-instances=project:us-west1:instance=tcp:5432'
+]
+
+DEPLOYMENT = {
+    'apiVersion': 'extensions/v1beta1',
+    'kind': 'Deployment',
+    'metadata': {
+        'name': APP_NAME,
+        'labels': {
+            'app': APP_NAME
+        }
+    },
+    'spec': {
+        'template': {
+            'metadata': {
+                'labels': {
+                    'app': APP_NAME
+                }
+            },
+            'spec': {
+                'containers': [{
+                    'name': 'mysite-app',
+                    'image': 'gcr.io/project/mysite',
+                    'ports': [{
+                        'containerPort': 8080
+                    }]
+                }, {
+                    'name': 'cloudsql-proxy',
+                    'image': 'b.gcr.io/cloudsql-docker/gce-proxy:1.05',
+                    'command': PROXY_COMMAND,
+                    'volumeMounts': [{
+                        'name': 'cloudsql',
+                        'mountPath': '/cloudsql'
+                    }]
+                }],
+                'volumes': [{
+                    'name': 'cloudsql',
+                    'emptyDir': None
+                }]
+            }
+        }
+    }
+}
+
+
+def _pod(name, container_states):
+    """Returns a fake pod whose containers have the given terminated states."""
+    statuses = [
+        mock.Mock(state=mock.Mock(terminated=terminated))
+        for _, terminated in container_states
+    ]
+    for status, (container_name, _) in zip(statuses, container_states):
+        status.name = container_name
+    pod = mock.Mock(status=mock.Mock(container_statuses=statuses))
+    pod.metadata.name = name
+    return pod
+
+
+def _terminated(exit_code, reason='Completed'):
+    return mock.Mock(exit_code=exit_code, reason=reason, message=None)
+
+
+class GenerateMigrationJobTest(absltest.TestCase):
+    """Tests for DeploygkeWorkflow._generate_migration_job."""
+
+    def _get_containers(self, job):
+        containers = job['spec']['template']['spec']['containers']
+        return {c['name']: c for c in containers}
+
+    def test_job(self):
+        job = _deploygke.DeploygkeWorkflow._generate_migration_job(
+            APP_NAME, DEPLOYMENT)
+        self.assertEqual(job['kind'], 'Job')
+        self.assertEqual(job['spec']['backoffLimit'], 0)
+        self.assertEqual(job['spec']['activeDeadlineSeconds'],
+                         _deploygke._MIGRATION_JOB_TIMEOUT)
+        # The service of the app must not route traffic to the job.
+        self.assertNotEqual(
+            job['spec']['template']['metadata']['labels']['app'], APP_NAME)
+        pod_spec = job['spec']['template']['spec']
+        self.assertEqual(pod_spec['restartPolicy'], 'Never')
+        self.assertNotIn('shareProcessNamespace', pod_spec)
+        self.assertIn({
+            'name': _deploygke._MIGRATION_STATUS_VOLUME,
+            'emptyDir': {}
+        }, pod_spec['volumes'])
+
+        # The deployment is not modified.
+        deployment_pod_spec = DEPLOYMENT['spec']['template']['spec']
+        self.assertNotIn('restartPolicy', deployment_pod_spec)
+        self.assertLen(deployment_pod_spec['volumes'], 1)
+
+    def test_app_container_runs_migrate(self):
+        job = _deploygke.DeploygkeWorkflow._generate_migration_job(
+            APP_NAME, DEPLOYMENT)
+        app_container = self._get_containers(job)['mysite-app']
+        self.assertNotIn('ports', app_container)
+        command = app_container['command']
+        self.assertEqual(command[:2], ['/bin/sh', '-c'])
+        self.assertIn('python manage.py migrate --noinput', command[2])
+        self.assertIn('touch ' + _deploygke._MIGRATION_DONE_FILE, command[2])
+        self.assertNotIn('pkill', command[2])
+        self.assertNotIn('env', app_container)
+
+    def test_proxy_stops_when_migrate_is_done(self):
+        job = _deploygke.DeploygkeWorkflow._generate_migration_job(
+            APP_NAME, DEPLOYMENT)
+        proxy_container = self._get_containers(job)['cloudsql-proxy']
+        command = proxy_container['command']
+        self.assertEqual(command[:2], ['/bin/sh', '-c'])
+        self.assertTrue(command[2].startswith(' '.join(PROXY_COMMAND) + ' &'))
+        self.assertIn(_deploygke._MIGRATION_DONE_FILE, command[2])
+        for container_def in self._get_containers(job).values():
+            self.assertIn({
+                'name': _deploygke._MIGRATION_STATUS_VOLUME,
+                'mountPath': _deploygke._MIGRATION_STATUS_DIR
+            }, container_def['volumeMounts'])
+
+    def test_timeouts(self):
+        job = _deploygke.DeploygkeWorkflow._generate_migration_job(
+            APP_NAME, DEPLOYMENT, lock_timeout='5s', statement_timeout='10min')
+        app_container = self._get_containers(job)['mysite-app']
+        self.assertEqual(app_container['env'], [{
+            'name': 'PGOPTIONS',
+            'value': '-c lock_timeout=5s -c statement_timeout=10min'
+        }])
+
+    def test_lock_timeout_only(self):
+        job = _deploygke.DeploygkeWorkflow._generate_migration_job(
+            APP_NAME, DEPLOYMENT, lock_timeout='5s')
+        app_container = self._get_containers(job)['mysite-app']
+        self.assertEqual(app_container['env'], [{
+            'name': 'PGOPTIONS',
+            'value': '-c lock_timeout=5s'
+        }])
+
+
+class MigrationJobTest(absltest.TestCase):
+    """Tests for running the migration job of DeploygkeWorkflow."""
+
+    def setUp(self):
+        self._client = mock.Mock(spec=container.ContainerClient)
+        patcher = mock.patch.object(
+            container.ContainerClient,
+            'from_credentials',
+            return_value=self._client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self._workflow = _deploygke.DeploygkeWorkflow(mock.Mock())
+        self._kube_config = mock.Mock()
+
+        # Use a fixed job name.
+        generate_job = self._workflow._generate_migration_job
+
+        def generate_migration_job(*args, **kwargs):
+            job = generate_job(*args, **kwargs)
+            job['metadata']['name'] = JOB_NAME
+            return job
+
+        patcher = mock.patch.object(
+            self._workflow,
+            '_generate_migration_job',
+            side_effect=generate_migration_job)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_migration_result(self):
+        terminated = _terminated(0)
+        self._client.list_job_pods.return_value = [
+            _pod('pod', [('cloudsql-proxy', _terminated(143)),
+                         ('mysite-app', terminated)])
+        ]
+        result = self._workflow._try_get_migration_result(
+            self._kube_config, JOB_NAME, 'mysite-app')
+        self.assertIs(result, terminated)
+        self._client.list_job_pods.assert_called_once_with(
+            JOB_NAME, self._kube_config)
+
+    def test_success(self):
+        self._client.list_job_pods.return_value = [
+            _pod('pod', [('mysite-app', _terminated(0))])
+        ]
+        self._workflow._run_migration_job(
+            self._kube_config,
+            APP_NAME,
+            DEPLOYMENT,
+            lock_timeout='5s',
+            statement_timeout='10min')
+        job = self._client.create_job.call_args[0][0]
+        self.assertEqual(job['metadata']['name'], JOB_NAME)
+        self.assertFalse(self._client.read_pod_log.called)
+        self._client.delete_job.assert_called_once_with(
+            JOB_NAME, self._kube_config)
+
+    def test_failure_reports_logs_before_deleting_job(self):
+        self._client.list_job_pods.return_value = [
+            _pod('pod', [('mysite-app', _terminated(1, reason='Error'))])
+        ]
+
+        def read_pod_log(*unused_args, **unused_kwargs):
+            self.assertFalse(self._client.delete_job.called)
+            return 'django.db.utils.OperationalError: lock timeout\n'
+
+        self._client.read_pod_log.side_effect = read_pod_log
+        with self.assertRaisesRegex(_deploygke.MigrationJobError,
+                                    'exit code 1: Error\n.*lock timeout'):
+            self._workflow._run_migration_job(self._kube_config, APP_NAME,
+                                              DEPLOYMENT)
+        self._client.read_pod_log.assert_called_once_with(
+            'pod',
+            'mysite-app',
+            self._kube_config,
+            tail_lines=_deploygke._MIGRATION_LOG_LINES)
+        self._client.delete_job.assert_called_once_with(
+            JOB_NAME, self._kube_config)
+
+    def test_logs_not_available(self):
+        self._client.list_job_pods.return_value = [
+            _pod('pod', [('mysite-app', _terminated(1, reason='Error'))])
+        ]
+        self._client.read_pod_log.side_effect = (
+            kubernetes.client.rest.ApiException(status=400))
+        with self.assertRaisesRegex(_deploygke.MigrationJobError,
+                                    'exit code 1'):
+            self._workflow._run_migration_job(self._kube_config, APP_NAME,
+                                              DEPLOYMENT)
+        self.assertTrue(self._client.delete_job.called)
+
+    def test_timeout(self):
+        self._client.list_job_pods.return_value = []
+        with mock.patch.object(
+                self._workflow, '_try_get_migration_result', return_value=None):
+            with self.assertRaisesRegex(_deploygke.MigrationJobError,
+                                        'did not finish'):
+                self._workflow._run_migration_job(self._kube_config, APP_NAME,
+                                                  DEPLOYMENT)
+        self._client.delete_job.assert_called_once_with(
+            JOB_NAME, self._kube_config)
+
+    def test_job_deleted_on_error(self):
+        with mock.patch.object(
+                self._workflow,
+                '_try_get_migration_result',
+                side_effect=ValueError('unexpected')):
+            with self.assertRaises(ValueError):
+                self._workflow._run_migration_job(self._kube_config, APP_NAME,
+                                                  DEPLOYMENT)
+        self._client.delete_job.assert_called_once_with(
+            JOB_NAME, self._kube_config)
+
+    def test_update_app_migrates_before_deployment(self):
+        app_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, app_dir)
+        with open(os.path.join(app_dir, APP_NAME + '.yaml'), 'w') as f:
+            yaml.safe_dump_all([DEPLOYMENT], f)
+        self._client.create_kubernetes_configuration.return_value = (
+            self._kube_config)
+        calls = []
+        self._client.create_job.side_effect = (
+            lambda *args: calls.append('create_job'))
+        self._client.update_deployment.side_effect = (
+            lambda *args: calls.append('update_deployment'))
+        self._client.list_job_pods.return_value = [
+            _pod('pod', [('mysite-app', _terminated(0))])
+        ]
+        with mock.patch.object(self._workflow, '_wait_for_deployment_ready'), \
+                mock.patch.object(self._workflow, '_get_ingress_url',
+                                  return_value='http://1.2.3.4/'):
+            url = self._workflow.update_app_sync(
+                'project',
+                'cluster',
+                app_dir,
+                APP_NAME,
+                'gcr.io/project/mysite',
+                location='us-west1',
+                migrate_in_cluster=True,
+                lock_timeout='5s')
+        self.assertEqual(url, 'http://1.2.3.4/')
+        self.assertEqual(calls, ['create_job', 'update_deployment'])
+        job = self._client.create_job.call_args[0][0]
+        self.assertIn('lock_timeout=5s', str(job))
+
+    def test_update_app_without_migration(self):
+        app_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, app_dir)
+        with open(os.path.join(app_dir, APP_NAME + '.yaml'), 'w') as f:
+            yaml.safe_dump_all([DEPLOYMENT], f)
+        with mock.patch.object(self._workflow, '_wait_for_deployment_ready'), \
+                mock.patch.object(self._workflow, '_get_ingress_url'):
+            self._workflow.update_app_sync('project', 'cluster', app_dir,
+                                           APP_NAME, 'gcr.io/project/mysite')
+        self.assertFalse(self._client.create_job.called)
+        self.assertTrue(self._client.update_deployment.called)
+
+
+if __name__ == '__main__':
+    absltest.main()
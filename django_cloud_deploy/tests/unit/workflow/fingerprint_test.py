@@ -0,0 +1,91 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit test for django_cloud_deploy/workflow/_fingerprint.py."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from django_cloud_deploy.workflow import _fingerprint
+
+
+class FingerprintTest(unittest.TestCase):
+    """Unit test for django_cloud_deploy/workflow/_fingerprint.py."""
+
+    def setUp(self):
+        self._project_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._project_dir)
+        self._write('manage.py', 'import django')
+        self._write('requirements.txt', 'Django==2.1')
+        self._write(os.path.join('polls', 'models.py'), 'class Poll: pass')
+        self._write(
+            os.path.join('polls', 'migrations', '0001_initial.py'), 'ops = []')
+        self._write(os.path.join('polls', 'views.py'), 'def index(): pass')
+
+    def _write(self, relative_path, content):
+        path = os.path.join(self._project_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_fingerprints_are_stable(self):
+        self.assertEqual(
+            _fingerprint.migrations_fingerprint(self._project_dir),
+            _fingerprint.migrations_fingerprint(self._project_dir))
+        self.assertEqual(
+            _fingerprint.build_context_fingerprint(self._project_dir),
+            _fingerprint.build_context_fingerprint(self._project_dir))
+
+    def test_view_change_does_not_change_migrations(self):
+        migrations = _fingerprint.migrations_fingerprint(self._project_dir)
+        build_context = _fingerprint.build_context_fingerprint(
+            self._project_dir)
+        self._write(os.path.join('polls', 'views.py'), 'def index(): return')
+        self.assertEqual(
+            _fingerprint.migrations_fingerprint(self._project_dir), migrations)
+        self.assertNotEqual(
+            _fingerprint.build_context_fingerprint(self._project_dir),
+            build_context)
+
+    def test_new_migration_changes_migrations(self):
+        migrations = _fingerprint.migrations_fingerprint(self._project_dir)
+        self._write(
+            os.path.join('polls', 'migrations', '0002_poll_name.py'),
+            'ops = []')
+        self.assertNotEqual(
+            _fingerprint.migrations_fingerprint(self._project_dir), migrations)
+
+    def test_generated_files_are_not_in_build_context(self):
+        build_context = _fingerprint.build_context_fingerprint(
+            self._project_dir)
+        self._write('.config.yaml', 'project_id: fake')
+        self._write(os.path.join('static', 'admin', 'base.css'), 'body {}')
+        self._write(
+            os.path.join('polls', '__pycache__', 'views.cpython-36.pyc'), '')
+        self.assertEqual(
+            _fingerprint.build_context_fingerprint(self._project_dir),
+            build_context)
+
+    def test_requirements(self):
+        requirements = _fingerprint.requirements_fingerprint(
+            self._project_dir)
+        self._write('requirements.txt', 'Django==2.1\ngunicorn==19.9.0')
+        self.assertNotEqual(
+            _fingerprint.requirements_fingerprint(self._project_dir),
+            requirements)
+
+
+if __name__ == '__main__':
+    unittest.main()
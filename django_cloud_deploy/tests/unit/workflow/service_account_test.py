@@ -0,0 +1,94 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for django_cloud_deploy.workflow._service_account."""
+
+from unittest import mock
+
+from absl.testing import absltest
+
+from django_cloud_deploy.cloudlib import service_account
+from django_cloud_deploy.tests.unit.cloudlib import service_account_test
+from django_cloud_deploy.workflow import _service_account
+
+PROJECT_ID = service_account_test.PROJECT_ID
+
+
+class ServiceAccountKeyGenerationWorkflowTest(absltest.TestCase):
+    """Tests for _service_account.ServiceAccountKeyGenerationWorkflow."""
+
+    def setUp(self):
+        self._iam_service_fake = service_account_test.IamServiceFake()
+        self._cloudresourcemanager_fake = (
+            service_account_test.CloudResourceManagerFake())
+        client = service_account.ServiceAccountClient(
+            self._iam_service_fake, self._cloudresourcemanager_fake)
+        with mock.patch.object(
+                service_account.ServiceAccountClient,
+                'from_credentials',
+                return_value=client):
+            self._workflow = (
+                _service_account.ServiceAccountKeyGenerationWorkflow(
+                    mock.Mock()))
+        self._service_accounts = [{
+            'id': 'account-{}'.format(i),
+            'name': 'Account {}'.format(i),
+            'roles': ['roles/role-{}'.format(i)]
+        } for i in range(5)]
+
+    def test_create_service_accounts_and_keys(self):
+        created = []
+        keys = self._workflow.create_service_accounts_and_keys(
+            PROJECT_ID,
+            self._service_accounts,
+            existing_service_account_ids=['account-0'],
+            on_created=created.append)
+
+        self.assertCountEqual(
+            keys, ['account-{}'.format(i) for i in range(5)])
+        self.assertCountEqual(created,
+                              ['account-{}'.format(i) for i in range(1, 5)])
+        projects_fake = self._cloudresourcemanager_fake.projects_fake
+        self.assertEqual(projects_fake.set_iam_policy_count, 1)
+        roles = [b['role'] for b in projects_fake.iam_policy['bindings']]
+        for i in range(5):
+            self.assertIn('roles/role-{}'.format(i), roles)
+
+    def test_existing_service_account_reused(self):
+        service_accounts = [{
+            'id': service_account_test.SERVICE,
+            'name': 'Existing',
+            'roles': ['roles/existing']
+        }]
+        created = []
+        keys = self._workflow.create_service_accounts_and_keys(
+            PROJECT_ID, service_accounts, on_created=created.append)
+
+        self.assertIn(service_account_test.SERVICE, keys)
+        self.assertEqual(created, [])
+
+    def test_no_roles_granted_on_failure(self):
+        service_accounts = self._service_accounts + [{
+            'id': 'invalid',
+            'name': 'Invalid',
+            'roles': ['roles/invalid']
+        }]
+        with self.assertRaises(service_account.ServiceAccountCreationError):
+            self._workflow.create_service_accounts_and_keys(
+                PROJECT_ID, service_accounts)
+        projects_fake = self._cloudresourcemanager_fake.projects_fake
+        self.assertEqual(projects_fake.set_iam_policy_count, 0)
+
+
+if __name__ == '__main__':
+    absltest.main()
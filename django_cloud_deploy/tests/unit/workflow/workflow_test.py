@@ -0,0 +1,81 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the helpers of django_cloud_deploy.workflow.WorkflowManager."""
+
+import threading
+import time
+
+from absl.testing import absltest
+from django_cloud_deploy import cancellation
+from django_cloud_deploy import workflow
+
+
+class RunInBackgroundTest(absltest.TestCase):
+    """Tests for WorkflowManager._run_in_background."""
+
+    def setUp(self):
+        self.addCleanup(cancellation.reset)
+
+    def test_result(self):
+        with workflow.WorkflowManager._run_in_background(lambda: 42) as f:
+            self.assertEqual(f.result(), 42)
+
+    def test_no_function(self):
+        with workflow.WorkflowManager._run_in_background(None) as f:
+            self.assertIsNone(f)
+
+    def test_error_logged_when_block_fails(self):
+
+        def fail():
+            raise ValueError('background failure')
+
+        with self.assertLogs(level='ERROR') as logs:
+            with self.assertRaises(RuntimeError):
+                with workflow.WorkflowManager._run_in_background(fail) as f:
+                    f.exception()  # Wait for the function to fail.
+                    raise RuntimeError('block failure')
+        self.assertIn('background failure', logs.output[0])
+
+    def test_block_failure_does_not_wait(self):
+        started = threading.Event()
+
+        def poll():
+            started.set()
+            cancellation.sleep(600)
+
+        start = time.monotonic()
+        with self.assertRaises(RuntimeError):
+            with workflow.WorkflowManager._run_in_background(poll) as f:
+                started.wait()
+                raise RuntimeError('block failure')
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertIsInstance(f.exception(timeout=10),
+                              cancellation.CancelledError)
+
+    def test_cancelled_on_interrupt(self):
+        started = threading.Event()
+
+        def wait_for_cancel():
+            started.set()
+            cancellation.sleep(60)
+
+        with self.assertRaises(KeyboardInterrupt):
+            with workflow.WorkflowManager._run_in_background(wait_for_cancel):
+                started.wait()
+                raise KeyboardInterrupt()
+        self.assertTrue(cancellation.is_cancelled())
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -14,14 +14,17 @@
 
 """Checks the user has the necessary requirements to run the tool."""
 
+from concurrent import futures
 import getpass
 import grp
+import json
 import os
 import shutil
+import socket
 import subprocess
 import sys
 
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
 from django_cloud_deploy.cli import io
 
@@ -62,9 +65,18 @@ class MissingRequirementError(Exception):
         self.how_to_install_message = how_to_install_message
 
 
+# Results of successful checks, so that later runs can skip them. See
+# _check_with_cache.
+_CACHE_PATH = '~/.config/django_cloud/tool_requirements.json'
+
+
 class Requirement(object):
     """Base class for all requirements the tool needs to run."""
 
+    # Name of the executable the requirement is about. Successful checks of
+    # requirements with an executable are cached until the executable changes.
+    BINARY = None
+
     @classmethod
     def check(cls):
         """Checks if the requirement is installed.
@@ -74,6 +86,19 @@ class Requirement(object):
         """
         raise NotImplementedError
 
+    @classmethod
+    def check_cached(cls):
+        """Checks what a cached successful "check" does not cover.
+
+        Called instead of "check" while the cached result is valid. The cache
+        only covers the executable, so requirements that also depend on
+        something else (e.g. a running server) must check it here, without
+        spawning processes.
+
+        Raises:
+            MissingRequirementError: If the requirement is not satisfied.
+        """
+
     @classmethod
     def handle(cls, console: io.IO):
         """Attempts to install the requirement.
@@ -100,16 +125,34 @@ class Requirement(object):
         try:
             cls.check()
         except MissingRequirementError as missing_requirement_error:
-            try:
-                cls.handle(console)
-            except UnableToAutomaticallyInstallError as e:
-                raise MissingRequirementError(e.name, e.how_to_install_message)
-            except NotImplementedError:
-                raise missing_requirement_error
+            cls.handle_missing(console, missing_requirement_error)
+
+    @classmethod
+    def handle_missing(cls, console: io.IO,
+                       missing_requirement_error: MissingRequirementError):
+        """Attempts to install the requirement after its check failed.
+
+        If unsuccessful, provides information on how to manually install.
+
+        Args:
+            console: Handles the input/output with the user.
+            missing_requirement_error: The error raised by "check".
+
+        Raises:
+            MissingRequirementError: If the requirement needs to be
+                installed manually.
+        """
+        try:
+            cls.handle(console)
+        except UnableToAutomaticallyInstallError as e:
+            raise MissingRequirementError(e.name, e.how_to_install_message)
+        except NotImplementedError:
+            raise missing_requirement_error
 
 
 class Gcloud(Requirement):
     NAME = 'Gcloud SDK'
+    BINARY = 'gcloud'
 
     _NOT_INSTALLED = (
         'The Google Cloud SDK is not installed.\n\n'
@@ -151,6 +194,7 @@ class Gcloud(Requirement):
 
 class Docker(Requirement):
     NAME = 'Docker'
+    BINARY = 'docker'
 
     _NOT_INSTALLED = (
         'Docker is not installed.\n\n'
@@ -214,36 +258,100 @@ class Docker(Requirement):
             raise MissingRequirementError(cls.NAME, cls._NOT_INSTALLED)
 
         if not cls._is_usable():
-            # Docker is installed but not useable. There are many possible
-            # causes e.g. the docker server is not running, the user does not
-            # have permissions to access the docker server. Try to narrow down
-            # the cause as much as possible and display a helpful error message.
-            if sys.platform.startswith('linux'):
-                if cls._is_missing_group_membership():
-                    # Docker is installed and there is a 'docker' group in the
-                    # UNIX group database but the user isn't part of that group.
-                    # By default, the user has to either run docker as root
-                    # or be a member of that group.
-                    raise MissingRequirementError(
-                        cls.NAME,
-                        cls._LINUX_NOT_IN_GROUP_MESSAGE)
-                else:
-                    raise MissingRequirementError(
-                        cls.NAME,
-                        cls._LINUX_GENERIC_NOT_USABLE_MESSAGE)
-            elif sys.platform.startswith('darwin'):
+            cls._raise_not_usable()
+
+    @classmethod
+    def check_cached(cls):
+        """Checks that the Docker daemon is reachable.
+
+        Connects to the daemon socket rather than running docker, so that it
+        stays cheap. Falls back to "check" for daemon addresses it does not
+        know how to connect to.
+
+        Raises:
+            MissingRequirementError: If the daemon is not reachable.
+        """
+        reachable = cls._is_daemon_reachable()
+        if reachable is None:
+            cls.check()
+        elif not reachable:
+            cls._raise_not_usable()
+
+    @staticmethod
+    def _is_daemon_reachable() -> Optional[bool]:
+        """Returns whether the Docker daemon accepts connections.
+
+        Returns:
+            True if the daemon accepts connections, False if it does not and
+            None if its address is not a UNIX socket or TCP address.
+        """
+        if sys.platform.startswith('win32'):
+            default_host = 'npipe:////./pipe/docker_engine'
+        else:
+            default_host = 'unix:///var/run/docker.sock'
+        host = os.environ.get('DOCKER_HOST') or default_host
+        if host.startswith('unix://'):
+            family = socket.AF_UNIX
+            address = host[len('unix://'):]
+        elif host.startswith('tcp://'):
+            family = socket.AF_INET
+            hostname, _, port = host[len('tcp://'):].partition(':')
+            try:
+                address = (hostname, int(port.rstrip('/')))
+            except ValueError:
+                return None
+        else:
+            return None
+
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(1)
+        try:
+            sock.connect(address)
+        except OSError:
+            return False
+        finally:
+            sock.close()
+        return True
+
+    @classmethod
+    def _raise_not_usable(cls):
+        """Raises an error explaining why installed Docker is not useable.
+
+        Raises:
+            MissingRequirementError: Always.
+        """
+        # Docker is installed but not useable. There are many possible
+        # causes e.g. the docker server is not running, the user does not
+        # have permissions to access the docker server. Try to narrow down
+        # the cause as much as possible and display a helpful error message.
+        if sys.platform.startswith('linux'):
+            if cls._is_missing_group_membership():
+                # Docker is installed and there is a 'docker' group in the
+                # UNIX group database but the user isn't part of that group.
+                # By default, the user has to either run docker as root
+                # or be a member of that group.
                 raise MissingRequirementError(
                     cls.NAME,
-                    cls._MAC_GENERIC_NOT_USABLE_MESSAGE)
-            elif sys.platform.startswith('win32'):
+                    cls._LINUX_NOT_IN_GROUP_MESSAGE)
+            else:
                 raise MissingRequirementError(
                     cls.NAME,
-                    cls._WINDOWS_GENERIC_NOT_USABLE_MESSAGE)
-
+                    cls._LINUX_GENERIC_NOT_USABLE_MESSAGE)
+        elif sys.platform.startswith('darwin'):
+            raise MissingRequirementError(
+                cls.NAME,
+                cls._MAC_GENERIC_NOT_USABLE_MESSAGE)
+        elif sys.platform.startswith('win32'):
+            raise MissingRequirementError(
+                cls.NAME,
+                cls._WINDOWS_GENERIC_NOT_USABLE_MESSAGE)
+        raise MissingRequirementError(cls.NAME,
+                                      cls._LINUX_GENERIC_NOT_USABLE_MESSAGE)
 
 
 class CloudSqlProxy(Requirement):
     NAME = 'Cloud SQL Proxy'
+    BINARY = 'cloud_sql_proxy'
 
     _NOT_INSTALLED = (
         'Cloud SQL Proxy is not installed.\n\n'
@@ -319,10 +427,81 @@ def check_and_handle_requirements(console: io.IO, backend: str) -> bool:
     Returns:
         True if all requirements have been satisfied, False otherwise.
     """
-    for req in _REQUIREMENTS[backend]:
+    requirements = _REQUIREMENTS[backend]
+    cache = _load_cache()
+    # Checks spawn subprocesses, so they run concurrently. Missing
+    # requirements are handled one by one afterwards because handling them
+    # may prompt the user.
+    with futures.ThreadPoolExecutor(max_workers=len(requirements)) as executor:
+        results = list(
+            executor.map(lambda req: _check_with_cache(req, cache),
+                         requirements))
+
+    satisfied = {}
+    for req, (error, cache_entry) in zip(requirements, results):
+        if cache_entry:
+            satisfied[req.NAME] = cache_entry
+        if error is None:
+            continue
         try:
-            req.check_and_handle(console)
+            req.handle_missing(console, error)
         except MissingRequirementError as e:
             console.error(e.how_to_install_message)
             return False
+    if satisfied:
+        cache.update(satisfied)
+        _save_cache(cache)
     return True
+
+
+def _check_with_cache(
+        req: Requirement, cache: Dict[str, Any]
+) -> Tuple[Optional[MissingRequirementError], Optional[Dict[str, Any]]]:
+    """Checks a requirement unless an earlier check of it is still valid.
+
+    A successful check is valid as long as the executable of the requirement
+    has the same path and modification time. While it is, only the cheap
+    "check_cached" of the requirement runs, for what does not depend on the
+    executable.
+
+    Args:
+        req: The requirement to check.
+        cache: Results of earlier successful checks, by requirement name.
+
+    Returns:
+        The error raised by the check, or None if the requirement is
+        satisfied, and the cache entry to record for the requirement, or None
+        if nothing should be recorded.
+    """
+    path = shutil.which(req.BINARY) if req.BINARY else None
+    cache_entry = None
+    if path:
+        cache_entry = {'path': path, 'mtime': os.path.getmtime(path)}
+    try:
+        if cache_entry and cache.get(req.NAME) == cache_entry:
+            req.check_cached()
+            return None, None
+        req.check()
+    except MissingRequirementError as e:
+        return e, None
+    return None, cache_entry
+
+
+def _load_cache() -> Dict[str, Any]:
+    try:
+        with open(os.path.expanduser(_CACHE_PATH)) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_cache(cache: Dict[str, Any]):
+    cache_path = os.path.expanduser(_CACHE_PATH)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w') as cache_file:
+            json.dump(cache, cache_file)
+    except OSError:
+        # The cache only saves time; failing to write it is not an error.
+        pass
@@ -0,0 +1,271 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Timing and tracing of workflow steps and Google Cloud API calls.
+
+Spans are only recorded after "enable" is called. They can be written as a
+Chrome trace file, which can be opened with chrome://tracing or
+https://ui.perfetto.dev, and can be forwarded to OpenTelemetry when the
+"opentelemetry-api" package is installed.
+
+Usage:
+    tracing.enable()
+    with tracing.span('Create GCP Project', category='workflow'):
+        ...
+    tracing.export_chrome_trace('trace.json')
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List
+import urllib.parse
+
+from googleapiclient import errors
+from googleapiclient import http
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+class TracingError(Exception):
+    """An error occurred while setting up tracing."""
+
+
+class Span(object):
+    """A timed operation with attributes.
+
+    Attributes:
+        name: Name of the operation, e.g. "storage.objects.insert".
+        category: Kind of the operation, e.g. "workflow" or "api".
+        attributes: Details of the operation, e.g. {'http.status': 200}.
+        start_time: Wall clock time when the span started, in seconds since
+            the epoch.
+        duration: How long the operation took in seconds. None if the span
+            is not finished.
+        thread_id: Identifier of the thread the span ran in.
+    """
+
+    def __init__(self, name: str, category: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.duration = None
+        self.thread_id = threading.get_ident()
+        self._start_counter = time.perf_counter()
+        self._otel_span = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+    def end(self):
+        self.duration = time.perf_counter() - self._start_counter
+        if self._otel_span is not None:
+            self._otel_span.end()
+
+
+class _NoopSpan(object):
+    """Span returned when tracing is disabled."""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer(object):
+    """Records spans of all threads."""
+
+    def __init__(self):
+        self.enabled = False
+        self._spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._otel_tracer = None
+
+    def enable(self, opentelemetry: bool = False):
+        """Start recording spans.
+
+        Args:
+            opentelemetry: Whether to also report spans to the OpenTelemetry
+                tracer provider configured by the application.
+
+        Raises:
+            TracingError: If "opentelemetry" is set but the
+                "opentelemetry-api" package is not installed.
+        """
+        if opentelemetry:
+            if otel_trace is None:
+                raise TracingError(
+                    'OpenTelemetry is not installed. Install it with '
+                    '"pip install opentelemetry-api opentelemetry-sdk".')
+            self._otel_tracer = otel_trace.get_tracer('django_cloud_deploy')
+        self.enabled = True
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = 'workflow', **attributes):
+        """Record the duration of the enclosed block as a span.
+
+        Args:
+            name: Name of the operation.
+            category: Kind of the operation, e.g. "workflow" or "api".
+            **attributes: Initial attributes of the span.
+
+        Yields:
+            The span, so that attributes can be added while it runs.
+        """
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        current_span = Span(name, category, attributes)
+        stack = self._stack()
+        if self._otel_tracer is not None:
+            context = None
+            if stack and stack[-1]._otel_span is not None:
+                context = otel_trace.set_span_in_context(stack[-1]._otel_span)
+            current_span._otel_span = self._otel_tracer.start_span(
+                name, context=context, attributes=dict(attributes))
+        stack.append(current_span)
+        try:
+            yield current_span
+        except BaseException as e:
+            current_span.set_attribute('error', type(e).__name__)
+            raise
+        finally:
+            stack.pop()
+            current_span.end()
+            with self._lock:
+                self._spans.append(current_span)
+
+    @property
+    def spans(self) -> List[Span]:
+        """Finished spans, in the order they finished."""
+        with self._lock:
+            return list(self._spans)
+
+    def export_chrome_trace(self, path: str):
+        """Write finished spans in the Chrome trace event format.
+
+        See
+        https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+
+        Args:
+            path: Path of the JSON file to write.
+        """
+        pid = os.getpid()
+        events = []
+        for finished_span in self.spans:
+            events.append({
+                'name': finished_span.name,
+                'cat': finished_span.category,
+                'ph': 'X',
+                'ts': int(finished_span.start_time * 1e6),
+                'dur': int(finished_span.duration * 1e6),
+                'pid': pid,
+                'tid': finished_span.thread_id,
+                'args': finished_span.attributes,
+            })
+        with open(os.path.expanduser(path), 'w') as trace_file:
+            json.dump({
+                'traceEvents': events,
+                'displayTimeUnit': 'ms'
+            },
+                      trace_file,
+                      default=str)
+
+
+class TracedHttpRequest(http.HttpRequest):
+    """A googleapiclient request recording a span for each execution.
+
+    Pass it as "requestBuilder" to googleapiclient.discovery.build.
+    """
+
+    def execute(self, http=None, num_retries=0):
+        tracer = get_tracer()
+        if not tracer.enabled:
+            return super().execute(http=http, num_retries=num_retries)
+
+        name = self.methodId or self.method
+        attributes = {
+            'api': name.split('.')[0],
+            'http.method': self.method,
+            'http.url': urllib.parse.urlsplit(self.uri)._replace(
+                query='').geturl(),
+            'request_bytes': len(self.body or b''),
+        }
+        if self.resumable:
+            attributes['request_bytes'] = self.resumable.size()
+        with tracer.span(name, category='api', **attributes) as api_span:
+            retries = [0]
+            sleep = self._sleep
+
+            def count_retry(seconds):
+                retries[0] += 1
+                sleep(seconds)
+
+            def record_response(resp):
+                api_span.set_attribute('http.status', resp.status)
+                if 'content-length' in resp:
+                    api_span.set_attribute('response_bytes',
+                                           int(resp['content-length']))
+
+            # The request may be executed again, e.g. when retried after a
+            # quota error, so the hooks only last for this execution.
+            self._sleep = count_retry
+            self.add_response_callback(record_response)
+            try:
+                return super().execute(http=http, num_retries=num_retries)
+            except errors.HttpError as e:
+                api_span.set_attribute('http.status', e.resp.status)
+                raise
+            finally:
+                self._sleep = sleep
+                self.response_callbacks.remove(record_response)
+                api_span.set_attribute('retries', retries[0])
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Returns the tracer of the process."""
+    return _tracer
+
+
+def enable(opentelemetry: bool = False):
+    """Start recording spans. See Tracer.enable."""
+    _tracer.enable(opentelemetry)
+
+
+def span(name: str, category: str = 'workflow', **attributes):
+    """Record a span with the tracer of the process. See Tracer.span."""
+    return _tracer.span(name, category, **attributes)
+
+
+def export_chrome_trace(path: str):
+    """Write spans recorded in the process. See Tracer.export_chrome_trace."""
+    _tracer.export_chrome_trace(path)
@@ -13,20 +13,27 @@
 # limitations under the License.
 """A module to manage workflow for deployment of Django apps."""
 
+from concurrent import futures
+import contextlib
+import functools
 import json
+import logging
 import os
 import shutil
 import socket
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import webbrowser
 
+from django_cloud_deploy import cancellation
 from django_cloud_deploy import config
+from django_cloud_deploy import tracing
 from django_cloud_deploy.cloudlib import billing
 from django_cloud_deploy.skeleton import source_generator
 from django_cloud_deploy.workflow import _database
 from django_cloud_deploy.workflow import _deploygae
 from django_cloud_deploy.workflow import _deploygke
 from django_cloud_deploy.workflow import _enable_service
+from django_cloud_deploy.workflow import _fingerprint
 from django_cloud_deploy.workflow import _project
 from django_cloud_deploy.workflow import _service_account
 from django_cloud_deploy.workflow import _static_content_serve
@@ -54,6 +61,15 @@ class WorkflowManager(object):
     _TOTAL_NEW_STEPS = 8
     _TOTAL_UPDATE_STEPS = 3
 
+    # Key of the fingerprints of the last successful deployment in the
+    # configuration file. See _fingerprint.
+    _FINGERPRINTS_KEY = 'deployed_fingerprints'
+
+    # Region used by deployments which did not record theirs, and zone of the
+    # zonal clusters they created.
+    _DEFAULT_REGION = 'us-west1'
+    _LEGACY_CLUSTER_ZONE = 'us-west1-a'
+
     def __init__(self, credentials: credentials.Credentials, backend: str):
         self._source_generator = source_generator.DjangoSourceFileGenerator()
         self._billing_client = billing.BillingClient.from_credentials(
@@ -63,7 +79,7 @@ class WorkflowManager(object):
         if backend == 'gke':
             self._deploygke_workflow = _deploygke.DeploygkeWorkflow(credentials)
         else:
-            self._deploygae_workflow = _deploygae.DeploygaeWorkflow()
+            self._deploygae_workflow = _deploygae.DeploygaeWorkflow(credentials)
         self._enable_service_workflow = _enable_service.EnableServiceWorkflow(
             credentials)
         self._service_account_workflow = (
@@ -89,11 +105,19 @@ class WorkflowManager(object):
                 Dict[str, List[Dict[str, Any]]]] = None,
             cloud_storage_bucket_name: str = None,
             region: str = 'us-west1',
+            static_bucket_location: Optional[str] = None,
+            static_cdn: bool = False,
             cloud_sql_proxy_path: str = 'cloud_sql_proxy',
             backend: str = 'gke',
-            open_browser: bool = True):
+            gae_scaling_profile: str = (
+                source_generator.DEFAULT_GAE_SCALING_PROFILE),
+            open_browser: bool = True,
+            resume: bool = False):
         """Workflow of deploying a newly generated Django app to GKE.
 
+        Completed steps and their outputs are recorded in the configuration
+        file of the Django project, so that a failed run can be resumed.
+
         Args:
             project_name: The name of the Google Cloud Platform project.
             project_id: The unique id to use when creating the Google Cloud
@@ -129,15 +153,40 @@ class WorkflowManager(object):
             cloud_storage_bucket_name: Name of the Google Cloud Storage Bucket
                 we use to serve static content. By default it is equal to
                 project id.
-            region: Where the service is hosted.
+            region: Where the service is hosted. The Cloud SQL instance and
+                the GKE cluster are created in this region, and the nodes of
+                the cluster are spread across several zones of it.
+            static_bucket_location: Location of the bucket serving static
+                content, e.g. the "US" multi-region or the "NAM4" dual-region.
+            static_cdn: Whether to serve static content through Cloud CDN.
+                "STATIC_URL" of the deployed project then points at the CDN.
+                Not supported when backend is "gae": the CDN is only served
+                over HTTP and the app.yaml handler serves "/static/".
             cloud_sql_proxy_path: The command to run your cloud sql proxy.
             backend: The desired backend to deploy the Django App on.
+            gae_scaling_profile: Name of the instance class and automatic
+                scaling settings of app.yaml. Only used when backend is "gae".
             open_browser: Whether we open the browser to show the deployed app
                 at the end.
+            resume: Whether to skip the steps completed by a previous run,
+                after checking that the resources they created still exist.
 
         Returns:
             The url of the deployed Django app.
+
+        Raises:
+            ValueError: If static_cdn is set with the "gae" backend.
         """
+        if static_cdn and backend == 'gae':
+            raise ValueError('Cloud CDN is only supported with the "gke" '
+                             'backend.')
+
+        # The journal of completed steps lives in the configuration file of the
+        # Django project, so the directory must exist from the first step on.
+        os.makedirs(django_directory_path, exist_ok=True)
+        journal = config.Configuration(django_directory_path)
+        if not resume:
+            journal.clear_completed_steps()
 
         # A bunch of variables necessary for deployment we hardcode for user.
         database_username = 'postgres'
@@ -152,109 +201,188 @@ class WorkflowManager(object):
             ['gcr.io', project_id, sanitized_django_project_name])
         static_content_dir = os.path.join(django_directory_path, 'static')
 
-        cloud_sql_proxy_port = portpicker.pick_unused_port()
-
-        # TODO: Use progress bar to show status info instead of print statement
-        print(
-            self._generate_section_header(1, 'Create GCP Project',
-                                          self._TOTAL_NEW_STEPS))
-        self._project_workflow.create_project(project_name, project_id,
-                                              project_creation_mode)
-
-        print(
-            self._generate_section_header(2, 'Billing Set Up',
-                                          self._TOTAL_NEW_STEPS))
-        if not self._billing_client.check_billing_enabled(project_id):
-            self._billing_client.enable_project_billing(project_id,
-                                                        billing_account_name)
-
-        print(
-            self._generate_section_header(3, 'Django Source Generation',
-                                          self._TOTAL_NEW_STEPS))
-
-        # Source generation requires service account ids.
-        required_service_accounts = (
-            required_service_accounts or
-            self._service_account_workflow.load_service_accounts())
-        cloud_sql_secrets, django_secrets = self._load_secret_names(
-            required_service_accounts)
-        self._source_generator.generate_all_source_files(
-            project_id=project_id,
-            project_name=django_project_name,
-            app_name=django_app_name,
-            project_dir=django_directory_path,
-            database_user=database_username,
-            database_password=database_password,
-            instance_name=database_instance_name,
-            database_name=database_name,
-            cloud_sql_proxy_port=cloud_sql_proxy_port,
-            cloud_storage_bucket_name=cloud_storage_bucket_name,
-            cloudsql_secrets=cloud_sql_secrets,
-            django_secrets=django_secrets,
-            image_tag=image_name)
-
-        print(
-            self._generate_section_header(
-                4, 'Database Set Up (Take Up To 5 Minutes)',
-                self._TOTAL_NEW_STEPS))
-        self._database_workflow.create_and_setup_database(
-            project_id=project_id,
-            instance_name=database_instance_name,
-            database_name=database_name,
-            database_password=database_password,
-            superuser_name=django_superuser_name,
-            superuser_email=django_superuser_email,
-            superuser_password=django_superuser_password,
-            database_user=database_username,
-            cloud_sql_proxy_path=cloud_sql_proxy_path,
-            region=region,
-            port=cloud_sql_proxy_port)
-
-        print(
-            self._generate_section_header(5, 'Enable Services',
-                                          self._TOTAL_NEW_STEPS))
-        if required_services is None:
-            required_services = self._enable_service_workflow.load_services()
-        self._enable_service_workflow.enable_required_services(
-            project_id, required_services)
-
-        print(
-            self._generate_section_header(
+        # The port is part of the generated settings, so it must not change
+        # when source generation is skipped.
+        source_outputs = journal.get_completed_step('source_generation') or {}
+        cloud_sql_proxy_port = (source_outputs.get('cloud_sql_proxy_port') or
+                                portpicker.pick_unused_port())
+
+        with self._workflow_step(1, 'Create GCP Project',
+                                 self._TOTAL_NEW_STEPS):
+            if resume and journal.get_completed_step('project'):
+                # The previous run created the project. Only check that it
+                # still exists and make it the active project.
+                project_creation_mode = ProjectCreationMode.MUST_EXIST
+            self._project_workflow.create_project(project_name, project_id,
+                                                  project_creation_mode)
+            journal.complete_step('project', {'project_id': project_id})
+
+        with self._workflow_step(2, 'Billing Set Up', self._TOTAL_NEW_STEPS):
+            if not self._billing_client.check_billing_enabled(project_id):
+                self._billing_client.enable_project_billing(
+                    project_id, billing_account_name)
+
+        # Enabling services takes minutes but only needs the project and its
+        # billing, so it runs in the background while the source files are
+        # generated and the database is set up. Step 5 waits for it.
+        enable_services = None
+        if not resume or journal.get_completed_step('enable_services') is None:
+            if required_services is None:
+                required_services = (
+                    self._enable_service_workflow.load_services())
+            enable_services = functools.partial(
+                self._enable_service_workflow.enable_required_services,
+                project_id, required_services)
+
+        with self._run_in_background(enable_services) as enable_services_future:
+            with self._workflow_step(3, 'Django Source Generation',
+                                     self._TOTAL_NEW_STEPS):
+                # Source generation requires service account ids.
+                required_service_accounts = (
+                    required_service_accounts or
+                    self._service_account_workflow.load_service_accounts())
+                cloud_sql_secrets, django_secrets = self._load_secret_names(
+                    required_service_accounts)
+                if self._is_step_resumable(
+                        journal, resume, 'source_generation',
+                        lambda: os.path.exists(
+                            os.path.join(django_directory_path, 'manage.py'))):
+                    self._source_generator.setup_django_environment(
+                        django_directory_path, django_project_name,
+                        database_username, database_password,
+                        cloud_sql_proxy_port)
+                else:
+                    self._source_generator.generate_all_source_files(
+                        project_id=project_id,
+                        project_name=django_project_name,
+                        app_name=django_app_name,
+                        project_dir=django_directory_path,
+                        database_user=database_username,
+                        database_password=database_password,
+                        instance_name=database_instance_name,
+                        database_name=database_name,
+                        cloud_sql_proxy_port=cloud_sql_proxy_port,
+                        cloud_storage_bucket_name=cloud_storage_bucket_name,
+                        cloudsql_secrets=cloud_sql_secrets,
+                        django_secrets=django_secrets,
+                        image_tag=image_name,
+                        gae_scaling_profile=gae_scaling_profile)
+                    # Source generation deletes all files in the project
+                    # directory, including the configuration file. Recording
+                    # the step saves the journal again.
+                    journal.complete_step(
+                        'source_generation', {
+                            'project_dir': django_directory_path,
+                            'cloud_sql_proxy_port': cloud_sql_proxy_port
+                        })
+
+            with self._workflow_step(
+                    4, 'Database Set Up (Take Up To 5 Minutes)',
+                    self._TOTAL_NEW_STEPS):
+                if not self._is_step_resumable(
+                        journal, resume, 'database',
+                        lambda: self._database_workflow.instance_exists(
+                            project_id, database_instance_name)):
+                    self._database_workflow.create_and_setup_database(
+                        project_id=project_id,
+                        instance_name=database_instance_name,
+                        database_name=database_name,
+                        database_password=database_password,
+                        superuser_name=django_superuser_name,
+                        superuser_email=django_superuser_email,
+                        superuser_password=django_superuser_password,
+                        database_user=database_username,
+                        cloud_sql_proxy_path=cloud_sql_proxy_path,
+                        region=region,
+                        port=cloud_sql_proxy_port)
+                    journal.complete_step('database', {
+                        'instance_name': database_instance_name,
+                        'database_name': database_name
+                    })
+
+            with self._workflow_step(5, 'Enable Services',
+                                     self._TOTAL_NEW_STEPS):
+                # Enabling a service is idempotent, so there is nothing to
+                # check.
+                if enable_services_future is None:
+                    print('Skipping, already completed by a previous run.')
+                else:
+                    enable_services_future.result()
+                    journal.complete_step('enable_services')
+
+        with self._workflow_step(
                 6, 'Static Content Serve Set Up (Take Up To 5 Minutes)',
-                self._TOTAL_NEW_STEPS))
-        self._static_content_workflow.serve_static_content(
-            project_id, cloud_storage_bucket_name, static_content_dir)
-
-        print(
-            self._generate_section_header(
+                self._TOTAL_NEW_STEPS):
+            if not self._is_step_resumable(
+                    journal, resume, 'static_content',
+                    lambda: self._static_content_workflow.bucket_exists(
+                        cloud_storage_bucket_name)):
+                static_url = self._static_content_workflow.serve_static_content(
+                    project_id,
+                    cloud_storage_bucket_name,
+                    static_content_dir,
+                    bucket_location=static_bucket_location,
+                    enable_cdn=static_cdn)
+                if static_url:
+                    # The settings are built into the image deployed in
+                    # step 8.
+                    self._source_generator.set_static_url(
+                        django_directory_path, django_project_name,
+                        static_url)
+                journal.complete_step('static_content', {
+                    'bucket_name': cloud_storage_bucket_name,
+                    'static_url': static_url
+                })
+
+        with self._workflow_step(
                 7, 'Create Service Account Necessary For Deployment',
-                self._TOTAL_NEW_STEPS))
-        secrets = self._generate_secrets(project_id, database_username,
-                                         database_password,
-                                         required_service_accounts)
+                self._TOTAL_NEW_STEPS):
+            # Service account keys are secrets and never written to the
+            # journal, so this step always runs. Service accounts created by a
+            # previous run only get a new key.
+            secrets = self._generate_secrets(project_id, database_username,
+                                             database_password,
+                                             required_service_accounts, journal)
 
         if backend == 'gke':
-            print(
-                self._generate_section_header(
-                    8, 'Deployment (Take Up To 20 Minutes)',
-                    self._TOTAL_NEW_STEPS))
-            app_url = self._deploygke_workflow.deploy_new_app_sync(
-                project_id, cluster_name, django_directory_path,
-                django_project_name, image_name, secrets)
+            with self._workflow_step(8, 'Deployment (Take Up To 20 Minutes)',
+                                     self._TOTAL_NEW_STEPS):
+                app_url = self._deploygke_workflow.deploy_new_app_sync(
+                    project_id,
+                    cluster_name,
+                    django_directory_path,
+                    django_project_name,
+                    image_name,
+                    secrets,
+                    region=region,
+                    journal=journal,
+                    resume=resume)
         else:
             self._upload_secrets_to_bucket(project_id, secrets)
-            print(
-                self._generate_section_header(
-                    8, 'Deployment (Take Up To 5 Minutes)',
-                    self._TOTAL_NEW_STEPS))
-            app_url = self._deploygae_workflow.deploy_gae_app(
-                project_id, django_directory_path)
+            with self._workflow_step(8, 'Deployment (Take Up To 5 Minutes)',
+                                     self._TOTAL_NEW_STEPS):
+                app_url = self._deploygae_workflow.deploy_gae_app(
+                    project_id, django_directory_path)
+        journal.complete_step('deployment', {'app_url': app_url})
+        if backend == 'gke':
+            self._record_fingerprints(
+                journal,
+                migrations=_fingerprint.migrations_fingerprint(
+                    django_directory_path),
+                static=_fingerprint.static_fingerprint(),
+                build_context=_fingerprint.build_context_fingerprint(
+                    django_directory_path),
+                requirements=_fingerprint.requirements_fingerprint(
+                    django_directory_path),
+                app_url=app_url)
 
         # Create configuration file to save information needed in "update"
         # command.
         attributes = {
             'project_id': project_id,
-            'django_project_name': django_project_name
+            'django_project_name': django_project_name,
+            'region': region,
+            'static_cdn': static_cdn
         }
         self._save_config(django_directory_path, attributes)
         print('Your app is running at {}.'.format(app_url))
@@ -267,33 +395,49 @@ class WorkflowManager(object):
                        django_directory_path: str,
                        database_password: str,
                        cloud_sql_proxy_path: str = 'cloud_sql_proxy',
-                       region: str = 'us-west1',
-                       open_browser: bool = True):
+                       region: Optional[str] = None,
+                       open_browser: bool = True,
+                       migrate_in_cluster: bool = False,
+                       lock_timeout: Optional[str] = None,
+                       statement_timeout: Optional[str] = None,
+                       force: bool = False):
         """Workflow of updating a deployed Django app on GKE.
 
+        Each step is skipped when the fingerprint of its inputs matches the
+        one recorded at the last successful deployment: migration files and
+        models for the database migration, static files for the static content
+        update, the docker build context and requirements for the deployment.
+
         Args:
             django_directory_path: The location where the generated Django
                 project code should be stored.
             database_password: The password for the default database user.
             cloud_sql_proxy_path: The command to run your cloud sql proxy.
-            region: Where the service is hosted.
+            region: Where the service is hosted. By default the region the
+                project was deployed to.
             open_browser: Whether we open the browser to show the deployed app
                 at the end.
+            migrate_in_cluster: Whether to apply database migrations with a
+                Kubernetes Job inside the cluster instead of through a local
+                cloud sql proxy.
+            lock_timeout: Postgres "lock_timeout" to use while migrating, e.g.
+                "5s".
+            statement_timeout: Postgres "statement_timeout" to use while
+                migrating, e.g. "10min".
+            force: Whether to run all steps, even those whose inputs did not
+                change since the last deployment.
+
+        Returns:
+            The url of the deployed Django app.
 
         Raises:
             InvalidConfigError: When failed to read required information in the
                 configuration file.
         """
 
-        config_obj = config.Configuration(django_directory_path)
-        project_id = config_obj.get('project_id')
-        django_project_name = config_obj.get('django_project_name')
+        project_id, django_project_name = self._load_project_config(
+            django_directory_path)
         cloud_sql_proxy_port = portpicker.pick_unused_port()
-        if not project_id or not django_project_name:
-            raise InvalidConfigError(
-                'Configuration file in [{}] does not contain enough '
-                'information to update a Django project.'.format(
-                    django_directory_path))
 
         # A bunch of variables necessary for deployment we hardcode for user.
         database_username = 'postgres'
@@ -308,31 +452,182 @@ class WorkflowManager(object):
         self._source_generator.setup_django_environment(
             django_directory_path, django_project_name, database_username,
             database_password, cloud_sql_proxy_port)
-        print(
-            self._generate_section_header(1, 'Database Migration',
-                                          self._TOTAL_UPDATE_STEPS))
-        self._database_workflow.migrate_database(
+        config_obj = config.Configuration(django_directory_path)
+        region = region or config_obj.get('region') or self._DEFAULT_REGION
+        # Deployments made before clusters became regional recorded the zone
+        # of their cluster.
+        cluster_outputs = config_obj.get_completed_step('cluster') or {}
+        cluster_location = (cluster_outputs.get('location') or
+                            cluster_outputs.get('zone') or
+                            self._LEGACY_CLUSTER_ZONE)
+        deployed = {} if force else (
+            config_obj.get(self._FINGERPRINTS_KEY) or {})
+        migrations = _fingerprint.migrations_fingerprint(django_directory_path)
+        migrations_changed = deployed.get('migrations') != migrations
+
+        with self._workflow_step(1, 'Database Migration',
+                                 self._TOTAL_UPDATE_STEPS):
+            if not migrations_changed:
+                print('No changes since the last deployment, skipping.')
+            elif migrate_in_cluster:
+                # Migration files are generated locally so that they are
+                # included in the new image. They are applied in step 3.
+                self._database_workflow.make_migrations(
+                    project_id=project_id,
+                    instance_name=database_instance_name,
+                    cloud_sql_proxy_path=cloud_sql_proxy_path,
+                    region=region,
+                    port=cloud_sql_proxy_port)
+            else:
+                self._database_workflow.migrate_database(
+                    project_id=project_id,
+                    instance_name=database_instance_name,
+                    cloud_sql_proxy_path=cloud_sql_proxy_path,
+                    region=region,
+                    port=cloud_sql_proxy_port,
+                    lock_timeout=lock_timeout,
+                    statement_timeout=statement_timeout)
+                # "migrate_database" runs "makemigrations", which may have
+                # generated new migration files.
+                self._record_fingerprints(
+                    config_obj,
+                    migrations=_fingerprint.migrations_fingerprint(
+                        django_directory_path))
+
+        with self._workflow_step(2, 'Static Content Update',
+                                 self._TOTAL_UPDATE_STEPS):
+            static = _fingerprint.static_fingerprint()
+            if deployed.get('static') == static:
+                print('No changes since the last deployment, skipping.')
+            else:
+                self._static_content_workflow.update_static_content(
+                    cloud_storage_bucket_name, static_content_dir)
+                if config_obj.get('static_cdn'):
+                    self._static_content_workflow.invalidate_cdn_cache(
+                        project_id, cloud_storage_bucket_name)
+                self._record_fingerprints(config_obj, static=static)
+
+        with self._workflow_step(3, 'Update Deployment',
+                                 self._TOTAL_UPDATE_STEPS):
+            # Computed after step 1, which may have generated new migration
+            # files.
+            build_context = _fingerprint.build_context_fingerprint(
+                django_directory_path)
+            requirements = _fingerprint.requirements_fingerprint(
+                django_directory_path)
+            if (deployed.get('build_context') == build_context and
+                    deployed.get('requirements') == requirements and
+                    deployed.get('app_url')):
+                print('No changes since the last deployment, skipping.')
+                app_url = deployed['app_url']
+            else:
+                app_url = self._deploygke_workflow.update_app_sync(
+                    project_id,
+                    cluster_name,
+                    django_directory_path,
+                    django_project_name,
+                    image_name,
+                    location=cluster_location,
+                    migrate_in_cluster=(migrate_in_cluster and
+                                        migrations_changed),
+                    lock_timeout=lock_timeout,
+                    statement_timeout=statement_timeout)
+                fingerprints = {
+                    'build_context': build_context,
+                    'requirements': requirements,
+                    'app_url': app_url
+                }
+                if migrate_in_cluster and migrations_changed:
+                    fingerprints['migrations'] = (
+                        _fingerprint.migrations_fingerprint(
+                            django_directory_path))
+                self._record_fingerprints(config_obj, **fingerprints)
+        print('Your app is running at {}.'.format(app_url))
+        if open_browser:
+            webbrowser.open(app_url)
+        return app_url
+
+    def plan_database_migration(self,
+                                django_directory_path: str,
+                                database_password: str,
+                                cloud_sql_proxy_path: str = 'cloud_sql_proxy',
+                                region: Optional[str] = None
+                               ) -> List[Dict[str, Any]]:
+        """Returns the migrations "update" would apply, without applying them.
+
+        Args:
+            django_directory_path: The location where the generated Django
+                project code is stored.
+            database_password: The password for the default database user.
+            cloud_sql_proxy_path: The command to run your cloud sql proxy.
+            region: Where the service is hosted. By default the region the
+                project was deployed to.
+
+        Returns:
+            The pending migrations and the sizes of the tables they touch. See
+            DatabaseClient.get_migration_plan for the format.
+
+        Raises:
+            InvalidConfigError: When failed to read required information in the
+                configuration file.
+        """
+        project_id, django_project_name = self._load_project_config(
+            django_directory_path)
+        cloud_sql_proxy_port = portpicker.pick_unused_port()
+        database_username = 'postgres'
+        sanitized_django_project_name = self._sanitize_name(django_project_name)
+        database_instance_name = sanitized_django_project_name + '-instance'
+        region = (region or
+                  config.Configuration(django_directory_path).get('region') or
+                  self._DEFAULT_REGION)
+
+        self._source_generator.setup_django_environment(
+            django_directory_path, django_project_name, database_username,
+            database_password, cloud_sql_proxy_port)
+        return self._database_workflow.get_migration_plan(
             project_id=project_id,
             instance_name=database_instance_name,
             cloud_sql_proxy_path=cloud_sql_proxy_path,
             region=region,
             port=cloud_sql_proxy_port)
 
-        print(
-            self._generate_section_header(2, 'Static Content Update',
-                                          self._TOTAL_UPDATE_STEPS))
-        self._static_content_workflow.update_static_content(
-            cloud_storage_bucket_name, static_content_dir)
-
-        print(
-            self._generate_section_header(3, 'Update Deployment',
-                                          self._TOTAL_UPDATE_STEPS))
-        app_url = self._deploygke_workflow.update_app_sync(
-            project_id, cluster_name, django_directory_path,
-            django_project_name, image_name)
-        print('Your app is running at {}.'.format(app_url))
-        if open_browser:
-            webbrowser.open(app_url)
+    @staticmethod
+    def _load_project_config(django_directory_path: str) -> Tuple[str, str]:
+        """Read information of a deployed project from its configuration file.
+
+        Args:
+            django_directory_path: The location of the Django project.
+
+        Returns:
+            The GCP project id and the Django project name.
+
+        Raises:
+            InvalidConfigError: When failed to read required information in the
+                configuration file.
+        """
+        config_obj = config.Configuration(django_directory_path)
+        project_id = config_obj.get('project_id')
+        django_project_name = config_obj.get('django_project_name')
+        if not project_id or not django_project_name:
+            raise InvalidConfigError(
+                'Configuration file in [{}] does not contain enough '
+                'information to update a Django project.'.format(
+                    django_directory_path))
+        return project_id, django_project_name
+
+    def _record_fingerprints(self, config_obj: config.Configuration,
+                             **fingerprints: str):
+        """Save fingerprints of successfully deployed inputs.
+
+        Args:
+            config_obj: Configuration of the Django project.
+            **fingerprints: Fingerprints to save, by name of the input, e.g.
+                "static".
+        """
+        deployed = config_obj.get(self._FINGERPRINTS_KEY) or {}
+        deployed.update(fingerprints)
+        config_obj.set(self._FINGERPRINTS_KEY, deployed)
+        config_obj.save()
 
     @staticmethod
     def _sanitize_name(name: str) -> str:
@@ -358,10 +653,101 @@ class WorkflowManager(object):
         return '\n**Step {} of {}: {}**\n'.format(
             str(step), total_steps, section_name)
 
+    @contextlib.contextmanager
+    def _workflow_step(self, step: int, section_name: str, total_steps: int):
+        """Print the header of a workflow step and trace the enclosed block.
+
+        Args:
+            step: Index of the step, starting from 1.
+            section_name: Title of the step.
+            total_steps: Number of steps of the workflow.
+
+        Yields:
+            The tracing span of the step.
+        """
+        print(self._generate_section_header(step, section_name, total_steps))
+        with tracing.span(
+                section_name, category='workflow', step=step) as step_span:
+            try:
+                yield step_span
+            except (KeyboardInterrupt, cancellation.CancelledError):
+                print('\nStep {} "{}" was interrupted.'.format(
+                    step, section_name))
+                raise
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _run_in_background(function: Optional[Callable[[], Any]]):
+        """Call a function in a background thread while the block runs.
+
+        Leaving the block waits for the function to finish. On Ctrl-C, the
+        function is cancelled. If the block fails, the function is cancelled
+        and its error is logged, as the block did not get to check its
+        result. Leaving the block does not wait for it then: a function that
+        already started is stopped with cancellation.cancel(), so it must be
+        cancellable (e.g. poll with cancellation.sleep) and later work in the
+        process needs cancellation.reset().
+
+        Args:
+            function: The function to call. Nothing is called if it is None.
+
+        Yields:
+            The future of the call, or None if function is None.
+        """
+        if function is None:
+            yield None
+            return
+
+        def log_error(future: futures.Future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error and not isinstance(error, cancellation.CancelledError):
+                logging.error('Background task failed: %r', error)
+
+        executor = futures.ThreadPoolExecutor(max_workers=1)
+        with cancellation.cancel_on_interrupt():
+            future = executor.submit(function)
+            try:
+                yield future
+            except BaseException:
+                if not future.cancel():
+                    future.add_done_callback(log_error)
+                    cancellation.cancel()
+                executor.shutdown(wait=False)
+                raise
+        executor.shutdown(wait=True)
+
+    @staticmethod
+    def _is_step_resumable(journal: config.Configuration, resume: bool,
+                           step: str, exists: Callable[[], bool]) -> bool:
+        """Returns whether a workflow step can be skipped when resuming.
+
+        Args:
+            journal: Configuration with the completed steps of previous runs.
+            resume: Whether the workflow is being resumed.
+            step: Name of the workflow step.
+            exists: Cheap check that the resources created by the step still
+                exist. Only called when the step completed in a previous run.
+
+        Returns:
+            True if the step completed in a previous run and its resources
+            still exist.
+        """
+        if not resume or journal.get_completed_step(step) is None:
+            return False
+        if not exists():
+            return False
+        print('Skipping, already completed by a previous run.')
+        return True
+
     def _generate_secrets(
-            self, project_id: str, database_username: str,
+            self,
+            project_id: str,
+            database_username: str,
             database_password: str,
-            required_service_accounts: Dict[str, List[Dict[str, Any]]]
+            required_service_accounts: Dict[str, List[Dict[str, Any]]],
+            journal: Optional[config.Configuration] = None
     ) -> Dict[str, Any]:
         """Generate Kubernetes secrets required for deployment.
 
@@ -370,6 +756,8 @@ class WorkflowManager(object):
             database_username: Name of the default database user.
             database_password: The password for the default database user.
             required_service_accounts: Service accounts needed by deployment.
+            journal: Configuration recording the service accounts created so
+                far. Service accounts recorded in it only get a new key.
 
         Returns:
             All secrets necessary for deployment. For example:
@@ -392,13 +780,26 @@ class WorkflowManager(object):
             self._generate_base_secrets(database_username, database_password)
         }
 
-        for _, container_secrets in required_service_accounts.items():
-            for s_a in container_secrets:
-                key_data = (self._service_account_workflow.
-                            create_service_account_and_key(
-                                project_id, s_a['id'], s_a['name'],
-                                s_a['roles']))
-                secrets[s_a['id']] = {s_a['file_name']: key_data}
+        outputs = (journal and journal.get_completed_step('service_accounts')
+                   or {})
+        created = list(outputs.get('created', []))
+
+        def record_created(service_account_id):
+            created.append(service_account_id)
+            if journal:
+                journal.complete_step('service_accounts', {'created': created})
+
+        service_accounts = [
+            s_a for container_secrets in required_service_accounts.values()
+            for s_a in container_secrets
+        ]
+        keys = self._service_account_workflow.create_service_accounts_and_keys(
+            project_id,
+            service_accounts,
+            existing_service_account_ids=list(created),
+            on_created=record_created)
+        for s_a in service_accounts:
+            secrets[s_a['id']] = {s_a['file_name']: keys[s_a['id']]}
         return secrets
 
     @staticmethod
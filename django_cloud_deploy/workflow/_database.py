@@ -13,7 +13,7 @@
 # limitations under the License.
 """Workflow for managing database of the Django app."""
 
-from typing import Callable, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from django_cloud_deploy.cloudlib import database
 
@@ -74,12 +74,23 @@ class DatabaseWorkflow(object):
             superuser_name, superuser_email, superuser_password, project_id,
             instance_name, cloud_sql_proxy_path, region, port)
 
+    def instance_exists(self, project_id: str, instance_name: str) -> bool:
+        """Returns True if the given Cloud SQL instance exists and is running.
+
+        Args:
+            project_id: GCP project id.
+            instance_name: The Cloud SQL instance name.
+        """
+        return self._database_client.instance_exists(project_id, instance_name)
+
     def migrate_database(self,
                          project_id: str,
                          instance_name: str,
                          cloud_sql_proxy_path: str = 'cloud_sql_proxy',
                          region: str = 'us-west1',
-                         port: Optional[int] = 5432):
+                         port: Optional[int] = 5432,
+                         lock_timeout: Optional[str] = None,
+                         statement_timeout: Optional[str] = None):
         """Migrate to Cloud SQL database.
 
         This function is useful for updating a deployed Django app. It should be
@@ -96,8 +107,56 @@ class DatabaseWorkflow(object):
             cloud_sql_proxy_path: The command to run your cloud sql proxy.
             region: Where the Cloud SQL instance is in.
             port: The port being forwarded by cloud sql proxy.
+            lock_timeout: Postgres "lock_timeout" to use while migrating, e.g.
+                "5s".
+            statement_timeout: Postgres "statement_timeout" to use while
+                migrating, e.g. "10min".
         """
         self._database_client.migrate_database(
+            project_id, instance_name, cloud_sql_proxy_path, region, port,
+            lock_timeout, statement_timeout)
+
+    def make_migrations(self,
+                        project_id: str,
+                        instance_name: str,
+                        cloud_sql_proxy_path: str = 'cloud_sql_proxy',
+                        region: str = 'us-west1',
+                        port: Optional[int] = 5432):
+        """Generate migration files without modifying the Cloud SQL database.
+
+        This is used when the migrations themselves are applied from inside the
+        cluster instead of through the local cloud sql proxy.
+
+        Args:
+            project_id: GCP project id.
+            instance_name: The Cloud SQL instance name of the database.
+            cloud_sql_proxy_path: The command to run your cloud sql proxy.
+            region: Where the Cloud SQL instance is in.
+            port: The port being forwarded by cloud sql proxy.
+        """
+        self._database_client.make_migrations(
+            project_id, instance_name, cloud_sql_proxy_path, region, port)
+
+    def get_migration_plan(self,
+                           project_id: str,
+                           instance_name: str,
+                           cloud_sql_proxy_path: str = 'cloud_sql_proxy',
+                           region: str = 'us-west1',
+                           port: Optional[int] = 5432) -> List[Dict[str, Any]]:
+        """Returns the pending migrations and the sizes of affected tables.
+
+        Args:
+            project_id: GCP project id.
+            instance_name: The Cloud SQL instance name of the database.
+            cloud_sql_proxy_path: The command to run your cloud sql proxy.
+            region: Where the Cloud SQL instance is in.
+            port: The port being forwarded by cloud sql proxy.
+
+        Returns:
+            The migration plan. See DatabaseClient.get_migration_plan for the
+            format.
+        """
+        return self._database_client.get_migration_plan(
             project_id, instance_name, cloud_sql_proxy_path, region, port)
 
     def with_cloud_sql_proxy(self,
@@ -13,29 +13,270 @@
 # limitations under the License.
 """Workflow for deploying a Django app to GAE."""
 
+from concurrent import futures
+import datetime
+import hashlib
 import os
+from typing import Any, Dict, Tuple
 
-import pexpect
+from django_cloud_deploy import cancellation
+from django_cloud_deploy import progress
+from django_cloud_deploy.cloudlib import app_engine
+import yaml
+
+from google.auth import credentials
+
+# Files and directories of the Django project which are not deployed. These
+# are the defaults of gcloud, plus the configuration of django-cloud-deploy.
+_IGNORED_FILES = ('.gcloudignore', '.gitignore', '.config.yaml',
+                  '.config.yaml.tmp')
+_IGNORED_DIRECTORIES = ('.git', '__pycache__')
+_IGNORED_EXTENSIONS = ('.pyc',)
+
+_SERVICE_ID = 'default'
+
+# Names of the StandardSchedulerSettings of the Admin API, by name of the
+# automatic_scaling setting in app.yaml.
+_STANDARD_SCHEDULER_SETTINGS = {
+    'min_instances': 'minInstances',
+    'max_instances': 'maxInstances',
+    'target_cpu_utilization': 'targetCpuUtilization',
+    'target_throughput_utilization': 'targetThroughputUtilization',
+}
 
 
 class DeployNewAppError(Exception):
     """A class to control the workflow for deploying an Django app to GAE."""
 
 
+def _sha1_file(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _convert_handler(handler: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a handler of app.yaml to an UrlMap of the Admin API.
+
+    Args:
+        handler: The handler, e.g. {'url': '/static', 'static_dir': 'static/'}
+
+    Returns:
+        The UrlMap. See
+        https://cloud.google.com/appengine/docs/admin-api/reference/rest/v1/apps.services.versions#urlmap
+
+    Raises:
+        DeployNewAppError: If the handler is not supported.
+    """
+    url = handler['url']
+    if 'static_dir' in handler:
+        static_dir = handler['static_dir'].rstrip('/')
+        url_map = {
+            'urlRegex': url.rstrip('/') + '/(.*)',
+            'staticFiles': {
+                'path': static_dir + r'/\1',
+                'uploadPathRegex': static_dir + '/.*'
+            }
+        }
+    elif 'static_files' in handler:
+        url_map = {
+            'urlRegex': url,
+            'staticFiles': {
+                'path': handler['static_files'],
+                'uploadPathRegex': handler['upload']
+            }
+        }
+    elif 'script' in handler:
+        url_map = {'urlRegex': url, 'script': {'scriptPath': handler['script']}}
+    else:
+        raise DeployNewAppError(
+            'Unsupported handler "{}" in app.yaml'.format(url))
+    if 'secure' in handler:
+        url_map['securityLevel'] = 'SECURE_' + handler['secure'].upper()
+    if 'login' in handler:
+        url_map['login'] = 'LOGIN_' + handler['login'].upper()
+    return url_map
+
+
+def _convert_automatic_scaling(scaling: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert automatic_scaling of app.yaml to an AutomaticScaling.
+
+    Args:
+        scaling: The automatic scaling settings, e.g. {'min_instances': 1}
+
+    Returns:
+        The AutomaticScaling. See
+        https://cloud.google.com/appengine/docs/admin-api/reference/rest/v1/apps.services.versions#automaticscaling
+
+    Raises:
+        DeployNewAppError: If a setting is not supported.
+    """
+    automatic_scaling = {}
+    scheduler_settings = {}
+    for name, value in scaling.items():
+        if name in _STANDARD_SCHEDULER_SETTINGS:
+            scheduler_settings[_STANDARD_SCHEDULER_SETTINGS[name]] = value
+        elif name == 'max_concurrent_requests':
+            automatic_scaling['maxConcurrentRequests'] = value
+        else:
+            raise DeployNewAppError(
+                'Unsupported automatic_scaling setting "{}" in app.yaml'.format(
+                    name))
+    if scheduler_settings:
+        automatic_scaling['standardSchedulerSettings'] = scheduler_settings
+    return automatic_scaling
+
+
+def _convert_app_yaml(app_yaml: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the content of app.yaml to a Version of the Admin API.
+
+    Only the settings used by the generated app.yaml are supported.
+
+    Args:
+        app_yaml: The content of app.yaml.
+
+    Returns:
+        The Version, without id and deployment. See
+        https://cloud.google.com/appengine/docs/admin-api/reference/rest/v1/apps.services.versions
+
+    Raises:
+        DeployNewAppError: If app.yaml has unsupported settings.
+    """
+    supported_keys = {
+        'runtime', 'entrypoint', 'env_variables', 'handlers', 'service',
+        'instance_class', 'automatic_scaling', 'inbound_services'
+    }
+    unsupported_keys = sorted(set(app_yaml) - supported_keys)
+    if unsupported_keys:
+        raise DeployNewAppError('Unsupported settings in app.yaml: {}'.format(
+            ', '.join(unsupported_keys)))
+
+    version = {'runtime': app_yaml['runtime'], 'env': 'standard'}
+    if 'entrypoint' in app_yaml:
+        version['entrypoint'] = {'shell': app_yaml['entrypoint']}
+    if 'instance_class' in app_yaml:
+        version['instanceClass'] = app_yaml['instance_class']
+    if 'automatic_scaling' in app_yaml:
+        version['automaticScaling'] = _convert_automatic_scaling(
+            app_yaml['automatic_scaling'])
+    if 'inbound_services' in app_yaml:
+        version['inboundServices'] = [
+            'INBOUND_SERVICE_' + service.upper()
+            for service in app_yaml['inbound_services']
+        ]
+    if 'env_variables' in app_yaml:
+        version['envVariables'] = {
+            name: str(value)
+            for name, value in app_yaml['env_variables'].items()
+        }
+    version['handlers'] = [
+        _convert_handler(handler) for handler in app_yaml.get('handlers', [])
+    ]
+    return version
+
+
 class DeploygaeWorkflow(object):
     """Workflow to deploy Django app on GAE."""
 
+    # The maximum number of files uploaded at the same time.
+    _MAX_UPLOAD_WORKERS = 16
+
+    def __init__(self, credentials: credentials.Credentials):
+        self._app_engine_client = app_engine.AppEngineClient.from_credentials(
+            credentials)
+
+    @staticmethod
+    def _build_file_manifest(
+            django_directory_path: str) -> Dict[str, Tuple[str, str]]:
+        """Find the files to deploy.
+
+        Args:
+            django_directory_path: Path where the django source files are
+                located.
+
+        Returns:
+            The SHA1 and absolute path of each file to deploy, by its path
+            relative to the Django directory.
+        """
+        manifest = {}
+        for root, dirs, files in os.walk(django_directory_path):
+            dirs[:] = [d for d in dirs if d not in _IGNORED_DIRECTORIES]
+            for name in files:
+                if name in _IGNORED_FILES or name.endswith(_IGNORED_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                relative_path = os.path.relpath(path, django_directory_path)
+                manifest[relative_path.replace(os.sep, '/')] = (
+                    _sha1_file(path), path)
+        return manifest
+
+    def _stage_files(self, bucket_name: str,
+                     manifest: Dict[str, Tuple[str, str]]):
+        """Upload the files missing from the staging bucket.
+
+        Files are named by their SHA1, so files deployed before are not
+        uploaded again.
+
+        Args:
+            bucket_name: Name of the staging bucket.
+            manifest: The files to deploy, as returned by _build_file_manifest.
+        """
+        staged = self._app_engine_client.list_staged_files(bucket_name)
+        missing = {}
+        for sha1, path in manifest.values():
+            if sha1 not in staged:
+                missing[sha1] = path
+        if not missing:
+            return
+
+        task = 'stage:{}'.format(bucket_name)
+        message = 'Uploading {} changed files'.format(len(missing))
+        total_bytes = sum(os.path.getsize(path) for path in missing.values())
+        uploaded_bytes = 0
+        with futures.ThreadPoolExecutor(
+                max_workers=self._MAX_UPLOAD_WORKERS) as executor:
+            # Leaving the executor waits for all queued uploads, so they must
+            # be cancelled before that on Ctrl-C.
+            with cancellation.cancel_on_interrupt():
+                future_to_path = {
+                    executor.submit(self._stage_file, bucket_name, sha1,
+                                    path): path
+                    for sha1, path in missing.items()
+                }
+                for future in futures.as_completed(future_to_path):
+                    future.result()
+                    uploaded_bytes += os.path.getsize(future_to_path[future])
+                    progress.report(
+                        task,
+                        message,
+                        current=uploaded_bytes,
+                        total=total_bytes,
+                        unit='B')
+        progress.report(task, message, done=True)
+
+    def _stage_file(self, bucket_name: str, sha1: str, path: str):
+        # Files still queued when the deployment is cancelled are not
+        # uploaded.
+        cancellation.check()
+        self._app_engine_client.stage_file(bucket_name, sha1, path)
+
     def deploy_gae_app(self,
                        project_id: str,
                        django_directory_path: str,
                        region: str = 'us-west2') -> str:
-        """Uses Gcloud SDK to upload to GAE.
+        """Deploy a Django app to GAE with the App Engine Admin API.
+
+        The App Engine application is created if the project does not have one
+        yet. Only files which are not in the staging bucket yet are uploaded.
 
         Args:
             project_id: GCP project id to use.
             django_directory_path: Path where the django source files are
                 located.
-            region: Region to deploy the django app.
+            region: Region to create the App Engine application in, if the
+                project does not have one yet.
 
         Raises:
             DeployNewAppError: If unable to deploy the app.
@@ -45,20 +286,43 @@ class DeploygaeWorkflow(object):
         """
 
         app_yaml_path = os.path.join(django_directory_path, 'app.yaml')
-        project = '--project={}'.format(project_id)
-        args = ['app', 'deploy', app_yaml_path, project]
-        process = pexpect.spawn('gcloud', args)
+        with open(app_yaml_path) as f:
+            app_yaml = yaml.safe_load(f)
+        version = _convert_app_yaml(app_yaml)
+        # The service is not part of the version.
+        service_id = app_yaml.get('service', _SERVICE_ID)
+
+        application = self._app_engine_client.get_application(project_id)
+        if application is None:
+            application = self._app_engine_client.create_application(
+                project_id, region)
+
+        manifest = self._build_file_manifest(django_directory_path)
+        bucket_name = application['codeBucket']
+        self._stage_files(bucket_name, manifest)
+
+        version_id = datetime.datetime.utcnow().strftime('%Y%m%dt%H%M%S')
+        version['id'] = version_id
+        version['deployment'] = {
+            'files': {
+                relative_path: {
+                    'sourceUrl': 'https://storage.googleapis.com/{}/{}'.format(
+                        bucket_name, sha1),
+                    'sha1Sum': sha1
+                } for relative_path, (sha1, _) in manifest.items()
+            }
+        }
         try:
-            index = process.expect(
-                ['\[{}\]\s*{}'.format(i, region) for i in range(1, 10)])
-            process.sendline(str(index))
-            process.expect('Do you want to continue (Y/n)?')
-            process.sendline('Y')
-            process.expect('Deployed service', timeout=600)  # 10 Min Timeout
-        except (pexpect.exceptions.TIMEOUT, pexpect.exceptions.EOF):
+            self._app_engine_client.create_version(project_id, service_id,
+                                                   version)
+            self._app_engine_client.promote_version(project_id, service_id,
+                                                    version_id)
+        except app_engine.AppEngineError as e:
             raise DeployNewAppError(
-                ('Error occured when trying to deploy GAE application. Output '
-                 'of process: \n{}').format(process.before))
-        finally:
-            process.close()
-        return 'https://{}.appspot.com/'.format(project_id)
+                'Error occured when trying to deploy GAE application: {}'
+                .format(e)) from e
+        hostname = application.get('defaultHostname',
+                                   '{}.appspot.com'.format(project_id))
+        if service_id != _SERVICE_ID:
+            hostname = '{}-dot-{}'.format(service_id, hostname)
+        return 'https://{}/'.format(hostname)
@@ -14,11 +14,17 @@
 """Workflow for deploying a Django app to GKE."""
 
 import base64
+import copy
 import os
-from typing import Dict
+import shlex
+import time
+from typing import Any, Dict, List, Optional
 import urllib.parse
 
 import backoff
+from django_cloud_deploy import cancellation
+from django_cloud_deploy import config
+from django_cloud_deploy import progress
 from django_cloud_deploy.cloudlib import container
 import kubernetes
 import yaml
@@ -31,6 +37,39 @@ class DeployNewAppError(Exception):
     pass
 
 
+class MigrationJobError(Exception):
+    """Exception raised when the database migration job fails."""
+    pass
+
+
+# The migration job reuses the pod definition of the Django app, including the
+# cloud sql proxy container. The proxy never exits by itself, which would keep
+# the job running. So the containers share an emptyDir volume: the Django
+# container creates a file in it after "migrate" finishes, and the proxy
+# container stops the proxy when the file appears.
+_MIGRATION_STATUS_VOLUME = 'migration-status'
+_MIGRATION_STATUS_DIR = '/migration-status'
+_MIGRATION_DONE_FILE = _MIGRATION_STATUS_DIR + '/done'
+
+_MIGRATION_JOB_SCRIPT = (
+    'until python -c "import socket; '
+    'socket.create_connection((\'127.0.0.1\', 5432), 1)"; do sleep 1; done; '
+    'python manage.py migrate --noinput; status=$?; '
+    'touch {done}; exit $status').format(done=_MIGRATION_DONE_FILE)
+
+# Runs the original command of a sidecar container until "migrate" finishes.
+_MIGRATION_SIDECAR_SCRIPT = (
+    '{command} & pid=$!; '
+    'until [ -f {done} ]; do sleep 1; done; '
+    'kill $pid')
+
+# Number of lines of the log of a failed migration job to report.
+_MIGRATION_LOG_LINES = 50
+
+# Maximum time in seconds to wait for the database migration job.
+_MIGRATION_JOB_TIMEOUT = 3600
+
+
 class DeploygkeWorkflow(object):
     """A class to control the workflow for deploying an Django app to GKE."""
 
@@ -47,7 +86,9 @@ class DeploygkeWorkflow(object):
                             image_name: str,
                             secrets: Dict[str, Dict[str, str]],
                             region: str = 'us-west1',
-                            zone: str = 'us-west1-a') -> str:
+                            zones: Optional[List[str]] = None,
+                            journal: Optional[config.Configuration] = None,
+                            resume: bool = False) -> str:
         """Deploy a Django app to gke.
 
         Args:
@@ -57,9 +98,14 @@ class DeploygkeWorkflow(object):
             app_name: Name of the Django app.
             image_name: Tag of the docker image of the app.
             secrets: Secrets necessary to run the app.
-            region: Where do you want to host the cluster.
-            zone: Name of the Google Compute Engine zone in which the cluster
-                resides.
+            region: Where do you want to host the cluster. Should be the
+                region of the Cloud SQL instance of the app.
+            zones: Zones of the region to spread the nodes of the cluster
+                across. By default GKE picks three zones of the region.
+            journal: Configuration to record the created cluster and the pushed
+                image in.
+            resume: Whether to reuse the cluster recorded in "journal" by a
+                previous run, if it still exists.
 
         Raises:
             DeployNewAppError: If unable to deploy the app.
@@ -68,13 +114,28 @@ class DeploygkeWorkflow(object):
             The url of the deployed Django app.
         """
 
-        self._container_client.create_cluster_sync(project_id, cluster_name,
-                                                   region, zone)
+        cluster_outputs = journal and journal.get_completed_step('cluster')
+        if not (resume and cluster_outputs and
+                self._container_client.cluster_exists(project_id, cluster_name,
+                                                       region)):
+            self._container_client.create_cluster_sync(project_id,
+                                                       cluster_name, region,
+                                                       zones)
+            if journal:
+                journal.complete_step('cluster', {
+                    'cluster_name': cluster_name,
+                    'location': region
+                })
         self._container_client.build_docker_image(image_name, app_directory)
-        self._container_client.push_docker_image(image_name)
+        digest = self._container_client.push_docker_image(image_name)
+        if journal:
+            journal.complete_step('image', {
+                'image': image_name,
+                'digest': digest
+            })
         yaml_file_path = os.path.join(app_directory, app_name + '.yaml')
         with open(yaml_file_path) as yaml_file:
-            for data in yaml.load_all(yaml_file):
+            for data in yaml.safe_load_all(yaml_file):
                 if data['kind'] == 'Deployment':
                     deployment_data = data
                 elif data['kind'] == 'Service':
@@ -87,7 +148,13 @@ class DeploygkeWorkflow(object):
                 ('Invalid kubernetes configuration file for Django app '
                  '"{}" in "{}"').format(app_name, app_directory))
         kube_config = self._container_client.create_kubernetes_configuration(
-            self._credentials, project_id, cluster_name, zone)
+            self._credentials, project_id, cluster_name, region)
+        if journal:
+            journal.complete_step('cluster', {
+                'cluster_name': cluster_name,
+                'location': region,
+                'endpoint': kube_config.host
+            })
         for secret_name, secret in secrets.items():
             for key, value in secret.items():
                 if isinstance(value, str):
@@ -114,7 +181,10 @@ class DeploygkeWorkflow(object):
                         app_directory: str,
                         app_name: str,
                         image_name: str,
-                        zone: str = 'us-west1-a') -> str:
+                        location: str = 'us-west1',
+                        migrate_in_cluster: bool = False,
+                        lock_timeout: Optional[str] = None,
+                        statement_timeout: Optional[str] = None) -> str:
         """Update an existing Django app on gke.
 
         Args:
@@ -123,11 +193,19 @@ class DeploygkeWorkflow(object):
             app_directory: Absolute path of the directory of your Django app.
             app_name: Name of the Django app.
             image_name: Tag of the docker image of the app.
-            zone: Name of the Google Compute Engine zone in which the cluster
-                resides.
+            location: The region of a regional cluster, or the zone of a zonal
+                cluster.
+            migrate_in_cluster: Whether to apply database migrations with a
+                one-off Kubernetes Job running the new image before the
+                deployment is updated.
+            lock_timeout: Postgres "lock_timeout" for the migration job, e.g.
+                "5s".
+            statement_timeout: Postgres "statement_timeout" for the migration
+                job, e.g. "10min".
 
         Raises:
             DeployNewAppError: If unable to deploy the app.
+            MigrationJobError: If the database migration job fails.
 
         Returns:
             The url of the deployed Django app.
@@ -136,7 +214,7 @@ class DeploygkeWorkflow(object):
         self._container_client.push_docker_image(image_name)
         yaml_file_path = os.path.join(app_directory, app_name + '.yaml')
         with open(yaml_file_path) as yaml_file:
-            for data in yaml.load_all(yaml_file):
+            for data in yaml.safe_load_all(yaml_file):
                 if data['kind'] == 'Deployment':
                     deployment_data = data
 
@@ -147,7 +225,10 @@ class DeploygkeWorkflow(object):
                 ('Invalid kubernetes configuration file for Django app '
                  '"{}" in "{}"').format(app_name, app_directory))
         kube_config = self._container_client.create_kubernetes_configuration(
-            self._credentials, project_id, cluster_name, zone)
+            self._credentials, project_id, cluster_name, location)
+        if migrate_in_cluster:
+            self._run_migration_job(kube_config, app_name, deployment_data,
+                                    lock_timeout, statement_timeout)
         self._container_client.update_deployment(deployment_data, kube_config)
         self._wait_for_deployment_ready(kube_config, app_name)
         ingress_url = self._get_ingress_url(kube_config)
@@ -172,6 +253,7 @@ class DeploygkeWorkflow(object):
     @backoff.on_predicate(backoff.constant, interval=0.5)
     def _try_get_ingress_url(self, api: kubernetes.client.CoreV1Api) -> str:
         """Return Ingress url when service is ready."""
+        cancellation.check()
         items = api.list_service_for_all_namespaces().items
         for item in items:
             ingress = item.status.load_balancer.ingress
@@ -203,9 +285,17 @@ class DeploygkeWorkflow(object):
                                 api: kubernetes.client.ExtensionsV1beta1Api,
                                 label_selector: str) -> int:
         """Return ready replicas when deployment is ready."""
+        cancellation.check()
         items = api.list_deployment_for_all_namespaces(
             label_selector=label_selector).items
         for item in items:
+            progress.report(
+                'rollout:{}'.format(item.metadata.name),
+                'Rolling out deployment "{}"'.format(item.metadata.name),
+                current=item.status.ready_replicas or 0,
+                total=item.spec.replicas,
+                unit='replicas',
+                done=bool(item.status.ready_replicas))
             if item.status.ready_replicas:
                 return item.status.ready_replicas
 
@@ -213,3 +303,189 @@ class DeploygkeWorkflow(object):
         # until it gets a non-falsey result. Return value of 0 means that the
         # deployment is not ready yet.
         return 0
+
+    def _run_migration_job(self,
+                           kube_config: kubernetes.client.Configuration,
+                           app_name: str,
+                           deployment_data: Dict[str, Any],
+                           lock_timeout: Optional[str] = None,
+                           statement_timeout: Optional[str] = None):
+        """Apply database migrations with a one-off Kubernetes Job.
+
+        The job runs inside the cluster, next to the Cloud SQL instance, so
+        long running migrations do not depend on the local network.
+
+        Args:
+            kube_config: A kubernetes configuration which has access to the
+                given cluster.
+            app_name: Name of the Django app.
+            deployment_data: Definition of the deployment of the Django app.
+            lock_timeout: Postgres "lock_timeout" to use while migrating.
+            statement_timeout: Postgres "statement_timeout" to use while
+                migrating.
+
+        Raises:
+            MigrationJobError: If the migration job fails or times out.
+        """
+        job_data = self._generate_migration_job(
+            app_name, deployment_data, lock_timeout, statement_timeout)
+        job_name = job_data['metadata']['name']
+        container_name = self._get_app_container_name(app_name)
+        self._container_client.create_job(job_data, kube_config)
+        try:
+            result = self._try_get_migration_result(kube_config, job_name,
+                                                    container_name)
+            if not result or result.exit_code != 0:
+                # Deleting the job deletes its pods and their logs.
+                logs = self._get_migration_logs(kube_config, job_name,
+                                                container_name)
+        finally:
+            self._container_client.delete_job(job_name, kube_config)
+        if not result:
+            raise MigrationJobError(
+                'Database migration job "{}" did not finish in {} seconds.\n{}'.
+                format(job_name, _MIGRATION_JOB_TIMEOUT, logs))
+        if result.exit_code != 0:
+            raise MigrationJobError(
+                'Database migration job "{}" failed with exit code {}: {}\n{}'.
+                format(job_name, result.exit_code, result.message or
+                       result.reason, logs))
+
+    def _get_migration_logs(self, kube_config: kubernetes.client.Configuration,
+                            job_name: str, container_name: str) -> str:
+        """Returns the end of the log of the migration container.
+
+        Args:
+            kube_config: A kubernetes configuration which has access to the
+                given cluster.
+            job_name: Name of the migration job.
+            container_name: Name of the container running "migrate".
+
+        Returns:
+            The last lines of the log, or an empty string if it cannot be
+            read.
+        """
+        logs = []
+        try:
+            for pod in self._container_client.list_job_pods(
+                    job_name, kube_config):
+                logs.append(
+                    self._container_client.read_pod_log(
+                        pod.metadata.name,
+                        container_name,
+                        kube_config,
+                        tail_lines=_MIGRATION_LOG_LINES))
+        except kubernetes.client.rest.ApiException:
+            # The pod may not have started, e.g. if the image cannot be
+            # pulled. The error message is more useful than nothing.
+            pass
+        return ''.join(logs)
+
+    @staticmethod
+    def _get_app_container_name(app_name: str) -> str:
+        # This is the name of the Django container in the generated yaml file.
+        return app_name + '-app'
+
+    @classmethod
+    def _generate_migration_job(
+            cls,
+            app_name: str,
+            deployment_data: Dict[str, Any],
+            lock_timeout: Optional[str] = None,
+            statement_timeout: Optional[str] = None) -> Dict[str, Any]:
+        """Generate a Kubernetes Job definition which runs "migrate".
+
+        Args:
+            app_name: Name of the Django app.
+            deployment_data: Definition of the deployment of the Django app.
+            lock_timeout: Postgres "lock_timeout" to use while migrating.
+            statement_timeout: Postgres "statement_timeout" to use while
+                migrating.
+
+        Returns:
+            Definition of the job.
+        """
+        pod_spec = copy.deepcopy(deployment_data['spec']['template']['spec'])
+        pod_spec['restartPolicy'] = 'Never'
+        pod_spec.setdefault('volumes', []).append({
+            'name': _MIGRATION_STATUS_VOLUME,
+            'emptyDir': {}
+        })
+        container_name = cls._get_app_container_name(app_name)
+        for container in pod_spec['containers']:
+            if container['name'] == container_name:
+                app_container = container
+                break
+        else:
+            app_container = pod_spec['containers'][0]
+        for container in pod_spec['containers']:
+            container.setdefault('volumeMounts', []).append({
+                'name': _MIGRATION_STATUS_VOLUME,
+                'mountPath': _MIGRATION_STATUS_DIR
+            })
+            if container is not app_container and container.get('command'):
+                command = ' '.join(
+                    shlex.quote(arg) for arg in container['command'])
+                container['command'] = [
+                    '/bin/sh', '-c',
+                    _MIGRATION_SIDECAR_SCRIPT.format(
+                        command=command, done=_MIGRATION_DONE_FILE)
+                ]
+        app_container.pop('ports', None)
+        app_container['command'] = ['/bin/sh', '-c', _MIGRATION_JOB_SCRIPT]
+
+        # libpq reads session settings from PGOPTIONS, so every connection
+        # opened by "migrate" gets the timeouts.
+        pg_options = []
+        if lock_timeout:
+            pg_options.append('-c lock_timeout={}'.format(lock_timeout))
+        if statement_timeout:
+            pg_options.append(
+                '-c statement_timeout={}'.format(statement_timeout))
+        if pg_options:
+            app_container.setdefault('env', []).append({
+                'name': 'PGOPTIONS',
+                'value': ' '.join(pg_options)
+            })
+
+        # The label must differ from the app label. Otherwise the service of
+        # the app would route traffic to the job.
+        labels = {'app': app_name + '-migrate'}
+        return {
+            'apiVersion': 'batch/v1',
+            'kind': 'Job',
+            'metadata': {
+                'name': '{}-migrate-{}'.format(app_name, int(time.time())),
+                'labels': labels
+            },
+            'spec': {
+                'backoffLimit': 0,
+                'activeDeadlineSeconds': _MIGRATION_JOB_TIMEOUT,
+                'template': {
+                    'metadata': {
+                        'labels': labels
+                    },
+                    'spec': pod_spec
+                }
+            }
+        }
+
+    @backoff.on_predicate(
+        backoff.constant, interval=2, max_time=_MIGRATION_JOB_TIMEOUT)
+    def _try_get_migration_result(
+            self, kube_config: kubernetes.client.Configuration, job_name: str,
+            container_name: str
+    ) -> Optional[kubernetes.client.V1ContainerStateTerminated]:
+        """Return the terminated state of the migration container when done."""
+        cancellation.check()
+        pods = self._container_client.list_job_pods(job_name, kube_config)
+        for pod in pods:
+            for container_status in pod.status.container_statuses or []:
+                if (container_status.name == container_name and
+                        container_status.state.terminated):
+                    return container_status.state.terminated
+
+        # @backoff.on_predicate(backoff.constant) will keep running this method
+        # until it gets a non-falsey result. Return value of None means that the
+        # migration is still running.
+        return None
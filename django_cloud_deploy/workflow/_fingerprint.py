@@ -0,0 +1,142 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Fingerprints of the inputs of each stage of deploying a Django project.
+
+A stage whose fingerprint matches the one recorded at the last successful
+deployment has nothing to do and can be skipped.
+"""
+
+import hashlib
+import os
+from typing import Callable, Iterable, Tuple
+
+# Files and directories in the Django project directory which are not inputs of
+# the docker image. ".config.yaml" changes on every deployment and "static" is
+# the output of collectstatic; static files are served from GCS.
+_BUILD_CONTEXT_EXCLUDES = ('.config.yaml', '.config.yaml.tmp', 'static')
+_IGNORED_DIRECTORIES = ('__pycache__', '.git')
+_IGNORED_EXTENSIONS = ('.pyc',)
+
+
+def _hash_files(files: Iterable[Tuple[str, str]]) -> str:
+    """Hash the names and contents of the given files.
+
+    Args:
+        files: Pairs of the name to hash the file under and the absolute path
+            of the file.
+
+    Returns:
+        The hex digest of the files.
+    """
+    digest = hashlib.sha256()
+    for name, path in sorted(files):
+        digest.update(name.encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _walk_files(directory: str,
+                include: Callable[[str], bool]) -> Iterable[Tuple[str, str]]:
+    """Yield files under the given directory, skipping generated files.
+
+    Args:
+        directory: Absolute path of the directory to walk.
+        include: Called with the path of each file, relative to "directory".
+            The file is yielded if it returns True.
+
+    Yields:
+        Pairs of the path of a file relative to "directory" and its absolute
+        path.
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if d not in _IGNORED_DIRECTORIES]
+        for name in files:
+            if name.endswith(_IGNORED_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            relative_path = os.path.relpath(path, directory)
+            if include(relative_path):
+                yield relative_path, path
+
+
+def migrations_fingerprint(project_dir: str) -> str:
+    """Fingerprint the inputs of database migrations of a Django project.
+
+    These are the migration files and the models they are generated from.
+
+    Args:
+        project_dir: Absolute path of the Django project directory.
+
+    Returns:
+        The fingerprint of the migrations.
+    """
+
+    def is_migration_input(relative_path):
+        parts = relative_path.split(os.sep)
+        return ('migrations' in parts[:-1] or 'models' in parts[:-1] or
+                parts[-1] == 'models.py')
+
+    return _hash_files(_walk_files(project_dir, is_migration_input))
+
+
+def static_fingerprint() -> str:
+    """Fingerprint the static files collectstatic would collect.
+
+    The files are found with the static files finders of Django, so this
+    includes static files of installed apps like the Django admin. This
+    function should be called only after django.setup() is called.
+
+    Returns:
+        The fingerprint of the static files.
+    """
+    # Imported here because Django settings must be configured first.
+    from django.contrib.staticfiles import finders
+
+    files = []
+    for finder in finders.get_finders():
+        for relative_path, storage in finder.list([]):
+            files.append((relative_path, storage.path(relative_path)))
+    return _hash_files(files)
+
+
+def build_context_fingerprint(project_dir: str) -> str:
+    """Fingerprint the docker build context of a Django project.
+
+    Args:
+        project_dir: Absolute path of the Django project directory.
+
+    Returns:
+        The fingerprint of the build context.
+    """
+
+    def is_build_input(relative_path):
+        return relative_path.split(os.sep)[0] not in _BUILD_CONTEXT_EXCLUDES
+
+    return _hash_files(_walk_files(project_dir, is_build_input))
+
+
+def requirements_fingerprint(project_dir: str) -> str:
+    """Fingerprint the requirements file of a Django project.
+
+    Args:
+        project_dir: Absolute path of the Django project directory.
+
+    Returns:
+        The fingerprint of requirements.txt.
+    """
+    path = os.path.join(project_dir, 'requirements.txt')
+    if not os.path.exists(path):
+        return _hash_files([])
+    return _hash_files([('requirements.txt', path)])
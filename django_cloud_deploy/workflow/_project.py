@@ -63,13 +63,20 @@ class ProjectWorkflow(object):
                 the active project of gcloud but the project does not exist.
         """
 
+        if project_creation == CreationMode.CREATE:
+            # Creating the project fails if it exists, so checking first would
+            # only cost a round trip.
+            try:
+                self._project_client.create_and_set_project(
+                    project_id, project_name)
+            except project.ProjectExistsError as e:
+                raise ProjectExistsError(
+                    'project {!r} already exists'.format(project_id)) from e
+            return
+
         exists = self._project_client.project_exists(project_id)
         if exists:
-            if project_creation == CreationMode.CREATE:
-                raise ProjectExistsError(
-                    'project {!r} already exists'.format(project_id))
-            else:
-                self._project_client.set_existing_project(project_id)
+            self._project_client.set_existing_project(project_id)
         else:
             if project_creation == CreationMode.MUST_EXIST:
                 raise ProjectionCreationError(
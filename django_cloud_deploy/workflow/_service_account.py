@@ -13,10 +13,12 @@
 # limitations under the License.
 """Workflow for creating service accounts and generating keys."""
 
+from concurrent import futures
 import json
 import os
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+from django_cloud_deploy import cancellation
 from django_cloud_deploy.cloudlib import service_account
 
 from google.auth import credentials
@@ -25,6 +27,9 @@ from google.auth import credentials
 class ServiceAccountKeyGenerationWorkflow(object):
     """A class to control the generation of service account keys."""
 
+    # The maximum number of service accounts created at the same time.
+    _MAX_WORKERS = 8
+
     def __init__(self, credentials: credentials.Credentials):
         self._service_account_client = (
             service_account.ServiceAccountClient.from_credentials(credentials))
@@ -65,6 +70,93 @@ class ServiceAccountKeyGenerationWorkflow(object):
             project_id, service_account_id)
         return key_data
 
+    def create_service_accounts_and_keys(
+            self,
+            project_id: str,
+            service_accounts: List[Dict[str, Any]],
+            existing_service_account_ids: Iterable[str] = (),
+            on_created: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, str]:
+        """Create service accounts and get their keys, concurrently.
+
+        The roles of all service accounts are granted with a single update of
+        the IAM policy of the project, at the end.
+
+        Args:
+            project_id: GCP project id you want to create the service accounts
+                in.
+            service_accounts: The service accounts to create. Each of them is a
+                dictionary with the keys "id", "name" and "roles", as loaded by
+                "load_service_accounts".
+            existing_service_account_ids: Ids of service accounts known to
+                exist already. They are not created again, but still get their
+                roles and a new key. Other existing service accounts are
+                reused as well, at the cost of a failed creation request.
+            on_created: Called in the calling thread with the id of each
+                service account created.
+
+        Returns:
+            The key content of each service account, by service account id.
+            See "create_service_account_and_key" for the format.
+        """
+        existing_service_account_ids = set(existing_service_account_ids)
+        keys = {}
+        with self._service_account_client.iam_policy_update(
+                project_id) as policy_update:
+            with futures.ThreadPoolExecutor(
+                    max_workers=self._MAX_WORKERS) as executor:
+                # Leaving the executor waits for all queued tasks, so they
+                # must be cancelled before that on Ctrl-C.
+                with cancellation.cancel_on_interrupt():
+                    future_to_id = {
+                        executor.submit(
+                            self._create_service_account_and_key, project_id,
+                            s_a, s_a['id'] in existing_service_account_ids,
+                            policy_update): s_a['id']
+                        for s_a in service_accounts
+                    }
+                    for future in futures.as_completed(future_to_id):
+                        service_account_id = future_to_id[future]
+                        created, keys[service_account_id] = future.result()
+                        if created and on_created:
+                            on_created(service_account_id)
+        return keys
+
+    def _create_service_account_and_key(
+            self, project_id: str, service_account: Dict[str, Any],
+            exists: bool, policy_update: service_account.IamPolicyUpdate
+    ) -> Tuple[bool, str]:
+        """Create a service account, unless it exists, and a key of it.
+
+        Args:
+            project_id: GCP project id of the service account.
+            service_account: The service account to create. See
+                "create_service_accounts_and_keys".
+            exists: Whether the service account is known to exist already.
+            policy_update: The IAM policy update to add the roles of the
+                service account to.
+
+        Returns:
+            Whether the service account was created, and the key content.
+        """
+        # Service accounts still queued when the deployment is cancelled are
+        # not created.
+        cancellation.check()
+        created = False
+        if exists:
+            policy_update.add_service_account_roles(service_account['id'],
+                                                    service_account['roles'])
+        else:
+            created = self._service_account_client.create_service_account(
+                project_id,
+                service_account['id'],
+                service_account['name'],
+                service_account['roles'],
+                policy_update=policy_update)
+        key_data = self._service_account_client.create_key(
+            project_id, service_account['id'])
+        return created, key_data
+
     @staticmethod
     def load_service_accounts() -> List[Dict[str, Any]]:
         """Load information of the service accounts to create from a json file.
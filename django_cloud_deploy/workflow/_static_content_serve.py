@@ -13,10 +13,16 @@
 # limitations under the License.
 """Workflow for serving static content of Django projects."""
 
+from typing import Optional
+
+from django_cloud_deploy.cloudlib import cdn
 from django_cloud_deploy.cloudlib import static_content_serve
 
 from google.auth import credentials
 
+# Browsers and CDN edge caches may keep static files for an hour.
+_STATIC_CACHE_CONTROL = 'public, max-age=3600'
+
 
 class StaticContentServeWorkflow(object):
     """A class to control the workflow of serving static content."""
@@ -25,25 +31,52 @@ class StaticContentServeWorkflow(object):
         self._static_content_serve_client = (
             static_content_serve.StaticContentServeClient.from_credentials(
                 credentials))
+        self._cdn_client = cdn.CdnClient.from_credentials(credentials)
 
-    def serve_static_content(self, project_id: str, bucket_name: str,
-                             static_content_dir: str):
+    def serve_static_content(self,
+                             project_id: str,
+                             bucket_name: str,
+                             static_content_dir: str,
+                             bucket_location: Optional[str] = None,
+                             enable_cdn: bool = False) -> Optional[str]:
         """Do all the work for serving static content of the provided project.
 
-        The static content is served with a public Google Cloud Storage Bucket.
+        The static content is served with a public Google Cloud Storage Bucket,
+        optionally through Cloud CDN.
 
         Args:
             project_id: Id of GCP project.
             bucket_name: Name of the bucket to create and serve static content.
             static_content_dir: Absolute path of the directory for static
                 content.
+            bucket_location: Location of the bucket, e.g. the "US"
+                multi-region or the "NAM4" dual-region.
+            enable_cdn: Whether to serve the bucket through Cloud CDN.
+
+        Returns:
+            The URL of the static content when it is served through Cloud CDN,
+            None otherwise.
         """
 
         self._static_content_serve_client.collect_static_content()
-        self._static_content_serve_client.create_bucket(project_id, bucket_name)
-        self._static_content_serve_client.make_bucket_public(bucket_name)
+        self._static_content_serve_client.provision_bucket(
+            project_id, bucket_name, bucket_location, public=True)
         self._static_content_serve_client.upload_content(
-            bucket_name, static_content_dir)
+            bucket_name, static_content_dir,
+            cache_control=_STATIC_CACHE_CONTROL)
+        if not enable_cdn:
+            return None
+        address = self._cdn_client.serve_bucket_sync(project_id, bucket_name)
+        return 'http://{}/{}/'.format(
+            address, static_content_serve.StaticContentServeClient.GCS_ROOT)
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        """Returns True if the given bucket exists and we have access to it.
+
+        Args:
+            bucket_name: Name of the bucket.
+        """
+        return self._static_content_serve_client.bucket_exists(bucket_name)
 
     def serve_secret_content(self, project_id: str, bucket_name: str,
                              secrec_content_dir: str):
@@ -58,7 +91,8 @@ class StaticContentServeWorkflow(object):
                 content.
         """
 
-        self._static_content_serve_client.create_bucket(project_id, bucket_name)
+        self._static_content_serve_client.provision_bucket(
+            project_id, bucket_name)
         self._static_content_serve_client.upload_content(
             bucket_name, secrec_content_dir, folder_root='secrets')
 
@@ -72,4 +106,16 @@ class StaticContentServeWorkflow(object):
         """
         self._static_content_serve_client.collect_static_content()
         self._static_content_serve_client.upload_content(
-            bucket_name, static_content_dir)
+            bucket_name, static_content_dir,
+            cache_control=_STATIC_CACHE_CONTROL)
+
+    def invalidate_cdn_cache(self, project_id: str, bucket_name: str):
+        """Make Cloud CDN serve the latest static content of the bucket.
+
+        Args:
+            project_id: Id of GCP project.
+            bucket_name: Name of the bucket serving static content.
+        """
+        self._cdn_client.invalidate_cache(
+            project_id, bucket_name, '/{}/*'.format(
+                static_content_serve.StaticContentServeClient.GCS_ROOT))